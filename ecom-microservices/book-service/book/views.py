@@ -1,6 +1,7 @@
 # book/views.py
 import logging
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.conf import settings
 import requests
@@ -77,4 +78,12 @@ class BookViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": error_msg},
                 status=status.HTTP_400_BAD_REQUEST
-            )
\ No newline at end of file
+            )
+
+    @action(detail=False, methods=["get"])
+    def batch(self, request):
+        """Lấy thông tin sách của nhiều sản phẩm: ?ids=product_id1,product_id2"""
+        ids = [i for i in request.query_params.get("ids", "").split(",") if i]
+        books = Book.objects.filter(product_id__in=ids)
+        serializer = self.get_serializer(books, many=True)
+        return Response(serializer.data)
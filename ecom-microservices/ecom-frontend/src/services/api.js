@@ -123,7 +123,8 @@ export const productService = {
       { id: 'panasonic', name: 'Panasonic' }
     ]
   }),
-  searchProducts: (query) => api.get('/api/products/', { params: { search: query } }),
+  searchProducts: ({ query, ...params }) => api.get('/api/products/search/', { params: { q: query, ...params } }),
+  autocompleteProducts: (query) => api.get('/api/products/autocomplete/', { params: { q: query } }),
   getRelatedProducts: (productId) => api.get(`/api/products/${productId}/related/`),
   filterProducts: (filters) => {
     // Convert filters to API parameters
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ProductConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'product'
+
+    def ready(self):
+        from . import categories, details, inventory, list_cache, related, search
+        categories.connect_signals()
+        details.connect_signals()
+        list_cache.connect_signals()
+        related.connect_signals()
+        search.connect_signals()
+        # Trả hàng của các lần giữ quá hạn ngay cả khi process chưa nhận lần giữ hàng nào
+        inventory.start_sweeper()
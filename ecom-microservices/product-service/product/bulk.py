@@ -0,0 +1,202 @@
+"""
+Cập nhật sản phẩm hàng loạt bằng MongoDB bulk_write.
+
+Toàn bộ dữ liệu được kiểm tra trước (một truy vấn $in để đọc các sản phẩm hiện có, serializer
+dùng lại cho mọi item), sau đó thay đổi được ghi bằng các lệnh bulk_write $set theo lô.
+Cây danh mục, chỉ mục tìm kiếm và cache chi tiết được cập nhật một lần cho cả lô thay vì theo
+tín hiệu save() của từng sản phẩm.
+"""
+
+import logging
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.utils import timezone
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from rest_framework.validators import UniqueValidator
+
+from . import categories, details, list_cache, related, search
+from .models import Product, normalize_category_path
+from .mongo import products_collection
+from .serializers import ProductSerializer
+
+logger = logging.getLogger(__name__)
+
+# Số lệnh mỗi lần gọi bulk_write
+BULK_WRITE_BATCH_SIZE = getattr(settings, 'BULK_WRITE_BATCH_SIZE', 1000)
+# Số ID mỗi truy vấn $in khi đọc các sản phẩm hiện có
+_LOOKUP_CHUNK_SIZE = 1000
+
+UPDATED = 'updated'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class _BulkValidator:
+    """
+    Một ProductSerializer dùng lại cho mọi item thay vì dựng serializer mới mỗi lần
+
+    Kiểm tra trùng sku được bỏ khỏi serializer (mỗi item một truy vấn); unique index của sku sẽ
+    báo lỗi trùng cho từng item khi ghi.
+    """
+
+    def __init__(self):
+        self.serializer = ProductSerializer(partial=True)
+        sku = self.serializer.fields['sku']
+        sku.validators = [v for v in sku.validators if not isinstance(v, UniqueValidator)]
+
+    def validate(self, instance, data):
+        serializer = self.serializer
+        serializer.instance = instance
+        serializer.initial_data = data
+        for attr in ('_validated_data', '_errors', '_data'):
+            serializer.__dict__.pop(attr, None)
+        if serializer.is_valid():
+            return serializer.validated_data, None
+        return None, serializer.errors
+
+
+def _load_products(object_ids):
+    products = {}
+    for start in range(0, len(object_ids), _LOOKUP_CHUNK_SIZE):
+        for product in Product.objects.filter(_id__in=object_ids[start:start + _LOOKUP_CHUNK_SIZE]):
+            products[product._id] = product
+    return products
+
+
+def bulk_update_products(items, ordered=True):
+    """
+    Kiểm tra và ghi hàng loạt cập nhật sản phẩm
+
+    Args:
+        items (list): Các dict cập nhật một phần, mỗi dict có `_id`
+        ordered (bool): True: có lỗi kiểm tra thì không ghi gì, lỗi khi ghi thì dừng ở item lỗi;
+            False: ghi mọi item hợp lệ, bỏ qua item lỗi
+
+    Returns:
+        dict: Số item đã cập nhật, lỗi và kết quả của từng item (theo thứ tự gửi lên)
+    """
+    results = [None] * len(items)
+    object_ids = {}
+    for index, item in enumerate(items):
+        try:
+            object_ids[index] = ObjectId(str(item["_id"]))
+        except (KeyError, TypeError, InvalidId):
+            results[index] = {"status": INVALID, "errors": {"_id": ["Invalid or missing _id"]}}
+
+    existing = _load_products(list(set(object_ids.values())))
+    validator = _BulkValidator()
+    now = timezone.now()
+    operations = []      # (index, UpdateOne)
+    changed = {}         # index -> (sản phẩm trước khi sửa, các trường mới)
+
+    for index, object_id in object_ids.items():
+        product = existing.get(object_id)
+        if product is None:
+            results[index] = {"status": NOT_FOUND}
+            continue
+        data = {key: value for key, value in items[index].items() if key != "_id"}
+        validated, errors = validator.validate(product, data)
+        if errors:
+            results[index] = {"status": INVALID, "errors": errors}
+            continue
+
+        if "product_type" in validated or "category_path" in validated:
+            validated["category_path"] = normalize_category_path(
+                validated.get("product_type", product.product_type),
+                list(validated.get("category_path", product.category_path)),
+                validated.get("name", product.name),
+            )
+        fields = {**validated, "updated_at": now}
+        operations.append((index, UpdateOne({"_id": object_id}, {"$set": fields})))
+        changed[index] = (product, fields)
+
+    has_errors = any(result is not None and result["status"] != NOT_FOUND for result in results)
+    if ordered and has_errors:
+        # Chế độ ordered: không ghi gì khi còn item không hợp lệ
+        for index, _ in operations:
+            results[index] = {"status": SKIPPED}
+        operations = []
+
+    written = _write(operations, ordered, results)
+    try:
+        _after_write([changed[index] for index in written])
+    except Exception as e:
+        logger.error(f"Error refreshing caches after bulk product update: {str(e)}")
+
+    for index, result in enumerate(results):
+        result["index"] = index
+        if index in object_ids:
+            result["_id"] = str(object_ids[index])
+    return {
+        "ordered": ordered,
+        "updated": len(written),
+        "not_updated": sum(1 for result in results if result["status"] != UPDATED),
+        "results": results,
+    }
+
+
+def _write(operations, ordered, results):
+    """Ghi các lệnh theo lô; trả về index các item đã ghi thành công"""
+    written = []
+    for start in range(0, len(operations), BULK_WRITE_BATCH_SIZE):
+        batch = operations[start:start + BULK_WRITE_BATCH_SIZE]
+        failed = {}
+        try:
+            products_collection().bulk_write([op for _, op in batch], ordered=ordered)
+        except BulkWriteError as e:
+            failed = {error["index"]: error.get("errmsg", "Write error") for error in e.details.get("writeErrors", [])}
+        except Exception as e:
+            # Lỗi kết nối/timeout...: không biết lệnh nào của lô đã được ghi, coi cả lô và các lô
+            # còn lại là lỗi; các item đã ghi ở lô trước vẫn được cập nhật cache/chỉ mục
+            logger.error(f"Error writing bulk product update batch: {str(e)}")
+            for index, _ in operations[start:]:
+                results[index] = {"status": FAILED, "errors": {"non_field_errors": [f"Write error: {str(e)}"]}}
+            break
+
+        for position, (index, _) in enumerate(batch):
+            if position in failed:
+                results[index] = {"status": FAILED, "errors": {"non_field_errors": [failed[position]]}}
+            elif ordered and failed and position > min(failed):
+                # bulk_write ordered dừng ở lệnh lỗi đầu tiên
+                results[index] = {"status": SKIPPED}
+            else:
+                results[index] = {"status": UPDATED}
+                written.append(index)
+
+        if ordered and failed:
+            for index, _ in operations[start + len(batch):]:
+                results[index] = {"status": SKIPPED}
+            break
+    return written
+
+
+def _after_write(changes):
+    """Cập nhật cây danh mục, chỉ mục tìm kiếm, sản phẩm liên quan và các cache một lần cho cả lô"""
+    if not changes:
+        return
+
+    removed, added, updated, related_changed = [], [], [], []
+    for product, fields in changes:
+        old_keys = categories.category_keys(product.product_type, product.category_path)
+        for name, value in fields.items():
+            setattr(product, name, value)
+        new_keys = categories.category_keys(product.product_type, product.category_path)
+        removed.extend(old_keys - new_keys)
+        added.extend(new_keys - old_keys)
+        updated.append(product)
+        if {"tags", "category_path", "product_type"} & fields.keys():
+            related_changed.append(product._id)
+
+    try:
+        categories.apply_delta(removed=removed, added=added)
+    except Exception as e:
+        logger.error(f"Error updating category counts after bulk update: {str(e)}")
+    search.reindex_products(updated)
+    details.invalidate_details_many([product._id for product in updated])
+    list_cache.bump_generation()
+    related.refresh_products_async(related_changed)
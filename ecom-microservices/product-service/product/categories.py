@@ -0,0 +1,203 @@
+"""
+Cây danh mục sản phẩm được vật chất hóa (materialized) kèm số lượng.
+
+Số sản phẩm của mỗi danh mục cấp 1 (theo product_type) và mỗi danh mục con (các phần tử sau
+của category_path) được lưu trong collection `product_category_counts` và cập nhật tăng dần
+bằng $inc khi sản phẩm được tạo, sửa hoặc xóa, thay vì đếm lại mỗi request. `rebuild()` tính
+lại toàn bộ bằng một aggregation pipeline (lệnh `manage.py rebuild_category_tree`).
+
+Mỗi thay đổi tăng số phiên bản của cây; cây đã dựng được cache theo khóa chứa phiên bản nên
+thay đổi có hiệu lực ngay ở request sau mà không cần xóa cache.
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_init, post_save
+from pymongo import UpdateOne
+
+from .models import PRODUCT_TYPE_CATEGORIES, Product
+from .mongo import get_collection, products_collection
+
+logger = logging.getLogger(__name__)
+
+COUNTS_COLLECTION = 'product_category_counts'
+# Tài liệu giữ số phiên bản của cây trong cùng collection
+VERSION_ID = '__version__'
+# Thời gian (giây) giữ cây đã dựng trong cache
+CACHE_TIMEOUT = 300
+
+
+def category_keys(product_type, category_path):
+    """
+    Các nút của cây mà một sản phẩm được đếm vào
+
+    Returns:
+        frozenset: (product_type, None) cho danh mục cấp 1 và (product_type, tên) cho mỗi danh mục con
+    """
+    keys = {(product_type, None)}
+    keys.update((product_type, sub) for sub in (category_path or [])[1:])
+    return frozenset(keys)
+
+
+def _node_id(product_type, subcategory):
+    return f"{product_type}:{subcategory}" if subcategory is not None else product_type
+
+
+def _counts():
+    return get_collection(COUNTS_COLLECTION)
+
+
+def apply_delta(removed=(), added=()):
+    """Giảm số lượng các nút trong `removed`, tăng các nút trong `added` và tăng phiên bản cây"""
+    deltas = {}
+    for key in removed:
+        deltas[key] = deltas.get(key, 0) - 1
+    for key in added:
+        deltas[key] = deltas.get(key, 0) + 1
+    operations = [
+        UpdateOne(
+            {'_id': _node_id(*key)},
+            {'$inc': {'count': delta}, '$setOnInsert': {'product_type': key[0], 'subcategory': key[1]}},
+            upsert=True,
+        )
+        for key, delta in deltas.items() if delta
+    ]
+    if not operations:
+        return
+
+    counts = _counts()
+    counts.bulk_write(operations, ordered=False)
+    counts.delete_many({'_id': {'$ne': VERSION_ID}, 'count': {'$lte': 0}})
+    counts.update_one({'_id': VERSION_ID}, {'$inc': {'version': 1}}, upsert=True)
+
+
+def rebuild():
+    """
+    Tính lại toàn bộ cây bằng một aggregation pipeline trên collection sản phẩm
+
+    Kết quả được ghi vào collection tạm rồi đổi tên đè lên collection cũ, nên người đọc không
+    bao giờ thấy cây dở dang.
+    """
+    pipeline = [
+        # Mỗi sản phẩm thành một nút cấp 1 (null) cộng các danh mục con không trùng lặp
+        {'$project': {
+            'product_type': 1,
+            'nodes': {'$concatArrays': [
+                [None],
+                {'$setUnion': [{'$slice': [{'$ifNull': ['$category_path', []]}, 1, 1000]}, []]},
+            ]},
+        }},
+        {'$unwind': '$nodes'},
+        {'$group': {'_id': {'product_type': '$product_type', 'subcategory': '$nodes'}, 'count': {'$sum': 1}}},
+    ]
+    nodes = [
+        {
+            '_id': _node_id(row['_id']['product_type'], row['_id']['subcategory']),
+            'product_type': row['_id']['product_type'],
+            'subcategory': row['_id']['subcategory'],
+            'count': row['count'],
+        }
+        for row in products_collection().aggregate(pipeline, allowDiskUse=True)
+    ]
+
+    counts = _counts()
+    current = counts.find_one({'_id': VERSION_ID}) or {}
+    staging = get_collection(f"{COUNTS_COLLECTION}_rebuild")
+    staging.drop()
+    staging.insert_many(nodes + [{'_id': VERSION_ID, 'version': current.get('version', 0) + 1}])
+    staging.rename(COUNTS_COLLECTION, dropTarget=True)
+    logger.info(f"Rebuilt category tree with {len(nodes)} nodes")
+    return len(nodes)
+
+
+def _build_tree(nodes):
+    """Dựng cấu trúc trả về của get_categories từ các nút đã đếm"""
+    categories = {}
+    for node in nodes:
+        if node['subcategory'] is None and node['product_type'] in PRODUCT_TYPE_CATEGORIES:
+            display_name = PRODUCT_TYPE_CATEGORIES[node['product_type']]
+            category_id = display_name.lower().replace(' & ', '-').replace(' ', '-')
+            categories[node['product_type']] = {
+                'id': category_id,
+                'name': display_name,
+                'count': node['count'],
+                'image': f'/images/category-{category_id}.jpg',
+                'product_type': node['product_type'],
+                'subcategories': []
+            }
+
+    for node in nodes:
+        category = categories.get(node['product_type'])
+        if node['subcategory'] is not None and category:
+            category['subcategories'].append({
+                'id': node['subcategory'].lower().replace(' ', '-'),
+                'name': node['subcategory'],
+                'count': node['count'],
+                'parent': category['name']
+            })
+
+    result = list(categories.values())
+    for category in result:
+        category['subcategories'].sort(key=lambda x: x['count'], reverse=True)
+    result.sort(key=lambda x: x['count'], reverse=True)
+    return result
+
+
+def get_category_tree():
+    """
+    Cây danh mục kèm số lượng, đọc từ cache theo phiên bản hiện tại
+
+    Returns:
+        list: Danh mục cấp 1 (sắp theo số lượng giảm dần), mỗi danh mục có danh sách danh mục con
+    """
+    counts = _counts()
+    version_doc = counts.find_one({'_id': VERSION_ID})
+    if version_doc is None:
+        # Chưa có cây (lần chạy đầu tiên): dựng từ dữ liệu sản phẩm
+        rebuild()
+        version_doc = counts.find_one({'_id': VERSION_ID})
+
+    cache_key = f"product_category_tree:{version_doc['version']}"
+    tree = cache.get(cache_key)
+    if tree is None:
+        tree = _build_tree(list(counts.find({'_id': {'$ne': VERSION_ID}})))
+        cache.set(cache_key, tree, CACHE_TIMEOUT)
+    return tree
+
+
+_CATEGORY_FIELDS = {'product_type', 'category_path'}
+
+
+def _remember_keys(sender, instance, **kwargs):
+    # Ghi nhớ các nút theo dữ liệu đã lưu để biết cần trừ nút nào khi sửa hoặc xóa.
+    # Bỏ qua instance tải bằng only()/defer() thiếu các trường danh mục để không phát sinh query
+    if not _CATEGORY_FIELDS & instance.get_deferred_fields():
+        instance._category_keys = category_keys(instance.product_type, instance.category_path)
+
+
+def _on_product_saved(sender, instance, created, **kwargs):
+    if not created and not hasattr(instance, '_category_keys'):
+        # Instance không tải các trường danh mục nên không thể thay đổi chúng
+        return
+    keys = category_keys(instance.product_type, instance.category_path)
+    previous = frozenset() if created else instance._category_keys
+    try:
+        apply_delta(removed=previous - keys, added=keys - previous)
+    except Exception as e:
+        # Số lượng lệch sẽ được sửa ở lần rebuild tiếp theo, không chặn việc lưu sản phẩm
+        logger.error(f"Error updating category counts for product {instance.pk}: {str(e)}")
+    instance._category_keys = keys
+
+
+def _on_product_deleted(sender, instance, **kwargs):
+    try:
+        apply_delta(removed=getattr(instance, '_category_keys', frozenset()))
+    except Exception as e:
+        logger.error(f"Error updating category counts for product {instance.pk}: {str(e)}")
+
+
+def connect_signals():
+    post_init.connect(_remember_keys, sender=Product, dispatch_uid='category-tree-init')
+    post_save.connect(_on_product_saved, sender=Product, dispatch_uid='category-tree-save')
+    post_delete.connect(_on_product_deleted, sender=Product, dispatch_uid='category-tree-delete')
@@ -0,0 +1,91 @@
+"""
+Bộ đếm lượt xem ghi trễ (write-behind).
+
+Mỗi lượt xem chỉ cộng vào bộ đệm trong bộ nhớ của process; một luồng nền định kỳ gộp các lượt
+xem theo sản phẩm và ghi xuống MongoDB bằng một bulk_write các lệnh $inc nguyên tử. Nhờ đó xem
+trang sản phẩm không còn là một lần ghi mỗi request và không mất lượt xem khi nhiều request cập
+nhật cùng lúc. Các truy vấn đọc total_views (trending) thấy giá trị đã được ghi xuống.
+"""
+
+import time
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from pymongo import UpdateOne
+
+from .mongo import products_collection
+
+logger = logging.getLogger(__name__)
+
+# Chu kỳ (giây) ghi bộ đệm xuống MongoDB
+VIEW_FLUSH_INTERVAL = getattr(settings, 'VIEW_FLUSH_INTERVAL', 5)
+# Ghi sớm khi số sản phẩm khác nhau trong bộ đệm đạt ngưỡng này
+VIEW_FLUSH_THRESHOLD = getattr(settings, 'VIEW_FLUSH_THRESHOLD', 1000)
+
+
+class WriteBehindCounter:
+    """
+    Cộng dồn số đếm theo product_id trong bộ nhớ và ghi định kỳ bằng $inc
+    """
+
+    def __init__(self, field, interval=VIEW_FLUSH_INTERVAL, threshold=VIEW_FLUSH_THRESHOLD):
+        self.field = field
+        self.interval = interval
+        self.threshold = threshold
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def increment(self, product_id, amount=1):
+        """Ghi nhận lượt tăng; trả về số đang chờ ghi của sản phẩm"""
+        with self._lock:
+            pending = self._pending.get(product_id, 0) + amount
+            self._pending[product_id] = pending
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f'{self.field}-flush', daemon=True)
+                self._worker.start()
+            if len(self._pending) >= self.threshold:
+                self._wakeup.set()
+        return pending
+
+    def pending(self, product_id):
+        with self._lock:
+            return self._pending.get(product_id, 0)
+
+    def flush(self):
+        """Ghi toàn bộ bộ đệm bằng một bulk_write; lỗi thì trả số đếm về bộ đệm để ghi lại sau"""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+
+        operations = [
+            UpdateOne({'_id': product_id}, {'$inc': {self.field: amount}})
+            for product_id, amount in batch.items()
+        ]
+        try:
+            products_collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} {self.field} counters: {str(e)}")
+            with self._lock:
+                for product_id, amount in batch.items():
+                    self._pending[product_id] = self._pending.get(product_id, 0) + amount
+            return 0
+        return len(batch)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            started = time.monotonic()
+            flushed = self.flush()
+            if flushed:
+                logger.debug(f"Flushed {self.field} for {flushed} products in {time.monotonic() - started:.3f}s")
+
+
+view_counter = WriteBehindCounter('total_views')
+# Ghi nốt bộ đệm khi process dừng bình thường
+atexit.register(view_counter.flush)
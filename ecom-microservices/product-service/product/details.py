@@ -0,0 +1,169 @@
+"""
+Lấy thông tin chi tiết theo loại sản phẩm từ các service chuyên biệt (book-service, shoe-service).
+
+Các request dùng chung một requests.Session (giữ kết nối) và luôn có timeout. Khi cần chi tiết
+của nhiều sản phẩm, mỗi service chỉ nhận một request batch và các service được gọi song song.
+
+Chi tiết được cache theo product_id (kèm mã băm nội dung dùng cho ETag) và bị xóa khỏi cache
+khi sản phẩm được cập nhật hoặc xóa, hoặc khi book-service/shoe-service báo chi tiết đã thay
+đổi qua `POST /products/<id>/invalidate_details/`. Khi service chi tiết chậm hoặc lỗi, kết quả không được
+cache và người gọi trả về sản phẩm cơ bản không kèm chi tiết.
+"""
+
+import json
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from requests.adapters import HTTPAdapter
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Timeout (giây) khi gọi service chi tiết: (kết nối, đọc)
+DETAIL_TIMEOUT = (1, getattr(settings, 'DETAIL_SERVICE_TIMEOUT', 2))
+# Thời gian (giây) giữ chi tiết sản phẩm trong cache
+DETAIL_CACHE_TIMEOUT = getattr(settings, 'DETAIL_CACHE_TIMEOUT', 300)
+
+# product_type -> (URL gốc của service, tên resource)
+DETAIL_SERVICES = {
+    "BOOK": (settings.BOOK_SERVICE_URL, "books"),
+    "SHOE": (settings.SHOE_SERVICE_URL, "shoes"),
+}
+
+_session = requests.Session()
+_session.mount("http://", HTTPAdapter(pool_connections=len(DETAIL_SERVICES), pool_maxsize=20))
+
+
+def _cache_key(product_id):
+    return f"product_details:{product_id}"
+
+
+def _entry(details):
+    """Mục cache: chi tiết (None nếu service không có) và mã băm nội dung"""
+    raw = json.dumps(details, sort_keys=True, default=str).encode()
+    return {"data": details, "hash": hashlib.md5(raw).hexdigest()}
+
+
+def _fetch_one(product_type, product_id):
+    """
+    Gọi service chi tiết cho một sản phẩm
+
+    Returns:
+        dict | None: Mục cache; None nếu service chậm hoặc lỗi (không cache)
+    """
+    base_url, resource = DETAIL_SERVICES[product_type]
+    try:
+        response = _session.get(f"{base_url}/{resource}/{product_id}/", timeout=DETAIL_TIMEOUT)
+        if response.status_code == 200:
+            return _entry(response.json())
+        if response.status_code == 404:
+            return _entry(None)
+        logger.warning(f"{product_type} detail request failed with status {response.status_code}")
+    except (requests.RequestException, ValueError) as e:
+        logger.warning(f"Error fetching {product_type} data: {str(e)}")
+    return None
+
+
+def get_details(product):
+    """
+    Chi tiết theo loại của một sản phẩm, ưu tiên đọc từ cache
+
+    Returns:
+        dict | None: {"data", "hash"} (data là None nếu sản phẩm không có chi tiết);
+        None nếu service chi tiết không trả lời kịp
+    """
+    if product.product_type not in DETAIL_SERVICES:
+        return _entry(None)
+
+    key = _cache_key(product._id)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _fetch_one(product.product_type, product._id)
+        if entry is not None:
+            cache.set(key, entry, DETAIL_CACHE_TIMEOUT)
+    return entry
+
+
+def product_etag(product, entry):
+    """ETag của response chi tiết sản phẩm: đổi khi sản phẩm hoặc chi tiết thay đổi"""
+    updated_at = product.updated_at.isoformat() if product.updated_at else ""
+    raw = f"{product._id}:{updated_at}:{entry['hash']}".encode()
+    return f'"{hashlib.md5(raw).hexdigest()}"'
+
+
+def invalidate_details(product_id):
+    cache.delete(_cache_key(product_id))
+
+
+def invalidate_details_many(product_ids):
+    cache.delete_many([_cache_key(product_id) for product_id in product_ids])
+
+
+def _fetch_batch(product_type, product_ids):
+    base_url, resource = DETAIL_SERVICES[product_type]
+    try:
+        response = _session.get(
+            f"{base_url}/{resource}/batch/",
+            params={"ids": ",".join(product_ids)},
+            timeout=DETAIL_TIMEOUT,
+        )
+        if response.status_code == 200:
+            found = {str(item["product_id"]): item for item in response.json()}
+            # Sản phẩm không có trong kết quả batch là không có chi tiết
+            return {product_id: _entry(found.get(product_id)) for product_id in product_ids}
+        logger.warning(f"{product_type} batch request failed with status {response.status_code}")
+    except (requests.RequestException, ValueError, KeyError) as e:
+        logger.warning(f"Error fetching {product_type} batch data: {str(e)}")
+    return {}
+
+
+def fetch_details_batch(products):
+    """
+    Chi tiết của nhiều sản phẩm: đọc cache trước, phần còn thiếu được lấy bằng một request batch
+    cho mỗi service, các service chạy song song
+
+    Args:
+        products (list): Các cặp (product_id, product_type)
+
+    Returns:
+        dict: product_id -> chi tiết (sản phẩm không có chi tiết thì không có trong kết quả)
+    """
+    types = {str(product_id): product_type for product_id, product_type in products
+             if product_type in DETAIL_SERVICES}
+    if not types:
+        return {}
+
+    cached = cache.get_many([_cache_key(product_id) for product_id in types])
+    entries = {product_id: cached[_cache_key(product_id)] for product_id in types
+               if _cache_key(product_id) in cached}
+
+    ids_by_type = {}
+    for product_id, product_type in types.items():
+        if product_id not in entries:
+            ids_by_type.setdefault(product_type, []).append(product_id)
+
+    if ids_by_type:
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=len(ids_by_type)) as executor:
+            futures = [executor.submit(_fetch_batch, product_type, ids) for product_type, ids in ids_by_type.items()]
+            for future in futures:
+                fetched.update(future.result())
+        cache.set_many({_cache_key(product_id): entry for product_id, entry in fetched.items()}, DETAIL_CACHE_TIMEOUT)
+        entries.update(fetched)
+
+    return {product_id: entry["data"] for product_id, entry in entries.items() if entry["data"] is not None}
+
+
+def _on_product_changed(sender, instance, **kwargs):
+    invalidate_details(instance.pk)
+
+
+def connect_signals():
+    post_save.connect(_on_product_changed, sender=Product, dispatch_uid='details-cache-save')
+    post_delete.connect(_on_product_changed, sender=Product, dispatch_uid='details-cache-delete')
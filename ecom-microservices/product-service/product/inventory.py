@@ -0,0 +1,326 @@
+"""
+Giữ hàng (stock reservation) bằng cập nhật có điều kiện nguyên tử trên MongoDB.
+
+Mỗi sản phẩm trong lần giữ hàng được trừ tồn kho bằng một update có điều kiện
+`quantity >= n` nên hai đơn hàng đồng thời không thể bán quá số lượng, không cần khóa. Lần giữ
+được ghi với trạng thái PENDING trước khi trừ kho, mỗi sản phẩm trừ xong được ghi thêm vào mảng
+`taken` của lần giữ, và lần giữ chỉ chuyển sang RESERVED khi mọi sản phẩm đã trừ xong. Nếu một
+sản phẩm không đủ hàng hoặc có lỗi bất kỳ (MongoDB, ghi lần giữ), các sản phẩm đã trừ trong cùng
+lần giữ được cộng trả lại và lần giữ chuyển sang FAILED.
+
+Lần giữ hàng có thời hạn: sau khi đặt hàng xong bên gọi `commit` (ghi nhận đã bán), nếu hủy thì
+`release` (trả hàng về kho). Luồng nền `expire_reservations` (khởi động trong
+`ProductConfig.ready`) trả hàng của các lần giữ quá hạn mà chưa commit, và của các lần giữ còn
+PENDING quá hạn (process chết giữa lúc trừ kho) theo các dòng đã ghi trong `taken`.
+"""
+
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+
+from . import list_cache, search
+from .models import ProductStatus
+from .mongo import get_collection, products_collection
+
+logger = logging.getLogger(__name__)
+
+RESERVATIONS_COLLECTION = 'stock_reservations'
+# Thời hạn mặc định và tối đa (giây) của một lần giữ hàng
+RESERVATION_TTL = getattr(settings, 'RESERVATION_TTL', 900)
+MAX_RESERVATION_TTL = 24 * 3600
+# Chu kỳ (giây) quét các lần giữ hàng quá hạn; 0 để tắt luồng quét (chạy expire_reservations theo lịch)
+RESERVATION_SWEEP_INTERVAL = getattr(settings, 'RESERVATION_SWEEP_INTERVAL', 30)
+# Lần giữ còn PENDING lâu hơn chừng này (giây) được coi là bị bỏ dở dù thời hạn giữ ngắn hơn
+RESERVATION_PENDING_TIMEOUT = getattr(settings, 'RESERVATION_PENDING_TIMEOUT', 60)
+
+PENDING = 'PENDING'
+RESERVED = 'RESERVED'
+FAILED = 'FAILED'
+COMMITTED = 'COMMITTED'
+RELEASED = 'RELEASED'
+EXPIRED = 'EXPIRED'
+
+
+class ReservationError(Exception):
+    """Lỗi nghiệp vụ khi giữ hàng; `code` là mã HTTP tương ứng"""
+
+    def __init__(self, message, code=400, details=None):
+        super().__init__(message)
+        self.code = code
+        self.details = details
+
+
+def _stock_update(change):
+    """
+    Update pipeline cộng `change` vào quantity và giữ status nhất quán như Product.update_stock
+
+    Hết hàng thì OUT_OF_STOCK, có hàng trở lại thì từ OUT_OF_STOCK về ACTIVE.
+    """
+    return [
+        {'$set': {'quantity': {'$add': ['$quantity', change]}, 'updated_at': '$$NOW'}},
+        {'$set': {'status': {'$switch': {
+            'branches': [
+                {'case': {'$eq': ['$quantity', 0]}, 'then': ProductStatus.OUT_OF_STOCK.value},
+                {'case': {'$and': [{'$gt': ['$quantity', 0]},
+                                   {'$eq': ['$status', ProductStatus.OUT_OF_STOCK.value]}]},
+                 'then': ProductStatus.ACTIVE.value},
+            ],
+            'default': '$status',
+        }}}},
+    ]
+
+
+def adjust_stock(product_id, change):
+    """
+    Cộng/trừ tồn kho nguyên tử; khi trừ chỉ thành công nếu còn đủ hàng
+
+    Returns:
+        int | None: Số lượng mới, None nếu không đủ hàng hoặc không có sản phẩm
+    """
+    query = {'_id': ObjectId(product_id)}
+    if change < 0:
+        query['quantity'] = {'$gte': -change}
+    product = products_collection().find_one_and_update(
+        query, _stock_update(change), projection={'quantity': 1, 'status': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if product is None:
+        return None
+    # Tồn kho và trạng thái hiển thị trong danh sách sản phẩm và bộ lọc status của tìm kiếm
+    list_cache.bump_generation()
+    search.update_status(product['_id'], product['status'])
+    return product['quantity']
+
+
+def _normalize_items(items):
+    """Gộp các dòng trùng sản phẩm và kiểm tra dữ liệu; trả về {ObjectId: số lượng}"""
+    if not isinstance(items, list) or not items:
+        raise ReservationError("items là bắt buộc")
+    quantities = {}
+    for item in items:
+        try:
+            product_id = ObjectId(str(item['product_id']))
+            quantity = int(item['quantity'])
+        except (KeyError, TypeError, ValueError, InvalidId):
+            raise ReservationError("Mỗi item cần product_id hợp lệ và quantity", details=item)
+        if quantity <= 0:
+            raise ReservationError("quantity phải lớn hơn 0", details=item)
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def _reservations():
+    return get_collection(RESERVATIONS_COLLECTION)
+
+
+def _serialize(reservation):
+    return {
+        'id': reservation['_id'],
+        'status': reservation['status'],
+        'order_id': reservation.get('order_id'),
+        'items': [{'product_id': str(item['product_id']), 'quantity': item['quantity']}
+                  for item in reservation['items']],
+        'expires_at': reservation['expires_at'],
+        'created_at': reservation['created_at'],
+    }
+
+
+def reserve(items, ttl=None, order_id=None):
+    """
+    Giữ hàng cho nhiều sản phẩm; tất cả cùng thành công hoặc không sản phẩm nào bị trừ
+
+    Args:
+        items (list): [{'product_id', 'quantity'}]
+        ttl (int, optional): Thời hạn giữ hàng (giây)
+        order_id (str, optional): Mã đơn hàng để đối chiếu
+
+    Returns:
+        dict: Lần giữ hàng đã tạo
+
+    Raises:
+        ReservationError: Dữ liệu không hợp lệ (400) hoặc không đủ hàng (409)
+    """
+    quantities = _normalize_items(items)
+    ttl = min(max(int(ttl or RESERVATION_TTL), 1), MAX_RESERVATION_TTL)
+    start_sweeper()
+
+    now = datetime.utcnow()
+    reservation = {
+        '_id': uuid.uuid4().hex,
+        'status': PENDING,
+        'order_id': order_id,
+        'items': [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in quantities.items()],
+        # Các dòng đã trừ kho, ghi ngay sau từng lần trừ để luồng quét trả lại nếu process chết giữa chừng
+        'taken': [],
+        'created_at': now,
+        'expires_at': now + timedelta(seconds=ttl),
+    }
+    # Ghi lần giữ trước khi trừ kho: lỗi ghi ở đây chưa làm mất tồn kho nào
+    _reservations().insert_one(reservation)
+
+    reserved = []
+    try:
+        for product_id, quantity in quantities.items():
+            if adjust_stock(product_id, -quantity) is None:
+                raise ReservationError(
+                    "Không đủ hàng", code=409, details={'product_id': str(product_id), 'requested': quantity}
+                )
+            reserved.append((product_id, quantity))
+            _reservations().update_one(
+                {'_id': reservation['_id']},
+                {'$push': {'taken': {'product_id': product_id, 'quantity': quantity}}}
+            )
+        result = _reservations().update_one(
+            {'_id': reservation['_id'], 'status': PENDING},
+            {'$set': {'status': RESERVED, 'updated_at': datetime.utcnow()}}
+        )
+        if result.matched_count == 0:
+            # Luồng quét đã coi lần giữ là bỏ dở và trả hàng theo `taken`
+            raise ReservationError("Reservation expired", code=409)
+    except Exception:
+        _rollback(reservation['_id'], reserved)
+        raise
+
+    reservation['status'] = RESERVED
+    return _serialize(reservation)
+
+
+def _rollback(reservation_id, reserved):
+    """
+    Đánh dấu FAILED lần giữ thất bại và trả lại phần đã trừ
+
+    Chỉ bên chuyển được PENDING sang FAILED mới trả hàng. Không chuyển được thì lần giữ đã được
+    luồng quét xử lý, hoặc đã thành RESERVED (lỗi mạng sau khi ghi) và sẽ được trả khi hết hạn;
+    lỗi MongoDB khi chuyển thì lần giữ vẫn PENDING và luồng quét trả hàng theo `taken`.
+    """
+    try:
+        if _transition(reservation_id, FAILED, from_status=PENDING) is None:
+            return
+    except PyMongoError as e:
+        logger.error(f"Error marking reservation {reservation_id} as failed: {str(e)}")
+        return
+    _restock([{'product_id': product_id, 'quantity': quantity} for product_id, quantity in reserved])
+
+
+def get_reservation(reservation_id):
+    reservation = _reservations().find_one({'_id': reservation_id})
+    if reservation is None:
+        raise ReservationError("Reservation not found", code=404)
+    return _serialize(reservation)
+
+
+def _transition(reservation_id, new_status, extra_query=None, from_status=RESERVED):
+    """Chuyển `from_status` sang trạng thái mới; chỉ một bên gọi đồng thời thắng"""
+    query = {'_id': reservation_id, 'status': from_status, **(extra_query or {})}
+    return _reservations().find_one_and_update(
+        query, {'$set': {'status': new_status, 'updated_at': datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def _restock(lines):
+    """Trả các dòng {'product_id', 'quantity'} về kho; lỗi một dòng không chặn các dòng còn lại"""
+    for line in lines:
+        try:
+            adjust_stock(line['product_id'], line['quantity'])
+        except PyMongoError as e:
+            logger.error(f"Error returning {line['quantity']} of product {line['product_id']} to stock: {str(e)}")
+
+
+def release(reservation_id):
+    """Hủy giữ hàng và trả hàng về kho (gọi lại nhiều lần không trả hàng hai lần)"""
+    reservation = _transition(reservation_id, RELEASED)
+    if reservation is None:
+        current = get_reservation(reservation_id)
+        if current['status'] in (RELEASED, EXPIRED):
+            return current
+        raise ReservationError(f"Reservation is {current['status']}", code=409)
+    _restock(reservation['items'])
+    return _serialize(reservation)
+
+
+def commit(reservation_id):
+    """Xác nhận đã bán: ghi nhận total_sold; lần giữ đã quá hạn không commit được"""
+    now = datetime.utcnow()
+    reservation = _transition(reservation_id, COMMITTED, {'expires_at': {'$gt': now}})
+    if reservation is None:
+        current = get_reservation(reservation_id)
+        if current['status'] == COMMITTED:
+            return current
+        raise ReservationError(f"Reservation is {current['status'].lower()} or expired", code=409)
+
+    for item in reservation['items']:
+        products_collection().update_one(
+            {'_id': item['product_id']},
+            {'$inc': {'total_sold': item['quantity']}, '$set': {'last_sold_at': now}}
+        )
+    # total_sold quyết định thứ tự best_sellers
+    list_cache.bump_generation()
+    return _serialize(reservation)
+
+
+def expire_reservations():
+    """
+    Trả hàng của các lần giữ đã quá hạn mà chưa commit và của các lần giữ PENDING bị bỏ dở
+
+    Returns:
+        int: Số lần giữ đã xử lý
+    """
+    expired = 0
+    now = datetime.utcnow()
+    overdue = {'expires_at': {'$lte': now}}
+    for reservation in _reservations().find({'status': RESERVED, **overdue}, {'_id': 1}):
+        reservation = _transition(reservation['_id'], EXPIRED, overdue)
+        if reservation is not None:
+            _restock(reservation['items'])
+            expired += 1
+
+    # PENDING quá hạn: process giữ hàng đã chết giữa chừng, chỉ các dòng trong `taken` đã bị trừ
+    abandoned = {**overdue, 'created_at': {'$lte': now - timedelta(seconds=RESERVATION_PENDING_TIMEOUT)}}
+    for reservation in _reservations().find({'status': PENDING, **abandoned}, {'_id': 1}):
+        reservation = _transition(reservation['_id'], FAILED, abandoned, from_status=PENDING)
+        if reservation is not None:
+            _restock(reservation.get('taken', []))
+            expired += 1
+    if expired:
+        logger.info(f"Released stock of {expired} expired or abandoned reservations")
+    return expired
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _sweep():
+    try:
+        _reservations().create_index([('status', ASCENDING), ('expires_at', ASCENDING)])
+    except PyMongoError as e:
+        logger.error(f"Error creating stock reservation index: {str(e)}")
+    while True:
+        try:
+            expire_reservations()
+        except Exception as e:
+            logger.error(f"Error expiring stock reservations: {str(e)}")
+        time.sleep(RESERVATION_SWEEP_INTERVAL)
+
+
+def start_sweeper():
+    """
+    Khởi động luồng quét quá hạn của process (gọi từ ProductConfig.ready và khi giữ hàng); khi
+    RESERVATION_SWEEP_INTERVAL = 0 thì expire_reservations phải được chạy theo lịch bên ngoài
+    """
+    global _sweeper
+    if _sweeper is not None or not RESERVATION_SWEEP_INTERVAL:
+        return
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = threading.Thread(target=_sweep, name='reservation-sweeper', daemon=True)
+            _sweeper.start()
@@ -0,0 +1,99 @@
+"""
+Cache response của các endpoint danh sách sản phẩm (list, best_sellers, latest_products).
+
+Khóa cache gồm tên endpoint, các query params đã chuẩn hóa (bỏ giá trị rỗng, sắp xếp) và số thế
+hệ (generation) hiện tại. Mọi thao tác ghi làm đổi dữ liệu hiển thị trong danh sách (lưu/xóa sản
+phẩm, cập nhật hàng loạt, thay đổi tồn kho, ghi nhận đã bán) tăng số thế hệ, nên toàn bộ response
+cũ không còn được đọc tới và tự hết hạn theo LIST_CACHE_TIMEOUT. Nhờ vậy danh sách không hiển thị
+tồn kho hay giá cũ sau khi sản phẩm thay đổi.
+
+Lượt xem (total_views) được ghi trễ và không làm tăng thế hệ: danh sách có thể hiển thị lượt xem
+cũ tối đa LIST_CACHE_TIMEOUT giây.
+"""
+
+import time
+import hashlib
+import logging
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Thời gian (giây) giữ một response danh sách trong cache
+LIST_CACHE_TIMEOUT = getattr(settings, 'LIST_CACHE_TIMEOUT', 60)
+GENERATION_KEY = 'product_list_generation'
+
+
+def _initial_generation():
+    """
+    Số thế hệ khi khóa chưa có (cache vừa khởi động hoặc khóa bị evict)
+
+    Dùng thời điểm hiện tại (ms) thay vì 1: nếu khóa bị evict trong khi các response cũ vẫn còn
+    trong cache, bắt đầu lại từ 1 sẽ làm các response của thế hệ 1, 2... được đọc lại.
+    """
+    return int(time.time() * 1000)
+
+
+def current_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        seed = _initial_generation()
+        cache.add(GENERATION_KEY, seed, None)
+        generation = cache.get(GENERATION_KEY, seed)
+    return generation
+
+
+def bump_generation():
+    """Làm mất hiệu lực mọi response danh sách đã cache"""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Chưa có khóa: bắt đầu một thế hệ mới chưa từng dùng
+        cache.add(GENERATION_KEY, _initial_generation(), None)
+        cache.incr(GENERATION_KEY)
+    except Exception as e:
+        logger.error(f"Error invalidating product list cache: {str(e)}")
+
+
+def _cache_key(name, query_params, generation):
+    params = sorted(
+        (key, value)
+        for key in query_params
+        for value in query_params.getlist(key)
+        if value != ''
+    )
+    digest = hashlib.md5(urlencode(params).encode()).hexdigest()
+    return f"product_list:{generation}:{name}:{digest}"
+
+
+def get_or_build(name, query_params, build):
+    """
+    Response đã cache của endpoint danh sách; chưa có thì gọi `build()` và lưu lại
+
+    Số thế hệ được đọc trước khi build: nếu có thao tác ghi trong lúc build, kết quả được lưu
+    dưới thế hệ cũ và không bao giờ được đọc.
+
+    Returns:
+        tuple: (dữ liệu response, True nếu lấy từ cache)
+    """
+    key = _cache_key(name, query_params, current_generation())
+    data = cache.get(key)
+    if data is not None:
+        return data, True
+    data = build()
+    cache.set(key, data, LIST_CACHE_TIMEOUT)
+    return data, False
+
+
+def _on_product_changed(sender, instance, **kwargs):
+    bump_generation()
+
+
+def connect_signals():
+    post_save.connect(_on_product_changed, sender=Product, dispatch_uid='list-cache-save')
+    post_delete.connect(_on_product_changed, sender=Product, dispatch_uid='list-cache-delete')
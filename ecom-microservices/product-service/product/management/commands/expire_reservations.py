@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from product.inventory import expire_reservations
+
+
+class Command(BaseCommand):
+    help = 'Trả hàng về kho cho các lần giữ hàng đã quá hạn mà chưa commit'
+
+    def handle(self, *args, **options):
+        expired = expire_reservations()
+        self.stdout.write(self.style.SUCCESS(f'Đã trả hàng của {expired} lần giữ hàng quá hạn'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from product.categories import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Tính lại cây danh mục và số lượng sản phẩm từ dữ liệu sản phẩm'
+
+    def handle(self, *args, **options):
+        nodes = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Đã dựng lại cây danh mục với {nodes} nút'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from product.related import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Tính lại chỉ mục sản phẩm liên quan theo mức trùng tags và danh mục'
+
+    def handle(self, *args, **options):
+        total = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Đã dựng lại chỉ mục sản phẩm liên quan cho {total} sản phẩm'))
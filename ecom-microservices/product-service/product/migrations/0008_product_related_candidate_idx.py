@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from pymongo import ASCENDING
+from pymongo.collation import Collation
+
+# Index tags không phân biệt hoa thường, dùng với related.TAGS_COLLATION khi tìm ứng viên
+TAGS_CI_INDEX = 'products_tags_ci_idx'
+
+
+def _products(apps, schema_editor):
+    schema_editor.connection.ensure_connection()
+    return schema_editor.connection.connection[apps.get_model('product', 'Product')._meta.db_table]
+
+
+def create_tags_ci_index(apps, schema_editor):
+    _products(apps, schema_editor).create_index(
+        [('tags', ASCENDING)], name=TAGS_CI_INDEX, collation=Collation(locale='en', strength=2)
+    )
+
+
+def drop_tags_ci_index(apps, schema_editor):
+    _products(apps, schema_editor).drop_index(TAGS_CI_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_product_tags_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category_path'], name='products_category_path_idx'),
+        ),
+        migrations.RunPython(create_tags_ci_index, drop_tags_ci_index),
+    ]
@@ -31,7 +31,44 @@ class ProductStatus(models.TextChoices):
     RESTRICTED = 'RESTRICTED', 'Restricted'  # Bị giới hạn bán (ví dụ: hàng cấm, hàng đặc biệt)
     BANNED = 'BANNED', 'Banned'  # Bị khóa do vi phạm chính sách
 
+# Tên danh mục cấp 1 (phần tử đầu của category_path) ứng với từng product_type
+PRODUCT_TYPE_CATEGORIES = {
+    'BOOK': 'Books',
+    'SHOE': 'Shoes',
+    'ELECTRONIC': 'Electronics',
+    'CLOTHING': 'Clothing',
+    'HOME_APPLIANCE': 'Home Appliances',
+    'FURNITURE': 'Furniture',
+    'BEAUTY': 'Beauty & Personal Care',
+    'FOOD': 'Food & Beverage',
+    'SPORTS': 'Sports Equipment',
+    'TOYS': 'Toys & Games',
+    'AUTOMOTIVE': 'Automotive',
+    'PET_SUPPLIES': 'Pet Supplies',
+    'HEALTH': 'Health & Wellness',
+    'OFFICE': 'Office Supplies',
+    'MUSIC': 'Musical Instruments'
+}
+
+def normalize_category_path(product_type, category_path, name=None):
+    """Đảm bảo category_path không rỗng và phần tử đầu tiên khớp với product_type"""
+    if not category_path or len(category_path) == 0:
+        # Nếu category_path trống, tạo mặc định từ product_type
+        return [PRODUCT_TYPE_CATEGORIES.get(product_type, product_type)]
+
+    expected_category = PRODUCT_TYPE_CATEGORIES.get(product_type)
+    if expected_category and category_path[0] != expected_category:
+        # Ghi lại thay đổi vào log để dễ debug
+        print(f"Chuẩn hóa category_path từ {category_path[0]} thành {expected_category} cho sản phẩm {name}")
+        category_path[0] = expected_category
+    return category_path
+
 class Product(models.Model):
+    # Các trường được cập nhật nguyên tử trực tiếp trên MongoDB ($inc lượt xem ghi trễ trong
+    # product/counters.py, giữ hàng trong product/inventory.py); save() chỉ ghi khi giá trị bị
+    # thay đổi trong bộ nhớ để không ghi đè bằng giá trị cũ đã đọc lên
+    ATOMIC_FIELDS = ('total_views', 'quantity')
+
     _id = models.ObjectIdField(primary_key=True)
     sku = models.CharField(max_length=50, unique=True)
     name = models.CharField(max_length=255)
@@ -85,6 +122,13 @@ class Product(models.Model):
             models.Index(fields=['seller_id']),
             models.Index(fields=['total_sold']),
             models.Index(fields=['brand']),
+            models.Index(fields=['total_views'], name='products_total_views_idx'),
+            # Tìm ứng viên khi tính lại sản phẩm liên quan (index multikey trên mảng tags và
+            # category_path; index tags không phân biệt hoa thường được tạo trong migration 0008)
+            models.Index(fields=['tags'], name='products_tags_idx'),
+            models.Index(fields=['category_path'], name='products_category_path_idx'),
+            # Phân trang keyset của danh sách sản phẩm
+            models.Index(fields=['created_at', '_id'], name='product_created_id_idx'),
         ]
 
     def __str__(self):
@@ -118,34 +162,29 @@ class Product(models.Model):
 
     def save(self, *args, **kwargs):
         # Đảm bảo tính nhất quán giữa product_type và category_path
-        product_type_mapping = {
-            'BOOK': 'Books',
-            'SHOE': 'Shoes',
-            'ELECTRONIC': 'Electronics',
-            'CLOTHING': 'Clothing',
-            'HOME_APPLIANCE': 'Home Appliances',
-            'FURNITURE': 'Furniture',
-            'BEAUTY': 'Beauty & Personal Care',
-            'FOOD': 'Food & Beverage',
-            'SPORTS': 'Sports Equipment',
-            'TOYS': 'Toys & Games',
-            'AUTOMOTIVE': 'Automotive',
-            'PET_SUPPLIES': 'Pet Supplies',
-            'HEALTH': 'Health & Wellness',
-            'OFFICE': 'Office Supplies',
-            'MUSIC': 'Musical Instruments'
+        self.category_path = normalize_category_path(self.product_type, self.category_path, self.name)
+
+        # Không ghi đè các trường cập nhật nguyên tử bằng giá trị cũ đã đọc lên
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            loaded = getattr(self, '_loaded_atomic', {})
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in deferred and (
+                    field.name not in self.ATOMIC_FIELDS
+                    or field.name not in loaded
+                    or loaded[field.name] != getattr(self, field.name)
+                )
+            ]
+
+        super().save(*args, **kwargs)
+        self._loaded_atomic = {name: self.__dict__[name] for name in self.ATOMIC_FIELDS if name in self.__dict__}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Giá trị đọc lên của các trường cập nhật nguyên tử, để save() biết trường nào bị sửa
+        instance._loaded_atomic = {
+            name: instance.__dict__[name] for name in cls.ATOMIC_FIELDS if name in instance.__dict__
         }
-        
-        # Đảm bảo category_path không rỗng
-        if not self.category_path or len(self.category_path) == 0:
-            # Nếu category_path trống, tạo mặc định từ product_type
-            self.category_path = [product_type_mapping.get(self.product_type, self.product_type)]
-        else:
-            # Đảm bảo phần tử đầu tiên khớp với product_type
-            expected_category = product_type_mapping.get(self.product_type)
-            if expected_category and self.category_path[0] != expected_category:
-                # Ghi lại thay đổi vào log để dễ debug
-                print(f"Chuẩn hóa category_path từ {self.category_path[0]} thành {expected_category} cho sản phẩm {self.name}")
-                self.category_path[0] = expected_category
-                
-        super().save(*args, **kwargs)
\ No newline at end of file
+        return instance
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+Truy cập trực tiếp các collection MongoDB qua kết nối của djongo.
+
+Dùng cho những thao tác ORM của djongo không dịch được hoặc dịch kém hiệu quả
+(aggregation pipeline, $inc nguyên tử, bulk_write, estimated_document_count).
+"""
+
+from django.db import connection
+
+
+def get_collection(name):
+    """Lấy collection pymongo theo tên trong database của service"""
+    connection.ensure_connection()
+    return connection.connection[name]
+
+
+def products_collection():
+    """Collection chứa sản phẩm (bảng của model Product)"""
+    from .models import Product
+    return get_collection(Product._meta.db_table)
@@ -0,0 +1,133 @@
+"""
+Phân trang keyset (cursor) cho danh sách sản phẩm.
+
+Danh sách được sắp theo (created_at, _id) giảm dần; mỗi trang trả về một token mờ
+(`next_cursor`) mã hóa vị trí của sản phẩm cuối trang. Trang tiếp theo lọc
+`(created_at, _id) < vị trí đó` rồi lấy `limit + 1` bản ghi, nên MongoDB chỉ đi theo index
+(created_at, _id) từ vị trí cũ thay vì bỏ qua (skip) mọi bản ghi phía trước: trang 1 và trang
+10.000 tốn như nhau.
+
+Tổng số sản phẩm không được đếm mặc định. `include_total=true` trả về số đếm chính xác (một lần
+quét theo bộ lọc); khi không có bộ lọc, số ước lượng từ metadata của collection được trả kèm
+`count_estimated: true`.
+
+Các client cũ (frontend) phân trang theo số trang: khi có `page` và không có `cursor`, trang được
+lấy bằng offset `(page - 1) * limit` và response luôn có số đếm chính xác, `total_pages` và
+`current_page`. Cách này vẫn bỏ qua các bản ghi phía trước nên trang càng sâu càng chậm; client
+mới nên dùng `next_cursor`.
+"""
+
+import json
+import base64
+import binascii
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .mongo import products_collection
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(product):
+    """Mã hóa vị trí (created_at, _id) của một sản phẩm thành token"""
+    position = {'t': product.created_at.isoformat(), 'id': str(product._id)}
+    raw = json.dumps(position, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Giải mã token thành (created_at, ObjectId); token không hợp lệ trả lỗi 400"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        position = json.loads(raw)
+        return datetime.fromisoformat(position['t']), ObjectId(position['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError, InvalidId):
+        raise ValidationError({'cursor': 'Invalid cursor'})
+
+
+class ProductCursorPagination:
+    """
+    Phân trang keyset theo (created_at, _id) giảm dần với token tiếp tục mờ
+    """
+    ordering = ('-created_at', '-_id')
+
+    def __init__(self, request):
+        self.request = request
+        self.cursor = request.query_params.get('cursor')
+        self.page_size = self.get_page_size()
+        self.page_number = None if self.cursor else self.get_page_number()
+        self.has_more = False
+        self.next_cursor = None
+
+    def get_page_size(self):
+        try:
+            size = int(self.request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'limit': 'Invalid limit'})
+        return max(1, min(size, MAX_PAGE_SIZE))
+
+    def get_page_number(self):
+        """Số trang (phân trang theo offset cho client cũ), None nếu không có `page`"""
+        page = self.request.query_params.get('page')
+        if not page:
+            return None
+        try:
+            return max(1, int(page))
+        except ValueError:
+            raise ValidationError({'page': 'Invalid page'})
+
+    def paginate_queryset(self, queryset):
+        """Lấy một trang bắt đầu sau vị trí trong cursor, theo số trang, hoặc từ đầu danh sách"""
+        queryset = queryset.order_by(*self.ordering)
+        offset = 0
+        if self.cursor:
+            created_at, product_id = decode_cursor(self.cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, _id__lt=product_id)
+            )
+        elif self.page_number:
+            offset = (self.page_number - 1) * self.page_size
+
+        # Lấy thêm một bản ghi để biết còn trang sau hay không
+        page = list(queryset[offset:offset + self.page_size + 1])
+        self.has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if self.has_more:
+            self.next_cursor = encode_cursor(page[-1])
+        return page
+
+    def get_count(self, queryset, filtered):
+        """
+        Tổng số sản phẩm: chính xác khi include_total=true hoặc phân trang theo số trang, ước lượng
+        khi không lọc, None nếu không có
+
+        Returns:
+            tuple: (count, estimated)
+        """
+        include_total = self.request.query_params.get('include_total', '').lower() in ('1', 'true', 'yes')
+        if include_total or self.page_number:
+            return queryset.count(), False
+        if not filtered:
+            # Ước lượng từ metadata của collection, không quét dữ liệu
+            return products_collection().estimated_document_count(), True
+        return None, False
+
+    def get_response_data(self, data, count=None, estimated=False):
+        response_data = {
+            'results': data,
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'limit': self.page_size,
+        }
+        if count is not None:
+            response_data['count'] = count
+            response_data['count_estimated'] = estimated
+            response_data['total_pages'] = max(1, -(-count // self.page_size))
+        if self.page_number:
+            response_data['current_page'] = self.page_number
+        return response_data
@@ -0,0 +1,275 @@
+"""
+Chỉ mục sản phẩm liên quan được tính trước theo mức trùng tags và danh mục.
+
+Mỗi sản phẩm có một document trong collection `product_related` chứa tối đa
+RELATED_INDEX_SIZE sản phẩm liên quan đã xếp hạng, nên endpoint `related` chỉ cần đọc theo
+khóa thay vì quét trùng mảng tags trên toàn collection.
+
+Điểm liên quan của hai sản phẩm:
+- mỗi tag chung cộng TAG_WEIGHT x idf(tag) (tag hiếm có trọng số cao hơn tag phổ biến)
+- mỗi danh mục con chung (category_path sau phần tử đầu) cộng CATEGORY_WEIGHT
+- cùng product_type cộng TYPE_WEIGHT
+Chỉ các sản phẩm có ít nhất một tag hoặc danh mục con chung mới được xếp hạng.
+
+`rebuild()` tính lại toàn bộ (lệnh `manage.py rebuild_related_products`). Khi tags hoặc danh
+mục của một sản phẩm thay đổi, danh sách của sản phẩm đó được tính lại trong nền, sản phẩm được
+chèn vào danh sách của các sản phẩm liên quan với nó nếu đủ điểm và bị gỡ khỏi danh sách của các
+sản phẩm không còn liên quan (danh sách đó có thể thiếu một chỗ tới lần rebuild sau). Cách tính
+lại từng sản phẩm dùng cùng quy tắc với rebuild: tags so khớp không phân biệt hoa thường và
+tag/danh mục có hơn MAX_CANDIDATE_POSTINGS sản phẩm không dùng để sinh ứng viên.
+"""
+
+import math
+import heapq
+import logging
+import threading
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.collation import Collation
+
+from .models import Product
+from .mongo import get_collection, products_collection
+
+logger = logging.getLogger(__name__)
+
+RELATED_COLLECTION = 'product_related'
+# Số sản phẩm liên quan lưu cho mỗi sản phẩm
+RELATED_INDEX_SIZE = getattr(settings, 'RELATED_INDEX_SIZE', 20)
+
+TAG_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+TYPE_WEIGHT = 0.25
+# Tag/danh mục có mặt ở quá nhiều sản phẩm hầu như không mang thông tin và làm tập ứng viên
+# quá lớn khi rebuild; bỏ qua khi sinh ứng viên (vẫn được tính điểm nếu trùng)
+MAX_CANDIDATE_POSTINGS = 5000
+
+# So khớp tags không phân biệt hoa thường như _features (dùng index products_tags_ci_idx)
+TAGS_COLLATION = Collation(locale='en', strength=2)
+
+_FIELDS = {'_id': 1, 'tags': 1, 'category_path': 1, 'product_type': 1}
+_WRITE_BATCH_SIZE = 1000
+
+
+def _features(product):
+    """(tags, danh mục con, product_type) của một document sản phẩm"""
+    tags = {str(tag).strip().lower() for tag in product.get('tags') or [] if tag}
+    subcategories = {str(c) for c in (product.get('category_path') or [])[1:] if c}
+    return tags, subcategories, product.get('product_type')
+
+
+def _score(features, other, idf):
+    tags, subcategories, product_type = features
+    other_tags, other_subcategories, other_type = other
+    shared_tags = tags & other_tags
+    shared_subcategories = subcategories & other_subcategories
+    if not shared_tags and not shared_subcategories:
+        return 0.0
+    score = TAG_WEIGHT * sum(idf(tag) for tag in shared_tags)
+    score += CATEGORY_WEIGHT * len(shared_subcategories)
+    if product_type and product_type == other_type:
+        score += TYPE_WEIGHT
+    return score
+
+
+def _related_collection():
+    return get_collection(RELATED_COLLECTION)
+
+
+def _document(product_id, ranked):
+    return {
+        '_id': product_id,
+        'related': [{'id': related_id, 'score': round(score, 4)} for score, related_id in ranked],
+        'updated_at': timezone.now(),
+    }
+
+
+def rebuild():
+    """
+    Tính lại danh sách liên quan của mọi sản phẩm bằng một lần đọc collection sản phẩm
+
+    Returns:
+        int: Số sản phẩm đã được ghi chỉ mục
+    """
+    started = timezone.now()
+    features = {product['_id']: _features(product) for product in products_collection().find({}, _FIELDS)}
+
+    tag_postings, category_postings = {}, {}
+    for product_id, (tags, subcategories, _) in features.items():
+        for tag in tags:
+            tag_postings.setdefault(tag, []).append(product_id)
+        for category in subcategories:
+            category_postings.setdefault(category, []).append(product_id)
+
+    total = len(features)
+
+    def idf(tag):
+        return math.log(1 + total / len(tag_postings[tag]))
+
+    collection = _related_collection()
+    operations = []
+    for product_id, product_features in features.items():
+        tags, subcategories, _ = product_features
+        candidates = set()
+        for postings in [tag_postings[t] for t in tags] + [category_postings[c] for c in subcategories]:
+            if len(postings) <= MAX_CANDIDATE_POSTINGS:
+                candidates.update(postings)
+        candidates.discard(product_id)
+
+        ranked = heapq.nlargest(RELATED_INDEX_SIZE, (
+            (score, candidate) for candidate in candidates
+            if (score := _score(product_features, features[candidate], idf)) > 0
+        ), key=lambda item: item[0])
+        operations.append(ReplaceOne({'_id': product_id}, _document(product_id, ranked), upsert=True))
+        if len(operations) >= _WRITE_BATCH_SIZE:
+            collection.bulk_write(operations, ordered=False)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+
+    # Xóa chỉ mục của các sản phẩm không còn tồn tại
+    collection.delete_many({'updated_at': {'$lt': started}})
+    collection.create_index([('related.id', ASCENDING)])
+    logger.info(f"Rebuilt related products index for {total} products")
+    return total
+
+
+def refresh_product(product_id):
+    """
+    Tính lại danh sách liên quan của một sản phẩm, chèn sản phẩm vào danh sách của các sản
+    phẩm liên quan với nó (nếu đủ điểm) và gỡ khỏi danh sách của các sản phẩm không còn liên quan
+    """
+    products = products_collection()
+    product = products.find_one({'_id': product_id}, _FIELDS)
+    if product is None:
+        return []
+    product_features = _features(product)
+    tags, subcategories, _ = product_features
+
+    total = products.estimated_document_count()
+    # Tags lưu nguyên dạng trong MongoDB; đếm và truy vấn không phân biệt hoa thường để khớp với
+    # các tag đã chuẩn hóa của rebuild()
+    raw_tags = {}
+    for tag in product.get('tags') or []:
+        if tag and str(tag).strip():
+            raw_tags.setdefault(str(tag).strip().lower(), str(tag).strip())
+    frequencies = {
+        tag: products.count_documents({'tags': raw}, collation=TAGS_COLLATION)
+        for tag, raw in raw_tags.items()
+    }
+
+    def idf(tag):
+        return math.log(1 + total / max(frequencies.get(tag, 1), 1))
+
+    # Tag/danh mục quá phổ biến không dùng để sinh ứng viên (như rebuild)
+    candidate_tags = [raw for tag, raw in raw_tags.items() if frequencies[tag] <= MAX_CANDIDATE_POSTINGS]
+    candidate_categories = [
+        category for category in subcategories
+        if products.count_documents({'category_path': category}, limit=MAX_CANDIDATE_POSTINGS + 1)
+        <= MAX_CANDIDATE_POSTINGS
+    ]
+
+    queries = []
+    if candidate_tags:
+        queries.append(({'tags': {'$in': candidate_tags}}, TAGS_COLLATION))
+    if candidate_categories:
+        queries.append(({'category_path': {'$in': candidate_categories}}, None))
+    scored, seen = [], {product_id}
+    for query, collation in queries:
+        # Hai truy vấn riêng để mỗi truy vấn dùng đúng index (tags theo collation, category_path)
+        for candidate in products.find(query, _FIELDS, collation=collation):
+            if candidate['_id'] in seen:
+                continue
+            seen.add(candidate['_id'])
+            score = _score(product_features, _features(candidate), idf)
+            if score > 0:
+                scored.append((score, candidate['_id']))
+    ranked = heapq.nlargest(RELATED_INDEX_SIZE, scored, key=lambda item: item[0])
+
+    collection = _related_collection()
+    collection.replace_one({'_id': product_id}, _document(product_id, ranked), upsert=True)
+
+    # Cập nhật vị trí của sản phẩm trong danh sách của các sản phẩm liên quan (quan hệ đối xứng),
+    # gỡ khỏi danh sách của các sản phẩm trước đây liên quan nhưng nay không còn trong ranked
+    ranked_ids = [related_id for _, related_id in ranked]
+    collection.update_many(
+        {'related.id': product_id, '_id': {'$nin': ranked_ids}}, {'$pull': {'related': {'id': product_id}}}
+    )
+    operations = []
+    for score, related_id in ranked:
+        operations.append(UpdateOne({'_id': related_id}, {'$pull': {'related': {'id': product_id}}}))
+        operations.append(UpdateOne({'_id': related_id}, {'$push': {'related': {
+            '$each': [{'id': product_id, 'score': round(score, 4)}],
+            '$sort': {'score': -1},
+            '$slice': RELATED_INDEX_SIZE,
+        }}}))
+    if operations:
+        collection.bulk_write(operations, ordered=True)
+    return ranked
+
+
+def refresh_products_async(product_ids):
+    """Tính lại tuần tự trong một luồng nền cho nhiều sản phẩm (cập nhật hàng loạt)"""
+    product_ids = list(product_ids)
+    if product_ids:
+        _run_in_background(lambda ids: [refresh_product(product_id) for product_id in ids], product_ids)
+
+
+def get_related_ids(product_id, limit):
+    """
+    Các sản phẩm liên quan đã xếp hạng; sản phẩm chưa có trong chỉ mục được tính ngay
+
+    Returns:
+        list: ObjectId của các sản phẩm liên quan, theo điểm giảm dần
+    """
+    document = _related_collection().find_one({'_id': product_id}, {'related': {'$slice': limit}})
+    if document is None:
+        return [related_id for _, related_id in refresh_product(product_id)[:limit]]
+    return [item['id'] for item in document['related']]
+
+
+def remove_product(product_id):
+    collection = _related_collection()
+    collection.delete_one({'_id': product_id})
+    collection.update_many({'related.id': product_id}, {'$pull': {'related': {'id': product_id}}})
+
+
+def _signature(instance):
+    return (instance.product_type, tuple(instance.tags or ()), tuple(instance.category_path or ()))
+
+
+def _run_in_background(func, arg):
+    def run():
+        try:
+            func(arg)
+        except Exception as e:
+            logger.error(f"Error updating related products for {arg}: {str(e)}")
+
+    threading.Thread(target=run, name='related-products', daemon=True).start()
+
+
+def _remember_signature(sender, instance, **kwargs):
+    if not {'product_type', 'tags', 'category_path'} & instance.get_deferred_fields():
+        instance._related_signature = _signature(instance)
+
+
+def _on_product_saved(sender, instance, created, **kwargs):
+    if not created and not hasattr(instance, '_related_signature'):
+        return
+    signature = _signature(instance)
+    if created or signature != instance._related_signature:
+        # Tính lại ngoài request: ghi sản phẩm không phải chờ
+        _run_in_background(refresh_product, instance.pk)
+    instance._related_signature = signature
+
+
+def _on_product_deleted(sender, instance, **kwargs):
+    _run_in_background(remove_product, instance.pk)
+
+
+def connect_signals():
+    post_init.connect(_remember_signature, sender=Product, dispatch_uid='related-products-init')
+    post_save.connect(_on_product_saved, sender=Product, dispatch_uid='related-products-save')
+    post_delete.connect(_on_product_deleted, sender=Product, dispatch_uid='related-products-delete')
@@ -0,0 +1,374 @@
+"""
+Chỉ mục tìm kiếm sản phẩm trong bộ nhớ (inverted index).
+
+Tên, thương hiệu, tags và category_path của mỗi sản phẩm được tách thành token (chữ thường, bỏ
+dấu tiếng Việt) và lưu trong inverted index token -> {product_id: trọng số}. Chỉ mục được dựng
+một lần từ MongoDB ở lần tìm kiếm đầu tiên, sau đó cập nhật tăng dần theo tín hiệu
+post_save/post_delete của Product, nên mỗi truy vấn chỉ duyệt danh sách posting của các token
+trong truy vấn thay vì quét regex toàn bộ collection.
+
+Hỗ trợ:
+- Xếp hạng theo độ liên quan (tf theo trọng số trường x idf)
+- Token cuối của truy vấn được khớp theo tiền tố (gõ tới đâu gợi ý tới đó)
+- Đếm facet brand, khoảng giá, rating và product_type trong cùng một lượt duyệt kết quả
+"""
+
+import re
+import math
+import time
+import bisect
+import logging
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from .models import Product
+from .mongo import products_collection
+
+logger = logging.getLogger(__name__)
+
+# Trọng số của từng trường khi tính điểm
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'brand': 2.0,
+    'tags': 1.5,
+    'category_path': 1.0,
+}
+
+# Các khoảng giá dùng cho facet: (nhãn, giá nhỏ nhất, giá lớn nhất - không bao gồm)
+PRICE_BANDS = [
+    ('under_100k', 0, 100000),
+    ('100k_500k', 100000, 500000),
+    ('500k_1m', 500000, 1000000),
+    ('1m_5m', 1000000, 5000000),
+    ('over_5m', 5000000, float('inf')),
+]
+
+# Số token tối đa được mở rộng từ tiền tố của token cuối
+MAX_PREFIX_EXPANSIONS = 50
+
+# Dựng lại toàn bộ chỉ mục sau khoảng thời gian này (giây) để bắt kịp các thay đổi không đi qua
+# tín hiệu của model (ví dụ cập nhật hàng loạt trực tiếp trên MongoDB); 0 để tắt
+SEARCH_INDEX_REFRESH = getattr(settings, 'SEARCH_INDEX_REFRESH', 900)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+_INDEX_FIELDS = {
+    '_id': 1, 'name': 1, 'brand': 1, 'tags': 1, 'category_path': 1, 'product_type': 1,
+    'status': 1, 'base_price': 1, 'sale_price': 1, 'rating': 1, 'total_sold': 1,
+}
+
+
+def normalize(text):
+    """Chữ thường và bỏ dấu (kể cả đ -> d) để 'Giày' khớp với 'giay'"""
+    text = unicodedata.normalize('NFD', str(text).lower().replace('đ', 'd'))
+    return ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text)) if text else []
+
+
+def _field_values(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if v]
+    return [value] if value else []
+
+
+def price_band(price):
+    for label, low, high in PRICE_BANDS:
+        if low <= price < high:
+            return label
+    return None
+
+
+def product_document(product):
+    """Chuyển Product (model hoặc document MongoDB) thành dữ liệu cần cho chỉ mục"""
+    get = product.get if isinstance(product, dict) else lambda name, default=None: getattr(product, name, default)
+    price = get('sale_price') or get('base_price') or 0
+    return {
+        'id': str(get('_id')),
+        'name': get('name') or '',
+        'brand': get('brand'),
+        'tags': get('tags') or [],
+        'category_path': get('category_path') or [],
+        # Mã danh mục giống cây danh mục ('Home Appliances' -> 'home-appliances')
+        'categories': {str(c).lower().replace(' & ', '-').replace(' ', '-') for c in get('category_path') or []},
+        'product_type': get('product_type'),
+        'status': get('status'),
+        'price': float(price),
+        'rating': float(get('rating') or 0),
+        'total_sold': get('total_sold') or 0,
+    }
+
+
+class ProductSearchIndex:
+    """
+    Inverted index trên name, brand, tags, category_path kèm thuộc tính để lọc và đếm facet
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}      # token -> {product_id: tf theo trọng số}
+        self._documents = {}     # product_id -> document
+        self._doc_tokens = {}    # product_id -> các token của sản phẩm (để gỡ khi cập nhật)
+        self._vocabulary = []    # token đã sắp xếp, dùng cho tìm theo tiền tố
+        self._vocabulary_dirty = False
+        self.built_at = 0.0
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, document):
+        """Thêm hoặc thay thế một sản phẩm trong chỉ mục"""
+        weights = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for value in _field_values(document.get(field)):
+                for token in tokenize(value):
+                    weights[token] = weights.get(token, 0.0) + weight
+
+        with self._lock:
+            self._remove(document['id'])
+            for token, weight in weights.items():
+                postings = self._postings.setdefault(token, {})
+                if not postings:
+                    self._vocabulary_dirty = True
+                postings[document['id']] = weight
+            self._documents[document['id']] = document
+            self._doc_tokens[document['id']] = tuple(weights)
+
+    def remove(self, product_id):
+        with self._lock:
+            self._remove(str(product_id))
+
+    def set_status(self, product_id, status):
+        """Đổi trạng thái của sản phẩm đã có trong chỉ mục (token không đổi nên không cần add lại)"""
+        with self._lock:
+            document = self._documents.get(str(product_id))
+            if document is not None:
+                self._documents[document['id']] = {**document, 'status': status}
+
+    def _remove(self, product_id):
+        for token in self._doc_tokens.pop(product_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+        self._documents.pop(product_id, None)
+
+    def _prefix_tokens(self, prefix):
+        """Các token trong từ điển bắt đầu bằng `prefix` (tìm nhị phân trên từ điển đã sắp xếp)"""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        tokens = []
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(prefix):
+                break
+            tokens.append(token)
+        return tokens
+
+    def _idf(self, token):
+        return math.log(1 + len(self._documents) / (1 + len(self._postings.get(token, ()))))
+
+    def _score(self, query):
+        """
+        Điểm liên quan của các sản phẩm khớp mọi token của truy vấn (token cuối khớp theo tiền tố)
+
+        Returns:
+            dict: product_id -> điểm
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return {}
+
+        scores = None
+        for i, token in enumerate(tokens):
+            is_last = i == len(tokens) - 1
+            # Token cuối có thể chưa gõ xong: khớp chính xác hoặc theo tiền tố
+            candidates = self._prefix_tokens(token) if is_last else [token]
+            term_scores = {}
+            for candidate in candidates:
+                # Khớp chính xác được ưu tiên hơn khớp tiền tố
+                boost = 1.0 if candidate == token else 0.5
+                idf = self._idf(candidate)
+                for product_id, weight in self._postings.get(candidate, {}).items():
+                    score = weight * idf * boost
+                    if score > term_scores.get(product_id, 0.0):
+                        term_scores[product_id] = score
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {pid: s + term_scores[pid] for pid, s in scores.items() if pid in term_scores}
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query='', filters=None, limit=20, offset=0, sort='relevance'):
+        """
+        Tìm sản phẩm, lọc, đếm facet và xếp hạng
+
+        Args:
+            query (str): Chuỗi tìm kiếm; rỗng thì khớp mọi sản phẩm
+            filters (dict): product_type, brand, status, category, min_price, max_price, min_rating
+            limit (int): Số kết quả trả về
+            offset (int): Vị trí bắt đầu trong danh sách đã xếp hạng
+            sort (str): relevance, price_asc, price_desc, rating, best_selling
+
+        Returns:
+            dict: ids (đã xếp hạng, đã cắt trang), total, facets
+        """
+        filters = filters or {}
+        with self._lock:
+            if query and query.strip():
+                scores = self._score(query)
+            else:
+                scores = dict.fromkeys(self._documents, 0.0)
+
+            facets = {'brand': {}, 'price_band': {}, 'rating': {}, 'product_type': {}}
+            matched = []
+            # Một lượt duyệt: lọc và đếm facet cùng lúc
+            for product_id, score in scores.items():
+                document = self._documents[product_id]
+                if not _matches(document, filters):
+                    continue
+                matched.append((score, document))
+                _count(facets['brand'], document['brand'])
+                _count(facets['price_band'], price_band(document['price']))
+                _count(facets['rating'], min(int(document['rating']), 4))
+                _count(facets['product_type'], document['product_type'])
+
+        matched.sort(key=_SORT_KEYS.get(sort, _SORT_KEYS['relevance']))
+        # Facet rating dạng "từ N sao trở lên"
+        rating_counts = facets['rating']
+        facets['rating'] = {
+            f"{stars}+": sum(count for bucket, count in rating_counts.items() if bucket >= stars)
+            for stars in (4, 3, 2, 1)
+        }
+        return {
+            'ids': [document['id'] for _, document in matched[offset:offset + limit]],
+            'total': len(matched),
+            'facets': facets,
+        }
+
+    def matching_ids(self, query):
+        """Tất cả product_id khớp truy vấn (không xếp hạng)"""
+        with self._lock:
+            return list(self._score(query))
+
+    def suggest(self, prefix, limit=10):
+        """
+        Gợi ý tên sản phẩm cho ô tìm kiếm khi đang gõ
+
+        Returns:
+            list: [{'id', 'name'}] theo độ liên quan, ưu tiên sản phẩm bán chạy
+        """
+        with self._lock:
+            scores = self._score(prefix)
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -self._documents[item[0]]['total_sold']))
+            return [{'id': pid, 'name': self._documents[pid]['name']} for pid, _ in ranked[:limit]]
+
+
+def _matches(document, filters):
+    for field in ('product_type', 'brand', 'status'):
+        if filters.get(field) and document[field] != filters[field]:
+            return False
+    if filters.get('category') and filters['category'] not in document['categories']:
+        return False
+    if filters.get('min_price') is not None and document['price'] < filters['min_price']:
+        return False
+    if filters.get('max_price') is not None and document['price'] > filters['max_price']:
+        return False
+    if filters.get('min_rating') is not None and document['rating'] < filters['min_rating']:
+        return False
+    return True
+
+
+def _count(counter, value):
+    if value is not None:
+        counter[value] = counter.get(value, 0) + 1
+
+
+_SORT_KEYS = {
+    'relevance': lambda item: (-item[0], -item[1]['total_sold']),
+    'price_asc': lambda item: item[1]['price'],
+    'price_desc': lambda item: -item[1]['price'],
+    'rating': lambda item: (-item[1]['rating'], -item[0]),
+    'best_selling': lambda item: (-item[1]['total_sold'], -item[0]),
+}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def build_index():
+    """Dựng chỉ mục mới từ toàn bộ sản phẩm trong MongoDB"""
+    index = ProductSearchIndex()
+    started = time.monotonic()
+    for product in products_collection().find({}, _INDEX_FIELDS):
+        index.add(product_document(product))
+    index.built_at = time.time()
+    logger.info(f"Built product search index with {len(index)} products in {time.monotonic() - started:.2f}s")
+    return index
+
+
+def get_index():
+    """Chỉ mục dùng chung của process; dựng ở lần gọi đầu và dựng lại định kỳ"""
+    global _index
+    expired = (
+        _index is not None and SEARCH_INDEX_REFRESH
+        and time.time() - _index.built_at > SEARCH_INDEX_REFRESH
+    )
+    if _index is None or expired:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+            elif expired and time.time() - _index.built_at > SEARCH_INDEX_REFRESH:
+                # Dựng lại trong nền; trong lúc đó vẫn phục vụ bằng chỉ mục cũ
+                _index.built_at = time.time()
+                threading.Thread(target=_refresh_index, name='product-search-refresh', daemon=True).start()
+    return _index
+
+
+def _refresh_index():
+    global _index
+    try:
+        _index = build_index()
+    except Exception as e:
+        logger.error(f"Error rebuilding product search index: {str(e)}")
+
+
+def reindex_products(products):
+    """Cập nhật nhiều sản phẩm vào chỉ mục (dùng cho ghi hàng loạt không đi qua save())"""
+    if _index is not None:
+        for product in products:
+            _index.add(product_document(product))
+
+
+def update_status(product_id, status):
+    """Cập nhật trạng thái trong chỉ mục cho các thay đổi tồn kho không đi qua save()"""
+    if _index is not None:
+        _index.set_status(product_id, status)
+
+
+def _on_product_saved(sender, instance, **kwargs):
+    # Chỉ cập nhật khi chỉ mục đã được dựng; nếu chưa, lần dựng đầu tiên sẽ đọc dữ liệu mới
+    if _index is not None:
+        _index.add(product_document(instance))
+
+
+def _on_product_deleted(sender, instance, **kwargs):
+    if _index is not None:
+        _index.remove(instance.pk)
+
+
+def connect_signals():
+    post_save.connect(_on_product_saved, sender=Product, dispatch_uid='search-index-save')
+    post_delete.connect(_on_product_deleted, sender=Product, dispatch_uid='search-index-delete')
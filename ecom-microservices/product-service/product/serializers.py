@@ -12,6 +12,14 @@ class ProductSerializer(serializers.ModelSerializer):
     tags = serializers.JSONField(default=list)  # Tags sản phẩm
     dimensions = serializers.JSONField(default=dict)  # Kích thước (dài, rộng, cao)
 
+    def __init__(self, *args, **kwargs):
+        # `fields`: chỉ trả về các trường được yêu cầu (projection)
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model = Product
         fields = [
@@ -1,3 +1,426 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+from bson import ObjectId
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models.signals import post_save
+from django.http import QueryDict
+from django.test import SimpleTestCase
+from pymongo.errors import PyMongoError
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory
+
+from . import bulk, inventory, list_cache
+from .inventory import FAILED, PENDING, RELEASED, RESERVED, ReservationError
+from .models import Product
+from .pagination import ProductCursorPagination, decode_cursor, encode_cursor
+from .search import ProductSearchIndex, product_document
+from . import views
+from .views import ProductViewSet
+
+
+class AdjustStockTests(SimpleTestCase):
+    def setUp(self):
+        self.products = MagicMock()
+        for target, value in (('products_collection', lambda: self.products),
+                              ('list_cache', MagicMock()), ('search', MagicMock())):
+            patcher = patch.object(inventory, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_decrement_requires_enough_stock(self):
+        """Trừ kho là update có điều kiện quantity >= n; không khớp thì trả None"""
+        product_id = ObjectId()
+        self.products.find_one_and_update.return_value = None
+
+        self.assertIsNone(inventory.adjust_stock(product_id, -3))
+        query = self.products.find_one_and_update.call_args[0][0]
+        self.assertEqual(query, {'_id': product_id, 'quantity': {'$gte': 3}})
+
+    def test_increment_updates_search_status(self):
+        """Cộng kho không có điều kiện tồn kho và cập nhật trạng thái trong chỉ mục tìm kiếm"""
+        product_id = ObjectId()
+        self.products.find_one_and_update.return_value = {'_id': product_id, 'quantity': 5, 'status': 'ACTIVE'}
+
+        self.assertEqual(inventory.adjust_stock(product_id, 5), 5)
+        self.assertEqual(self.products.find_one_and_update.call_args[0][0], {'_id': product_id})
+        inventory.search.update_status.assert_called_once_with(product_id, 'ACTIVE')
+
+
+class ReservationTests(SimpleTestCase):
+    def setUp(self):
+        self.reservations = MagicMock()
+        self.adjust = MagicMock(return_value=10)
+        for target, value in (('_reservations', lambda: self.reservations), ('adjust_stock', self.adjust),
+                              ('start_sweeper', MagicMock())):
+            patcher = patch.object(inventory, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.first, self.second = ObjectId(), ObjectId()
+        self.items = [{'product_id': str(self.first), 'quantity': 2},
+                      {'product_id': str(self.second), 'quantity': 1}]
+
+    def _statuses(self):
+        """Trạng thái được ghi bằng update_one (RESERVED) và find_one_and_update (FAILED, EXPIRED...)"""
+        calls = self.reservations.update_one.call_args_list + self.reservations.find_one_and_update.call_args_list
+        return [call[0][1]['$set']['status'] for call in calls if '$set' in call[0][1]]
+
+    def _taken(self):
+        return [call[0][1]['$push']['taken'] for call in self.reservations.update_one.call_args_list
+                if '$push' in call[0][1]]
+
+    def test_reserve_records_taken_lines_then_reserved(self):
+        """Lần giữ được ghi PENDING trước khi trừ kho, mỗi dòng đã trừ được ghi vào taken, xong thì RESERVED"""
+        result = inventory.reserve(self.items)
+
+        inserted = self.reservations.insert_one.call_args[0][0]
+        self.assertEqual((inserted['status'], inserted['taken']), (PENDING, []))
+        self.assertEqual(self._taken(), [{'product_id': self.first, 'quantity': 2},
+                                         {'product_id': self.second, 'quantity': 1}])
+        self.assertEqual(self._statuses(), [RESERVED])
+        self.assertEqual(result['status'], RESERVED)
+        self.assertEqual([call[0] for call in self.adjust.call_args_list], [(self.first, -2), (self.second, -1)])
+
+    def test_insufficient_stock_rolls_back(self):
+        """Sản phẩm sau không đủ hàng: trả lại phần đã trừ và đánh dấu FAILED"""
+        self.adjust.side_effect = [8, None, 10]
+
+        with self.assertRaises(ReservationError) as raised:
+            inventory.reserve(self.items)
+        self.assertEqual(raised.exception.code, 409)
+        self.assertEqual(self.adjust.call_args_list[-1][0], (self.first, 2))
+        self.assertEqual(self._statuses(), [FAILED])
+        self.assertEqual(self.reservations.find_one_and_update.call_args[0][0]['status'], PENDING)
+
+    def test_error_rolls_back(self):
+        """Lỗi MongoDB giữa chừng hoặc khi chuyển RESERVED vẫn trả lại toàn bộ phần đã trừ"""
+        self.adjust.side_effect = [8, PyMongoError('boom'), 10]
+        with self.assertRaises(PyMongoError):
+            inventory.reserve(self.items)
+        self.assertEqual(self.adjust.call_args_list[-1][0], (self.first, 2))
+
+        self.adjust.reset_mock(side_effect=True)
+        self.adjust.return_value = 10
+        self.reservations.reset_mock()
+        self.reservations.update_one.side_effect = [None, None, PyMongoError('boom')]
+        with self.assertRaises(PyMongoError):
+            inventory.reserve(self.items)
+        self.assertEqual([call[0] for call in self.adjust.call_args_list][2:], [(self.first, 2), (self.second, 1)])
+        self.assertEqual(self._statuses(), [RESERVED, FAILED])
+
+    def test_rollback_skipped_when_sweeper_took_over(self):
+        """Lần giữ không còn PENDING (luồng quét đã trả hàng theo taken) thì không trả hàng lần nữa"""
+        self.reservations.update_one.return_value.matched_count = 0
+        self.reservations.find_one_and_update.return_value = None
+
+        with self.assertRaises(ReservationError) as raised:
+            inventory.reserve(self.items)
+        self.assertEqual(raised.exception.code, 409)
+        self.assertEqual([call[0] for call in self.adjust.call_args_list], [(self.first, -2), (self.second, -1)])
+
+    def test_failed_insert_does_not_touch_stock(self):
+        """Không ghi được lần giữ thì chưa trừ kho"""
+        self.reservations.insert_one.side_effect = PyMongoError('boom')
+        with self.assertRaises(PyMongoError):
+            inventory.reserve(self.items)
+        self.adjust.assert_not_called()
+
+    def test_sweeper_restocks_taken_lines_of_abandoned_reservation(self):
+        """PENDING quá hạn (process chết giữa lúc trừ kho): chỉ trả các dòng đã ghi trong taken"""
+        abandoned = {'_id': 'r2', 'status': FAILED, 'items': self.items,
+                     'taken': [{'product_id': self.first, 'quantity': 2}]}
+        self.reservations.find.side_effect = [[], [{'_id': 'r2'}]]
+        self.reservations.find_one_and_update.return_value = abandoned
+
+        self.assertEqual(inventory.expire_reservations(), 1)
+        query = self.reservations.find_one_and_update.call_args[0][0]
+        self.assertEqual((query['_id'], query['status']), ('r2', PENDING))
+        self.assertIn('created_at', query)
+        self.assertEqual(self._statuses(), [FAILED])
+        self.adjust.assert_called_once_with(self.first, 2)
+
+    def test_double_release_restocks_once(self):
+        """Gọi release hai lần chỉ trả hàng về kho một lần"""
+        reservation = {
+            '_id': 'r1', 'status': RELEASED, 'order_id': None, 'expires_at': None, 'created_at': None,
+            'items': [{'product_id': self.first, 'quantity': 2}],
+        }
+        self.reservations.find_one_and_update.side_effect = [reservation, None]
+        self.reservations.find_one.return_value = reservation
+
+        self.assertEqual(inventory.release('r1')['status'], RELEASED)
+        self.assertEqual(inventory.release('r1')['status'], RELEASED)
+        self.adjust.assert_called_once_with(self.first, 2)
+
+
+class BulkWriteTests(SimpleTestCase):
+    def test_unexpected_error_fails_remaining_items(self):
+        """Lỗi không phải BulkWriteError: lô hiện tại và các lô sau bị đánh dấu lỗi, lô trước vẫn được tính"""
+        collection = MagicMock()
+        collection.bulk_write.side_effect = [None, PyMongoError('connection reset')]
+        operations = [(index, MagicMock()) for index in range(5)]
+        results = [None] * 5
+
+        with patch.object(bulk, 'products_collection', lambda: collection), \
+                patch.object(bulk, 'BULK_WRITE_BATCH_SIZE', 2):
+            written = bulk._write(operations, False, results)
+
+        self.assertEqual(written, [0, 1])
+        self.assertEqual([result['status'] for result in results],
+                         [bulk.UPDATED, bulk.UPDATED, bulk.FAILED, bulk.FAILED, bulk.FAILED])
+        self.assertEqual(collection.bulk_write.call_count, 2)
+
+
+class FakeQuerySet:
+    """QuerySet tối thiểu cho phân trang: ghi lại bộ lọc và lát cắt được yêu cầu"""
+
+    def __init__(self, items):
+        self.items = items
+        self.filters = []
+        self.slices = []
+
+    def order_by(self, *fields):
+        return self
+
+    def filter(self, *args, **kwargs):
+        self.filters.append((args, kwargs))
+        return self
+
+    def count(self):
+        return len(self.items)
+
+    def __getitem__(self, key):
+        self.slices.append(key)
+        return self.items[key]
+
+
+class PaginationTests(SimpleTestCase):
+    def setUp(self):
+        start = datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc)
+        self.products = [
+            SimpleNamespace(_id=ObjectId(), created_at=start - timedelta(minutes=index)) for index in range(10)
+        ]
+
+    def _paginator(self, query):
+        return ProductCursorPagination(SimpleNamespace(query_params=QueryDict(query)))
+
+    def test_cursor_round_trip(self):
+        """Token giữ nguyên (created_at có múi giờ, _id) của sản phẩm"""
+        product = self.products[3]
+        created_at, product_id = decode_cursor(encode_cursor(product))
+        self.assertEqual((created_at, product_id), (product.created_at, product._id))
+        self.assertEqual(created_at.utcoffset(), timedelta(0))
+
+    def test_invalid_cursor_is_400(self):
+        """Token hỏng, thiếu khóa hoặc ObjectId sai đều là lỗi 400"""
+        for token in ('not a cursor', 'e30', 'eyJ0IjoiMjAyNC0wNS0wMSIsImlkIjoieCJ9'):
+            with self.assertRaises(ValidationError) as raised:
+                decode_cursor(token)
+            self.assertEqual(raised.exception.status_code, 400)
+        with self.assertRaises(ValidationError):
+            self._paginator('cursor=bogus').paginate_queryset(FakeQuerySet(self.products))
+
+    def test_limit_plus_one_sets_next_cursor(self):
+        """Lấy limit + 1 bản ghi: còn trang sau thì next_cursor trỏ tới sản phẩm cuối trang"""
+        paginator = self._paginator('limit=3')
+        queryset = FakeQuerySet(self.products)
+        page = paginator.paginate_queryset(queryset)
+
+        self.assertEqual(page, self.products[:3])
+        self.assertEqual(queryset.slices, [slice(0, 4)])
+        self.assertTrue(paginator.has_more)
+        self.assertEqual(decode_cursor(paginator.next_cursor)[1], self.products[2]._id)
+
+        paginator = self._paginator(f'limit=3&cursor={paginator.next_cursor}')
+        queryset = FakeQuerySet(self.products[8:])
+        self.assertEqual(paginator.paginate_queryset(queryset), self.products[8:])
+        self.assertEqual(len(queryset.filters), 1)
+        self.assertFalse(paginator.has_more)
+        self.assertIsNone(paginator.next_cursor)
+
+    def test_legacy_page_uses_offset_and_exact_count(self):
+        """Có `page` mà không có cursor: lấy theo offset, đếm chính xác, trả total_pages và current_page"""
+        paginator = self._paginator('page=3&limit=3&cursor=')
+        queryset = FakeQuerySet(self.products)
+        page = paginator.paginate_queryset(queryset)
+
+        self.assertEqual(page, self.products[6:9])
+        self.assertEqual(queryset.slices, [slice(6, 10)])
+        count, estimated = paginator.get_count(queryset, filtered=False)
+        self.assertEqual((count, estimated), (10, False))
+        data = paginator.get_response_data([], count, estimated)
+        self.assertEqual((data['total_pages'], data['current_page'], data['has_more']), (4, 3, True))
+
+        self.assertIsNone(self._paginator(f'page=3&cursor={encode_cursor(self.products[0])}').page_number)
+
+
+def _indexed(product_id, name, brand=None, tags=(), category_path=(), price=100000, rating=0,
+             product_type='shoe', status='ACTIVE', total_sold=0):
+    return product_document({
+        '_id': product_id, 'name': name, 'brand': brand, 'tags': list(tags), 'category_path': list(category_path),
+        'base_price': price, 'rating': rating, 'product_type': product_type, 'status': status,
+        'total_sold': total_sold,
+    })
+
+
+class SearchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = ProductSearchIndex()
+        for document in (
+            _indexed('p1', 'Giày chạy bộ Nike', 'Nike', ['running'], ['Fashion', 'Shoes'], 1200000, 4.5, total_sold=50),
+            _indexed('p2', 'Giày da nam', 'Bata', ['leather'], ['Fashion', 'Shoes'], 800000, 3.2, total_sold=10),
+            _indexed('p3', 'Sách chạy bộ', 'Kim Đồng', ['running'], ['Books'], 90000, 4.0, 'book'),
+            _indexed('p4', 'Giày thể thao', 'Other', [], ['Fashion'], 2000000, 0, status='INACTIVE'),
+        ):
+            self.index.add(document)
+
+    def _ids(self, query, **kwargs):
+        return self.index.search(query, **kwargs)['ids']
+
+    def test_field_weights_and_idf_rank_results(self):
+        """Token ở name nặng hơn brand, brand nặng hơn tags; token hiếm có điểm cao hơn token phổ biến"""
+        index = ProductSearchIndex()
+        for document in (_indexed('tag', 'Sneaker', tags=['nike']), _indexed('name', 'Nike'),
+                         _indexed('brand', 'Sneaker', 'Nike')):
+            index.add(document)
+        self.assertEqual(index.search('nike')['ids'], ['name', 'brand', 'tag'])
+
+        # Cùng nằm trong name của p2: 'da' chỉ có ở 1 sản phẩm, 'giay' ở 3 sản phẩm
+        self.assertGreater(self.index._score('da')['p2'], self.index._score('giay')['p2'])
+
+    def test_exact_match_beats_prefix_match(self):
+        """Token cuối khớp chính xác xếp trên khớp theo tiền tố dù cùng trường và cùng idf"""
+        index = ProductSearchIndex()
+        index.add(_indexed('prefix', 'Nikeair', total_sold=100))
+        index.add(_indexed('exact', 'Nike'))
+        self.assertEqual(index.search('nike')['ids'], ['exact', 'prefix'])
+
+    def test_only_last_token_matches_by_prefix(self):
+        """Token cuối khớp theo tiền tố, các token trước phải khớp chính xác"""
+        self.assertEqual(self._ids('giay ch'), ['p1'])
+        self.assertEqual(self._ids('gia chay'), [])
+        self.assertEqual([item['id'] for item in self.index.suggest('sac')], ['p3'])
+
+    def test_diacritics_are_folded(self):
+        """'giay' tìm thấy 'Giày', 'dong' tìm thấy 'Đồng' và ngược lại"""
+        self.assertEqual(sorted(self._ids('giay')), ['p1', 'p2', 'p4'])
+        self.assertEqual(sorted(self._ids('Giày')), ['p1', 'p2', 'p4'])
+        self.assertEqual(self._ids('kim dong'), ['p3'])
+        self.assertEqual(self._ids('SÁCH'), ['p3'])
+
+    def test_facets_follow_filters(self):
+        """Facet được đếm trên các sản phẩm đã qua bộ lọc; rating đếm theo dạng 'từ N sao trở lên'"""
+        result = self.index.search('', filters={'product_type': 'shoe', 'status': 'ACTIVE'})
+        self.assertEqual(result['total'], 2)
+        facets = result['facets']
+        self.assertEqual(facets['brand'], {'Nike': 1, 'Bata': 1})
+        self.assertEqual(facets['price_band'], {'1m_5m': 1, '500k_1m': 1})
+        self.assertEqual(facets['product_type'], {'shoe': 2})
+        self.assertEqual(facets['rating'], {'4+': 1, '3+': 2, '2+': 2, '1+': 2})
+
+        result = self.index.search('chay', filters={'min_rating': 4, 'max_price': 1000000})
+        self.assertEqual((result['ids'], result['facets']['rating']), (['p3'], {'4+': 1, '3+': 1, '2+': 1, '1+': 1}))
+
+    def test_updates_keep_postings_and_vocabulary_consistent(self):
+        """Thêm lại, gỡ và đổi trạng thái giữ postings, từ điển tiền tố và document khớp nhau"""
+        self.assertEqual(self.index._prefix_tokens('lea'), ['leather'])
+        self.index.remove('p2')
+        self.assertNotIn('leather', self.index._postings)
+        self.assertNotIn('p2', self.index._postings['giay'])
+        self.assertEqual(self.index._prefix_tokens('lea'), [])
+        self.assertEqual(len(self.index), 3)
+
+        self.index.add(_indexed('p1', 'Dép Nike', 'Nike', ['running'], ['Fashion', 'Shoes'], 1200000, 4.5))
+        self.assertNotIn('p1', self.index._postings['giay'])
+        self.assertEqual(self.index._prefix_tokens('de'), ['dep'])
+        for token, postings in self.index._postings.items():
+            self.assertEqual('p1' in postings, token in self.index._doc_tokens['p1'])
+
+        self.index.set_status('p1', 'OUT_OF_STOCK')
+        self.index.set_status('missing', 'ACTIVE')
+        self.assertEqual(self._ids('nike', filters={'status': 'ACTIVE'}), [])
+        self.assertEqual(self._ids('nike'), ['p1'])
+        self.assertNotIn('missing', self.index._documents)
+        self.assertEqual(len(self.index), 3)
+
+
+class BatchViewTests(SimpleTestCase):
+    def test_post_rejects_malformed_options(self):
+        """fields phải là danh sách chuỗi và include_details là bool, nếu không trả 400 trước khi truy vấn"""
+        view = ProductViewSet.as_view({'post': 'batch'})
+        ids = [str(ObjectId())]
+        for body in ({'ids': ids, 'fields': 'name'}, {'ids': ids, 'fields': ['name', 1]},
+                     {'ids': ids, 'include_details': 'false'}):
+            request = APIRequestFactory().post('/products/batch/', body, format='json')
+            self.assertEqual(view(request).status_code, 400, body)
+
+
+class IncreaseViewsTests(SimpleTestCase):
+    def test_unknown_product_is_404(self):
+        """Sản phẩm không tồn tại trả 404; sản phẩm đang có lượt xem chờ ghi không bị tra lại"""
+        view = ProductViewSet.as_view({'patch': 'increase_views'})
+        product_id = ObjectId()
+        counter, model = MagicMock(), MagicMock()
+        counter.pending.return_value = 0
+        model.objects.filter.return_value.exists.return_value = False
+
+        with patch.object(views, 'view_counter', counter), patch.object(views, 'Product', model):
+            response = view(APIRequestFactory().patch('/'), pk=str(product_id))
+            self.assertEqual(response.status_code, 404)
+            counter.increment.assert_not_called()
+
+            counter.pending.return_value = 3
+            counter.increment.return_value = 4
+            response = view(APIRequestFactory().patch('/'), pk=str(product_id))
+            self.assertEqual(response.status_code, 202)
+            model.objects.filter.assert_called_once_with(_id=product_id)
+
+
+class ListCacheTests(SimpleTestCase):
+    def setUp(self):
+        patcher = patch.object(list_cache, 'cache', LocMemCache('product-list-tests', {}))
+        self.cache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_key_normalizes_params(self):
+        """Thứ tự params, giá trị rỗng và thứ tự các giá trị lặp lại không đổi khóa"""
+        def key(query, name='list'):
+            return list_cache._cache_key(name, QueryDict(query), 7)
+
+        self.assertEqual(key('brand=Nike&limit=20'), key('limit=20&brand=Nike'))
+        self.assertEqual(key('brand=Nike&status='), key('brand=Nike'))
+        self.assertEqual(key('tag=a&tag=b'), key('tag=b&tag=a'))
+        self.assertNotEqual(key('tag=a&tag=b'), key('tag=a'))
+        self.assertNotEqual(key('', name='best_sellers'), key(''))
+        self.assertTrue(key('').startswith('product_list:7:list:'))
+
+    def test_writes_make_next_read_a_miss(self):
+        """bump_generation và post_save của Product đều làm lần đọc sau phải build lại"""
+        builds = []
+
+        def build():
+            builds.append(None)
+            return {'build': len(builds)}
+
+        params = QueryDict('limit=20')
+        self.assertEqual(list_cache.get_or_build('list', params, build), ({'build': 1}, False))
+        self.assertEqual(list_cache.get_or_build('list', params, build), ({'build': 1}, True))
+
+        list_cache.bump_generation()
+        self.assertEqual(list_cache.get_or_build('list', params, build), ({'build': 2}, False))
+
+        list_cache.connect_signals()
+        post_save.send(sender=Product, instance=SimpleNamespace(pk=ObjectId()), created=False)
+        self.assertEqual(list_cache.get_or_build('list', params, build), ({'build': 3}, False))
+        self.assertEqual(list_cache.get_or_build('list', params, build), ({'build': 3}, True))
+
+    def test_missing_generation_is_reseeded_from_clock(self):
+        """Khóa thế hệ bị mất được tạo lại từ thời điểm hiện tại (ms), không bắt đầu lại từ 1"""
+        with patch.object(list_cache.time, 'time', return_value=1700000000.0):
+            self.assertEqual(list_cache.current_generation(), 1700000000000)
+
+        self.cache.delete(list_cache.GENERATION_KEY)
+        with patch.object(list_cache.time, 'time', return_value=1700000005.0):
+            list_cache.bump_generation()
+        self.assertEqual(self.cache.get(list_cache.GENERATION_KEY), 1700000005001)
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet
+from .views import ProductViewSet, ReservationViewSet
 
 # Tạo router cho ViewSet
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
+router.register(r'reservations', ReservationViewSet, basename='reservation')
 
 urlpatterns = [
     path('', include(router.urls)),
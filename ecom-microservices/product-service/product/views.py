@@ -7,6 +7,14 @@ from django.core.cache import cache
 from django.db.models import Q
 from .models import Product, ProductStatus
 from .serializers import ProductSerializer
+from .pagination import ProductCursorPagination
+from .categories import get_category_tree
+from .search import get_index
+from .counters import view_counter
+from . import inventory, list_cache
+from .bulk import bulk_update_products
+from .related import RELATED_INDEX_SIZE, get_related_ids
+from .details import fetch_details_batch, get_details, invalidate_details, product_etag
 from rest_framework.decorators import api_view
 import requests
 from django.conf import settings
@@ -18,6 +26,11 @@ class ProductViewSet(viewsets.ModelViewSet):
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    # Các query param lọc danh sách trong get_queryset
+    filter_params = (
+        'product_type', 'category', 'parent_category', 'subcategory', 'min_price',
+        'max_price', 'min_rating', 'brand', 'status', 'search',
+    )
 
     def get_queryset(self):
         """Refresh queryset mỗi lần get và hỗ trợ lọc sản phẩm"""
@@ -28,10 +41,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             # Lọc theo product_type
             product_type = self.request.query_params.get('product_type')
             if product_type:
-                print(f"Filtering by product_type: {product_type}")
                 queryset = queryset.filter(product_type=product_type)
-                # Debug - in ra số lượng sản phẩm sau khi lọc
-                print(f"Found {queryset.count()} products after filtering")
                 
             # Lọc theo category_path - đơn giản
             category = self.request.query_params.get('category')
@@ -71,10 +81,11 @@ class ProductViewSet(viewsets.ModelViewSet):
             if status_filter:
                 queryset = queryset.filter(status=status_filter)
                 
-            # Tìm kiếm theo tên
+            # Tìm kiếm theo tên, thương hiệu, tags, danh mục qua chỉ mục tìm kiếm
             search = self.request.query_params.get('search')
             if search:
-                queryset = queryset.filter(name__icontains=search)
+                product_ids = [ObjectId(pid) for pid in get_index().matching_ids(search)]
+                queryset = queryset.filter(_id__in=product_ids)
         
         return queryset
 
@@ -88,42 +99,36 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def retrieve(self, request, *args, **kwargs):
-        try:
-            product_id = ObjectId(kwargs.get('pk'))
-            product = Product.objects.get(_id=product_id)
-            product_type = product.product_type
-
-            # Chọn API phù hợp dựa trên product_type
-            service_urls = {
-                "BOOK": f"{settings.BOOK_SERVICE_URL}/books/{str(product._id)}/",
-                "SHOE": f"{settings.SHOE_SERVICE_URL}/shoes/{str(product._id)}/",
-            }
-
-            extra_data = None  # Khởi tạo biến để lưu dữ liệu chi tiết
-
-            if product_type in service_urls:
-                try:
-                    response = requests.get(service_urls[product_type])
-                    if response.status_code == 200:
-                        extra_data = response.json()  # Lưu thông tin chi tiết sản phẩm
-                except requests.RequestException as e:
-                    print(f"Error fetching {product_type} data: {str(e)}")
-
-            serializer = self.get_serializer(product)
-            product_data = serializer.data
-
-            # Nếu có dữ liệu từ service khác, gộp vào response
-            if extra_data:
-                product_data["details"] = extra_data
-
-            return Response(product_data)
+        """
+        Chi tiết sản phẩm kèm thông tin theo loại (sách, giày) từ service tương ứng.
 
+        Thông tin theo loại được cache; nếu service chi tiết không trả lời kịp, trả về sản phẩm
+        cơ bản với `details_available: false`. Response đầy đủ có ETag để gateway và trình duyệt
+        xác thực lại bằng If-None-Match (304 khi không đổi).
+        """
+        try:
+            product = Product.objects.get(_id=ObjectId(kwargs.get('pk')))
         except (InvalidId, Product.DoesNotExist):
             return Response(
                 {"error": "Product not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        entry = get_details(product)
+        etag = product_etag(product, entry) if entry is not None else None
+        if etag and etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        product_data = self.get_serializer(product).data
+        if entry is None:
+            product_data["details_available"] = False
+            return Response(product_data, headers={'Cache-Control': 'no-store'})
+
+        # Nếu có dữ liệu từ service khác, gộp vào response
+        if entry["data"]:
+            product_data["details"] = entry["data"]
+        return Response(product_data, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
     def update(self, request, *args, **kwargs):
         """Cập nhật sản phẩm."""
         product = self.get_object()
@@ -153,11 +158,18 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["patch"])
     def increase_views(self, request, *args, **kwargs):
-        """Tăng số lượt xem sản phẩm."""
-        instance = self.get_object()
-        instance.total_views += 1
-        instance.save()
-        return Response({"message": "Views increased", "total_views": instance.total_views}, status=status.HTTP_200_OK)
+        """Ghi nhận một lượt xem; được cộng vào total_views ở lần ghi định kỳ tiếp theo."""
+        try:
+            product_id = ObjectId(kwargs.get('pk'))
+        except InvalidId:
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        # Sản phẩm đang có lượt xem chờ ghi đã được kiểm tra tồn tại; chỉ tra index _id khi chưa có
+        if not view_counter.pending(product_id) and not Product.objects.filter(_id=product_id).exists():
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        pending = view_counter.increment(product_id)
+        return Response({"message": "View recorded", "pending_views": pending}, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=False, methods=["get"])
     def filter(self, request):
@@ -177,9 +189,27 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"])
     def best_sellers(self, request):
-        """Lấy danh sách sản phẩm bán chạy nhất."""
+        """Lấy danh sách sản phẩm bán chạy nhất (có cache, xem list_cache)."""
+        limit = int(request.query_params.get("limit", 10))
+
+        def build():
+            queryset = Product.objects.order_by("-total_sold")[:limit]
+            serializer = self.get_serializer(queryset, many=True)
+            # Trả về dạng phân trang để frontend hiển thị nhất quán
+            return {
+                'results': serializer.data,
+                'count': len(serializer.data),
+                'total_pages': 1,
+                'current_page': 1
+            }
+
+        return self._cached_response('best_sellers', request, build)
+
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        """Lấy danh sách sản phẩm được xem nhiều nhất (theo lượt xem đã ghi xuống)."""
         limit = int(request.query_params.get("limit", 10))
-        queryset = Product.objects.order_by("-total_sold")[:limit]
+        queryset = Product.objects.filter(status=ProductStatus.ACTIVE).order_by("-total_views")[:limit]
 
         serializer = self.get_serializer(queryset, many=True)
         # Trả về dạng phân trang để frontend hiển thị nhất quán
@@ -193,9 +223,19 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["get"])
     def related(self, request, *args, **kwargs):
-        """Lấy danh sách sản phẩm liên quan."""
+        """
+        Lấy danh sách sản phẩm liên quan, xếp hạng theo mức trùng tags và danh mục.
+
+        Đọc từ chỉ mục tính trước (`product_related`) theo khóa; query param `limit` (mặc định 5).
+        """
         instance = self.get_object()
-        related_products = Product.objects.filter(tags__overlap=instance.tags).exclude(pk=instance.pk)[:5]
+        try:
+            limit = min(max(int(request.query_params.get('limit', 5)), 1), RELATED_INDEX_SIZE)
+        except ValueError:
+            limit = 5
+        related_ids = get_related_ids(instance.pk, limit)
+        products = {product.pk: product for product in Product.objects.filter(_id__in=related_ids)}
+        related_products = [products[pk] for pk in related_ids if pk in products]
 
         serializer = self.get_serializer(related_products, many=True)
         # Trả về dạng phân trang để frontend hiển thị nhất quán
@@ -208,61 +248,176 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(response_data)
 
     def list(self, request, *args, **kwargs):
-        """Lấy danh sách sản phẩm."""
-        # Tạm thời bỏ qua cache
-        # cache_key = f"product_list_{request.query_params.get('page', 1)}"
-        # cached_data = cache.get(cache_key)
+        """
+        Lấy danh sách sản phẩm, phân trang keyset theo (created_at, _id).
+
+        Query params: `limit` (mặc định 20, tối đa 100), `cursor` (giá trị `next_cursor` của trang
+        trước) và `include_total=true` để đếm chính xác tổng số sản phẩm theo bộ lọc. Client cũ
+        gửi `page` (không kèm cursor) được phân trang theo offset, response có `total_pages` và
+        `current_page`. Response được cache theo query params và làm mới khi sản phẩm thay đổi
+        (xem list_cache).
+        """
+        def build():
+            queryset = self.get_queryset()
+            paginator = ProductCursorPagination(request)
+            page = paginator.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
 
-        # if cached_data:
-        #     return Response(cached_data, status=status.HTTP_200_OK)
+            filtered = any(request.query_params.get(param) for param in self.filter_params)
+            count, estimated = paginator.get_count(queryset, filtered)
+            return paginator.get_response_data(serializer.data, count, estimated)
 
-        queryset = self.get_queryset()
-        print(f"Total products before pagination: {queryset.count()}")
-        
-        # In ra loại của tất cả sản phẩm để debug
-        for product in queryset:
-            print(f"Product ID: {product._id}, Type: {product.product_type}, Name: {product.name}")
-            
-        page = self.paginate_queryset(queryset)
-        
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            
-            # Tạo response theo định dạng chuẩn
-            response_data = {
-                'results': serializer.data,
-                'count': self.paginator.page.paginator.count,
-                'total_pages': self.paginator.page.paginator.num_pages,
-                'current_page': self.paginator.page.number
+        return self._cached_response('list', request, build)
+
+    def _cached_response(self, name, request, build):
+        """Response của endpoint danh sách qua cache theo query params; header X-Cache: HIT/MISS"""
+        data, hit = list_cache.get_or_build(name, request.query_params, build)
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+    @action(detail=False, methods=["GET"])
+    def search(self, request):
+        """
+        Tìm kiếm sản phẩm xếp hạng theo độ liên quan kèm facet.
+
+        Query params: `q`, `page`, `limit`, `sort` (relevance, price_asc, price_desc, rating,
+        best_selling) và các bộ lọc product_type, brand, status, category, min_price, max_price,
+        min_rating.
+        """
+        params = request.query_params
+        try:
+            page = max(int(params.get("page", 1)), 1)
+            limit = min(max(int(params.get("limit", 20)), 1), 100)
+            filters = {
+                "product_type": params.get("product_type"),
+                "brand": params.get("brand"),
+                "status": params.get("status"),
+                "category": params.get("category"),
+                "min_price": float(params["min_price"]) if params.get("min_price") else None,
+                "max_price": float(params["max_price"]) if params.get("max_price") else None,
+                "min_rating": float(params["min_rating"]) if params.get("min_rating") else None,
             }
-            
-            # Không lưu cache để tránh dữ liệu cũ
-            # cache.set(cache_key, response_data, timeout=300)
-            return Response(response_data)
-        
-        # Nếu không có pagination
-        serializer = self.get_serializer(queryset, many=True)
-        response_data = {
-            'results': serializer.data,
-            'count': len(serializer.data),
-            'total_pages': 1,
-            'current_page': 1
-        }
-        
-        # Không lưu cache
-        # cache.set(cache_key, response_data, timeout=300)
-        return Response(response_data)
+        except ValueError:
+            return Response({"error": "Invalid search parameters"}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = get_index().search(
+            params.get("q", ""), filters, limit=limit, offset=(page - 1) * limit,
+            sort=params.get("sort", "relevance")
+        )
+
+        # Lấy đúng các sản phẩm của trang và giữ thứ tự xếp hạng
+        products = Product.objects.filter(_id__in=[ObjectId(pid) for pid in result["ids"]])
+        by_id = {str(product._id): product for product in products}
+        ranked = [by_id[pid] for pid in result["ids"] if pid in by_id]
+
+        serializer = self.get_serializer(ranked, many=True)
+        return Response({
+            "results": serializer.data,
+            "total": result["total"],
+            "total_pages": max(1, -(-result["total"] // limit)),
+            "current_page": page,
+            "facets": result["facets"],
+        })
+
+    @action(detail=False, methods=["GET"])
+    def autocomplete(self, request):
+        """Gợi ý tên sản phẩm theo tiền tố đang gõ."""
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), 20)
+        except ValueError:
+            return Response({"error": "Invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"query": query, "suggestions": get_index().suggest(query, limit)})
+
+    @action(detail=False, methods=["GET", "POST"])
+    def batch(self, request):
+        """
+        Lấy nhiều sản phẩm theo danh sách ID trong một lần gọi.
+
+        GET: `?ids=id1,id2&fields=name,base_price&include_details=true`
+        POST: `{"ids": [...], "fields": [...], "include_details": true}` cho danh sách dài.
+        Kết quả giữ thứ tự ID yêu cầu; ID không hợp lệ hoặc không tồn tại nằm trong `missing`.
+        """
+        if request.method == "POST":
+            ids = request.data.get("ids") or []
+            fields = request.data.get("fields")
+            include_details = request.data.get("include_details", False)
+            if fields is not None and (
+                not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)
+            ):
+                return Response({"error": "fields phải là danh sách chuỗi"}, status=status.HTTP_400_BAD_REQUEST)
+            if not isinstance(include_details, bool):
+                return Response({"error": "include_details phải là true/false"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            ids = [i for i in request.query_params.get("ids", "").split(",") if i]
+            fields = request.query_params.get("fields")
+            fields = [f for f in fields.split(",") if f] if fields else None
+            include_details = request.query_params.get("include_details", "").lower() in ("1", "true", "yes")
+
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "ids là bắt buộc"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.PRODUCT_BATCH_MAX_IDS:
+            return Response(
+                {"error": f"Tối đa {settings.PRODUCT_BATCH_MAX_IDS} sản phẩm mỗi request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        requested = list(dict.fromkeys(map(str, ids)))
+        object_ids = {}
+        for product_id in requested:
+            try:
+                object_ids[product_id] = ObjectId(product_id)
+            except (InvalidId, TypeError):
+                continue
+
+        # Một truy vấn $in; chỉ đọc các cột cần cho các trường được yêu cầu
+        queryset = Product.objects.filter(_id__in=list(object_ids.values()))
+        if fields is not None:
+            model_fields = {f.name for f in Product._meta.concrete_fields} & set(fields)
+            if "current_price" in fields:
+                model_fields |= {"base_price", "sale_price"}
+            if include_details:
+                model_fields.add("product_type")
+            queryset = queryset.only("_id", *model_fields)
+        products = {str(product._id): product for product in queryset}
+
+        serializer = self.get_serializer(list(products.values()), many=True, fields=fields)
+        data = dict(zip(products, serializer.data))
+
+        if include_details:
+            details = fetch_details_batch(
+                (product_id, product.product_type) for product_id, product in products.items()
+            )
+            for product_id, product_details in details.items():
+                data[product_id]["details"] = product_details
+
+        return Response({
+            "results": [data[product_id] for product_id in requested if product_id in data],
+            "missing": [product_id for product_id in requested if product_id not in data],
+        })
 
     @action(detail=True, methods=["POST"])
     def update_stock(self, request, *args, **kwargs):
-        """Cập nhật số lượng tồn kho."""
-        product = self.get_object()
+        """Cập nhật số lượng tồn kho (nguyên tử; không cho tồn kho âm)."""
         try:
             quantity_change = int(request.data.get("quantity_change", 0))
-            product.update_stock(quantity_change)
-            return Response({"message": "Stock updated successfully", "new_quantity": product.quantity})
+            product_id = ObjectId(kwargs.get('pk'))
         except (ValueError, TypeError):
             return Response({"error": "Invalid quantity"}, status=status.HTTP_400_BAD_REQUEST)
+        except InvalidId:
+            return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        new_quantity = inventory.adjust_stock(product_id, quantity_change)
+        if new_quantity is None:
+            if not Product.objects.filter(_id=product_id).exists():
+                return Response({"error": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"error": "Stock cannot be negative"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Stock updated successfully", "new_quantity": new_quantity})
+
+    @action(detail=True, methods=["POST"], url_path="invalidate_details")
+    def invalidate_details_cache(self, request, *args, **kwargs):
+        """Xóa chi tiết đã cache của sản phẩm; book-service/shoe-service gọi khi chi tiết thay đổi."""
+        invalidate_details(kwargs.get('pk'))
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=["POST"])
     def add_to_wishlist(self, request, *args, **kwargs):
@@ -278,17 +433,19 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["GET"])
     def latest_products(self, request):
-        """Lấy danh sách sản phẩm mới nhất."""
-        products = Product.objects.filter(status=ProductStatus.ACTIVE).order_by("-created_at")[:10]
-        serializer = self.get_serializer(products, many=True)
-        # Trả về dạng phân trang để frontend hiển thị nhất quán
-        response_data = {
-            'results': serializer.data,
-            'count': len(serializer.data),
-            'total_pages': 1,
-            'current_page': 1
-        }
-        return Response(response_data)
+        """Lấy danh sách sản phẩm mới nhất (có cache, xem list_cache)."""
+        def build():
+            products = Product.objects.filter(status=ProductStatus.ACTIVE).order_by("-created_at")[:10]
+            serializer = self.get_serializer(products, many=True)
+            # Trả về dạng phân trang để frontend hiển thị nhất quán
+            return {
+                'results': serializer.data,
+                'count': len(serializer.data),
+                'total_pages': 1,
+                'current_page': 1
+            }
+
+        return self._cached_response('latest_products', request, build)
 
     @action(detail=False, methods=["GET"])
     def recommend(self, request):
@@ -315,24 +472,30 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["POST"])
     def bulk_update(self, request):
-        """Cập nhật hàng loạt sản phẩm."""
-        data = request.data.get("products", [])
-        updated_products = []
+        """
+        Cập nhật hàng loạt sản phẩm: `{"products": [{"_id": ..., <trường cần sửa>}], "ordered": true}`.
 
-        for product_data in data:
-            try:
-                product = Product.objects.get(pk=product_data["_id"])
-                serializer = self.get_serializer(product, data=product_data, partial=True)
+        Mọi item được kiểm tra trước rồi ghi bằng bulk_write. `ordered=true` không ghi gì nếu có
+        item không hợp lệ; `ordered=false` ghi mọi item hợp lệ. Kết quả có trạng thái từng item.
+        """
+        data = request.data.get("products", [])
+        if not isinstance(data, list):
+            return Response({"error": "products phải là danh sách"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(data) > settings.BULK_UPDATE_MAX_ITEMS:
+            return Response(
+                {"error": f"Tối đa {settings.BULK_UPDATE_MAX_ITEMS} sản phẩm mỗi request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-                if serializer.is_valid():
-                    serializer.save()
-                    updated_products.append(serializer.data)
-                else:
-                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            except Product.DoesNotExist:
-                continue  # Bỏ qua sản phẩm không tồn tại
+        ordered = request.data.get("ordered", True)
+        if isinstance(ordered, str):
+            ordered = ordered.lower() in ("1", "true", "yes")
+        result = bulk_update_products(data, ordered=bool(ordered))
 
-        return Response({"updated_products": updated_products}, status=status.HTTP_200_OK)
+        response_status = status.HTTP_200_OK
+        if ordered and result["updated"] == 0 and result["not_updated"]:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
 
     @api_view(["GET"])
     def check_product_exists(request, product_id):
@@ -412,6 +575,9 @@ class ProductViewSet(viewsets.ModelViewSet):
                     "book_error": book_response.json()
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            # Book service gọi retrieve để kiểm tra product khi sách chưa tồn tại: bỏ chi tiết rỗng đã cache
+            invalidate_details(product._id)
+
             # 5️⃣ Trả về thông tin Product + Book
             response_data = {
                 "product": serializer.data,
@@ -495,6 +661,9 @@ class ProductViewSet(viewsets.ModelViewSet):
                     "shoe_error": shoe_response.json()
                 }, status=status.HTTP_400_BAD_REQUEST)
 
+            # Shoe service gọi retrieve để kiểm tra product khi giày chưa tồn tại: bỏ chi tiết rỗng đã cache
+            invalidate_details(product._id)
+
             # 5️⃣ Trả về thông tin Product + Shoe
             response_data = {
                 "product": serializer.data,
@@ -512,74 +681,45 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["GET"])
     def get_categories(self, request):
-        """Lấy danh sách danh mục sản phẩm có cấu trúc phân cấp."""
-        # Tạo ánh xạ từ product_type sang tên danh mục
-        product_type_mapping = {
-            'BOOK': 'Books',
-            'SHOE': 'Shoes',
-            'ELECTRONIC': 'Electronics',
-            'CLOTHING': 'Clothing',
-            'HOME_APPLIANCE': 'Home Appliances',
-            'FURNITURE': 'Furniture',
-            'BEAUTY': 'Beauty & Personal Care',
-            'FOOD': 'Food & Beverage',
-            'SPORTS': 'Sports Equipment',
-            'TOYS': 'Toys & Games',
-            'AUTOMOTIVE': 'Automotive',
-            'PET_SUPPLIES': 'Pet Supplies',
-            'HEALTH': 'Health & Wellness',
-            'OFFICE': 'Office Supplies',
-            'MUSIC': 'Musical Instruments'
-        }
-        
-        # Xây dựng cấu trúc danh mục từ dữ liệu sản phẩm
-        categories = {}
-        subcategories = {}
-        
-        # Lấy tất cả sản phẩm
-        products = Product.objects.all()
-        
-        # Tạo danh sách danh mục cấp 1 dựa trên product_type
-        for product_type, display_name in product_type_mapping.items():
-            count = Product.objects.filter(product_type=product_type).count()
-            if count > 0:
-                category_id = display_name.lower().replace(' & ', '-').replace(' ', '-')
-                categories[display_name] = {
-                    'id': category_id,
-                    'name': display_name,
-                    'count': count,
-                    'image': f'/images/category-{category_id}.jpg',
-                    'product_type': product_type,
-                    'subcategories': []
-                }
-        
-        # Thu thập các danh mục con (cấp 2) từ category_path
-        for product in products:
-            if len(product.category_path) > 1:
-                main_category = product.category_path[0]
-                for i in range(1, len(product.category_path)):
-                    sub_category = product.category_path[i]
-                    if main_category in categories and sub_category not in [s['name'] for s in categories[main_category]['subcategories']]:
-                        # Tính số lượng sản phẩm trong danh mục con này
-                        subcategory_count = Product.objects.filter(
-                            category_path__contains=[main_category, sub_category]
-                        ).count()
-                        
-                        # Thêm danh mục con vào danh mục chính
-                        subcategory_id = sub_category.lower().replace(' ', '-')
-                        categories[main_category]['subcategories'].append({
-                            'id': subcategory_id,
-                            'name': sub_category,
-                            'count': subcategory_count,
-                            'parent': main_category
-                        })
-        
-        # Chuyển đổi dictionary thành danh sách để trả về
-        result = []
-        for category_name, category_data in categories.items():
-            result.append(category_data)
-        
-        # Sắp xếp theo số lượng sản phẩm (giảm dần)
-        result.sort(key=lambda x: x['count'], reverse=True)
-        
-        return Response(result)
\ No newline at end of file
+        """Lấy danh sách danh mục sản phẩm có cấu trúc phân cấp (từ cây danh mục đã vật chất hóa)."""
+        return Response(get_category_tree())
+
+
+class ReservationViewSet(viewsets.ViewSet):
+    """
+    Giữ hàng cho đơn hàng: tạo (trừ tồn kho nguyên tử cho nhiều sản phẩm), commit khi đặt hàng
+    thành công, release khi hủy. Lần giữ quá hạn chưa commit được tự động trả hàng về kho.
+    """
+
+    def _handle(self, func, *args, success_status=status.HTTP_200_OK):
+        try:
+            return Response(func(*args), status=success_status)
+        except inventory.ReservationError as e:
+            error = {"error": str(e)}
+            if e.details is not None:
+                error["details"] = e.details
+            return Response(error, status=e.code)
+
+    def create(self, request):
+        """Giữ hàng: `{"items": [{"product_id", "quantity"}], "ttl_seconds": 900, "order_id": "..."}`"""
+        try:
+            ttl = int(request.data["ttl_seconds"]) if request.data.get("ttl_seconds") else None
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid ttl_seconds"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._handle(
+            inventory.reserve, request.data.get("items"), ttl, request.data.get("order_id"),
+            success_status=status.HTTP_201_CREATED
+        )
+
+    def retrieve(self, request, pk=None):
+        return self._handle(inventory.get_reservation, pk)
+
+    @action(detail=True, methods=["POST"])
+    def commit(self, request, pk=None):
+        """Xác nhận đã bán các sản phẩm đang giữ."""
+        return self._handle(inventory.commit, pk)
+
+    @action(detail=True, methods=["POST"])
+    def release(self, request, pk=None):
+        """Hủy giữ hàng và trả hàng về kho."""
+        return self._handle(inventory.release, pk)
@@ -18,6 +18,28 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 BOOK_SERVICE_URL = "http://book-service:8002"
 SHOE_SERVICE_URL = "http://shoe-service:8006"
 
+# Timeout đọc (giây) khi gọi book-service/shoe-service lấy chi tiết sản phẩm
+DETAIL_SERVICE_TIMEOUT = float(os.getenv("DETAIL_SERVICE_TIMEOUT", "1.5"))
+# Thời gian (giây) cache chi tiết sản phẩm theo loại
+DETAIL_CACHE_TIMEOUT = int(os.getenv("DETAIL_CACHE_TIMEOUT", "300"))
+# Thời gian (giây) cache response danh sách sản phẩm (bị làm mới ngay khi sản phẩm thay đổi)
+LIST_CACHE_TIMEOUT = int(os.getenv("LIST_CACHE_TIMEOUT", "60"))
+
+# Chu kỳ (giây) ghi lượt xem sản phẩm đang đệm xuống MongoDB
+VIEW_FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "5"))
+
+# Thời hạn mặc định (giây) của một lần giữ hàng
+RESERVATION_TTL = int(os.getenv("RESERVATION_TTL", "900"))
+
+# Số sản phẩm tối đa trong một request /products/batch/
+PRODUCT_BATCH_MAX_IDS = int(os.getenv("PRODUCT_BATCH_MAX_IDS", "100"))
+
+# Số sản phẩm tối đa trong một request /products/bulk_update/
+BULK_UPDATE_MAX_ITEMS = int(os.getenv("BULK_UPDATE_MAX_ITEMS", "20000"))
+
+# Chu kỳ (giây) dựng lại toàn bộ chỉ mục tìm kiếm sản phẩm; 0 để tắt
+SEARCH_INDEX_REFRESH = int(os.getenv("SEARCH_INDEX_REFRESH", "900"))
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -67,23 +67,65 @@ class ProductClient:
             response = requests.get(url, timeout=self.timeout)
             
             if response.status_code == 200:
-                product = response.json()
-                return {
-                    'id': product.get('id', product_id),
-                    'name': product.get('name', ''),
-                    'description': product.get('description', ''),
-                    'price': product.get('price', 0),
-                    'category': product.get('type', 'general').lower(),  # Using type field from ProductType choices
-                    'image_url': product.get('image_url', ''),
-                    'rating': product.get('avg_rating', 0),
-                    'reviews_count': product.get('reviews_count', 0)
-                }
+                return self._format_product(response.json(), product_id)
             
             return None
         except Exception as e:
             logger.error(f"Error fetching product {product_id} from product service: {str(e)}")
             return None
     
+    def _format_product(self, product: Dict[str, Any], product_id: str) -> Dict[str, Any]:
+        """Convert a product service payload into the recommendation product format"""
+        return {
+            'id': product.get('id', product_id),
+            'name': product.get('name', ''),
+            'description': product.get('description', ''),
+            'price': product.get('price', 0),
+            'category': product.get('type', 'general').lower(),  # Using type field from ProductType choices
+            'image_url': product.get('image_url', ''),
+            'rating': product.get('avg_rating', 0),
+            'reviews_count': product.get('reviews_count', 0)
+        }
+    
+    def get_products_by_ids(self, product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get details for many products with one request to the product service batch endpoint
+        
+        Products the product service does not know are looked up one by one
+        (book and shoe services), like get_product.
+        
+        Args:
+            product_ids (List[str]): IDs of the products
+            
+        Returns:
+            Dict[str, Dict[str, Any]]: Product details keyed by product ID (missing products are omitted)
+        """
+        product_ids = [str(product_id) for product_id in dict.fromkeys(product_ids) if product_id]
+        products = {}
+        if not product_ids:
+            return products
+        
+        try:
+            response = requests.post(
+                f"{self.product_service_url}/products/batch/",
+                json={'ids': product_ids},
+                timeout=self.timeout
+            )
+            if response.status_code == 200:
+                for product in response.json().get('results', []):
+                    product_id = str(product.get('_id'))
+                    products[product_id] = self._format_product(product, product_id)
+        except Exception as e:
+            logger.error(f"Error fetching {len(product_ids)} products from product service: {str(e)}")
+        
+        for product_id in product_ids:
+            if product_id not in products:
+                product = self.get_product(product_id)
+                if product:
+                    products[product_id] = product
+        
+        return products
+    
     @cache(ttl=3600)
     def _get_book(self, book_id: str) -> Optional[Dict[str, Any]]:
         """
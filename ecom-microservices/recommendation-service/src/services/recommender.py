@@ -103,10 +103,11 @@ class RecommendationService:
             
             # Otherwise, enrich with product details
             enriched_recommendations = []
+            products = self.product_client.get_products_by_ids([rec.get('product_id') for rec in top_products])
             
             for rec in top_products:
                 product_id = rec.get('product_id')
-                product = self.product_client.get_product(product_id)
+                product = products.get(str(product_id))
                 
                 if product:
                     # Merge recommendation data with product details
@@ -157,10 +158,11 @@ class RecommendationService:
             List[Dict[str, Any]]: Enriched recommendations with product details
         """
         enriched_recommendations = []
+        products = self.product_client.get_products_by_ids([rec.get('product_id') for rec in recommendations])
         
         for rec in recommendations:
             product_id = rec.get('product_id')
-            product = self.product_client.get_product(product_id)
+            product = products.get(str(product_id))
             
             if product:
                 # Extract recommendation metadata
@@ -3,9 +3,11 @@ Sentiment Client - Client for communicating with sentiment analysis service
 """
 
 import os
+import re
+import time
 import requests
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from ..config.settings import Config
 from ..utils.cache import cache
 
@@ -25,6 +27,46 @@ class SentimentClient:
         """
         self.base_url = base_url or Config.SENTIMENT_SERVICE_URL
         self.timeout = 5  # Timeout in seconds
+        self.session = requests.Session()
+        # Conditional-request cache: key -> (fresh until, ETag, payload)
+        self._http_cache: Dict[Tuple, Tuple[float, Optional[str], Any]] = {}
+    
+    def _get_revalidated(self, path: str, params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """
+        GET a JSON resource honoring the service's Cache-Control and ETag headers
+        
+        The payload is reused without a request while it is fresh (max-age); once
+        stale it is revalidated with If-None-Match and a 304 keeps the cached copy.
+        
+        Args:
+            path (str): Path relative to the service base URL
+            params (Dict[str, Any], optional): Query parameters
+            
+        Returns:
+            Optional[Any]: Decoded JSON payload, or None if the service did not return 200/304
+        """
+        key = (path, tuple(sorted((params or {}).items())))
+        cached = self._http_cache.get(key)
+        if cached and time.time() < cached[0]:
+            return cached[2]
+        
+        headers = {}
+        if cached and cached[1]:
+            headers['If-None-Match'] = cached[1]
+        response = self.session.get(f"{self.base_url}{path}", params=params, headers=headers, timeout=self.timeout)
+        
+        if response.status_code == 304 and cached:
+            payload = cached[2]
+        elif response.status_code == 200:
+            payload = response.json()
+        else:
+            logger.warning(f"Failed to get {path}: {response.status_code}")
+            return None
+        
+        match = re.search(r'max-age=(\d+)', response.headers.get('Cache-Control', ''))
+        max_age = int(match.group(1)) if match else 0
+        self._http_cache[key] = (time.time() + max_age, response.headers.get('ETag') or (cached and cached[1]), payload)
+        return payload
     
     @cache(ttl=3600)
     def get_product_sentiment(self, product_id: str) -> Dict[str, Any]:
@@ -39,7 +81,8 @@ class SentimentClient:
         """
         try:
             url = f"{self.base_url}/product/{product_id}/sentiment"
-            response = requests.get(url, timeout=self.timeout)
+            # Only the aggregate is used; without reviews the service answers from pre-analysed data
+            response = self.session.get(url, params={"include_reviews": "false"}, timeout=self.timeout)
             
             if response.status_code == 200:
                 return response.json()
@@ -75,7 +118,6 @@ class SentimentClient:
             results[product_id] = self.get_product_sentiment(product_id)
         return results
     
-    @cache(ttl=3600)
     def get_sentiment_distribution(self) -> Dict[str, Any]:
         """
         Get overall sentiment distribution statistics
@@ -84,19 +126,14 @@ class SentimentClient:
             Dict[str, Any]: Overall sentiment distribution
         """
         try:
-            url = f"{self.base_url}/trends/distribution"
-            response = requests.get(url, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                return response.json()
-            
-            logger.warning(f"Failed to get sentiment distribution: {response.status_code}")
+            result = self._get_revalidated("/trends/distribution")
+            if result is not None:
+                return result
             return {"distribution": {"positive": 0, "neutral": 0, "negative": 0}}
         except Exception as e:
             logger.error(f"Error fetching sentiment distribution: {str(e)}")
             return {"distribution": {"positive": 0, "neutral": 0, "negative": 0}}
     
-    @cache(ttl=3600)
     def get_top_sentiment_products(self, category: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Get top products based on sentiment scores
@@ -109,17 +146,13 @@ class SentimentClient:
             List[Dict[str, Any]]: List of top products with sentiment data
         """
         try:
-            url = f"{self.base_url}/products/top"
             params = {'limit': limit}
             if category:
                 params['category'] = category
                 
-            response = requests.get(url, params=params, timeout=self.timeout)
-            
-            if response.status_code == 200:
-                return response.json().get('products', [])
-            
-            logger.warning(f"Failed to get top sentiment products: {response.status_code}")
+            result = self._get_revalidated("/products/top", params=params)
+            if result is not None:
+                return result.get('products', [])
             return []
         except Exception as e:
             logger.error(f"Error fetching top sentiment products: {str(e)}")
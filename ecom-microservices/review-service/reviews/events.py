@@ -0,0 +1,147 @@
+"""
+Gửi sự kiện review tới sentiment-service để phân tích cảm xúc trước.
+
+Review mới gửi sự kiện 'created'. Review bị sửa nội dung hoặc điểm gửi 'updated' để
+sentiment-service phân tích lại; review bị xóa hoặc bị ẩn gửi 'deleted' để loại khỏi kho của
+sentiment-service. Thay đổi không ảnh hưởng cảm xúc (lượt vote, số báo cáo) không gửi sự kiện.
+
+Sự kiện được đưa vào bộ đệm cục bộ sau khi transaction commit và một luồng nền gửi theo lô
+tới SENTIMENT_EVENTS_URL, nên request tạo review không phải chờ sentiment-service. Khi
+sentiment-service trả 429 (hàng đợi đầy), luồng gửi chờ theo Retry-After rồi gửi lại; nếu bộ
+đệm cũng đầy thì sự kiện cũ nhất bị bỏ (cảm xúc của review đó vẫn được tính khi có người hỏi).
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .models import GeneralReview, VerifiedReview
+
+logger = logging.getLogger(__name__)
+
+# Số sự kiện tối đa mỗi lần gửi
+BATCH_SIZE = 100
+# Số sự kiện tối đa giữ trong bộ đệm khi sentiment-service chậm hoặc không truy cập được
+BUFFER_SIZE = 10000
+# Thời gian chờ (giây) trước khi gửi lại khi lỗi kết nối
+RETRY_DELAY = 5
+# Các trường ảnh hưởng tới kết quả phân tích cảm xúc của một review
+SENTIMENT_FIELDS = ('rating', 'title', 'comment', 'is_hidden')
+
+
+def review_event(review, event='created'):
+    """Dữ liệu của review gửi kèm sự kiện"""
+    return {
+        'event': event,
+        'id': str(review.pk),
+        'product_id': review.product_id,
+        'user_id': str(review.user_id),
+        'rating': review.rating,
+        'title': review.title,
+        'comment': review.comment,
+        'created_at': review.created_at.isoformat() if review.created_at else None,
+    }
+
+
+class ReviewEventPublisher:
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+        self._buffer = deque(maxlen=BUFFER_SIZE)
+        self._ready = threading.Condition()
+        self._worker = None
+
+    def publish(self, event):
+        with self._ready:
+            if len(self._buffer) == self._buffer.maxlen:
+                logger.warning(f"Review event buffer full, dropping event {self._buffer[0]['id']}")
+            self._buffer.append(event)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='review-events', daemon=True)
+                self._worker.start()
+            self._ready.notify()
+
+    def _run(self):
+        while True:
+            with self._ready:
+                while not self._buffer:
+                    self._ready.wait()
+                batch = [self._buffer.popleft() for _ in range(min(BATCH_SIZE, len(self._buffer)))]
+
+            delay = self._send(batch)
+            if delay:
+                # Trả lô về đầu bộ đệm để giữ thứ tự, rồi chờ trước khi gửi lại
+                with self._ready:
+                    self._buffer.extendleft(reversed(batch))
+                time.sleep(delay)
+
+    def _send(self, batch):
+        """Gửi một lô sự kiện; trả về số giây cần chờ trước khi gửi lại, 0 nếu không cần"""
+        try:
+            response = self.session.post(self.url, json={'reviews': batch}, timeout=5)
+        except requests.RequestException as e:
+            logger.warning(f"Error sending review events: {e}")
+            return RETRY_DELAY
+
+        if response.status_code == 429:
+            return int(response.headers.get('Retry-After', RETRY_DELAY))
+        if response.status_code >= 400:
+            # Lỗi dữ liệu không tự khỏi khi gửi lại
+            logger.error(f"Review events rejected (status: {response.status_code}): {response.text[:200]}")
+        return 0
+
+
+_publisher = None
+
+
+def get_publisher():
+    global _publisher
+    if _publisher is None and settings.SENTIMENT_EVENTS_URL:
+        _publisher = ReviewEventPublisher(settings.SENTIMENT_EVENTS_URL)
+    return _publisher
+
+
+def _signature(review):
+    return tuple(getattr(review, field) for field in SENTIMENT_FIELDS)
+
+
+def _publish_on_commit(publisher, event):
+    transaction.on_commit(lambda: publisher.publish(event))
+
+
+def remember_signature(sender, instance, **kwargs):
+    if not set(SENTIMENT_FIELDS) & instance.get_deferred_fields():
+        instance._sentiment_signature = _signature(instance)
+
+
+def on_review_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_sentiment_signature', None)
+    signature = _signature(instance)
+    instance._sentiment_signature = signature
+    publisher = get_publisher()
+    if publisher is None:
+        return
+    if created:
+        _publish_on_commit(publisher, review_event(instance))
+    elif previous is not None and previous != signature:
+        _publish_on_commit(publisher, review_event(instance, 'deleted' if instance.is_hidden else 'updated'))
+
+
+def on_review_deleted(sender, instance, **kwargs):
+    publisher = get_publisher()
+    if publisher is not None:
+        _publish_on_commit(publisher, review_event(instance, 'deleted'))
+
+
+def connect_signals():
+    for model in (VerifiedReview, GeneralReview):
+        name = model.__name__
+        post_init.connect(remember_signature, sender=model, dispatch_uid=f'review-events-init-{name}')
+        post_save.connect(on_review_saved, sender=model, dispatch_uid=f'review-events-{name}')
+        post_delete.connect(on_review_deleted, sender=model, dispatch_uid=f'review-events-delete-{name}')
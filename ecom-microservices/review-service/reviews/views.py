@@ -57,18 +57,48 @@ class ReviewViewSet(viewsets.ViewSet):
         verified_reviews = VerifiedReview.objects.filter(product_id=product_id, is_hidden=False)
         general_reviews = GeneralReview.objects.filter(product_id=product_id, is_hidden=False)
 
-        total_reviews = verified_reviews.count() + general_reviews.count()
+        verified_count = verified_reviews.count()
+        general_count = general_reviews.count()
+        total_reviews = verified_count + general_count
         average_rating = (
-            (verified_reviews.aggregate(Avg('rating'))['rating__avg'] or 0) * verified_reviews.count()
-            + (general_reviews.aggregate(Avg('rating'))['rating__avg'] or 0) * general_reviews.count()
+            (verified_reviews.aggregate(Avg('rating'))['rating__avg'] or 0) * verified_count
+            + (general_reviews.aggregate(Avg('rating'))['rating__avg'] or 0) * general_count
         ) / total_reviews if total_reviews > 0 else 0
 
-        return Response({
+        response = {
             'product': product_info,
             'stats': {'total_reviews': total_reviews, 'average_rating': round(average_rating, 2)},
-            'verified_reviews': VerifiedReviewSerializer(verified_reviews, many=True).data,
-            'general_reviews': GeneralReviewSerializer(general_reviews, many=True).data
-        })
+        }
+
+        # Phân trang tùy chọn qua limit/offset trên danh sách verified rồi general
+        if 'limit' in request.query_params:
+            try:
+                limit = max(int(request.query_params['limit']), 0)
+                offset = max(int(request.query_params.get('offset', 0)), 0)
+            except ValueError:
+                return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+            verified_page = verified_reviews.order_by('-created_at', '-pk')[offset:offset + limit]
+            verified_data = VerifiedReviewSerializer(verified_page, many=True).data
+            general_offset = max(offset - verified_count, 0)
+            general_page = general_reviews.order_by('-created_at', '-pk')[
+                general_offset:general_offset + limit - len(verified_data)
+            ]
+            general_data = GeneralReviewSerializer(general_page, many=True).data
+
+            response['verified_reviews'] = verified_data
+            response['general_reviews'] = general_data
+            response['pagination'] = {
+                'limit': limit,
+                'offset': offset,
+                'total': total_reviews,
+                'has_more': offset + len(verified_data) + len(general_data) < total_reviews
+            }
+            return Response(response)
+
+        response['verified_reviews'] = VerifiedReviewSerializer(verified_reviews, many=True).data
+        response['general_reviews'] = GeneralReviewSerializer(general_reviews, many=True).data
+        return Response(response)
 
     @action(detail=False, methods=['GET'], url_path='user_reviews/(?P<user_id>[^/.]+)')
     def user_reviews(self, request, user_id=None):
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -129,4 +130,5 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-
+# Endpoint nhận sự kiện review mới của sentiment-service (rỗng = không gửi)
+SENTIMENT_EVENTS_URL = os.environ.get('SENTIMENT_EVENTS_URL', '')
@@ -12,9 +12,12 @@ echo "✅ Đã kết nối thành công tới review-service!"
 # Tạo thư mục cần thiết
 mkdir -p /app/reports/sentiment_analysis
 
-# Tải dữ liệu NLTK nếu cần
-echo "🔄 Đảm bảo dữ liệu NLTK đã được tải..."
-python -c "import nltk; nltk.download('stopwords', quiet=True); nltk.download('punkt', quiet=True)"
+# SERVING_MODE=prefork: gunicorn tải mô hình một lần rồi fork worker dùng chung trọng số
+# SERVING_MODE=flask: server phát triển của Flask, một tiến trình
+if [ "${SERVING_MODE:-prefork}" = "prefork" ]; then
+  echo "🚀 Khởi động Sentiment Analysis Service với gunicorn (${GUNICORN_WORKERS:-2} workers)..."
+  exec gunicorn -c gunicorn.conf.py
+fi
 
 echo "🚀 Khởi động Sentiment Analysis Service..."
 exec python -m src.app
@@ -0,0 +1,38 @@
+"""
+Cấu hình gunicorn cho chế độ phục vụ pre-fork (SERVING_MODE=prefork).
+
+Mô hình được tải một lần trong master (`preload_app`) và các worker dùng chung trọng số
+qua copy-on-write, nên bộ nhớ gần như không tăng khi thêm worker. Xem src/utils/prefork.py.
+"""
+
+import os
+
+from src.utils.prefork import configure_worker, freeze_shared_state, prepare_master_environment, worker_exited
+
+# Phải chạy trước khi ứng dụng (và mô hình) được import
+_worker_threads = prepare_master_environment()
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8010')}"
+wsgi_app = 'src.app:create_app()'
+preload_app = True
+
+workers = int(os.environ.get('GUNICORN_WORKERS', '2'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+accesslog = '-'
+
+
+def when_ready(server):
+    """Master đã tải xong ứng dụng, chuẩn bị fork worker"""
+    freeze_shared_state()
+
+
+def post_fork(server, worker):
+    """Đặt lại số luồng suy luận trong từng worker"""
+    configure_worker(_worker_threads, server.cfg.workers)
+
+
+def child_exit(server, worker):
+    """Dọn số liệu Prometheus của worker đã thoát"""
+    worker_exited(worker.pid)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+"""
+Benchmark thông lượng và độ trễ của sentiment-service, chạy hoàn toàn offline.
+
+Sinh corpus reviews tiếng Anh/tiếng Việt tổng hợp (số lượng và phân phối độ dài cấu hình được),
+rồi chạy đồng thời các kịch bản:
+    - model: SentimentModel.analyze_batch với mô hình tí hon tạo tại chỗ (scripts/build_tiny_model.py)
+    - rules: bộ phân tích rule-based dùng khi không có transformer
+    - api:   các route Flask /api/analyze và /api/analyze_batch qua test client
+
+Mỗi kịch bản báo cáo texts/sec, độ trễ p50/p99 mỗi request, tỷ lệ padding (chỉ với transformer)
+và RSS đỉnh của tiến trình.
+
+Ví dụ:
+    python -m scripts.benchmark_sentiment --texts 2000 --batch-size 32 --concurrency 4
+    python -m scripts.benchmark_sentiment --scenarios rules --vi-ratio 1.0 --mean-words 80
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+# Thêm thư mục gốc của dự án vào PYTHONPATH
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SCENARIOS = ('model', 'rules', 'api')
+
+EN_WORDS = {
+    'positive': ['great', 'excellent', 'love', 'amazing', 'recommend', 'perfect', 'fast', 'happy', 'worth'],
+    'neutral': ['okay', 'average', 'expected', 'fine', 'normal', 'decent', 'standard'],
+    'negative': ['terrible', 'broken', 'waste', 'disappointed', 'poor', 'slow', 'awful', 'refund'],
+    'filler': ['the', 'product', 'quality', 'shipping', 'price', 'it', 'is', 'was', 'and', 'but',
+               'this', 'after', 'one', 'week', 'very', 'not', 'really', 'box', 'seller', 'color'],
+}
+VI_WORDS = {
+    'positive': ['tốt', 'tuyệt vời', 'hài lòng', 'đáng tiền', 'nhanh', 'đẹp', 'chất lượng cao'],
+    'neutral': ['tạm được', 'bình thường', 'trung bình', 'ổn'],
+    'negative': ['kém', 'thất vọng', 'hỏng', 'chậm', 'tệ', 'không nên mua', 'lừa đảo'],
+    'filler': ['sản phẩm', 'này', 'giao hàng', 'giá', 'và', 'nhưng', 'rất', 'không', 'người bán',
+               'đóng gói', 'màu', 'sau', 'một', 'tuần', 'dùng', 'thì', 'cũng'],
+}
+
+
+def generate_corpus(n_texts: int, vi_ratio: float = 0.5, mean_words: int = 30, sigma: float = 0.8,
+                    max_words: int = 600, seed: int = 42) -> List[str]:
+    """
+    Sinh corpus reviews tổng hợp
+
+    Độ dài (số từ) theo phân phối log-normal có trung vị `mean_words`, nên có đuôi dài
+    gồm một ít review rất dài như dữ liệu thật.
+
+    Args:
+        n_texts: Số lượng văn bản
+        vi_ratio: Tỷ lệ văn bản tiếng Việt
+        mean_words: Trung vị số từ mỗi văn bản
+        sigma: Độ lệch chuẩn của log độ dài
+        max_words: Số từ tối đa mỗi văn bản
+        seed: Seed cho bộ sinh số ngẫu nhiên
+
+    Returns:
+        List[str]: Danh sách văn bản
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n_texts):
+        words = VI_WORDS if rng.random() < vi_ratio else EN_WORDS
+        polarity = rng.choice(('positive', 'neutral', 'negative'))
+        length = max(1, min(max_words, int(rng.lognormvariate(np.log(mean_words), sigma))))
+        tokens = [
+            rng.choice(words[polarity]) if rng.random() < 0.25 else rng.choice(words['filler'])
+            for _ in range(length)
+        ]
+        text = ' '.join(tokens)
+        corpus.append(text[0].upper() + text[1:] + rng.choice(('.', '!', '', '...')))
+    return corpus
+
+
+def _batches(corpus: List[str], batch_size: int) -> List[List[str]]:
+    return [corpus[i:i + batch_size] for i in range(0, len(corpus), batch_size)]
+
+
+def _peak_rss_mb() -> float:
+    """RSS đỉnh của tiến trình (MB); ru_maxrss tính bằng kB trên Linux"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_scenario(name: str, requests: List[Any], handler: Callable[[Any], int], concurrency: int) -> Dict[str, Any]:
+    """
+    Chạy các request đồng thời và đo độ trễ từng request
+
+    Args:
+        name: Tên kịch bản
+        requests: Danh sách payload request
+        handler: Hàm xử lý một request, trả về số văn bản đã xử lý
+        concurrency: Số luồng gửi request đồng thời
+
+    Returns:
+        Dict[str, Any]: texts/sec, p50/p99 (ms) và RSS đỉnh (MB)
+    """
+    def timed(payload):
+        start = time.perf_counter()
+        count = handler(payload)
+        return count, time.perf_counter() - start
+
+    # Chạy nóng một request để không tính thời gian tải lười (mô hình, từ điển, route)
+    handler(requests[0])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, requests))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for _, latency in results]) * 1000
+    texts = sum(count for count, _ in results)
+    return {
+        'scenario': name,
+        'requests': len(requests),
+        'texts': texts,
+        'texts_per_sec': texts / elapsed if elapsed else float('inf'),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def padding_ratio(backend, batches: List[List[str]], micro_batch: int, max_length: int) -> float:
+    """
+    Tỷ lệ token padding trên tổng số token đưa vào mô hình, theo cách SentimentModel
+    gom nhóm (sắp theo độ dài rồi chia thành nhóm `micro_batch`)
+
+    Args:
+        backend: Backend suy luận có phương thức `encode`
+        batches: Các batch văn bản của từng request
+        micro_batch: Kích thước nhóm suy luận (SentimentModel.batch_size)
+        max_length: Số token tối đa mỗi văn bản
+
+    Returns:
+        float: Tỷ lệ padding trong khoảng [0, 1)
+    """
+    real = padded = 0
+    for batch in batches:
+        lengths = sorted(len(f['input_ids']) for f in backend.encode(batch, max_length=max_length))
+        for i in range(0, len(lengths), micro_batch):
+            group = lengths[i:i + micro_batch]
+            real += sum(group)
+            padded += group[-1] * len(group)
+    return 1 - real / padded if padded else 0.0
+
+
+def _prepare_environment(model_dir: Optional[str], workdir: str) -> Optional[str]:
+    """
+    Chuẩn bị biến môi trường trước khi import mô hình/route: dùng mô hình tí hon cho cả
+    tiếng Anh và đa ngôn ngữ, tải đồng bộ, kho reviews trong thư mục tạm
+
+    Returns:
+        Optional[str]: Đường dẫn mô hình, None nếu không có torch/transformers (chỉ chạy rule-based)
+    """
+    import importlib.util
+
+    os.environ['MODEL_LOAD_ASYNC'] = 'False'
+    os.environ['REVIEW_STORE_DIR'] = os.path.join(workdir, 'review_store')
+
+    if model_dir is None:
+        if not all(importlib.util.find_spec(m) is not None for m in ('torch', 'transformers')):
+            return None
+        from scripts.build_tiny_model import build_tiny_model
+        model_dir = build_tiny_model(
+            os.path.join(workdir, 'tiny'),
+            corpus=[' '.join(sum(words.values(), [])) for words in (EN_WORDS, VI_WORDS)]
+        )
+
+    os.environ['SENTIMENT_MODEL_PATH'] = model_dir
+    os.environ['MULTILINGUAL_MODEL_PATH'] = model_dir
+    return model_dir
+
+
+def _print_table(results: List[Dict[str, Any]]):
+    header = f"{'scenario':<14}{'texts/sec':>12}{'p50 ms':>10}{'p99 ms':>10}{'padding':>10}{'peak RSS MB':>13}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        padding = f"{r['padding_ratio']:.1%}" if r.get('padding_ratio') is not None else 'n/a'
+        print(f"{r['scenario']:<14}{r['texts_per_sec']:>12.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+              f"{padding:>10}{r['peak_rss_mb']:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sentiment-service offline')
+    parser.add_argument('--texts', type=int, default=2000, help='Số văn bản trong corpus')
+    parser.add_argument('--vi-ratio', type=float, default=0.5, help='Tỷ lệ văn bản tiếng Việt')
+    parser.add_argument('--mean-words', type=int, default=30, help='Trung vị số từ mỗi văn bản')
+    parser.add_argument('--sigma', type=float, default=0.8, help='Độ phân tán (log-normal) của độ dài')
+    parser.add_argument('--max-words', type=int, default=600, help='Số từ tối đa mỗi văn bản')
+    parser.add_argument('--batch-size', type=int, default=32, help='Số văn bản mỗi request')
+    parser.add_argument('--concurrency', type=int, default=4, help='Số request đồng thời')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Các kịch bản, cách nhau bởi dấu phẩy')
+    parser.add_argument('--model-dir', help='Mô hình dùng thay cho mô hình tí hon (đường dẫn cục bộ)')
+    parser.add_argument('--json', help='Ghi kết quả ra file JSON')
+    parser.add_argument('--seed', type=int, default=42, help='Seed sinh corpus')
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Kịch bản không hợp lệ: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix='sentiment-bench-')
+    model_dir = _prepare_environment(args.model_dir, workdir)
+    if model_dir is None:
+        print("torch/transformers chưa được cài đặt: kịch bản model và api chạy bằng rule-based")
+
+    corpus = generate_corpus(args.texts, args.vi_ratio, args.mean_words, args.sigma, args.max_words, args.seed)
+    batches = _batches(corpus, args.batch_size)
+    print(f"Corpus: {len(corpus)} văn bản, {len(batches)} request x {args.batch_size}, "
+          f"concurrency {args.concurrency}, trung bình {np.mean([len(t.split()) for t in corpus]):.0f} từ")
+
+    results = []
+    if 'model' in scenarios:
+        from src.models.sentiment_model import SentimentModel
+        from src.utils.text_preprocessing import preprocess_batch
+
+        model = SentimentModel()
+        result = run_scenario(
+            f'model[{model.status}]', batches,
+            lambda batch: len(model.analyze_batch(preprocess_batch(batch))), args.concurrency
+        )
+        if model.en_backend is not None:
+            max_length = int(os.environ.get('MAX_LENGTH', 512))
+            result['padding_ratio'] = padding_ratio(
+                model.en_backend, [preprocess_batch(b) for b in batches], model.batch_size, max_length
+            )
+        results.append(result)
+
+    if 'rules' in scenarios:
+        from src.models.rule_engine import RuleEngine
+        from src.utils.language_router import LanguageRouter
+
+        engine = RuleEngine.from_env()
+        router = LanguageRouter()
+        results.append(run_scenario(
+            'rules', batches,
+            lambda batch: len(engine.analyze_batch(batch, router.route_batch(batch))), args.concurrency
+        ))
+
+    if 'api' in scenarios:
+        from src.app import create_app
+
+        app = create_app()
+
+        def post(path, payload):
+            # Mỗi request dùng test client riêng để các luồng không dùng chung trạng thái client
+            response = app.test_client().post(path, json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} returned {response.status_code}")
+
+        def analyze_batch(batch):
+            post('/api/analyze_batch', {'texts': batch})
+            return len(batch)
+
+        def analyze_text(text):
+            post('/api/analyze', {'text': text})
+            return 1
+
+        results.append(run_scenario('api/batch', batches, analyze_batch, args.concurrency))
+        results.append(run_scenario('api/text', corpus[:len(batches) * 4], analyze_text, args.concurrency))
+
+    print()
+    _print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+        print(f"\nĐã ghi kết quả vào {args.json}")
+
+
+if __name__ == '__main__':
+    main()
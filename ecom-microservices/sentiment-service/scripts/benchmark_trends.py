@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Benchmark SentimentTrendAnalyzer trên dữ liệu reviews tổng hợp.
+
+Ví dụ:
+    python -m scripts.benchmark_trends --reviews 1000000 --products 5000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+# Thêm thư mục gốc của dự án vào PYTHONPATH
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.analytics.sentiment_trends import SentimentTrendAnalyzer
+
+
+def generate_reviews(n_reviews: int, n_products: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Sinh reviews đã phân tích cảm xúc với phân phối ngẫu nhiên
+
+    Args:
+        n_reviews: Số lượng reviews
+        n_products: Số lượng sản phẩm
+        seed: Seed cho bộ sinh số ngẫu nhiên
+
+    Returns:
+        List[Dict[str, Any]]: Danh sách reviews theo định dạng của review-service
+    """
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    labels = ['positive', 'neutral', 'negative']
+    return [
+        {
+            'id': i,
+            'product_id': f'product-{rng.randrange(n_products)}',
+            'user_id': f'user-{rng.randrange(n_reviews)}',
+            'rating': rng.randint(1, 5),
+            'created_at': (start + timedelta(minutes=rng.randrange(525600))).isoformat(),
+            'sentiment': {'label': rng.choice(labels), 'score': rng.random()}
+        }
+        for i in range(n_reviews)
+    ]
+
+
+def _timed(label: str, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"{label:<32}{time.perf_counter() - start:>10.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SentimentTrendAnalyzer')
+    parser.add_argument('--reviews', type=int, default=1000000, help='Số lượng reviews')
+    parser.add_argument('--products', type=int, default=5000, help='Số lượng sản phẩm')
+    parser.add_argument('--compare', type=int, default=20, help='Số sản phẩm đưa vào compare_products')
+    args = parser.parse_args()
+
+    reviews = _timed('generate reviews', generate_reviews, args.reviews, args.products)
+    analyzer = _timed('build dataframe', SentimentTrendAnalyzer, reviews)
+    _timed('get_sentiment_distribution', analyzer.get_sentiment_distribution)
+    _timed('get_sentiment_by_rating', analyzer.get_sentiment_by_rating)
+    _timed('get_sentiment_score_over_time', analyzer.get_sentiment_score_over_time, time_unit='month')
+    _timed('get_top_products', analyzer.get_top_products, n=10)
+    product_ids = [f'product-{i}' for i in range(args.compare)]
+    _timed('compare_products', analyzer.compare_products, product_ids)
+
+
+if __name__ == '__main__':
+    main()
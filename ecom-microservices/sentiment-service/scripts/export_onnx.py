@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Script export mô hình transformer sang ONNX để chạy với backend `INFERENCE_BACKEND=onnx`.
+
+Ví dụ:
+    python -m scripts.export_onnx --model distilbert-base-uncased-finetuned-sst-2-english
+    python -m scripts.export_onnx --model nlptown/bert-base-multilingual-uncased-sentiment --quantize
+"""
+
+import os
+import sys
+import argparse
+from typing import Optional
+
+# Thêm thư mục gốc của dự án vào PYTHONPATH
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.models.inference_backends import onnx_model_dir
+
+
+def export_onnx(model_path: str, output_dir: Optional[str] = None, quantize: bool = False,
+                opset: int = 14) -> str:
+    """
+    Export mô hình phân loại sang ONNX, kèm tokenizer trong cùng thư mục
+
+    Args:
+        model_path: Tên hoặc đường dẫn mô hình
+        output_dir: Thư mục đích, mặc định suy ra từ `ONNX_MODEL_DIR`
+        quantize: Tạo thêm `model_quantized.onnx` (lượng tử hóa động int8)
+        opset: Phiên bản ONNX opset
+
+    Returns:
+        str: Thư mục chứa đồ thị ONNX
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    output_dir = output_dir or onnx_model_dir(model_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+
+    # Input mẫu để trace đồ thị; trục batch và sequence được khai báo động
+    sample = tokenizer(["export sample", "another export sample text"], padding=True, return_tensors="pt")
+    input_names = list(sample.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    graph_path = os.path.join(output_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            graph_path,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(graph_path, os.path.join(output_dir, "model_quantized.onnx"),
+                         weight_type=QuantType.QInt8)
+
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export mô hình transformer sang ONNX')
+    parser.add_argument('--model', required=True, help='Tên hoặc đường dẫn mô hình')
+    parser.add_argument('--output', help='Thư mục lưu đồ thị ONNX')
+    parser.add_argument('--quantize', action='store_true', help='Tạo thêm bản lượng tử hóa int8')
+    parser.add_argument('--opset', type=int, default=14, help='Phiên bản ONNX opset')
+    args = parser.parse_args()
+
+    output_dir = export_onnx(args.model, args.output, quantize=args.quantize, opset=args.opset)
+    print(f"Đã export mô hình ONNX vào: {output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,9 +7,14 @@ Tạo các biểu đồ và báo cáo chi tiết về phân phối cảm xúc, x
 import os
 import sys
 import json
+import hashlib
+import multiprocessing
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tabulate import tabulate
 from datetime import datetime, timedelta
 
@@ -17,9 +22,14 @@ from datetime import datetime, timedelta
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.analytics.sentiment_trends import SentimentTrendAnalyzer
+from src.analytics.review_store import ReviewSentimentStore
+from src.analytics.report_jobs import REPORT_WORKERS
 from src.services.sentiment_analyzer import SentimentAnalyzer
 from src.services.review_client import ReviewClient
 
+# Dấu vân tay dữ liệu của từng báo cáo sản phẩm, dùng để bỏ qua sản phẩm không đổi
+MANIFEST_FILE = 'manifest.json'
+
 def load_data_from_api(product_ids=None, limit=100):
     """
     Tải dữ liệu từ API
@@ -209,14 +219,132 @@ def generate_overall_report(trend_analyzer, output_dir):
     
     print(f"Báo cáo tổng quan đã được lưu vào thư mục: {output_dir}")
 
-def generate_product_reports(trend_analyzer, product_ids, output_dir):
+def product_fingerprint(product_analyzer, product_stats):
+    """
+    Dấu vân tay các số liệu tổng hợp mà báo cáo của một sản phẩm hiển thị
+    
+    Args:
+        product_analyzer (SentimentTrendAnalyzer): Analyzer chỉ chứa reviews của sản phẩm
+        product_stats (dict): Số liệu so sánh của sản phẩm
+    
+    Returns:
+        str: Chuỗi hex thay đổi khi số liệu hoặc xu hướng theo tháng thay đổi
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps(product_stats, sort_keys=True, default=str).encode('utf-8'))
+    trend = product_analyzer.get_sentiment_score_over_time(time_unit='month')
+    digest.update(trend.to_json().encode('utf-8'))
+    return digest.hexdigest()
+
+def render_product_report(product_id, product_data, product_stats, product_subdir):
+    """
+    Vẽ biểu đồ và tạo trang tóm tắt cho một sản phẩm
+    
+    Hàm ở cấp module để có thể chạy trong process pool.
+    
+    Args:
+        product_id (str): ID sản phẩm
+        product_data (pd.DataFrame): Reviews đã chuẩn bị của sản phẩm
+        product_stats (dict): Số liệu so sánh của sản phẩm
+        product_subdir (str): Thư mục lưu báo cáo của sản phẩm
+    
+    Returns:
+        str: ID sản phẩm đã được tạo báo cáo
+    """
+    os.makedirs(product_subdir, exist_ok=True)
+    
+    # Tạo analyzer mới chỉ với dữ liệu của sản phẩm này
+    product_analyzer = SentimentTrendAnalyzer()
+    product_analyzer.df = product_data
+    
+    # 1. Phân phối cảm xúc
+    try:
+        fig = product_analyzer.plot_sentiment_distribution()
+        plt.savefig(os.path.join(product_subdir, 'sentiment_distribution.png'))
+        plt.close(fig)
+    except Exception as e:
+        print(f"  Lỗi khi tạo biểu đồ phân phối cảm xúc: {str(e)}")
+    
+    # 2. Xu hướng cảm xúc theo thời gian
+    try:
+        fig = product_analyzer.plot_sentiment_over_time(
+            time_unit='month', 
+            title=f'Xu hướng cảm xúc cho sản phẩm {product_id}'
+        )
+        plt.savefig(os.path.join(product_subdir, 'sentiment_trend.png'))
+        plt.close(fig)
+    except Exception as e:
+        print(f"  Lỗi khi tạo biểu đồ xu hướng cảm xúc: {str(e)}")
+    
+    # 3. Tạo file báo cáo tổng quan cho sản phẩm
+    with open(os.path.join(product_subdir, 'summary.html'), 'w') as f:
+        f.write(f'<html><head><title>Sentiment Analysis for Product {product_id}</title>')
+        f.write('<style>body{font-family:Arial,sans-serif;margin:20px;} .metric{font-size:24px;font-weight:bold;} .card{border:1px solid #ddd;border-radius:5px;padding:15px;margin-bottom:15px;} table{border-collapse:collapse;width:100%;} th,td{text-align:left;padding:8px;border-bottom:1px solid #ddd;} th{background-color:#4CAF50;color:white;}</style>')
+        f.write('</head><body>')
+        f.write(f'<h1>Sentiment Analysis Report for Product {product_id}</h1>')
+        f.write('<div class="card">')
+        f.write('<h2>Summary</h2>')
+        f.write('<table>')
+        f.write(f'<tr><td>Total Reviews:</td><td class="metric">{product_stats["total_reviews"]}</td></tr>')
+        f.write(f'<tr><td>Sentiment Score:</td><td class="metric">{product_stats["sentiment_score"]:.2f}</td></tr>')
+        f.write(f'<tr><td>Average Rating:</td><td class="metric">{product_stats["avg_rating"]:.1f}</td></tr>')
+        f.write('</table>')
+        f.write('</div>')
+        
+        f.write('<div class="card">')
+        f.write('<h2>Sentiment Distribution</h2>')
+        f.write('<table>')
+        f.write('<tr><th>Sentiment</th><th>Count</th><th>Percentage</th></tr>')
+        f.write(f'<tr><td>Positive</td><td>{product_stats["positive"]}</td><td>{product_stats["positive_pct"]:.1f}%</td></tr>')
+        f.write(f'<tr><td>Neutral</td><td>{product_stats["neutral"]}</td><td>{product_stats["neutral_pct"]:.1f}%</td></tr>')
+        f.write(f'<tr><td>Negative</td><td>{product_stats["negative"]}</td><td>{product_stats["negative_pct"]:.1f}%</td></tr>')
+        f.write('</table>')
+        f.write('</div>')
+        
+        f.write('<div class="card">')
+        f.write('<h2>Visualizations</h2>')
+        f.write('<p>Sentiment Distribution:</p>')
+        f.write(f'<img src="sentiment_distribution.png" alt="Sentiment Distribution" style="max-width:100%">')
+        f.write('<p>Sentiment Trend Over Time:</p>')
+        f.write(f'<img src="sentiment_trend.png" alt="Sentiment Trend" style="max-width:100%">')
+        f.write('</div>')
+        
+        f.write('<p>Generated on: ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '</p>')
+        f.write('</body></html>')
+    
+    return product_id
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def generate_product_reports(trend_analyzer, product_ids, output_dir, workers=1, incremental=True, progress=None):
     """
     Tạo báo cáo riêng cho từng sản phẩm
     
+    Mỗi sản phẩm được vẽ trong một tiến trình của process pool. Ở chế độ tăng dần, sản phẩm
+    có dấu vân tay số liệu trùng với lần tạo trước (lưu trong manifest.json) được giữ nguyên.
+    
     Args:
         trend_analyzer (SentimentTrendAnalyzer): Bộ phân tích xu hướng
         product_ids (list): Danh sách ID sản phẩm
         output_dir (str): Thư mục lưu báo cáo
+        workers (int): Số tiến trình vẽ song song (1 = vẽ tuần tự trong tiến trình hiện tại)
+        incremental (bool): Bỏ qua sản phẩm có số liệu không đổi
+        progress (callable, optional): Gọi progress(product_id, rendered) sau mỗi sản phẩm
+    
+    Returns:
+        dict: Danh sách sản phẩm đã vẽ lại ('rendered') và được giữ nguyên ('skipped')
     """
     print("Đang tạo báo cáo cho từng sản phẩm...")
     
@@ -232,18 +360,16 @@ def generate_product_reports(trend_analyzer, product_ids, output_dir):
     
     # Phân tích chi tiết cho từng sản phẩm
     comparison_data = trend_analyzer.compare_products(product_ids)
+    previous = _load_manifest(output_dir) if incremental else {}
+    manifest = dict(previous)
+    tasks = []
+    summary = {'rendered': [], 'skipped': []}
     
     for product_id in product_ids:
         if product_id not in comparison_data:
             print(f"  Không có dữ liệu cho sản phẩm {product_id}, bỏ qua...")
             continue
         
-        print(f"- Đang tạo báo cáo cho sản phẩm {product_id}...")
-        
-        # Tạo thư mục cho sản phẩm
-        product_subdir = os.path.join(product_dir, product_id)
-        os.makedirs(product_subdir, exist_ok=True)
-        
         # Lọc dữ liệu cho sản phẩm này
         product_data = trend_analyzer.df[trend_analyzer.df['product_id'] == product_id].copy()
         
@@ -251,68 +377,42 @@ def generate_product_reports(trend_analyzer, product_ids, output_dir):
             print(f"  Không có dữ liệu cho sản phẩm {product_id}, bỏ qua...")
             continue
         
-        # Tạo analyzer mới chỉ với dữ liệu của sản phẩm này
+        product_subdir = os.path.join(product_dir, str(product_id))
         product_analyzer = SentimentTrendAnalyzer()
         product_analyzer.df = product_data
+        fingerprint = product_fingerprint(product_analyzer, comparison_data[product_id])
+        manifest[str(product_id)] = fingerprint
         
-        # 1. Phân phối cảm xúc
-        try:
-            fig = product_analyzer.plot_sentiment_distribution()
-            plt.savefig(os.path.join(product_subdir, 'sentiment_distribution.png'))
-            plt.close(fig)
-        except Exception as e:
-            print(f"  Lỗi khi tạo biểu đồ phân phối cảm xúc: {str(e)}")
-        
-        # 2. Xu hướng cảm xúc theo thời gian
-        try:
-            fig = product_analyzer.plot_sentiment_over_time(
-                time_unit='month', 
-                title=f'Xu hướng cảm xúc cho sản phẩm {product_id}'
-            )
-            plt.savefig(os.path.join(product_subdir, 'sentiment_trend.png'))
-            plt.close(fig)
-        except Exception as e:
-            print(f"  Lỗi khi tạo biểu đồ xu hướng cảm xúc: {str(e)}")
-        
-        # 3. Tạo file báo cáo tổng quan cho sản phẩm
-        product_stats = comparison_data[product_id]
+        if previous.get(str(product_id)) == fingerprint and os.path.exists(os.path.join(product_subdir, 'summary.html')):
+            summary['skipped'].append(product_id)
+            if progress:
+                progress(product_id, False)
+            continue
         
-        with open(os.path.join(product_subdir, 'summary.html'), 'w') as f:
-            f.write(f'<html><head><title>Sentiment Analysis for Product {product_id}</title>')
-            f.write('<style>body{font-family:Arial,sans-serif;margin:20px;} .metric{font-size:24px;font-weight:bold;} .card{border:1px solid #ddd;border-radius:5px;padding:15px;margin-bottom:15px;} table{border-collapse:collapse;width:100%;} th,td{text-align:left;padding:8px;border-bottom:1px solid #ddd;} th{background-color:#4CAF50;color:white;}</style>')
-            f.write('</head><body>')
-            f.write(f'<h1>Sentiment Analysis Report for Product {product_id}</h1>')
-            f.write('<div class="card">')
-            f.write('<h2>Summary</h2>')
-            f.write('<table>')
-            f.write(f'<tr><td>Total Reviews:</td><td class="metric">{product_stats["total_reviews"]}</td></tr>')
-            f.write(f'<tr><td>Sentiment Score:</td><td class="metric">{product_stats["sentiment_score"]:.2f}</td></tr>')
-            f.write(f'<tr><td>Average Rating:</td><td class="metric">{product_stats["avg_rating"]:.1f}</td></tr>')
-            f.write('</table>')
-            f.write('</div>')
-            
-            f.write('<div class="card">')
-            f.write('<h2>Sentiment Distribution</h2>')
-            f.write('<table>')
-            f.write('<tr><th>Sentiment</th><th>Count</th><th>Percentage</th></tr>')
-            f.write(f'<tr><td>Positive</td><td>{product_stats["positive"]}</td><td>{product_stats["positive_pct"]:.1f}%</td></tr>')
-            f.write(f'<tr><td>Neutral</td><td>{product_stats["neutral"]}</td><td>{product_stats["neutral_pct"]:.1f}%</td></tr>')
-            f.write(f'<tr><td>Negative</td><td>{product_stats["negative"]}</td><td>{product_stats["negative_pct"]:.1f}%</td></tr>')
-            f.write('</table>')
-            f.write('</div>')
-            
-            f.write('<div class="card">')
-            f.write('<h2>Visualizations</h2>')
-            f.write('<p>Sentiment Distribution:</p>')
-            f.write(f'<img src="sentiment_distribution.png" alt="Sentiment Distribution" style="max-width:100%">')
-            f.write('<p>Sentiment Trend Over Time:</p>')
-            f.write(f'<img src="sentiment_trend.png" alt="Sentiment Trend" style="max-width:100%">')
-            f.write('</div>')
-            
-            f.write('<p>Generated on: ' + datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '</p>')
-            f.write('</body></html>')
+        tasks.append((product_id, product_data, comparison_data[product_id], product_subdir))
+    
+    print(f"- Vẽ lại {len(tasks)} sản phẩm, giữ nguyên {len(summary['skipped'])} sản phẩm không đổi...")
+    
+    if workers > 1 and len(tasks) > 1:
+        # spawn: tiến trình con không thừa kế luồng và trạng thái mô hình của tiến trình cha
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=context) as executor:
+            futures = [executor.submit(render_product_report, *task) for task in tasks]
+            for future in as_completed(futures):
+                product_id = future.result()
+                summary['rendered'].append(product_id)
+                if progress:
+                    progress(product_id, True)
+    else:
+        for task in tasks:
+            product_id = render_product_report(*task)
+            summary['rendered'].append(product_id)
+            if progress:
+                progress(product_id, True)
     
+    _save_manifest(output_dir, manifest)
     print(f"Báo cáo sản phẩm đã được lưu vào thư mục: {product_dir}")
+    return summary
 
 def generate_index_page(output_dir):
     """
@@ -380,29 +480,42 @@ def generate_index_page(output_dir):
     
     print(f"Trang index đã được tạo: {os.path.join(output_dir, 'index.html')}")
 
-def main():
-    parser = argparse.ArgumentParser(description='Tạo báo cáo phân tích cảm xúc')
-    parser.add_argument('--output', help='Thư mục lưu báo cáo', default='sentiment_reports')
-    parser.add_argument('--product-ids', help='Danh sách ID sản phẩm, cách nhau bởi dấu phẩy')
-    parser.add_argument('--use-sample', action='store_true', help='Sử dụng dữ liệu mẫu thay vì tải từ API')
-    parser.add_argument('--limit', type=int, default=100, help='Số lượng reviews tối đa cho mỗi sản phẩm')
-    args = parser.parse_args()
+def generate_report(output_dir, product_ids=None, use_sample=False, from_store=False, limit=100,
+                    workers=1, incremental=True, progress=None):
+    """
+    Tải dữ liệu và tạo toàn bộ báo cáo (tổng quan, từng sản phẩm, trang index)
     
-    # Chuyển đổi chuỗi ID sản phẩm thành list
-    product_ids = args.product_ids.split(',') if args.product_ids else None
+    Args:
+        output_dir (str): Thư mục lưu báo cáo
+        product_ids (list, optional): Danh sách ID sản phẩm; mặc định lấy mọi sản phẩm có dữ liệu
+        use_sample (bool): Sử dụng dữ liệu mẫu thay vì tải từ API
+        from_store (bool): Đọc reviews đã phân tích từ kho dạng cột
+        limit (int): Số lượng reviews tối đa cho mỗi sản phẩm khi tải từ API
+        workers (int): Số tiến trình vẽ báo cáo sản phẩm song song
+        incremental (bool): Chỉ vẽ lại sản phẩm có số liệu thay đổi
+        progress (callable, optional): Gọi progress(product_id, rendered) sau mỗi sản phẩm
     
+    Returns:
+        dict: Tóm tắt báo cáo, hoặc None nếu không có dữ liệu
+    """
     # Tải dữ liệu
-    if args.use_sample:
-        reviews = load_sample_data()
+    if from_store:
+        trend_analyzer = ReviewSentimentStore().analyzer(product_ids=product_ids)
+        if trend_analyzer.df is None or trend_analyzer.df.empty:
+            print("Kho reviews không có dữ liệu, không thể tạo báo cáo.")
+            return None
     else:
-        reviews = load_data_from_api(product_ids, args.limit)
-    
-    if not reviews:
-        print("Không có dữ liệu reviews, không thể tạo báo cáo.")
-        return
-    
-    # Khởi tạo trend analyzer
-    trend_analyzer = SentimentTrendAnalyzer(reviews)
+        if use_sample:
+            reviews = load_sample_data()
+        else:
+            reviews = load_data_from_api(product_ids, limit)
+        
+        if not reviews:
+            print("Không có dữ liệu reviews, không thể tạo báo cáo.")
+            return None
+        
+        # Khởi tạo trend analyzer
+        trend_analyzer = SentimentTrendAnalyzer(reviews)
     
     # Lấy danh sách các ID sản phẩm từ dữ liệu nếu không được chỉ định
     if not product_ids:
@@ -412,15 +525,45 @@ def main():
             product_ids = []
     
     # Tạo các báo cáo
-    generate_overall_report(trend_analyzer, args.output)
+    generate_overall_report(trend_analyzer, output_dir)
     
+    summary = {'rendered': [], 'skipped': []}
     if product_ids:
-        generate_product_reports(trend_analyzer, product_ids, args.output)
+        summary = generate_product_reports(
+            trend_analyzer, product_ids, output_dir,
+            workers=workers, incremental=incremental, progress=progress
+        )
+    
+    generate_index_page(output_dir)
     
-    generate_index_page(args.output)
+    summary['products'] = len(product_ids)
+    summary['reviews'] = len(trend_analyzer.df)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description='Tạo báo cáo phân tích cảm xúc')
+    parser.add_argument('--output', help='Thư mục lưu báo cáo', default='sentiment_reports')
+    parser.add_argument('--product-ids', help='Danh sách ID sản phẩm, cách nhau bởi dấu phẩy')
+    parser.add_argument('--use-sample', action='store_true', help='Sử dụng dữ liệu mẫu thay vì tải từ API')
+    parser.add_argument('--from-store', action='store_true',
+                        help='Đọc reviews đã phân tích từ kho dạng cột (REVIEW_STORE_DIR) thay vì phân tích lại')
+    parser.add_argument('--limit', type=int, default=100, help='Số lượng reviews tối đa cho mỗi sản phẩm')
+    parser.add_argument('--workers', type=int, default=REPORT_WORKERS, help='Số tiến trình vẽ báo cáo sản phẩm song song')
+    parser.add_argument('--full', action='store_true', help='Vẽ lại mọi sản phẩm, bỏ qua manifest của lần tạo trước')
+    args = parser.parse_args()
+    
+    # Chuyển đổi chuỗi ID sản phẩm thành list
+    product_ids = args.product_ids.split(',') if args.product_ids else None
+    
+    summary = generate_report(
+        args.output, product_ids=product_ids, use_sample=args.use_sample, from_store=args.from_store,
+        limit=args.limit, workers=args.workers, incremental=not args.full
+    )
+    if summary is None:
+        return
     
     print(f"\nBáo cáo đã được tạo thành công trong thư mục: {args.output}")
     print(f"Mở file {os.path.join(args.output, 'index.html')} để xem báo cáo.")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Script đo bộ nhớ của master gunicorn và các worker để kiểm tra trọng số mô hình được chia sẻ.
+
+Với chế độ pre-fork, PSS (bộ nhớ chia đều phần dùng chung) của mỗi worker nhỏ hơn nhiều so
+với RSS, và tổng PSS gần như không đổi khi tăng GUNICORN_WORKERS.
+
+Ví dụ:
+    python -m scripts.worker_memory --pid $(pgrep -o gunicorn)
+"""
+
+import os
+import sys
+import argparse
+
+# Thêm thư mục gốc của dự án vào PYTHONPATH
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.prefork import process_memory
+
+
+def _children(pid: int):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Đo bộ nhớ của master gunicorn và các worker')
+    parser.add_argument('--pid', type=int, required=True, help='PID của tiến trình master gunicorn')
+    args = parser.parse_args()
+
+    total_pss = 0
+    print(f"{'role':<8}{'pid':>8}{'rss (MB)':>12}{'pss (MB)':>12}{'private (MB)':>14}")
+    for role, pid in [('master', args.pid)] + [('worker', child) for child in _children(args.pid)]:
+        memory = process_memory(pid)
+        total_pss += memory['pss']
+        print(f"{role:<8}{pid:>8}{memory['rss'] / 1024:>12.1f}"
+              f"{memory['pss'] / 1024:>12.1f}{memory['private'] / 1024:>14.1f}")
+    print(f"Total PSS: {total_pss / 1024:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
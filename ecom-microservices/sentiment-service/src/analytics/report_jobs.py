@@ -0,0 +1,181 @@
+"""
+Chạy việc tạo báo cáo cảm xúc dưới dạng job nền.
+
+Request tạo báo cáo chỉ ghi nhận job và trả về ngay; job chạy trong một luồng điều phối,
+việc vẽ biểu đồ từng sản phẩm được giao cho process pool (xem scripts/sentiment_report.py).
+Trạng thái job được ghi ra file JSON để mọi worker của gunicorn đều đọc được, và một file
+khóa trên thư mục báo cáo đảm bảo mỗi lúc chỉ một job ghi vào đó.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import fcntl
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Thư mục báo cáo được phục vụ bởi /api/reports/view
+REPORT_DIR = os.getenv("REPORT_DIR", os.path.join("reports", "sentiment_analysis"))
+# Thư mục lưu trạng thái các job
+REPORT_JOBS_DIR = os.getenv("REPORT_JOBS_DIR", os.path.join("reports", "jobs"))
+# Số tiến trình vẽ báo cáo sản phẩm song song (0 = số CPU)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "0")) or os.cpu_count() or 1
+
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+# Các file nội bộ của thư mục báo cáo, không liệt kê như artifact
+_INTERNAL_FILES = {".lock", "manifest.json"}
+
+
+def _run_report(output_dir: str, workers: int, progress: Callable, **params) -> Optional[Dict[str, Any]]:
+    """Tạo báo cáo bằng script; import khi chạy để service không phải tải matplotlib lúc khởi động"""
+    from scripts.sentiment_report import generate_report
+    return generate_report(output_dir, workers=workers, progress=progress, **params)
+
+
+class ReportJobManager:
+    """
+    Quản lý các job tạo báo cáo: gửi job, xem trạng thái, liệt kê artifact
+    """
+
+    def __init__(self, output_dir: str = REPORT_DIR, jobs_dir: str = REPORT_JOBS_DIR,
+                 workers: int = REPORT_WORKERS, runner: Callable = _run_report):
+        """
+        Args:
+            output_dir (str): Thư mục báo cáo
+            jobs_dir (str): Thư mục lưu trạng thái job
+            workers (int): Số tiến trình vẽ báo cáo sản phẩm
+            runner (Callable): Hàm tạo báo cáo runner(output_dir, workers, progress, **params)
+        """
+        self.output_dir = output_dir
+        self.jobs_dir = jobs_dir
+        self.workers = workers
+        self.runner = runner
+        # Luồng điều phối chỉ được tạo ở lần submit đầu tiên (sau khi gunicorn fork worker)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="report-job")
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job: Dict[str, Any]):
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        path = self._path(job["job_id"])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def submit(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Ghi nhận một job tạo báo cáo và đưa vào hàng đợi
+
+        Args:
+            params (Dict[str, Any]): Tham số của generate_report (product_ids, use_sample, from_store, limit, incremental)
+
+        Returns:
+            Dict[str, Any]: Trạng thái ban đầu của job
+        """
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "params": params,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "products_done": 0,
+            "products_rendered": 0,
+            "summary": None,
+            "error": None,
+        }
+        self._save(job)
+        with self._lock:
+            self._futures[job["job_id"]] = self._executor.submit(self._run, dict(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Đọc trạng thái job
+
+        Args:
+            job_id (str): ID job
+
+        Returns:
+            Optional[Dict[str, Any]]: Trạng thái job, kèm danh sách artifact khi job hoàn thành;
+                None nếu không có job
+        """
+        if not _JOB_ID.match(job_id or ""):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job["status"] == "succeeded":
+            job["artifacts"] = self.artifacts()
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Chờ job do tiến trình này gửi chạy xong
+
+        Args:
+            job_id (str): ID job
+            timeout (float, optional): Thời gian chờ tối đa (giây)
+
+        Returns:
+            Optional[Dict[str, Any]]: Trạng thái job sau khi chờ
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.get(job_id)
+
+    def artifacts(self) -> List[str]:
+        """
+        Liệt kê các file của báo cáo hiện tại
+
+        Returns:
+            List[str]: Đường dẫn tương đối so với thư mục báo cáo
+        """
+        paths = []
+        for root, _, files in os.walk(self.output_dir):
+            for name in files:
+                if name in _INTERNAL_FILES or name.endswith(".tmp"):
+                    continue
+                paths.append(os.path.relpath(os.path.join(root, name), self.output_dir))
+        return sorted(paths)
+
+    def _run(self, job: Dict[str, Any]):
+        os.makedirs(self.output_dir, exist_ok=True)
+        try:
+            # Khóa thư mục báo cáo: job của các worker khác chờ tới lượt thay vì ghi chồng lên nhau
+            with open(os.path.join(self.output_dir, ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                job.update(status="running", started_at=time.time())
+                self._save(job)
+
+                def progress(product_id, rendered):
+                    job["products_done"] += 1
+                    job["products_rendered"] += int(rendered)
+                    self._save(job)
+
+                summary = self.runner(self.output_dir, self.workers, progress, **job["params"])
+            if summary is None:
+                job.update(status="failed", error="No reviews available to build the report")
+            else:
+                job.update(status="succeeded", summary=summary)
+        except Exception as e:
+            logger.error(f"Report job {job['job_id']} failed: {str(e)}")
+            job.update(status="failed", error=str(e))
+        job["finished_at"] = time.time()
+        self._save(job)
+        with self._lock:
+            self._futures.pop(job["job_id"], None)
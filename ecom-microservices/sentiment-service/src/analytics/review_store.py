@@ -0,0 +1,435 @@
+"""
+Kho lưu trữ dạng cột (Parquet) cho reviews đã phân tích cảm xúc.
+
+Dữ liệu được phân vùng theo tháng tạo review (`month=YYYY-MM/part-*.parquet`), mỗi lần ghi
+thêm một file mới nên không phải viết lại dữ liệu cũ. Khi đọc, file được memory-map và bộ
+lọc (tháng, sản phẩm, danh mục, khoảng thời gian) được đẩy xuống tầng quét: phân vùng tháng
+không khớp bị bỏ qua hoàn toàn, các row group được loại bằng thống kê min/max của Parquet.
+
+Nhiều worker gunicorn dùng chung một kho: ghi thêm và gộp file được khóa bằng `fcntl.flock`
+trên file `.lock` ở thư mục gốc, và tập ID đã lưu được đồng bộ với các file hiện có ngay trong
+khóa nên một review chỉ được ghi một lần dù nhiều worker cùng nhận. Review bị sửa hoặc xóa ở
+review-service được loại khỏi kho bằng cách viết lại các file chứa nó (`remove`, hoặc
+`append(..., replace=...)` để thay bằng kết quả phân tích mới). Review không có `id` được gán
+ID suy ra từ nội dung để vẫn được khử trùng.
+"""
+
+import os
+import uuid
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+from src.analytics.sentiment_trends import SentimentTrendAnalyzer
+
+logger = logging.getLogger(__name__)
+
+REVIEW_STORE_DIR = os.getenv("REVIEW_STORE_DIR", "data/review_sentiment")
+# Gộp các file nhỏ của một tháng khi số file vượt quá ngưỡng này
+REVIEW_STORE_COMPACT_FILES = int(os.getenv("REVIEW_STORE_COMPACT_FILES", "32"))
+REVIEW_STORE_ROW_GROUP_SIZE = int(os.getenv("REVIEW_STORE_ROW_GROUP_SIZE", "65536"))
+
+UNKNOWN_MONTH = "unknown"
+
+SCHEMA = pa.schema([
+    ("review_id", pa.string()),
+    ("product_id", pa.string()),
+    ("category", pa.string()),
+    ("user_id", pa.string()),
+    ("rating", pa.float32()),
+    ("label", pa.string()),
+    ("score", pa.float32()),
+    ("created_at", pa.timestamp("us")),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+
+# Tên cột trong kho -> tên cột của SentimentTrendAnalyzer
+_ANALYZER_COLUMNS = {
+    "review_id": "id",
+    "product_id": "product_id",
+    "user_id": "user_id",
+    "rating": "rating",
+    "label": "sentiment",
+    "score": "sentiment_score",
+    "created_at": "created_at",
+}
+
+
+def _optional_str(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def _review_id(review: Dict[str, Any]) -> str:
+    """
+    ID của review trong kho; review không có 'id' dùng ID ổn định suy ra từ sản phẩm, người dùng,
+    nội dung và thời điểm tạo, nên cùng một review gửi lại nhiều lần vẫn chỉ được ghi một lần
+    """
+    if review.get("id") is not None:
+        return str(review["id"])
+    key = "\x1f".join(str(review.get(field) or "") for field in ("product_id", "user_id", "comment", "created_at"))
+    return "derived-" + hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def _parse_timestamps(values: List[Any]) -> pd.Series:
+    """
+    Chuyển chuỗi thời gian ISO (có hoặc không có múi giờ) về UTC không múi giờ
+
+    pandas >= 2 suy ra định dạng từ phần tử đầu tiên, nên các phần tử không khớp định dạng
+    đó được parse lại riêng lẻ.
+    """
+    series = pd.Series(values, dtype=object)
+    parsed = pd.to_datetime(series, errors="coerce", utc=True)
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = [pd.to_datetime(value, errors="coerce", utc=True) for value in series[retry]]
+    return parsed.dt.tz_localize(None)
+
+
+def _sentiment_fields(review: Dict[str, Any]):
+    """
+    Lấy nhãn và điểm cảm xúc, hỗ trợ cả hai định dạng đang dùng trong service:
+    {'sentiment': {'label', 'score'}} và {'sentiment': 'positive', 'sentiment_score': 0.9}
+    """
+    sentiment = review.get("sentiment")
+    if isinstance(sentiment, dict):
+        return sentiment.get("label", "neutral"), sentiment.get("score", 0.5)
+    return sentiment, review.get("sentiment_score", 0.5)
+
+
+def reviews_to_table(reviews: Iterable[Dict[str, Any]]) -> pa.Table:
+    """
+    Chuyển danh sách review đã phân tích sang bảng Arrow theo SCHEMA của kho
+
+    Args:
+        reviews: Reviews theo định dạng của SentimentAnalyzer hoặc load_sample_data
+
+    Returns:
+        pa.Table: Bảng Arrow
+    """
+    columns: Dict[str, List[Any]] = {name: [] for name in SCHEMA.names}
+    for review in reviews:
+        label, score = _sentiment_fields(review)
+        columns["review_id"].append(_review_id(review))
+        columns["product_id"].append(_optional_str(review.get("product_id")))
+        columns["category"].append(_optional_str(review.get("category")))
+        columns["user_id"].append(_optional_str(review.get("user_id")))
+        columns["rating"].append(review.get("rating"))
+        columns["label"].append(label)
+        columns["score"].append(score)
+        columns["created_at"].append(review.get("created_at"))
+
+    columns["created_at"] = _parse_timestamps(columns["created_at"])
+    columns["rating"] = pd.to_numeric(pd.Series(columns["rating"], dtype=object), errors="coerce")
+    columns["score"] = pd.to_numeric(pd.Series(columns["score"], dtype=object), errors="coerce")
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=SCHEMA, preserve_index=False)
+
+
+class ReviewSentimentStore:
+    """
+    Kho reviews đã phân tích cảm xúc, phân vùng theo tháng và ghi thêm tăng dần
+    """
+
+    def __init__(self, root: str = REVIEW_STORE_DIR, compact_files: int = REVIEW_STORE_COMPACT_FILES):
+        """
+        Args:
+            root: Thư mục gốc của dataset
+            compact_files: Số file tối đa trong một phân vùng tháng trước khi tự động gộp
+        """
+        self.root = os.path.abspath(root)
+        self.compact_files = compact_files
+        self.filesystem = fs.LocalFileSystem(use_mmap=True)
+        self._lock = threading.Lock()
+        self._review_ids: Set[str] = set()
+        # Các file đã được nạp vào _review_ids
+        self._id_files: Set[str] = set()
+
+    def _dataset(self) -> Optional[ds.Dataset]:
+        if not os.path.isdir(self.root):
+            return None
+        return ds.dataset(
+            self.root, schema=SCHEMA.append(pa.field("month", pa.string())), format="parquet",
+            filesystem=self.filesystem, partitioning=PARTITIONING, exclude_invalid_files=False,
+        )
+
+    def _files(self, month: str) -> List[str]:
+        directory = os.path.join(self.root, f"month={month}")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".parquet")
+        )
+
+    def files(self) -> List[str]:
+        """
+        Danh sách file dữ liệu hiện có trong kho
+
+        Returns:
+            List[str]: Đường dẫn các file Parquet, sắp xếp theo tên
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            path for name in os.listdir(self.root) if name.startswith("month=")
+            for path in self._files(name[len("month="):])
+        )
+
+    def read_files(self, paths: List[str], columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        Đọc (memory-map) một tập file cụ thể của kho
+
+        Args:
+            paths: Đường dẫn các file, thường lấy từ `files()`
+            columns: Các cột cần đọc, mặc định là toàn bộ schema
+
+        Returns:
+            pa.Table: Bảng Arrow gộp từ các file
+        """
+        columns = columns or SCHEMA.names
+        tables = [pq.ParquetFile(path, memory_map=True).read(columns=columns) for path in paths]
+        return pa.concat_tables(tables) if tables else SCHEMA.empty_table().select(columns)
+
+    def is_empty(self) -> bool:
+        """Kho chưa có dữ liệu nào"""
+        return not os.path.isdir(self.root) or not any(
+            name.startswith("month=") and self._files(name[len("month="):]) for name in os.listdir(self.root)
+        )
+
+    @contextmanager
+    def _exclusive(self):
+        """Khóa ghi của kho, dùng chung giữa các luồng và các tiến trình"""
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                yield
+
+    def _known_ids(self) -> Set[str]:
+        """
+        ID các review đã lưu, đồng bộ với file hiện có (gọi trong khóa ghi)
+
+        Chỉ đọc cột review_id của các file mới (do worker khác ghi); nếu có file đã bị gộp thì
+        nạp lại từ đầu.
+        """
+        files = set(self.files())
+        if not files >= self._id_files:
+            self._review_ids, self._id_files = set(), set()
+        new_files = sorted(files - self._id_files)
+        if new_files:
+            ids = self.read_files(new_files, columns=["review_id"]).column("review_id")
+            self._review_ids.update(review_id for review_id in ids.to_pylist() if review_id is not None)
+            self._id_files.update(new_files)
+        return self._review_ids
+
+    def _write(self, table: pa.Table, month: str) -> str:
+        """Ghi một file mới vào phân vùng tháng, sắp theo product_id để thống kê row group chặt hơn"""
+        directory = os.path.join(self.root, f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        table = table.sort_by([("product_id", "ascending"), ("created_at", "ascending")])
+
+        name = f"part-{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:12]}.parquet"
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, tmp_path, row_group_size=REVIEW_STORE_ROW_GROUP_SIZE, compression="zstd")
+        # Đổi tên nguyên tử để tiến trình đọc không thấy file ghi dở
+        path = os.path.join(directory, name)
+        os.replace(tmp_path, path)
+        return path
+
+    def _remove(self, review_ids: Set[str]) -> int:
+        """Viết lại các file chứa các review cần loại (gọi trong khóa ghi)"""
+        known_ids = self._known_ids()
+        review_ids = review_ids & known_ids
+        if not review_ids:
+            return 0
+        removed = 0
+        value_set = pa.array(sorted(review_ids), type=pa.string())
+        for path in self.files():
+            ids = self.read_files([path], columns=["review_id"]).column("review_id")
+            matches = pc.is_in(ids, value_set=value_set)
+            count = pc.sum(matches).as_py() or 0
+            if not count:
+                continue
+            table = pq.ParquetFile(path, memory_map=True).read()
+            kept = table.filter(pc.invert(pc.fill_null(matches, False)))
+            if kept.num_rows:
+                month = os.path.basename(os.path.dirname(path))[len("month="):]
+                self._id_files.add(self._write(kept, month))
+            os.remove(path)
+            self._id_files.discard(path)
+            removed += count
+        known_ids.difference_update(review_ids)
+        return removed
+
+    def remove(self, review_ids: Iterable[str]) -> int:
+        """
+        Loại các review khỏi kho (review đã bị xóa hoặc ẩn ở review-service)
+
+        Args:
+            review_ids: ID các review cần loại
+
+        Returns:
+            int: Số review đã loại
+        """
+        review_ids = {str(review_id) for review_id in review_ids if review_id}
+        if not review_ids:
+            return 0
+        with self._exclusive():
+            return self._remove(review_ids)
+
+    def append(self, reviews: List[Dict[str, Any]], replace: Optional[Iterable[str]] = None) -> int:
+        """
+        Ghi thêm reviews đã phân tích; review có ID đã tồn tại trong kho sẽ bị bỏ qua
+
+        Args:
+            reviews: Danh sách review (định dạng của SentimentAnalyzer hoặc load_sample_data)
+            replace: ID các review đã bị sửa; bản cũ trong kho được loại trước khi ghi
+
+        Returns:
+            int: Số review được ghi
+        """
+        with self._exclusive():
+            if replace:
+                self._remove({str(review_id) for review_id in replace if review_id})
+            known_ids = self._known_ids()
+            new_reviews, seen = [], set()
+            for review in reviews:
+                label, _ = _sentiment_fields(review)
+                key = _review_id(review)
+                if not label or key in known_ids or key in seen:
+                    continue
+                seen.add(key)
+                new_reviews.append(review)
+
+            if not new_reviews:
+                return 0
+
+            table = reviews_to_table(new_reviews)
+            months = pc.strftime(table.column("created_at"), format="%Y-%m").fill_null(UNKNOWN_MONTH)
+            for month in pc.unique(months).to_pylist():
+                self._id_files.add(self._write(table.filter(pc.equal(months, month)), month))
+                if len(self._files(month)) > self.compact_files:
+                    self._compact_month(month)
+
+            known_ids.update(seen)
+            return len(new_reviews)
+
+    def _compact_month(self, month: str):
+        """Gộp các file của một phân vùng tháng thành một file, loại review trùng ID"""
+        files = self._files(month)
+        if len(files) <= 1:
+            return
+        table = pa.concat_tables([pq.ParquetFile(path, memory_map=True).read() for path in files])
+        with_ids = table.filter(pc.is_valid(table.column("review_id")))
+        frame = with_ids.to_pandas().drop_duplicates("review_id", keep="last")
+        table = pa.concat_tables([
+            pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False),
+            table.filter(pc.is_null(table.column("review_id"))),
+        ])
+        self._id_files.add(self._write(table, month))
+        for path in files:
+            os.remove(path)
+            self._id_files.discard(path)
+        logger.info(f"Compacted {len(files)} files in review store partition month={month}")
+
+    def compact(self, month: Optional[str] = None):
+        """
+        Gộp file nhỏ trong một hoặc tất cả các phân vùng tháng
+
+        Args:
+            month: Tháng cần gộp ('YYYY-MM'), mặc định là tất cả
+        """
+        with self._exclusive():
+            if month:
+                months = [month]
+            elif os.path.isdir(self.root):
+                months = [name[len("month="):] for name in os.listdir(self.root) if name.startswith("month=")]
+            else:
+                months = []
+            for partition in months:
+                self._compact_month(partition)
+
+    @staticmethod
+    def _filter(product_ids: Optional[List[str]] = None, category: Optional[str] = None,
+                start_date: Optional[str] = None, end_date: Optional[str] = None) -> Optional[ds.Expression]:
+        conditions = []
+        if product_ids:
+            conditions.append(ds.field("product_id").isin([str(p) for p in product_ids]))
+        if category:
+            conditions.append(ds.field("category") == category)
+        if start_date:
+            start = pd.Timestamp(start_date)
+            # Điều kiện trên cột phân vùng để bỏ qua cả thư mục tháng không liên quan
+            conditions.append(ds.field("month") >= start.strftime("%Y-%m"))
+            conditions.append(ds.field("created_at") >= pa.scalar(start.to_pydatetime(), pa.timestamp("us")))
+        if end_date:
+            end = pd.Timestamp(end_date)
+            conditions.append(ds.field("month") <= end.strftime("%Y-%m"))
+            if len(str(end_date).strip()) <= len("YYYY-MM-DD"):
+                # Chỉ có ngày: lấy trọn ngày kết thúc, tức mọi review trước 00:00 ngày hôm sau
+                end_of_day = (end + pd.Timedelta(days=1)).to_pydatetime()
+                conditions.append(ds.field("created_at") < pa.scalar(end_of_day, pa.timestamp("us")))
+            else:
+                conditions.append(ds.field("created_at") <= pa.scalar(end.to_pydatetime(), pa.timestamp("us")))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def query(self, product_ids: Optional[List[str]] = None, category: Optional[str] = None,
+              start_date: Optional[str] = None, end_date: Optional[str] = None,
+              columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        Truy vấn reviews với bộ lọc được đẩy xuống tầng quét Parquet
+
+        Args:
+            product_ids: Chỉ lấy reviews của các sản phẩm này
+            category: Chỉ lấy reviews thuộc danh mục này
+            start_date: Thời điểm bắt đầu (bao gồm), định dạng 'YYYY-MM-DD'
+            end_date: Thời điểm kết thúc (bao gồm), định dạng 'YYYY-MM-DD'
+            columns: Các cột cần đọc, mặc định là toàn bộ schema
+
+        Returns:
+            pa.Table: Bảng Arrow kết quả
+        """
+        columns = columns or SCHEMA.names
+        expression = self._filter(product_ids, category, start_date, end_date)
+        for attempt in range(2):
+            dataset = self._dataset()
+            if dataset is None:
+                return SCHEMA.empty_table().select(columns)
+            try:
+                return dataset.to_table(columns=columns, filter=expression)
+            except FileNotFoundError:
+                # Worker khác vừa gộp phân vùng giữa lúc liệt kê và lúc đọc: liệt kê lại
+                if attempt:
+                    raise
+
+    def analyzer(self, product_ids: Optional[List[str]] = None, category: Optional[str] = None,
+                 start_date: Optional[str] = None, end_date: Optional[str] = None) -> SentimentTrendAnalyzer:
+        """
+        Tạo SentimentTrendAnalyzer từ kết quả truy vấn, không qua danh sách dict
+
+        Args:
+            product_ids: Chỉ lấy reviews của các sản phẩm này
+            category: Chỉ lấy reviews thuộc danh mục này
+            start_date: Thời điểm bắt đầu, định dạng 'YYYY-MM-DD'
+            end_date: Thời điểm kết thúc, định dạng 'YYYY-MM-DD'
+
+        Returns:
+            SentimentTrendAnalyzer: Analyzer trên tập reviews đã lọc
+        """
+        table = self.query(product_ids, category, start_date, end_date, columns=list(_ANALYZER_COLUMNS))
+        frame = table.to_pandas().rename(columns=_ANALYZER_COLUMNS)
+        return SentimentTrendAnalyzer.from_frame(frame)
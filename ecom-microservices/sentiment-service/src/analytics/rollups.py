@@ -0,0 +1,343 @@
+"""
+Các bảng tổng hợp (rollup) được duy trì sẵn trong bộ nhớ cho các endpoint xu hướng.
+
+`SentimentRollups` giữ phân phối nhãn toàn cục, bộ đếm theo sản phẩm (kèm danh mục) và bộ
+đếm theo khung thời gian (ngày/tuần/tháng/năm). Dữ liệu mới chỉ được cộng dồn, top-N theo
+danh mục được tính lại bằng heap khi danh mục đó thay đổi và cache cho tới lần cập nhật sau.
+
+`StoreRollups` gắn rollups với `ReviewSentimentStore`: mỗi lần đọc chỉ nạp thêm các file
+mới xuất hiện trong kho; nếu có file bị gộp/xóa (compaction) thì dựng lại từ đầu.
+"""
+
+import os
+import heapq
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from src.analytics.sentiment_trends import SENTIMENT_LABELS, SENTIMENT_VALUES
+
+logger = logging.getLogger(__name__)
+
+# Thời gian (giây) client được phép cache response của các endpoint dùng rollups
+ROLLUP_MAX_AGE = int(os.getenv("ROLLUP_MAX_AGE", "60"))
+
+# Số sản phẩm tối đa của một truy vấn top-N và số truy vấn top-N được cache
+TOP_PRODUCTS_MAX = 100
+TOP_CACHE_SIZE = 256
+
+TIME_UNITS = ("day", "week", "month", "year")
+ROLLUP_COLUMNS = ["product_id", "category", "rating", "label", "score", "created_at"]
+
+# Vị trí trong bộ đếm: positive, neutral, negative, nhãn khác
+_LABEL_INDEX = {label: i for i, label in enumerate(SENTIMENT_LABELS)}
+_OTHER = len(SENTIMENT_LABELS)
+
+
+def _period_keys(created_at: pd.Series, time_unit: str) -> pd.Series:
+    """Nhãn khung thời gian dạng chuỗi, sắp xếp theo thứ tự từ điển cũng là thứ tự thời gian"""
+    if time_unit == "day":
+        return created_at.dt.strftime("%Y-%m-%d")
+    if time_unit == "week":
+        iso = created_at.dt.isocalendar()
+        return iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+    if time_unit == "month":
+        return created_at.dt.strftime("%Y-%m")
+    if time_unit == "year":
+        return created_at.dt.strftime("%Y")
+    raise ValueError(f"Đơn vị thời gian không hợp lệ: {time_unit}")
+
+
+def _category_key(category: Optional[str]) -> Optional[str]:
+    """Khóa danh mục không phân biệt hoa thường ('Books' và 'books' là một)"""
+    return category.casefold() if category else None
+
+
+def _score(counts: List[float]) -> float:
+    """Điểm cảm xúc: positive = 1, neutral = 0.5, negative = 0, chia cho tổng số review"""
+    total = sum(counts[:_OTHER + 1])
+    if not total:
+        return 0.5
+    return (counts[0] * SENTIMENT_VALUES['positive'] + counts[1] * SENTIMENT_VALUES['neutral']) / total
+
+
+class SentimentRollups:
+    """
+    Bộ đếm tổng hợp cảm xúc, cập nhật tăng dần theo từng lô reviews
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._distribution: Dict[str, int] = defaultdict(int)
+        # product_id -> [positive, neutral, negative, khác, tổng rating, số rating, tổng điểm, số điểm]
+        self._products: Dict[str, List[float]] = {}
+        self._product_category: Dict[str, str] = {}
+        # khóa danh mục (_category_key) -> các sản phẩm
+        self._category_products: Dict[str, Set[str]] = defaultdict(set)
+        # đơn vị thời gian -> nhãn khung -> [positive, neutral, negative, khác]
+        self._buckets: Dict[str, Dict[str, List[int]]] = {
+            unit: defaultdict(lambda: [0] * (_OTHER + 1)) for unit in TIME_UNITS
+        }
+        self._top_cache: "OrderedDict[Tuple[Optional[str], int], List[Dict[str, Any]]]" = OrderedDict()
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> "SentimentRollups":
+        """Dựng rollups từ một bảng Arrow có các cột ROLLUP_COLUMNS"""
+        rollups = cls()
+        rollups.ingest(table)
+        return rollups
+
+    def ingest(self, table: pa.Table):
+        """
+        Cộng dồn một lô reviews vào các bộ đếm
+
+        Args:
+            table (pa.Table): Bảng Arrow có các cột product_id, category, rating, label, score, created_at
+        """
+        if table.num_rows == 0:
+            return
+        df = table.select(ROLLUP_COLUMNS).to_pandas()
+        # Review không gắn sản phẩm không được tính (tránh một "sản phẩm" rỗng trong top và danh mục)
+        df = df[df["label"].notna() & df["product_id"].notna() & (df["product_id"] != "")]
+        if df.empty:
+            return
+        slot = df["label"].map(_LABEL_INDEX).fillna(_OTHER).astype(int)
+
+        # Mọi phép đếm được gom theo nhóm trước, vòng lặp Python chỉ chạy trên số nhóm
+        label_counts = df.groupby("label").size()
+        product_counts = slot.groupby([df["product_id"], slot]).size()
+        ratings = df.groupby(df["product_id"])["rating"].agg(["sum", "count"])
+        scores = df.groupby(df["product_id"])["score"].agg(["sum", "count"])
+        categories = df[df["category"].notna()].groupby(df["product_id"])["category"].last()
+        bucket_counts = {}
+        timed = df["created_at"].notna()
+        for unit in TIME_UNITS:
+            periods = _period_keys(df.loc[timed, "created_at"], unit)
+            bucket_counts[unit] = slot[timed].groupby([periods, slot[timed]]).size()
+
+        with self._lock:
+            for label, count in label_counts.items():
+                self._distribution[label] += int(count)
+
+            touched = set()
+            for (product_id, index), count in product_counts.items():
+                counts = self._products.setdefault(product_id, [0] * (_OTHER + 5))
+                counts[index] += int(count)
+                touched.add(product_id)
+            for product_id, row in ratings.iterrows():
+                counts = self._products[product_id]
+                counts[_OTHER + 1] += float(row["sum"])
+                counts[_OTHER + 2] += int(row["count"])
+            for product_id, row in scores.iterrows():
+                counts = self._products[product_id]
+                counts[_OTHER + 3] += float(row["sum"])
+                counts[_OTHER + 4] += int(row["count"])
+            dirty: Set[Optional[str]] = {None}
+            for product_id, category in categories.items():
+                dirty |= self._assign_category(product_id, category)
+
+            for unit, counts in bucket_counts.items():
+                buckets = self._buckets[unit]
+                for (period, index), count in counts.items():
+                    buckets[period][index] += int(count)
+
+            # Chỉ bỏ cache top-N của các danh mục có sản phẩm thay đổi (và bảng toàn cục)
+            dirty |= {_category_key(self._product_category.get(product_id)) for product_id in touched}
+            self._invalidate_top(dirty)
+
+    def _assign_category(self, product_id: str, category: str) -> Set[Optional[str]]:
+        """Gán danh mục cho sản phẩm (gọi trong khóa); trả về các khóa danh mục bị thay đổi"""
+        previous = self._product_category.get(product_id)
+        if previous == category:
+            return set()
+        changed = {_category_key(category)}
+        if previous is not None:
+            self._category_products[_category_key(previous)].discard(product_id)
+            changed.add(_category_key(previous))
+        self._product_category[product_id] = category
+        self._category_products[_category_key(category)].add(product_id)
+        return changed
+
+    def _invalidate_top(self, dirty: Set[Optional[str]]):
+        for key in [key for key in self._top_cache if key[0] in dirty]:
+            del self._top_cache[key]
+
+    def uncategorized(self) -> List[str]:
+        """
+        Các sản phẩm chưa có danh mục (reviews được ghi trước khi có danh mục)
+
+        Returns:
+            List[str]: ID sản phẩm
+        """
+        with self._lock:
+            return [product_id for product_id in self._products if product_id not in self._product_category]
+
+    def set_categories(self, categories: Dict[str, Optional[str]]):
+        """
+        Gán danh mục cho các sản phẩm đã có trong rollups (giá trị None bị bỏ qua)
+
+        Args:
+            categories (Dict[str, Optional[str]]): product_id -> danh mục
+        """
+        with self._lock:
+            dirty: Set[Optional[str]] = set()
+            for product_id, category in categories.items():
+                if category and product_id in self._products:
+                    dirty |= self._assign_category(product_id, category)
+            self._invalidate_top(dirty)
+
+    def distribution(self) -> Dict[str, int]:
+        """
+        Phân phối nhãn cảm xúc toàn cục
+
+        Returns:
+            Dict[str, int]: Số lượng mỗi nhãn, luôn có đủ ba nhãn chuẩn
+        """
+        with self._lock:
+            distribution = {label: 0 for label in SENTIMENT_LABELS}
+            distribution.update(self._distribution)
+            return distribution
+
+    def _product_entry(self, product_id: str) -> Dict[str, Any]:
+        counts = self._products[product_id]
+        entry = {
+            'product_id': product_id,
+            'sentiment_score': _score(counts),
+            'positive_count': int(counts[0]),
+            'neutral_count': int(counts[1]),
+            'negative_count': int(counts[2]),
+            'total_reviews': int(sum(counts[:_OTHER + 1])),
+            'avg_rating': counts[_OTHER + 1] / counts[_OTHER + 2] if counts[_OTHER + 2] else None
+        }
+        if product_id in self._product_category:
+            entry['category'] = self._product_category[product_id]
+        return entry
+
+    def product_summary(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Tổng hợp cảm xúc của một sản phẩm
+
+        Args:
+            product_id (str): ID sản phẩm
+
+        Returns:
+            Optional[Dict[str, Any]]: Số lượng từng nhãn, điểm, rating trung bình và điểm trung bình
+                của mô hình (avg_score); None nếu sản phẩm chưa có review nào
+        """
+        with self._lock:
+            if product_id not in self._products:
+                return None
+            counts = self._products[product_id]
+            entry = self._product_entry(product_id)
+            entry['avg_score'] = counts[_OTHER + 3] / counts[_OTHER + 4] if counts[_OTHER + 4] else None
+            return entry
+
+    def top_products(self, n: int = 10, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Top sản phẩm theo điểm cảm xúc (hòa điểm thì ưu tiên sản phẩm nhiều review hơn)
+
+        Args:
+            n (int): Số sản phẩm tối đa (giới hạn trong 1..TOP_PRODUCTS_MAX)
+            category (str, optional): Chỉ xét sản phẩm thuộc danh mục này (không phân biệt hoa thường)
+
+        Returns:
+            List[Dict[str, Any]]: Danh sách sản phẩm kèm số lượng từng nhãn
+        """
+        n = max(1, min(int(n), TOP_PRODUCTS_MAX))
+        with self._lock:
+            key = (_category_key(category), n)
+            if key not in self._top_cache:
+                candidates = self._category_products.get(key[0], ()) if category else self._products.keys()
+                top = heapq.nlargest(
+                    n, candidates,
+                    key=lambda product_id: (_score(self._products[product_id]), sum(self._products[product_id][:_OTHER + 1]))
+                )
+                self._top_cache[key] = [self._product_entry(product_id) for product_id in top]
+                while len(self._top_cache) > TOP_CACHE_SIZE:
+                    self._top_cache.popitem(last=False)
+            else:
+                self._top_cache.move_to_end(key)
+            return list(self._top_cache[key])
+
+    def over_time(self, time_unit: str = 'month') -> Dict[str, List[Any]]:
+        """
+        Số lượng từng nhãn và điểm cảm xúc theo khung thời gian
+
+        Args:
+            time_unit (str): Đơn vị thời gian ('day', 'week', 'month', 'year')
+
+        Returns:
+            Dict[str, List[Any]]: time_periods, positive, neutral, negative, sentiment_score, review_count
+
+        Raises:
+            ValueError: Nếu đơn vị thời gian không hợp lệ
+        """
+        if time_unit not in self._buckets:
+            raise ValueError(f"Đơn vị thời gian không hợp lệ: {time_unit}")
+
+        with self._lock:
+            periods = sorted(self._buckets[time_unit])
+            counts = [self._buckets[time_unit][period] for period in periods]
+
+        # Điểm trung bình chỉ tính trên các nhãn chuẩn (giống SentimentTrendAnalyzer)
+        return {
+            'time_periods': periods,
+            'positive': [c[0] for c in counts],
+            'neutral': [c[1] for c in counts],
+            'negative': [c[2] for c in counts],
+            'sentiment_score': [_score(c[:_OTHER]) for c in counts],
+            'review_count': [sum(c) for c in counts]
+        }
+
+
+class StoreRollups:
+    """
+    Rollups đồng bộ với các file của ReviewSentimentStore
+    """
+
+    def __init__(self, store):
+        """
+        Args:
+            store (ReviewSentimentStore): Kho reviews làm nguồn dữ liệu
+        """
+        self.store = store
+        self._lock = threading.Lock()
+        self._rollups = SentimentRollups()
+        self._ingested: Set[str] = set()
+        self.version = ""
+
+    def refresh(self) -> SentimentRollups:
+        """
+        Nạp các file mới của kho vào rollups; dựng lại nếu có file đã bị gộp hoặc xóa
+
+        Returns:
+            SentimentRollups: Rollups đã đồng bộ với kho
+        """
+        with self._lock:
+            files = self.store.files()
+            current = set(files)
+            if not current >= self._ingested:
+                logger.info("Review store files were compacted, rebuilding sentiment rollups")
+                self._rollups = SentimentRollups()
+                self._ingested = set()
+
+            new_files = [path for path in files if path not in self._ingested]
+            if new_files:
+                try:
+                    self._rollups.ingest(self.store.read_files(new_files, columns=ROLLUP_COLUMNS))
+                    self._ingested.update(new_files)
+                except OSError as e:
+                    # File vừa bị gộp giữa lúc liệt kê và lúc đọc; lần gọi sau sẽ dựng lại
+                    logger.warning(f"Review store changed while refreshing rollups: {str(e)}")
+
+            # Phiên bản dữ liệu giống nhau giữa các worker đọc cùng một kho, dùng làm ETag
+            digest = hashlib.blake2b(digest_size=8)
+            for path in sorted(self._ingested):
+                digest.update(os.path.relpath(path, self.store.root).encode('utf-8'))
+            self.version = digest.hexdigest()
+            return self._rollups
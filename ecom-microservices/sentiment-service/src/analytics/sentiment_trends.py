@@ -1,10 +1,20 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional, Tuple, Union
 from collections import defaultdict
 
+# Nhãn cảm xúc chuẩn và giá trị số tương ứng dùng cho điểm cảm xúc tổng hợp
+SENTIMENT_LABELS = ['positive', 'neutral', 'negative']
+SENTIMENT_VALUES = {'positive': 1.0, 'neutral': 0.5, 'negative': 0.0}
+
+def _pyplot():
+    """Import matplotlib khi cần vẽ biểu đồ, tránh làm chậm khởi động service"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
 class SentimentTrendAnalyzer:
     """
     Phân tích xu hướng cảm xúc từ dữ liệu reviews đã được phân tích
@@ -33,6 +43,24 @@ class SentimentTrendAnalyzer:
         self.reviews = reviews
         self._prepare_dataframe()
     
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "SentimentTrendAnalyzer":
+        """
+        Khởi tạo analyzer trực tiếp từ dữ liệu dạng cột (ví dụ đọc từ ReviewSentimentStore)
+        
+        Args:
+            frame (pd.DataFrame): Các cột id, product_id, user_id, rating, sentiment, sentiment_score, created_at
+        
+        Returns:
+            SentimentTrendAnalyzer: Analyzer đã sẵn sàng truy vấn
+        """
+        analyzer = cls()
+        if frame.empty:
+            analyzer.df = pd.DataFrame()
+        else:
+            analyzer._set_dataframe(frame.reset_index(drop=True))
+        return analyzer
+    
     def _prepare_dataframe(self):
         """
         Chuyển đổi reviews thành DataFrame để phân tích
@@ -41,28 +69,40 @@ class SentimentTrendAnalyzer:
             self.df = pd.DataFrame()
             return
         
-        # Chuẩn bị dữ liệu
-        data = []
-        for review in self.reviews:
-            # Kiểm tra review có sentiment info không
-            sentiment_info = review.get('sentiment', {})
-            if not sentiment_info:
-                continue
-            
-            row = {
-                'id': review.get('id', ''),
-                'product_id': review.get('product_id', ''),
-                'user_id': review.get('user_id', ''),
-                'rating': review.get('rating', 0),
-                'sentiment': sentiment_info.get('label', 'neutral'),
-                'sentiment_score': sentiment_info.get('score', 0.5),
-                'created_at': review.get('created_at', '')
-            }
-            
-            data.append(row)
+        # Chỉ giữ các review có thông tin cảm xúc, dựng DataFrame theo cột trong một lượt
+        reviews = [review for review in self.reviews if review.get('sentiment')]
+        if not reviews:
+            self.df = pd.DataFrame()
+            return
+        
+        self._set_dataframe(pd.DataFrame({
+            'id': [review.get('id', '') for review in reviews],
+            'product_id': [review.get('product_id', '') for review in reviews],
+            'user_id': [review.get('user_id', '') for review in reviews],
+            'rating': [review.get('rating', 0) for review in reviews],
+            'sentiment': [review['sentiment'].get('label', 'neutral') for review in reviews],
+            'sentiment_score': [review['sentiment'].get('score', 0.5) for review in reviews],
+            'created_at': [review.get('created_at', '') for review in reviews]
+        }))
+    
+    def _set_dataframe(self, df: pd.DataFrame):
+        """
+        Chuẩn hóa kiểu dữ liệu và thêm các cột dẫn xuất cho DataFrame reviews
         
-        # Tạo DataFrame
-        self.df = pd.DataFrame(data)
+        Args:
+            df (pd.DataFrame): DataFrame dạng cột của reviews đã phân tích
+        """
+        # Cột phân loại (categorical): nhãn cảm xúc luôn có đủ ba nhãn chuẩn
+        labels = df['sentiment'].astype(object)
+        extra_labels = sorted(set(labels.dropna().unique()) - set(SENTIMENT_LABELS), key=str)
+        sentiment = pd.Categorical(labels, categories=SENTIMENT_LABELS + extra_labels)
+        df['sentiment'] = sentiment
+        # Giá trị số theo mã category; mã -1 (thiếu nhãn) trỏ vào phần tử NaN cuối cùng
+        values = [SENTIMENT_VALUES.get(label, np.nan) for label in sentiment.categories]
+        df['sentiment_value'] = np.array(values + [np.nan])[sentiment.codes]
+        df['product_id'] = df['product_id'].astype('category')
+        
+        self.df = df
         
         # Chuyển đổi cột ngày tháng
         if 'created_at' in self.df.columns:
@@ -115,20 +155,13 @@ class SentimentTrendAnalyzer:
         if self.df is None or self.df.empty or 'created_at' not in self.df.columns:
             return pd.DataFrame()
         
-        # Lọc theo khoảng thời gian
-        df_filtered = self.df.copy()
+        # Lọc theo khoảng thời gian (giá trị số của cảm xúc đã được tính sẵn khi dựng DataFrame)
+        df_filtered = self.df
         if start_date:
             df_filtered = df_filtered[df_filtered['created_at'] >= pd.to_datetime(start_date)]
         if end_date:
             df_filtered = df_filtered[df_filtered['created_at'] <= pd.to_datetime(end_date)]
         
-        # Chuyển đổi cảm xúc thành giá trị số
-        df_filtered['sentiment_value'] = df_filtered['sentiment'].map({
-            'positive': 1.0, 
-            'neutral': 0.5, 
-            'negative': 0.0
-        })
-        
         # Nhóm theo đơn vị thời gian
         if time_unit == 'day':
             grouped = df_filtered.groupby('date')
@@ -164,16 +197,8 @@ class SentimentTrendAnalyzer:
         if self.df is None or self.df.empty or 'rating' not in self.df.columns:
             return pd.DataFrame()
         
-        # Nhóm theo rating và sentiment
-        grouped = self.df.groupby(['rating', 'sentiment']).size().reset_index(name='count')
-        
-        # Pivot để có định dạng phù hợp
-        pivot_table = grouped.pivot(index='rating', columns='sentiment', values='count').fillna(0)
-        
-        # Đảm bảo có đủ các cột
-        for sentiment in ['positive', 'neutral', 'negative']:
-            if sentiment not in pivot_table.columns:
-                pivot_table[sentiment] = 0
+        # Đếm số lượng theo rating x cảm xúc trong một lượt
+        pivot_table = self._label_counts('rating').astype(float)
         
         # Tính tổng số reviews cho mỗi rating
         pivot_table['total'] = pivot_table.sum(axis=1)
@@ -184,6 +209,57 @@ class SentimentTrendAnalyzer:
         
         return pivot_table
     
+    def _label_counts(self, key: str, df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Đếm số review theo từng nhãn cảm xúc cho mỗi giá trị của một cột, trong một lượt groupby
+        
+        Args:
+            key (str): Cột dùng để nhóm (ví dụ 'product_id', 'rating')
+            df (pd.DataFrame, optional): DataFrame cần đếm, mặc định là toàn bộ dữ liệu
+        
+        Returns:
+            pd.DataFrame: Bảng (giá trị của key x nhãn cảm xúc), luôn có đủ các nhãn chuẩn
+        """
+        df = self.df if df is None else df
+        counts = df.groupby([key, 'sentiment'], observed=True).size().unstack(fill_value=0)
+        counts = counts.reindex(columns=df['sentiment'].cat.categories, fill_value=0)
+        counts.columns.name = 'sentiment'
+        return counts
+    
+    def _product_stats(self, product_ids: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Tính các chỉ số cảm xúc cho mỗi sản phẩm bằng phép toán vector trên toàn bộ DataFrame
+        
+        Args:
+            product_ids (List[str], optional): Chỉ tính cho các sản phẩm này, mặc định là tất cả
+        
+        Returns:
+            pd.DataFrame: Chỉ số theo product_id (total_reviews, sentiment_score, số lượng từng nhãn, avg_rating)
+        """
+        df = self.df
+        if product_ids is not None:
+            df = df[df['product_id'].isin(product_ids)]
+        
+        counts = self._label_counts('product_id', df)
+        total_reviews = counts.sum(axis=1)
+        
+        # Điểm cảm xúc tổng hợp: positive = 1, neutral = 0.5, negative = 0
+        sentiment_score = (counts['positive'] * 1.0 + counts['neutral'] * 0.5) / total_reviews
+        
+        stats = pd.DataFrame({
+            'total_reviews': total_reviews,
+            'sentiment_score': sentiment_score,
+            'positive_count': counts['positive'],
+            'neutral_count': counts['neutral'],
+            'negative_count': counts['negative']
+        })
+        stats['avg_rating'] = pd.to_numeric(df['rating'], errors='coerce').groupby(
+            df['product_id'], observed=True
+        ).mean()
+        
+        stats.index.name = 'product_id'
+        return stats
+    
     def compare_products(self, product_ids: List[str]) -> Dict[str, Dict[str, Union[float, int]]]:
         """
         So sánh cảm xúc giữa các sản phẩm
@@ -197,43 +273,25 @@ class SentimentTrendAnalyzer:
         if self.df is None or self.df.empty or 'product_id' not in self.df.columns:
             return {}
         
-        results = {}
+        stats = self._product_stats(product_ids)
         
+        results = {}
         for product_id in product_ids:
-            # Lọc reviews của sản phẩm
-            product_reviews = self.df[self.df['product_id'] == product_id]
-            
-            if product_reviews.empty:
+            if product_id not in stats.index:
                 continue
             
-            # Tính phân phối cảm xúc
-            sentiment_counts = product_reviews['sentiment'].value_counts().to_dict()
-            
-            # Đảm bảo có đủ các key
-            for sentiment in ['positive', 'neutral', 'negative']:
-                if sentiment not in sentiment_counts:
-                    sentiment_counts[sentiment] = 0
-            
-            total_reviews = len(product_reviews)
-            
-            # Tính điểm cảm xúc tổng hợp
-            sentiment_score = (
-                (sentiment_counts['positive'] * 1.0) + 
-                (sentiment_counts['neutral'] * 0.5) + 
-                (sentiment_counts['negative'] * 0.0)
-            ) / total_reviews if total_reviews > 0 else 0
-            
-            # Lưu kết quả
+            row = stats.loc[product_id]
+            total_reviews = int(row['total_reviews'])
             results[product_id] = {
                 'total_reviews': total_reviews,
-                'sentiment_score': sentiment_score,
-                'positive': sentiment_counts['positive'],
-                'positive_pct': sentiment_counts['positive'] / total_reviews * 100 if total_reviews > 0 else 0,
-                'neutral': sentiment_counts['neutral'],
-                'neutral_pct': sentiment_counts['neutral'] / total_reviews * 100 if total_reviews > 0 else 0,
-                'negative': sentiment_counts['negative'],
-                'negative_pct': sentiment_counts['negative'] / total_reviews * 100 if total_reviews > 0 else 0,
-                'avg_rating': product_reviews['rating'].mean() if 'rating' in product_reviews.columns else None
+                'sentiment_score': float(row['sentiment_score']),
+                'positive': int(row['positive_count']),
+                'positive_pct': float(row['positive_count'] / total_reviews * 100),
+                'neutral': int(row['neutral_count']),
+                'neutral_pct': float(row['neutral_count'] / total_reviews * 100),
+                'negative': int(row['negative_count']),
+                'negative_pct': float(row['negative_count'] / total_reviews * 100),
+                'avg_rating': float(row['avg_rating'])
             }
         
         return results
@@ -252,52 +310,11 @@ class SentimentTrendAnalyzer:
         if self.df is None or self.df.empty or 'product_id' not in self.df.columns:
             return pd.DataFrame()
         
-        # Nhóm theo product_id
-        grouped = self.df.groupby('product_id')
+        products_df = self._product_stats().reset_index()
         
-        # Tính các chỉ số cho mỗi sản phẩm
-        product_stats = []
-        
-        for product_id, group in grouped:
-            # Đếm số lượng mỗi loại cảm xúc
-            sentiment_counts = group['sentiment'].value_counts().to_dict()
-            
-            # Đảm bảo có đủ các key
-            for sentiment in ['positive', 'neutral', 'negative']:
-                if sentiment not in sentiment_counts:
-                    sentiment_counts[sentiment] = 0
-            
-            total_reviews = len(group)
-            
-            # Tính điểm cảm xúc tổng hợp
-            sentiment_score = (
-                (sentiment_counts['positive'] * 1.0) + 
-                (sentiment_counts['neutral'] * 0.5) + 
-                (sentiment_counts['negative'] * 0.0)
-            ) / total_reviews
-            
-            product_stats.append({
-                'product_id': product_id,
-                'total_reviews': total_reviews,
-                'sentiment_score': sentiment_score,
-                'positive_count': sentiment_counts['positive'],
-                'neutral_count': sentiment_counts['neutral'],
-                'negative_count': sentiment_counts['negative'],
-                'avg_rating': group['rating'].mean() if 'rating' in group.columns else None
-            })
-        
-        # Chuyển đổi thành DataFrame
-        products_df = pd.DataFrame(product_stats)
-        
-        # Sắp xếp theo tiêu chí
-        if by == 'sentiment_score':
-            products_df = products_df.sort_values('sentiment_score', ascending=False)
-        elif by == 'positive_count':
-            products_df = products_df.sort_values('positive_count', ascending=False)
-        elif by == 'negative_count':
-            products_df = products_df.sort_values('negative_count', ascending=False)
-        elif by == 'total_reviews':
-            products_df = products_df.sort_values('total_reviews', ascending=False)
+        # Sắp xếp theo tiêu chí; chỉ cần n dòng đầu nên dùng nlargest thay vì sắp xếp toàn bộ
+        if by in ('sentiment_score', 'positive_count', 'negative_count', 'total_reviews'):
+            return products_df.nlargest(n, by, keep='first')
         
         # Lấy top n sản phẩm
         return products_df.head(n)
@@ -323,6 +340,8 @@ class SentimentTrendAnalyzer:
         Returns:
             matplotlib.figure.Figure: Biểu đồ
         """
+        plt = _pyplot()
+        
         # Lấy dữ liệu
         time_series = self.get_sentiment_score_over_time(time_unit, start_date, end_date)
         
@@ -392,6 +411,8 @@ class SentimentTrendAnalyzer:
         Returns:
             matplotlib.figure.Figure: Biểu đồ
         """
+        plt = _pyplot()
+        
         # Lấy phân phối cảm xúc
         distribution = self.get_sentiment_distribution()
         
@@ -439,6 +460,8 @@ class SentimentTrendAnalyzer:
         Returns:
             matplotlib.figure.Figure: Biểu đồ
         """
+        plt = _pyplot()
+        
         # Lấy dữ liệu
         rating_data = self.get_sentiment_by_rating()
         
@@ -484,6 +507,8 @@ class SentimentTrendAnalyzer:
         Returns:
             matplotlib.figure.Figure: Biểu đồ
         """
+        plt = _pyplot()
+        
         # Lấy dữ liệu
         comparison = self.compare_products(product_ids)
         
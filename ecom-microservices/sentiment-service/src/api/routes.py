@@ -1,17 +1,177 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, g, request, jsonify, send_from_directory
 from src.services.sentiment_analyzer import SentimentAnalyzer
 from src.api.schemas import SentimentRequest, ProductReviewsRequest
 from src.analytics.sentiment_trends import SentimentTrendAnalyzer
-from typing import Dict, Any, List
+from src.analytics.review_store import ReviewSentimentStore, reviews_to_table
+from src.analytics.rollups import ROLLUP_COLUMNS, ROLLUP_MAX_AGE, SentimentRollups, StoreRollups
+from src.analytics.report_jobs import ReportJobManager
+from src.services.preanalysis import RETRY_AFTER_SECONDS, PreAnalysisQueue
+from src.services.product_catalog import ProductCategoryResolver
+from src.utils.profiling import RequestTrace, profile_requested, should_profile
+from typing import Dict, Any, List, Optional
+from functools import lru_cache
 import os
+import hashlib
+import logging
 import tempfile
-import subprocess
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Loại sự kiện review service gửi tới /reviews/events
+REVIEW_EVENTS = ('created', 'updated', 'deleted')
 
 # Khởi tạo Blueprint
 api_bp = Blueprint('api', __name__)
 
-# Khởi tạo analyzer
-sentiment_analyzer = SentimentAnalyzer()
+# Khởi tạo analyzer; mô hình được tải trong luồng nền để /health phản hồi ngay,
+# trạng thái sẵn sàng được báo qua /ready
+sentiment_analyzer = SentimentAnalyzer(
+    load_async=os.environ.get('MODEL_LOAD_ASYNC', 'True').lower() == 'true'
+)
+
+# Kho dạng cột của reviews đã phân tích, dùng cho các endpoint xu hướng
+review_store = ReviewSentimentStore()
+
+# Danh mục sản phẩm (từ product-service) gắn vào reviews trước khi ghi vào kho
+product_catalog = ProductCategoryResolver()
+
+# Bộ đếm tổng hợp của kho, chỉ nạp thêm file mới ở mỗi lần đọc
+rollups = StoreRollups(review_store)
+
+# Job tạo báo cáo chạy nền, request chỉ gửi job và trả về ngay
+report_jobs = ReportJobManager()
+
+# Số request API đang xử lý trong worker; hàng đợi phân tích trước chỉ chạy khi bằng 0
+_active_requests = 0
+_active_lock = threading.Lock()
+
+@api_bp.before_request
+def _start_trace():
+    """
+    Đo thời gian từng giai đoạn của request; header X-Profile: 1 kèm X-Profile-Token đúng
+    yêu cầu chạy torch profiler
+    """
+    forced = profile_requested(request.headers.get('X-Profile'), request.headers.get('X-Profile-Token'))
+    endpoint = (request.endpoint or 'unknown').rsplit('.', 1)[-1]
+    g.trace = RequestTrace(endpoint, profile=should_profile(forced)).start()
+    global _active_requests
+    with _active_lock:
+        _active_requests += 1
+
+@api_bp.after_request
+def _finish_trace(response):
+    """Trả thời gian các giai đoạn qua header Server-Timing"""
+    trace = g.pop('trace', None)
+    if trace is not None:
+        trace.finish()
+        response.headers['Server-Timing'] = trace.server_timing()
+        if trace.trace_file:
+            response.headers['X-Profile-Trace'] = os.path.basename(trace.trace_file)
+    return response
+
+@api_bp.teardown_request
+def _end_request(exc):
+    """Kết thúc trace của request bị lỗi (after_request không được gọi) và giảm số request đang xử lý"""
+    trace = g.pop('trace', None)
+    if trace is not None:
+        trace.finish()
+    global _active_requests
+    with _active_lock:
+        _active_requests -= 1
+
+def _record_analyzed_reviews(reviews: List[Dict[str, Any]], product_id: Optional[str] = None):
+    """
+    Ghi reviews vừa phân tích vào kho kèm danh mục sản phẩm; lỗi ghi không làm hỏng response
+    
+    Args:
+        reviews (List[Dict[str, Any]]): Reviews đã phân tích cảm xúc
+        product_id (str, optional): ID sản phẩm dùng khi review không có trường product_id
+    """
+    if product_id is not None:
+        reviews = [r if r.get('product_id') else {**r, 'product_id': product_id} for r in reviews]
+    # Review không gắn sản phẩm không có chỗ trong các thống kê theo sản phẩm/danh mục
+    reviews = [r for r in reviews if r.get('product_id')]
+    if not reviews:
+        return
+    # Review đã sửa (sự kiện 'updated') thay thế bản phân tích cũ trong kho
+    replaced = [r['id'] for r in reviews if r.get('event') == 'updated' and r.get('id')]
+    try:
+        review_store.append(product_catalog.enrich(reviews), replace=replaced)
+    except Exception as e:
+        logger.error(f"Error appending reviews to review store: {str(e)}")
+
+# Hàng đợi phân tích trước reviews mới, kết quả được ghi vào kho
+preanalysis = PreAnalysisQueue(
+    analyze=sentiment_analyzer.analyze_reviews,
+    sink=_record_analyzed_reviews,
+    busy=lambda: _active_requests > 0
+)
+
+@lru_cache(maxsize=1)
+def _sample_reviews() -> tuple:
+    """Dữ liệu mẫu khi kho còn trống, chỉ tạo một lần cho mỗi tiến trình"""
+    from scripts.sentiment_report import load_sample_data
+    return tuple(load_sample_data())
+
+@lru_cache(maxsize=1)
+def _sample_rollups() -> SentimentRollups:
+    """Rollups trên dữ liệu mẫu khi kho còn trống"""
+    return SentimentRollups.from_table(reviews_to_table(list(_sample_reviews())))
+
+def _current_rollups() -> tuple:
+    """
+    Rollups hiện hành kèm phiên bản dữ liệu
+    
+    Returns:
+        tuple: (SentimentRollups, phiên bản dùng làm ETag)
+    """
+    if review_store.is_empty():
+        return _sample_rollups(), 'sample'
+    current = rollups.refresh()
+    return current, rollups.version
+
+def _cached_response(payload: Dict[str, Any], version: str):
+    """
+    Response JSON có ETag theo phiên bản dữ liệu và tham số truy vấn, kèm Cache-Control
+    
+    Client gửi lại If-None-Match trùng ETag sẽ nhận 304 không có body.
+    
+    Args:
+        payload (Dict[str, Any]): Dữ liệu trả về
+        version (str): Phiên bản dữ liệu rollups
+    """
+    response = jsonify(payload)
+    # Băm cố định (không dùng hash() vốn khác nhau giữa các worker)
+    params = hashlib.blake2b(request.query_string, digest_size=4).hexdigest()
+    response.set_etag(f"{version}-{params}")
+    response.cache_control.public = True
+    response.cache_control.max_age = ROLLUP_MAX_AGE
+    return response.make_conditional(request)
+
+def _trend_analyzer(product_ids: Optional[List[str]] = None, category: Optional[str] = None) -> SentimentTrendAnalyzer:
+    """
+    Tạo trend analyzer cho các endpoint xu hướng
+    
+    Đọc từ kho dạng cột với bộ lọc được đẩy xuống tầng quét; khi kho còn trống
+    thì dùng dữ liệu mẫu (bỏ qua bộ lọc nếu không có review nào khớp, như trước đây).
+    
+    Args:
+        product_ids (List[str], optional): Chỉ lấy reviews của các sản phẩm này
+        category (str, optional): Chỉ lấy reviews thuộc danh mục này
+    
+    Returns:
+        SentimentTrendAnalyzer: Analyzer trên tập reviews đã lọc
+    """
+    if not review_store.is_empty():
+        return review_store.analyzer(product_ids=product_ids, category=category)
+    
+    reviews = list(_sample_reviews())
+    if product_ids:
+        reviews = [r for r in reviews if r.get('product_id') in product_ids] or reviews
+    if category:
+        reviews = [r for r in reviews if r.get('category') == category] or reviews
+    return SentimentTrendAnalyzer(reviews)
 
 @api_bp.route('/health', methods=['GET'])
 def health_check() -> Dict[str, str]:
@@ -23,6 +183,40 @@ def health_check() -> Dict[str, str]:
     """
     return jsonify({'status': 'ok', 'service': 'sentiment-service'})
 
+@api_bp.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Endpoint kiểm tra service đã sẵn sàng nhận traffic (mô hình đã tải xong)
+    
+    Returns:
+        Dict[str, Any]: Trạng thái tải mô hình, mã 503 nếu chưa sẵn sàng
+    """
+    model = sentiment_analyzer.model
+    response = {
+        'status': 'ready' if sentiment_analyzer.is_ready() else 'not_ready',
+        'service': 'sentiment-service',
+        'model_status': model.status
+    }
+    if model.load_error:
+        response['error'] = model.load_error
+    
+    return jsonify(response), 200 if sentiment_analyzer.is_ready() else 503
+
+@api_bp.route('/models', methods=['GET'])
+def list_models():
+    """
+    Endpoint liệt kê các mô hình trong registry của worker xử lý request
+    
+    Returns:
+        Dict[str, Any]: Các mô hình (key, phiên bản, đã tải, dung lượng, số batch đang dùng) và tổng dung lượng
+    """
+    models = sentiment_analyzer.model.models
+    return jsonify({
+        'models': models.stats(),
+        'loaded_mb': round(models.loaded_bytes() / (1024 * 1024), 1),
+        'memory_budget_mb': models.memory_budget // (1024 * 1024)
+    })
+
 @api_bp.route('/analyze', methods=['POST'])
 def analyze_text() -> Dict[str, Any]:
     """
@@ -61,13 +255,11 @@ def analyze_batch():
     data = request.get_json()
     texts = data.get('texts', [])
     
-    if not texts or not isinstance(texts, list):
-        return jsonify({"error": "Invalid or missing 'texts' parameter. Must be a non-empty array."}), 400
+    if not texts or not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({"error": "Invalid or missing 'texts' parameter. Must be a non-empty array of strings."}), 400
     
-    results = []
-    for text in texts:
-        result = sentiment_analyzer.analyze_text(text)
-        results.append(result)
+    # Tiền xử lý (cắt theo MAX_TEXT_CHARS, bỏ trùng) và suy luận theo batch trong một lần gọi
+    results = sentiment_analyzer.analyze_batch(texts)
     
     return jsonify({"results": results})
 
@@ -80,15 +272,30 @@ def analyze_product_reviews(product_id: str) -> Dict[str, Any]:
         product_id (str): ID của sản phẩm
     
     Query parameters:
-        limit (int, optional): Số lượng reviews tối đa. Mặc định là 100.
+        limit (int, optional): Số lượng reviews tối đa. Mặc định là 100, 0 là toàn bộ.
+        include_reviews (bool, optional): Trả về danh sách reviews đã phân tích. Mặc định là true.
     
     Returns:
         Dict[str, Any]: Kết quả phân tích cảm xúc bao gồm phân phối cảm xúc và danh sách reviews đã phân tích
     """
     limit = request.args.get('limit', default=100, type=int)
-    
-    # Phân tích cảm xúc
-    result = sentiment_analyzer.analyze_product_reviews(product_id, limit=limit)
+    include_reviews = request.args.get('include_reviews', 'true').lower() != 'false'
+    
+    # Reviews đã được phân tích trước (qua /reviews/events hoặc các lần gọi trước): trả về từ kho,
+    # không tải reviews và không chạy suy luận, nếu kho có đủ reviews hiện tại của sản phẩm
+    if not include_reviews and request.args.get('source') != 'live' and not review_store.is_empty():
+        summary = rollups.refresh().product_summary(product_id)
+        if summary is not None and _store_covers(summary, limit):
+            return jsonify(_stored_product_sentiment(summary))
+    
+    # Phân tích cảm xúc theo từng trang, mỗi trang được ghi vào kho ngay khi phân tích xong
+    # (lần phân tích trực tiếp đầu tiên bổ sung các reviews kho còn thiếu)
+    result = sentiment_analyzer.analyze_product_reviews(
+        product_id,
+        limit=limit if limit > 0 else None,
+        include_reviews=include_reviews,
+        on_page=lambda page: _record_analyzed_reviews(page, product_id)
+    )
     
     # Chuẩn hóa kết quả để phù hợp với các client
     response = {
@@ -100,7 +307,8 @@ def analyze_product_reviews(product_id: str) -> Dict[str, Any]:
             "negative": 0
         }),
         "reviews": result.get("reviews", []),
-        "overall_sentiment": result.get("overall_sentiment", "neutral")
+        "overall_sentiment": result.get("overall_sentiment", "neutral"),
+        "source": "live"
     }
     
     # Thêm thông tin sản phẩm và thống kê nếu có
@@ -115,6 +323,118 @@ def analyze_product_reviews(product_id: str) -> Dict[str, Any]:
     
     return jsonify(response)
 
+def _store_covers(summary: Dict[str, Any], limit: int) -> bool:
+    """
+    Kho có thể trả lời thay cho phân tích trực tiếp hay không
+    
+    So số reviews trong kho với số reviews hiện tại của review service (một request limit=0):
+    lệch nhau nghĩa là kho còn thiếu reviews cũ (chưa từng được phân tích) hoặc còn giữ review
+    đã xóa, khi đó dùng phân tích trực tiếp. Kho chứa toàn bộ reviews nên chỉ dùng khi `limit`
+    không nhỏ hơn tổng số reviews. Nếu không lấy được thống kê (review service lỗi) thì dùng kho,
+    vì phân tích trực tiếp lúc đó chỉ có dữ liệu mẫu.
+    
+    Args:
+        summary (Dict[str, Any]): Kết quả SentimentRollups.product_summary
+        limit (int): Số reviews tối đa được yêu cầu, 0 là toàn bộ
+    """
+    stats = sentiment_analyzer.review_client.get_product_review_stats(summary['product_id'])
+    if stats is None:
+        return True
+    total = stats.get('total_reviews')
+    if total != summary['total_reviews']:
+        return False
+    return limit <= 0 or limit >= total
+
+def _stored_product_sentiment(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Response cảm xúc sản phẩm dựng từ rollups của kho (cùng schema với kết quả phân tích trực tiếp)
+    
+    Args:
+        summary (Dict[str, Any]): Kết quả SentimentRollups.product_summary
+    """
+    distribution = {
+        'positive': summary['positive_count'],
+        'neutral': summary['neutral_count'],
+        'negative': summary['negative_count']
+    }
+    if distribution['positive'] > distribution['negative']:
+        overall_sentiment = 'positive'
+    elif distribution['negative'] > distribution['positive']:
+        overall_sentiment = 'negative'
+    else:
+        overall_sentiment = 'neutral'
+    
+    return {
+        'product_id': summary['product_id'],
+        'sentiment_score': summary['avg_score'] if summary['avg_score'] is not None else summary['sentiment_score'],
+        'sentiment_distribution': distribution,
+        'reviews': [],
+        'overall_sentiment': overall_sentiment,
+        'review_stats': {
+            'total_reviews': summary['total_reviews'],
+            'average_rating': summary['avg_rating'] or 0.0
+        },
+        'source': 'store'
+    }
+
+@api_bp.route('/reviews/events', methods=['POST'])
+def review_events():
+    """
+    Endpoint nhận sự kiện review từ review service để phân tích trước trong nền
+    
+    `event` là 'created' (mặc định), 'updated' (phân tích lại và thay bản cũ trong kho) hoặc
+    'deleted' (review bị xóa hoặc ẩn, loại khỏi kho).
+    
+    Request body:
+        {
+            "reviews": [
+                {"id": "review_id", "product_id": "...", "comment": "...", "rating": 5, "created_at": "...",
+                 "event": "created"},
+                ...
+            ]
+        }
+    
+    Returns:
+        Dict[str, Any]: Số reviews được nhận (202), hoặc 429 kèm Retry-After khi hàng đợi đầy
+    """
+    data = request.get_json(silent=True) or {}
+    reviews = data.get('reviews')
+    if not isinstance(reviews, list) or not all(
+        isinstance(r, dict) and r.get('id') and r.get('product_id')
+        and r.get('event', 'created') in REVIEW_EVENTS for r in reviews
+    ):
+        return jsonify({
+            'error': "'reviews' must be a list of reviews with 'id', 'product_id' and an optional "
+                     f"'event' in {list(REVIEW_EVENTS)}"
+        }), 400
+    
+    # Review đã xóa hoặc bị ẩn: loại khỏi kho ngay, không cần phân tích
+    deleted = [r['id'] for r in reviews if r.get('event') == 'deleted']
+    if deleted:
+        try:
+            review_store.remove(deleted)
+        except Exception as e:
+            logger.error(f"Error removing deleted reviews from review store: {str(e)}")
+        reviews = [r for r in reviews if r.get('event') != 'deleted']
+    
+    if reviews and not preanalysis.submit(reviews):
+        response = jsonify({'error': 'Pre-analysis queue is full, retry later', **preanalysis.stats()})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+        return response
+    
+    return jsonify({'accepted': len(reviews) + len(deleted), 'queue_depth': preanalysis.depth}), 202
+
+@api_bp.route('/reviews/events', methods=['GET'])
+def review_events_status():
+    """
+    Endpoint xem trạng thái hàng đợi phân tích trước của worker xử lý request
+    
+    Returns:
+        Dict[str, Any]: depth, capacity và số reviews đã nhận, từ chối, phân tích, lỗi
+    """
+    return jsonify(preanalysis.stats())
+
 @api_bp.route('/reviews/sentiment', methods=['POST'])
 def analyze_reviews() -> Dict[str, List[Dict[str, Any]]]:
     """
@@ -143,66 +463,87 @@ def analyze_reviews() -> Dict[str, List[Dict[str, Any]]]:
     
     # Phân tích cảm xúc
     analyzed_reviews = sentiment_analyzer.analyze_reviews(data['reviews'])
+    _record_analyzed_reviews(analyzed_reviews)
     
     return jsonify({'results': analyzed_reviews})
 
 @api_bp.route('/reports/generate', methods=['POST'])
 def generate_sentiment_report() -> Dict[str, Any]:
     """
-    Endpoint tạo báo cáo phân tích cảm xúc
+    Endpoint gửi job tạo báo cáo phân tích cảm xúc
+    
+    Báo cáo được tạo nền; theo dõi tiến độ qua /reports/jobs/<job_id>.
     
     Request body:
         {
             "product_ids": ["id1", "id2", ...],  # Optional, danh sách ID sản phẩm cần phân tích
             "use_sample": true,                  # Optional, sử dụng dữ liệu mẫu thay vì API
-            "limit": 100                         # Optional, số lượng reviews tối đa mỗi sản phẩm
+            "from_store": false,                 # Optional, đọc reviews đã phân tích từ kho dạng cột
+            "limit": 100,                        # Optional, số lượng reviews tối đa mỗi sản phẩm
+            "full": false                        # Optional, vẽ lại mọi sản phẩm kể cả khi số liệu không đổi
         }
     
     Returns:
-        Dict[str, Any]: Thông tin về báo cáo đã tạo và đường dẫn để xem
+        Dict[str, Any]: ID job và đường dẫn theo dõi trạng thái (HTTP 202)
     """
     data = request.get_json() or {}
     
     # Xác định tham số
     product_ids = data.get('product_ids')
-    product_ids_str = ','.join(product_ids) if product_ids else None
-    use_sample = data.get('use_sample', False)
-    limit = data.get('limit', 100)
-    
-    # Tạo thư mục tạm thời cho báo cáo
-    output_dir = os.path.join('reports', 'sentiment_analysis')
-    os.makedirs(output_dir, exist_ok=True)
+    if product_ids is not None and not isinstance(product_ids, list):
+        return jsonify({
+            'status': 'error',
+            'message': 'product_ids must be a list'
+        }), 400
     
-    # Xây dựng command để chạy script
-    cmd = ['python', '-m', 'scripts.sentiment_report', f'--output={output_dir}']
+    params = {
+        'product_ids': [str(product_id) for product_id in product_ids] if product_ids else None,
+        'use_sample': bool(data.get('use_sample', False)),
+        'from_store': bool(data.get('from_store', False)),
+        'limit': int(data.get('limit', 100)),
+        'incremental': not data.get('full', False)
+    }
     
-    if use_sample:
-        cmd.append('--use-sample')
+    try:
+        job = report_jobs.submit(params)
+    except OSError as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to submit sentiment report job: {str(e)}'
+        }), 500
     
-    if product_ids_str:
-        cmd.append(f'--product-ids={product_ids_str}')
+    return jsonify({
+        'status': 'accepted',
+        'message': 'Sentiment report job submitted',
+        'job_id': job['job_id'],
+        'status_url': f"/api/reports/jobs/{job['job_id']}",
+        'report_path': '/api/reports/view'
+    }), 202
+
+@api_bp.route('/reports/jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id: str):
+    """
+    Endpoint xem trạng thái job tạo báo cáo
     
-    cmd.append(f'--limit={limit}')
+    Args:
+        job_id (str): ID job trả về từ /reports/generate
     
-    try:
-        # Chạy script tạo báo cáo
-        process = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        
-        # Trả về thông tin báo cáo
-        return jsonify({
-            'status': 'success',
-            'message': 'Sentiment report generated successfully',
-            'report_path': f'/api/reports/view',
-            'output_dir': output_dir,
-            'command_output': process.stdout
-        })
-    except subprocess.CalledProcessError as e:
+    Returns:
+        Dict[str, Any]: Trạng thái (queued, running, succeeded, failed), tiến độ và artifact khi hoàn thành
+    """
+    job = report_jobs.get(job_id)
+    if job is None:
         return jsonify({
             'status': 'error',
-            'message': f'Failed to generate sentiment report: {str(e)}',
-            'command_output': e.stdout,
-            'error_output': e.stderr
-        }), 500
+            'message': f'Report job {job_id} not found'
+        }), 404
+    
+    if 'artifacts' in job:
+        job['artifacts'] = [
+            {'file': path, 'url': f'/api/reports/view?file={path}'}
+            for path in job['artifacts']
+        ]
+    return jsonify(job)
 
 @api_bp.route('/reports/view', methods=['GET'])
 def view_sentiment_report():
@@ -216,7 +557,7 @@ def view_sentiment_report():
         File: Nội dung tệp báo cáo
     """
     file_path = request.args.get('file', 'index.html')
-    report_dir = os.path.join('reports', 'sentiment_analysis')
+    report_dir = os.path.abspath(report_jobs.output_dir)
     
     # Kiểm tra tệp tồn tại
     if not os.path.exists(os.path.join(report_dir, file_path)):
@@ -247,13 +588,9 @@ def get_sentiment_distribution():
         result = sentiment_analyzer.analyze_product_reviews(product_id)
         distribution = result['sentiment_distribution']
     else:
-        # Nếu không có product_id, sử dụng dữ liệu mẫu
-        from scripts.sentiment_report import load_sample_data
-        reviews = load_sample_data()
-        
-        # Khởi tạo trend analyzer
-        trend_analyzer = SentimentTrendAnalyzer(reviews)
-        distribution = trend_analyzer.get_sentiment_distribution()
+        # Nếu không có product_id, đọc từ rollups đã tổng hợp sẵn
+        current, version = _current_rollups()
+        distribution = current.distribution()
     
     # Tính tổng và tỷ lệ phần trăm
     total = sum(distribution.values())
@@ -269,7 +606,9 @@ def get_sentiment_distribution():
         'total': total
     }
     
-    return jsonify(response)
+    if product_id:
+        return jsonify(response)
+    return _cached_response(response, version)
 
 @api_bp.route('/trends/overtime', methods=['GET'])
 def get_sentiment_over_time():
@@ -278,7 +617,7 @@ def get_sentiment_over_time():
     
     Query parameters:
         product_id (str, optional): ID sản phẩm. Nếu không cung cấp, sẽ phân tích tất cả.
-        time_unit (str, optional): Đơn vị thời gian (day, week, month). Mặc định là month.
+        time_unit (str, optional): Đơn vị thời gian (day, week, month, year). Mặc định là month.
     
     Returns:
         Dict[str, Any]: Dữ liệu xu hướng cảm xúc theo thời gian
@@ -286,33 +625,23 @@ def get_sentiment_over_time():
     product_id = request.args.get('product_id')
     time_unit = request.args.get('time_unit', 'month')
     
-    # Tải dữ liệu mẫu
-    from scripts.sentiment_report import load_sample_data
-    reviews = load_sample_data()
-    
-    # Khởi tạo trend analyzer
-    trend_analyzer = SentimentTrendAnalyzer(reviews)
-    
-    # Lọc dữ liệu theo sản phẩm nếu có
-    if product_id:
-        filtered_reviews = [r for r in reviews if r.get('product_id') == product_id]
-        if filtered_reviews:
-            trend_analyzer = SentimentTrendAnalyzer(filtered_reviews)
-    
-    # Lấy dữ liệu theo thời gian
     try:
-        trend_data = trend_analyzer.get_sentiment_score_over_time(time_unit=time_unit)
-        
-        # Chuyển đổi DataFrame thành định dạng JSON
-        result = {
-            'time_periods': trend_data.index.tolist(),
-            'positive': trend_data['positive'].tolist() if 'positive' in trend_data.columns else [],
-            'neutral': trend_data['neutral'].tolist() if 'neutral' in trend_data.columns else [],
-            'negative': trend_data['negative'].tolist() if 'negative' in trend_data.columns else [],
-            'sentiment_score': trend_data['sentiment_score'].tolist() if 'sentiment_score' in trend_data.columns else []
-        }
+        if product_id:
+            # Rollups tạm thời chỉ trên reviews của sản phẩm (quét đã lọc theo product_id)
+            if review_store.is_empty():
+                reviews = [r for r in _sample_reviews() if r.get('product_id') == product_id] or list(_sample_reviews())
+                table = reviews_to_table(reviews)
+            else:
+                table = review_store.query(product_ids=[product_id], columns=ROLLUP_COLUMNS)
+            return jsonify(SentimentRollups.from_table(table).over_time(time_unit))
         
-        return jsonify(result)
+        current, version = _current_rollups()
+        return _cached_response(current.over_time(time_unit), version)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -340,12 +669,8 @@ def compare_products():
     
     product_ids = product_ids_str.split(',')
     
-    # Tải dữ liệu mẫu
-    from scripts.sentiment_report import load_sample_data
-    reviews = load_sample_data()
-    
-    # Khởi tạo trend analyzer
-    trend_analyzer = SentimentTrendAnalyzer(reviews)
+    # Khởi tạo trend analyzer, chỉ đọc reviews của các sản phẩm cần so sánh
+    trend_analyzer = _trend_analyzer(product_ids)
     
     # So sánh sản phẩm
     try:
@@ -373,44 +698,19 @@ def get_top_sentiment_products():
     category = request.args.get('category')
     
     try:
-        # Sử dụng dữ liệu mẫu từ sentiment_report nếu không có dữ liệu thực
-        from scripts.sentiment_report import load_sample_data
-        reviews = load_sample_data()
-        
-        # Khởi tạo trend analyzer
-        from src.analytics.sentiment_trends import SentimentTrendAnalyzer
-        trend_analyzer = SentimentTrendAnalyzer(reviews)
-        
-        # Lọc theo danh mục nếu cần
+        # Top-N đã được tính sẵn theo danh mục trong rollups
+        current, version = _current_rollups()
         if category:
-            filtered_reviews = [r for r in reviews if r.get('category') == category]
-            if filtered_reviews:
-                trend_analyzer = SentimentTrendAnalyzer(filtered_reviews)
-        
-        # Lấy top sản phẩm
-        top_products = trend_analyzer.get_top_products(n=limit, by='sentiment_score')
-        
-        # Chuyển đổi sang định dạng phù hợp
-        products = []
-        for _, row in top_products.iterrows():
-            product = {
-                'product_id': row.get('product_id', ''),
-                'sentiment_score': float(row.get('sentiment_score', 0.5)),
-                'positive_count': int(row.get('positive_count', 0)),
-                'neutral_count': int(row.get('neutral_count', 0)),
-                'negative_count': int(row.get('negative_count', 0)),
-                'total_reviews': int(row.get('total_reviews', 0))
-            }
-            
-            # Thêm thông tin sản phẩm nếu có
-            if 'product_name' in row:
-                product['product_name'] = row['product_name']
-            if 'category' in row:
-                product['category'] = row['category']
-                
-            products.append(product)
+            # Sản phẩm có reviews ghi trước khi kho có danh mục: tra danh mục từ product-service (có cache)
+            missing = current.uncategorized()
+            if missing and version != 'sample':
+                current.set_categories(product_catalog.categories(missing))
+        products = current.top_products(n=limit, category=category)
+        if not products and category and version == 'sample':
+            # Dữ liệu mẫu không có danh mục: bỏ qua bộ lọc như trước đây
+            products = current.top_products(n=limit)
         
-        return jsonify({'products': products})
+        return _cached_response({'products': products}, version)
     except Exception as e:
         return jsonify({
             'error': f'Error getting top products: {str(e)}',
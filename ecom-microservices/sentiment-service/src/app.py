@@ -12,9 +12,10 @@ import werkzeug
 if not hasattr(werkzeug.urls, 'url_quote'):
     werkzeug.urls.url_quote = werkzeug.urls.quote
 
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 from src.api.routes import api_bp
+from src.utils.profiling import metrics_payload
 
 # Thiết lập logging
 logging.basicConfig(
@@ -44,6 +45,12 @@ def create_app():
             'version': '1.0.0'
         })
     
+    # Số liệu Prometheus: thời gian từng giai đoạn, kích thước batch, độ dài chuỗi token
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        payload, content_type = metrics_payload()
+        return Response(payload, content_type=content_type)
+    
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,302 @@
+"""
+Các backend suy luận cho mô hình transformer phân loại cảm xúc.
+
+Hỗ trợ ba backend, chọn qua biến môi trường `INFERENCE_BACKEND`:
+    - torch:     PyTorch fp32 (mặc định)
+    - quantized: PyTorch với lượng tử hóa động int8 cho các lớp Linear
+    - onnx:      ONNX Runtime trên CPU, dùng đồ thị đã export bằng `scripts/export_onnx.py`
+
+Mọi backend đều trả về ma trận xác suất (numpy) kích thước (số văn bản, số nhãn),
+việc chuyển xác suất thành nhãn cảm xúc do `SentimentModel` đảm nhiệm. Ngoài
+`predict_proba(texts)`, backend tách riêng bước `encode` (tokenize cả batch trong một lần
+gọi tokenizer, không padding) và `predict_encoded` (padding và suy luận một nhóm đã
+tokenize) để bên gọi gom nhóm theo độ dài mà không tokenize lại.
+"""
+
+import os
+import logging
+import weakref
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cấu hình backend
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").lower()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "model.onnx")
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", "0"))  # 0 = để thư viện tự chọn
+
+SUPPORTED_BACKENDS = ("torch", "quantized", "onnx")
+
+# Các OnnxBackend đang sống, để configure_threads tạo lại session với số luồng mới
+_onnx_backends = weakref.WeakSet()
+
+
+def onnx_model_dir(model_path: str, base_dir: Optional[str] = None) -> str:
+    """
+    Xác định thư mục chứa đồ thị ONNX đã export cho một mô hình
+
+    Args:
+        model_path: Tên mô hình trên Hugging Face hoặc đường dẫn cục bộ
+        base_dir: Thư mục gốc chứa các mô hình ONNX, mặc định là `ONNX_MODEL_DIR`
+
+    Returns:
+        str: Đường dẫn thư mục, ví dụ `models/onnx/nlptown--bert-base-multilingual-uncased-sentiment`
+    """
+    name = os.path.basename(os.path.normpath(model_path)) if os.path.isdir(model_path) else model_path
+    return os.path.join(base_dir or ONNX_MODEL_DIR, name.replace("/", "--"))
+
+
+def configure_threads(num_threads: int):
+    """
+    Đặt số luồng intra-op cho torch (nếu đã được import) và cho các session ONNX Runtime
+
+    Số luồng của session ONNX Runtime chỉ đặt được khi tạo session, nên các session đã có được
+    tạo lại; mô hình ONNX tải sau đó cũng dùng số luồng mới.
+
+    Args:
+        num_threads: Số luồng, bỏ qua nếu <= 0
+    """
+    import sys
+    global INFERENCE_THREADS
+
+    if num_threads <= 0:
+        return
+    INFERENCE_THREADS = num_threads
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(num_threads)
+    for backend in list(_onnx_backends):
+        backend.create_session(num_threads)
+
+
+def _encode(tokenizer, texts: List[str], max_length: int) -> List[Dict[str, List[int]]]:
+    """Tokenize cả batch trong một lần gọi (fast tokenizer xử lý song song), không padding"""
+    encoded = tokenizer(texts, truncation=True, max_length=max_length)
+    keys = list(encoded.keys())
+    return [{key: encoded[key][i] for key in keys} for i in range(len(texts))]
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    """Softmax ổn định số học theo trục nhãn"""
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class TorchBackend:
+    """
+    Backend PyTorch fp32
+    """
+    name = "torch"
+
+    def __init__(self, model_path: str, device: str = "cpu"):
+        """
+        Args:
+            model_path: Tên hoặc đường dẫn mô hình
+            device: Thiết bị chạy mô hình ('cpu' hoặc 'cuda')
+        """
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        configure_threads(INFERENCE_THREADS)
+
+        self.model_path = model_path
+        self.device = device
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_path)
+        self.model = self._prepare_model(self.model).to(self.device)
+        self.model.eval()
+        # Chỉ suy luận, không cần grad; tránh ghi vào tensor trọng số để các worker fork
+        # từ cùng một tiến trình cha vẫn chia sẻ trang bộ nhớ (copy-on-write)
+        self.model.requires_grad_(False)
+
+    def _prepare_model(self, model):
+        """Cho phép lớp con biến đổi mô hình trước khi đưa lên thiết bị"""
+        return model
+
+    def predict_proba(self, texts: List[str], max_length: int = 512) -> np.ndarray:
+        """
+        Tính xác suất các nhãn cho một batch văn bản
+
+        Args:
+            texts: Danh sách văn bản
+            max_length: Số token tối đa cho mỗi văn bản
+
+        Returns:
+            np.ndarray: Ma trận xác suất (len(texts), num_labels)
+        """
+        return self.predict_encoded(self.encode(texts, max_length=max_length))
+
+    def encode(self, texts: List[str], max_length: int = 512) -> List[Dict[str, List[int]]]:
+        """
+        Tokenize một batch văn bản trong một lần gọi tokenizer
+
+        Args:
+            texts: Danh sách văn bản
+            max_length: Số token tối đa cho mỗi văn bản
+
+        Returns:
+            List[Dict[str, List[int]]]: Đặc trưng chưa padding của từng văn bản
+        """
+        return _encode(self.tokenizer, texts, max_length)
+
+    def predict_encoded(self, features: List[Dict[str, List[int]]]) -> np.ndarray:
+        """
+        Tính xác suất các nhãn cho các văn bản đã tokenize
+
+        Args:
+            features: Đặc trưng trả về từ `encode`
+
+        Returns:
+            np.ndarray: Ma trận xác suất (len(features), num_labels)
+        """
+        import torch
+
+        inputs = self.tokenizer.pad(features, return_tensors="pt")
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return logits.softmax(dim=1).float().cpu().numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """
+    Backend PyTorch với lượng tử hóa động int8 (chỉ chạy trên CPU)
+    """
+    name = "quantized"
+
+    def __init__(self, model_path: str, device: str = "cpu"):
+        if device != "cpu":
+            logger.warning("Quantized backend only supports CPU, ignoring device %s", device)
+        super().__init__(model_path, device="cpu")
+
+    def _prepare_model(self, model):
+        import torch
+
+        model.eval()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend:
+    """
+    Backend ONNX Runtime trên CPU
+    """
+    name = "onnx"
+
+    def __init__(self, model_path: str, device: str = "cpu", onnx_dir: Optional[str] = None):
+        """
+        Args:
+            model_path: Tên hoặc đường dẫn mô hình gốc (dùng để tìm thư mục ONNX)
+            device: Không sử dụng, ONNX backend luôn chạy trên CPU
+            onnx_dir: Thư mục chứa `model.onnx` và tokenizer; mặc định suy ra từ `model_path`
+        """
+        from transformers import AutoTokenizer
+
+        self.model_path = model_path
+        self.onnx_dir = onnx_dir or onnx_model_dir(model_path)
+        graph_path = os.path.join(self.onnx_dir, ONNX_MODEL_FILE)
+        if not os.path.exists(graph_path):
+            raise FileNotFoundError(
+                f"ONNX graph not found at {graph_path}. "
+                f"Run: python -m scripts.export_onnx --model {model_path}"
+            )
+
+        self.graph_path = graph_path
+        self.tokenizer = AutoTokenizer.from_pretrained(self.onnx_dir)
+        self.create_session(INFERENCE_THREADS)
+        _onnx_backends.add(self)
+
+    def create_session(self, num_threads: int):
+        """
+        Tạo (lại) session ONNX Runtime với số luồng intra-op cho trước
+
+        Ở chế độ pre-fork, session tạo trong master chỉ có một luồng; mỗi worker gọi lại hàm này
+        (qua `configure_threads`) sau khi fork. Trọng số của session mới nằm trong bộ nhớ riêng của
+        worker nên backend ONNX không dùng chung trọng số qua copy-on-write như torch.
+
+        Args:
+            num_threads: Số luồng intra-op, <= 0 để ONNX Runtime tự chọn
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(self.graph_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def predict_proba(self, texts: List[str], max_length: int = 512) -> np.ndarray:
+        """
+        Tính xác suất các nhãn cho một batch văn bản
+
+        Args:
+            texts: Danh sách văn bản
+            max_length: Số token tối đa cho mỗi văn bản
+
+        Returns:
+            np.ndarray: Ma trận xác suất (len(texts), num_labels)
+        """
+        return self.predict_encoded(self.encode(texts, max_length=max_length))
+
+    def encode(self, texts: List[str], max_length: int = 512) -> List[Dict[str, List[int]]]:
+        """
+        Tokenize một batch văn bản trong một lần gọi tokenizer
+
+        Args:
+            texts: Danh sách văn bản
+            max_length: Số token tối đa cho mỗi văn bản
+
+        Returns:
+            List[Dict[str, List[int]]]: Đặc trưng chưa padding của từng văn bản
+        """
+        return _encode(self.tokenizer, texts, max_length)
+
+    def predict_encoded(self, features: List[Dict[str, List[int]]]) -> np.ndarray:
+        """
+        Tính xác suất các nhãn cho các văn bản đã tokenize
+
+        Args:
+            features: Đặc trưng trả về từ `encode`
+
+        Returns:
+            np.ndarray: Ma trận xác suất (len(features), num_labels)
+        """
+        inputs = self.tokenizer.pad(features, return_tensors="np")
+        feed = {k: v.astype(np.int64) for k, v in inputs.items() if k in self.input_names}
+        logits = self.session.run(None, feed)[0]
+        return _softmax(logits.astype(np.float32))
+
+
+_BACKENDS = {
+    TorchBackend.name: TorchBackend,
+    QuantizedTorchBackend.name: QuantizedTorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def load_backend(model_path: str, device: str = "cpu", backend: Optional[str] = None):
+    """
+    Tải mô hình với backend được cấu hình
+
+    Args:
+        model_path: Tên hoặc đường dẫn mô hình
+        device: Thiết bị chạy mô hình
+        backend: Tên backend, mặc định lấy từ `INFERENCE_BACKEND`
+
+    Returns:
+        Backend đã tải, có thuộc tính `tokenizer` và các phương thức `predict_proba`, `encode`, `predict_encoded`
+
+    Raises:
+        ValueError: Nếu tên backend không được hỗ trợ
+    """
+    backend = (backend or INFERENCE_BACKEND).lower()
+    if backend not in _BACKENDS:
+        raise ValueError(f"Unsupported inference backend: {backend}. Choose one of {SUPPORTED_BACKENDS}")
+
+    logger.info(f"Loading {model_path} with {backend} backend")
+    return _BACKENDS[backend](model_path, device=device)
@@ -0,0 +1,433 @@
+"""
+Registry các mô hình transformer theo ngôn ngữ/phiên bản.
+
+Mô hình được tải khi có request đầu tiên cần đến nó và được giữ theo thứ tự LRU. Mỗi lần
+suy luận giữ một tham chiếu (`acquire`) tới mô hình đang dùng; khi tổng dung lượng trọng số
+vượt MODEL_MEMORY_BUDGET_MB, các mô hình ít dùng nhất và không có tham chiếu nào bị gỡ.
+
+Đổi phiên bản (`swap`) tải mô hình mới trước rồi mới thay thế trong một bước dưới khóa:
+request mới dùng ngay phiên bản mới, các batch đang chạy vẫn hoàn tất trên trọng số cũ và
+phiên bản cũ được giải phóng khi tham chiếu cuối cùng trả về.
+
+Danh sách mô hình có thể khai báo trong file JSON MODEL_REGISTRY_FILE, ví dụ:
+    {"en": {"path": "models/en-v2", "version": "v2"}, "th": {"path": "models/th"}}
+Mọi worker kiểm tra file này theo chu kỳ MODEL_REGISTRY_POLL giây và tự đổi sang phiên bản
+mới, nên không cần khởi động lại service.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tổng dung lượng trọng số (MB) được giữ trong bộ nhớ, 0 = không giới hạn
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# File JSON khai báo mô hình theo ngôn ngữ/phiên bản (tùy chọn)
+MODEL_REGISTRY_FILE = os.getenv("MODEL_REGISTRY_FILE", "")
+# Chu kỳ (giây) kiểm tra thay đổi của MODEL_REGISTRY_FILE
+MODEL_REGISTRY_POLL = float(os.getenv("MODEL_REGISTRY_POLL", "30"))
+
+
+def estimate_backend_bytes(backend) -> int:
+    """
+    Ước lượng dung lượng trọng số của một backend
+
+    Args:
+        backend: Backend suy luận (torch, quantized hoặc onnx)
+
+    Returns:
+        int: Số byte, 0 nếu không ước lượng được
+    """
+    model = getattr(backend, 'model', None)
+    if model is not None and hasattr(model, 'state_dict'):
+        total = 0
+        # state_dict gồm cả trọng số đã lượng tử hóa (dạng tuple packed params)
+        for value in model.state_dict().values():
+            for tensor in value if isinstance(value, (tuple, list)) else (value,):
+                if hasattr(tensor, 'element_size'):
+                    total += tensor.numel() * tensor.element_size()
+        return total
+    onnx_dir = getattr(backend, 'onnx_dir', None)
+    if onnx_dir and os.path.isdir(onnx_dir):
+        return sum(
+            os.path.getsize(os.path.join(onnx_dir, name))
+            for name in os.listdir(onnx_dir) if name.endswith('.onnx')
+        )
+    return 0
+
+
+class LoadedModel:
+    """
+    Một phiên bản mô hình đã tải cùng số tham chiếu đang dùng
+    """
+
+    def __init__(self, key: str, model_path: Optional[str], version: Optional[str], backend, size: int):
+        self.key = key
+        self.model_path = model_path
+        self.version = version
+        self.backend = backend
+        self.size = size
+        self.refs = 0
+        self.retired = False
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    """
+    Registry mô hình với tải theo nhu cầu, đếm tham chiếu, gỡ theo LRU và đổi phiên bản nóng
+    """
+
+    def __init__(self, loader: Callable[[str], Any], memory_budget_mb: int = MODEL_MEMORY_BUDGET_MB,
+                 config_path: str = MODEL_REGISTRY_FILE, poll_interval: float = MODEL_REGISTRY_POLL,
+                 sizer: Callable[[Any], int] = estimate_backend_bytes):
+        """
+        Args:
+            loader (Callable): Hàm tải backend từ đường dẫn mô hình
+            memory_budget_mb (int): Ngân sách bộ nhớ cho trọng số (MB), 0 = không giới hạn
+            config_path (str): File JSON khai báo mô hình, rỗng = không dùng
+            poll_interval (float): Chu kỳ (giây) kiểm tra thay đổi của file khai báo
+            sizer (Callable): Hàm ước lượng dung lượng (byte) của một backend
+        """
+        self.loader = loader
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.config_path = config_path
+        self.poll_interval = poll_interval
+        self.sizer = sizer
+        # key -> (đường dẫn, phiên bản)
+        self._specs: Dict[str, Tuple[str, Optional[str]]] = {}
+        # Các mô hình đang phục vụ, theo thứ tự dùng gần nhất ở cuối
+        self._active: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._config_mtime: Optional[float] = None
+        self._next_poll = 0.0
+        self._swap_thread: Optional[threading.Thread] = None
+
+    def register(self, key: str, model_path: str, version: Optional[str] = None):
+        """
+        Khai báo mô hình cho một key; mô hình chỉ được tải khi có request cần đến
+
+        Nếu key đang phục vụ một phiên bản khác, phiên bản đó được loại khỏi registry
+        (các batch đang giữ tham chiếu vẫn chạy xong) và phiên bản mới được tải ở lần dùng sau.
+
+        Args:
+            key (str): Mã ngôn ngữ hoặc tên mô hình ('en', 'multilingual', 'vi', ...)
+            model_path (str): Tên hoặc đường dẫn mô hình
+            version (str, optional): Nhãn phiên bản
+        """
+        with self._lock:
+            self._specs[key] = (model_path, version)
+            current = self._active.get(key)
+            if current is not None and (current.model_path, current.version) != (model_path, version):
+                self._retire(self._active.pop(key))
+
+    def swap(self, key: str, model_path: str, version: Optional[str] = None) -> Optional[LoadedModel]:
+        """
+        Tải phiên bản mới rồi thay thế phiên bản đang phục vụ trong một bước
+
+        Args:
+            key (str): Key của mô hình
+            model_path (str): Tên hoặc đường dẫn mô hình mới
+            version (str, optional): Nhãn phiên bản mới
+
+        Khai báo được đổi ngay khi bắt đầu; nếu một lần swap/register khác đổi khai báo trong lúc
+        tải thì bản vừa tải bị bỏ, tránh việc các lần swap kết thúc không theo thứ tự để lại
+        phiên bản cũ hơn đang phục vụ.
+
+        Returns:
+            Optional[LoadedModel]: Phiên bản vừa được đưa vào phục vụ, None nếu đã bị thay thế
+        """
+        wanted = (model_path, version)
+        with self._lock:
+            previous_spec = self._specs.get(key)
+            self._specs[key] = wanted
+        try:
+            entry = self._load(key, model_path, version)
+        except Exception:
+            with self._lock:
+                # Tải lỗi: giữ khai báo của phiên bản đang phục vụ
+                if self._specs.get(key) == wanted and previous_spec is not None:
+                    self._specs[key] = previous_spec
+            raise
+        with self._lock:
+            if self._specs.get(key) != wanted:
+                entry.retired = True
+                entry.backend = None
+                logger.info(f"Discarded model {key} from {model_path} (version {version}): superseded while loading")
+                return None
+            previous = self._active.pop(key, None)
+            self._active[key] = entry
+            if previous is not None:
+                self._retire(previous)
+            self._evict()
+        logger.info(f"Swapped model {key} to {model_path} (version {version})")
+        return entry
+
+    def install(self, key: str, backend, model_path: Optional[str] = None, version: Optional[str] = None):
+        """
+        Đưa một backend đã tải sẵn vào phục vụ (None để gỡ key)
+
+        Args:
+            key (str): Key của mô hình
+            backend: Backend đã tải hoặc None
+            model_path (str, optional): Đường dẫn mô hình
+            version (str, optional): Nhãn phiên bản
+        """
+        with self._lock:
+            previous = self._active.pop(key, None)
+            if previous is not None:
+                self._retire(previous)
+            if backend is not None:
+                self._active[key] = LoadedModel(key, model_path, version, backend, self.sizer(backend))
+
+    def has(self, key: str) -> bool:
+        """Key đã được khai báo hoặc đang phục vụ"""
+        with self._lock:
+            return key in self._specs or key in self._active
+
+    def peek(self, key: str):
+        """
+        Backend đang phục vụ của key, không tải và không giữ tham chiếu
+
+        Returns:
+            Backend hoặc None nếu chưa tải
+        """
+        with self._lock:
+            entry = self._active.get(key)
+            return entry.backend if entry is not None else None
+
+    def ensure_loaded(self, key: str):
+        """
+        Tải mô hình của key nếu chưa tải
+
+        Returns:
+            Backend đang phục vụ của key
+
+        Raises:
+            KeyError: Nếu key chưa được khai báo
+        """
+        with self.acquire(key) as backend:
+            return backend
+
+    @contextmanager
+    def acquire(self, key: str, load: bool = True) -> Iterator[Any]:
+        """
+        Giữ tham chiếu tới mô hình của key trong suốt một lần suy luận
+
+        Args:
+            key (str): Key của mô hình
+            load (bool): Tải mô hình nếu chưa có; False thì trả về None khi chưa tải
+
+        Yields:
+            Backend của mô hình, hoặc None nếu chưa tải và load=False
+
+        Raises:
+            KeyError: Nếu key chưa được khai báo và cần tải
+        """
+        entry = self.checkout(key, load=load)
+        if entry is None:
+            yield None
+            return
+        try:
+            yield entry.backend
+        finally:
+            self.release(entry)
+
+    def checkout(self, key: str, load: bool = True) -> Optional[LoadedModel]:
+        """
+        Lấy phiên bản đang phục vụ của key và tăng số tham chiếu; phải gọi `release` khi dùng xong
+
+        Args:
+            key (str): Key của mô hình
+            load (bool): Tải mô hình nếu chưa có
+
+        Returns:
+            Optional[LoadedModel]: Phiên bản mô hình, None nếu chưa tải và load=False
+
+        Raises:
+            KeyError: Nếu key chưa được khai báo và cần tải
+        """
+        self.poll_config()
+        entry = self._checkout_active(key)
+        if entry is not None or not load:
+            return entry
+
+        # Mỗi key chỉ một luồng tải; các luồng khác chờ rồi dùng kết quả
+        with self._load_locks[key]:
+            entry = self._checkout_active(key)
+            if entry is not None:
+                return entry
+            with self._lock:
+                if key not in self._specs:
+                    raise KeyError(f"Model {key} is not registered")
+                model_path, version = self._specs[key]
+            entry = self._load(key, model_path, version)
+            with self._lock:
+                # Khai báo có thể đã đổi trong lúc tải: chỉ đưa vào phục vụ nếu vẫn đúng phiên bản
+                if self._specs.get(key) == (model_path, version) and key not in self._active:
+                    self._active[key] = entry
+                else:
+                    entry.retired = True
+                entry.refs += 1
+                self._evict()
+            return entry
+
+    def release(self, entry: LoadedModel):
+        """
+        Trả tham chiếu lấy bằng `checkout`; phiên bản đã bị thay thế được giải phóng khi hết tham chiếu
+
+        Args:
+            entry (LoadedModel): Phiên bản mô hình đã lấy
+        """
+        with self._lock:
+            entry.refs -= 1
+            if entry.retired and entry.refs == 0:
+                logger.info(f"Released retired model {entry.key} ({entry.model_path})")
+                entry.backend = None
+            elif not entry.retired:
+                self._evict()
+
+    def unload(self, key: str) -> bool:
+        """
+        Gỡ mô hình của key khỏi bộ nhớ (batch đang chạy vẫn hoàn tất)
+
+        Returns:
+            bool: True nếu key đang được tải
+        """
+        with self._lock:
+            entry = self._active.pop(key, None)
+            if entry is not None:
+                self._retire(entry)
+            return entry is not None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Trạng thái các mô hình đã khai báo
+
+        Returns:
+            List[Dict[str, Any]]: key, đường dẫn, phiên bản, đã tải hay chưa, dung lượng và số tham chiếu
+        """
+        with self._lock:
+            keys = list(self._specs) + [key for key in self._active if key not in self._specs]
+            result = []
+            for key in keys:
+                entry = self._active.get(key)
+                model_path, version = self._specs.get(key, (entry.model_path, entry.version) if entry else (None, None))
+                result.append({
+                    'key': key,
+                    'model_path': model_path,
+                    'version': version,
+                    'loaded': entry is not None,
+                    'size_mb': round(entry.size / (1024 * 1024), 1) if entry is not None else 0.0,
+                    'in_use': entry.refs if entry is not None else 0
+                })
+            return result
+
+    def loaded_bytes(self) -> int:
+        """Tổng dung lượng trọng số của các mô hình đang phục vụ"""
+        with self._lock:
+            return sum(entry.size for entry in self._active.values())
+
+    def poll_config(self, force: bool = False):
+        """
+        Áp dụng thay đổi của MODEL_REGISTRY_FILE (tối đa một lần mỗi poll_interval giây)
+
+        Key đang được tải sẽ được đổi phiên bản trong luồng nền, request vẫn dùng phiên bản
+        cũ cho tới khi phiên bản mới tải xong.
+
+        Args:
+            force (bool): Bỏ qua chu kỳ kiểm tra
+        """
+        if not self.config_path:
+            return
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+        try:
+            mtime = os.path.getmtime(self.config_path)
+        except OSError:
+            return
+        if mtime == self._config_mtime:
+            return
+        try:
+            with open(self.config_path) as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Error reading model registry file {self.config_path}: {str(e)}")
+            return
+        self._config_mtime = mtime
+
+        swaps = []
+        with self._lock:
+            for key, spec in config.items():
+                spec = {'path': spec} if isinstance(spec, str) else spec
+                wanted = (spec['path'], spec.get('version'))
+                if self._specs.get(key) == wanted:
+                    continue
+                if key in self._active:
+                    swaps.append((key,) + wanted)
+                else:
+                    self._specs[key] = wanted
+        if swaps:
+            self._swap_in_background(swaps)
+
+    def _swap_in_background(self, swaps: List[Tuple[str, str, Optional[str]]]):
+        def run():
+            for key, model_path, version in swaps:
+                try:
+                    self.swap(key, model_path, version)
+                except Exception as e:
+                    logger.error(f"Error swapping model {key} to {model_path}: {str(e)}")
+
+        self._swap_thread = threading.Thread(target=run, name='model-swap', daemon=True)
+        self._swap_thread.start()
+
+    def _load(self, key: str, model_path: str, version: Optional[str]) -> LoadedModel:
+        start = time.perf_counter()
+        backend = self.loader(model_path)
+        entry = LoadedModel(key, model_path, version, backend, self.sizer(backend))
+        logger.info(
+            f"Loaded model {key} from {model_path} ({entry.size / (1024 * 1024):.1f} MB) "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        return entry
+
+    def _checkout_active(self, key: str) -> Optional[LoadedModel]:
+        with self._lock:
+            entry = self._active.get(key)
+            if entry is None:
+                return None
+            entry.refs += 1
+            entry.last_used = time.time()
+            self._active.move_to_end(key)
+            return entry
+
+    def _retire(self, entry: LoadedModel):
+        """Loại một phiên bản khỏi phục vụ; giải phóng ngay nếu không còn ai dùng"""
+        entry.retired = True
+        if entry.refs == 0:
+            entry.backend = None
+
+    def _evict(self):
+        """Gỡ các mô hình ít dùng nhất, không có tham chiếu, cho tới khi nằm trong ngân sách"""
+        if self.memory_budget <= 0:
+            return
+        total = sum(entry.size for entry in self._active.values())
+        # Mô hình dùng gần nhất luôn được giữ, kể cả khi riêng nó đã vượt ngân sách
+        for key in list(self._active)[:-1]:
+            if total <= self.memory_budget:
+                break
+            entry = self._active[key]
+            if entry.refs > 0:
+                continue
+            del self._active[key]
+            self._retire(entry)
+            total -= entry.size
+            logger.info(f"Evicted model {key} ({entry.size / (1024 * 1024):.1f} MB) to stay within memory budget")
@@ -0,0 +1,237 @@
+"""
+Bộ phân tích cảm xúc rule-based dùng khi mô hình transformer không khả dụng.
+
+Từ điển (kể cả cụm nhiều từ như 'tuyệt vời', 'không hài lòng') được biên dịch một lần
+thành trie theo token. Mỗi văn bản được tách token một lần rồi duyệt trie theo kiểu
+longest-match, trong cùng lượt đó xử lý từ phủ định (đảo cực trong một cửa sổ token)
+và từ tăng cường.
+"""
+
+import os
+import re
+import json
+import logging
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NEGATION_WINDOW = int(os.getenv("NEGATION_WINDOW", "3"))
+SENTIMENT_LEXICON_PATH = os.getenv("SENTIMENT_LEXICON_PATH")
+
+# Từ điển tiếng Anh
+EN_POSITIVE = {
+    'good', 'great', 'excellent', 'amazing', 'wonderful', 'best', 'love', 'awesome',
+    'happy', 'satisfied', 'perfect', 'recommended', 'recommend', 'positive', 'beautiful', 'nice', 'fan',
+}
+EN_NEGATIVE = {
+    'bad', 'worst', 'terrible', 'awful', 'disappointing', 'horrible', 'poor', 'waste',
+    'problem', 'issues', 'faulty', 'negative', 'broken', 'uncomfortable', 'useless',
+}
+EN_NEGATIONS = {'not', 'no', 'never', 'cannot', 'without', 'nothing'}
+EN_INTENSIFIERS = {'very': 1.5, 'really': 1.5, 'extremely': 2.0, 'absolutely': 2.0, 'highly': 1.5, 'so': 1.5}
+
+# Từ điển tiếng Việt (có cụm nhiều từ)
+VI_POSITIVE = {
+    'tốt', 'hay', 'tuyệt', 'xuất sắc', 'đẹp', 'thích', 'yêu', 'hài lòng',
+    'tuyệt vời', 'tốt nhất', 'tuyệt hảo', 'hoàn hảo', 'giỏi', 'hấp dẫn', 'tiện lợi',
+}
+VI_NEGATIVE = {
+    'tệ', 'kém', 'xấu', 'dở', 'chán', 'thất vọng', 'không thích',
+    'không hài lòng', 'không tốt', 'hỏng', 'lỗi', 'vấn đề', 'khó chịu', 'gãy', 'hư',
+}
+VI_NEGATIONS = {'không', 'chẳng', 'chưa', 'chả'}
+VI_INTENSIFIERS = {'rất': 1.5, 'cực kỳ': 2.0, 'quá': 1.5, 'siêu': 1.8}
+
+POSITIVE, NEGATIVE, NEGATION, INTENSIFIER = 'positive', 'negative', 'negation', 'intensifier'
+
+_TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)?")
+_TERMINAL = ''  # Khóa đánh dấu nút kết thúc một mục từ trong trie
+
+
+def tokenize(text: str) -> List[str]:
+    """Chuẩn hóa NFC, chuyển chữ thường và tách token (giữ dạng rút gọn như "don't")"""
+    return _TOKEN_PATTERN.findall(unicodedata.normalize('NFC', text).lower())
+
+
+class _PhraseTrie:
+    """
+    Trie theo token cho các mục từ một hoặc nhiều từ
+    """
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+        self.max_len = 0
+
+    def add(self, phrase: str, kind: str, weight: float = 1.0):
+        tokens = tokenize(phrase)
+        if not tokens:
+            return
+        node = self.root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_TERMINAL] = (kind, weight)
+        self.max_len = max(self.max_len, len(tokens))
+
+    def matches(self, tokens: List[str]) -> Iterator[Tuple[int, int, str, float]]:
+        """
+        Duyệt văn bản một lượt, trả về các mục khớp dài nhất không chồng lấn
+
+        Yields:
+            Tuple[int, int, str, float]: (vị trí bắt đầu, vị trí kết thúc, loại, trọng số)
+        """
+        i, n = 0, len(tokens)
+        while i < n:
+            node = self.root
+            best = None
+            j = i
+            while j < n and j - i < self.max_len:
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                j += 1
+                if _TERMINAL in node:
+                    best = (j, node[_TERMINAL])
+
+            if best is not None:
+                end, (kind, weight) = best
+                yield i, end, kind, weight
+                i = end
+            else:
+                # Dạng rút gọn phủ định tiếng Anh: don't, isn't, wasn't...
+                if tokens[i].endswith("n't"):
+                    yield i, i + 1, NEGATION, 1.0
+                i += 1
+
+
+class RuleEngine:
+    """
+    Bộ phân tích cảm xúc rule-based, trie được xây một lần khi khởi tạo
+    """
+
+    def __init__(self, extra_lexicon: Optional[Dict[str, Any]] = None, negation_window: int = NEGATION_WINDOW):
+        """
+        Args:
+            extra_lexicon: Từ điển bổ sung cho tiếng Anh, cùng định dạng với
+                sentiment_keywords.json (positive_words, negative_words, intensifiers, negations)
+            negation_window: Số token sau từ phủ định mà cực cảm xúc bị đảo
+        """
+        self.negation_window = negation_window
+        extra = extra_lexicon or {}
+
+        english = self._entries(
+            EN_POSITIVE | set(extra.get('positive_words', [])),
+            EN_NEGATIVE | set(extra.get('negative_words', [])),
+            EN_NEGATIONS | set(extra.get('negations', [])),
+            {**EN_INTENSIFIERS, **extra.get('intensifiers', {})},
+        )
+        vietnamese = self._entries(VI_POSITIVE, VI_NEGATIVE, VI_NEGATIONS, VI_INTENSIFIERS)
+
+        # Văn bản tiếng Việt vẫn có thể chứa từ tiếng Anh nên dùng cả hai từ điển
+        self._tries = {
+            'en': self._build(english),
+            'vi': self._build(english + vietnamese),
+        }
+
+    @classmethod
+    def from_env(cls) -> "RuleEngine":
+        """Khởi tạo với từ điển bổ sung từ `SENTIMENT_LEXICON_PATH` nếu có"""
+        extra = None
+        if SENTIMENT_LEXICON_PATH:
+            try:
+                with open(SENTIMENT_LEXICON_PATH, encoding='utf-8') as f:
+                    extra = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error loading sentiment lexicon {SENTIMENT_LEXICON_PATH}: {str(e)}")
+        return cls(extra)
+
+    @staticmethod
+    def _entries(positive: Iterable[str], negative: Iterable[str], negations: Iterable[str],
+                 intensifiers: Dict[str, float]) -> List[Tuple[str, str, float]]:
+        entries = [(w, POSITIVE, 1.0) for w in positive]
+        entries += [(w, NEGATIVE, 1.0) for w in negative]
+        entries += [(w, NEGATION, 1.0) for w in negations]
+        entries += [(w, INTENSIFIER, float(v)) for w, v in intensifiers.items()]
+        return entries
+
+    @staticmethod
+    def _build(entries: List[Tuple[str, str, float]]) -> _PhraseTrie:
+        trie = _PhraseTrie()
+        for phrase, kind, weight in entries:
+            trie.add(phrase, kind, weight)
+        return trie
+
+    def analyze(self, text: str, lang: str = 'en') -> Dict[str, Any]:
+        """
+        Phân tích cảm xúc của một văn bản
+
+        Args:
+            text: Văn bản cần phân tích
+            lang: Mã ngôn ngữ; 'vi' bật thêm từ điển tiếng Việt
+
+        Returns:
+            Dict[str, Any]: Kết quả phân tích cảm xúc (text, sentiment, score)
+        """
+        tokens = tokenize(text) if text else []
+        trie = self._tries.get(lang, self._tries['en'])
+
+        positive = negative = 0.0
+        pending_negations = 0
+        negate_until = -1     # Vị trí token cuối cùng còn chịu ảnh hưởng của từ phủ định
+        boost, boost_at = 1.0, -1
+
+        for start, end, kind, weight in trie.matches(tokens):
+            if kind == NEGATION:
+                negate_until = end + self.negation_window
+                pending_negations += 1
+                continue
+            if kind == INTENSIFIER:
+                boost, boost_at = weight, end
+                continue
+
+            weight *= boost if start == boost_at else 1.0
+            is_positive = kind == POSITIVE
+            if start < negate_until:
+                is_positive = not is_positive
+                negate_until = -1
+                pending_negations -= 1
+
+            if is_positive:
+                positive += weight
+            else:
+                negative += weight
+
+        n = len(tokens)
+        if positive > negative:
+            sentiment = "positive"
+            score = 0.5 + min(0.5, (positive - negative) / n)
+        elif negative > positive:
+            sentiment = "negative"
+            score = 0.5 + min(0.5, (negative - positive) / n)
+        elif pending_negations > 0:
+            # Không có từ cảm xúc nào bị đảo, chỉ còn từ phủ định
+            sentiment = "negative"
+            score = 0.5 + min(0.4, pending_negations / n)
+        else:
+            sentiment = "neutral"
+            score = 0.5
+
+        return {
+            "text": text,
+            "sentiment": sentiment,
+            "score": score
+        }
+
+    def analyze_batch(self, texts: List[str], langs: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Phân tích cảm xúc cho một danh sách văn bản
+
+        Args:
+            texts: Danh sách văn bản
+            langs: Mã ngôn ngữ tương ứng với từng văn bản, mặc định là 'en'
+
+        Returns:
+            List[Dict[str, Any]]: Kết quả phân tích cho từng văn bản
+        """
+        langs = langs or ['en'] * len(texts)
+        return [self.analyze(text, lang) for text, lang in zip(texts, langs)]
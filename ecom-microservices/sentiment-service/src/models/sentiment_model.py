@@ -1,16 +1,14 @@
 import os
-import json
-import numpy as np
-from typing import Dict, Any, List, Optional
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import random
-import torch
 import logging
-from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
-import re
-from langdetect import detect
+import threading
+import importlib.util
+import numpy as np
+from typing import Callable, Dict, Any, List, Optional
+from src.models.inference_backends import INFERENCE_BACKEND, load_backend
+from src.models.model_registry import ModelRegistry
+from src.models.rule_engine import RuleEngine
+from src.utils.language_router import LanguageRouter
+from src.utils.profiling import observe_batch, span
 
 # Cấu hình logging
 logging.basicConfig(
@@ -19,36 +17,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize transformers variables
-TRANSFORMER_AVAILABLE = False
-try:
-    from transformers import AutoModelForSequenceClassification, AutoTokenizer
-    import torch
-    from langdetect import detect
-    TRANSFORMER_AVAILABLE = True
-except ImportError:
+# Chỉ kiểm tra thư viện có được cài đặt hay không; torch/transformers được import
+# khi thực sự tải mô hình để khởi động service (và /health) không phải chờ
+_BACKEND_RUNTIME = 'onnxruntime' if INFERENCE_BACKEND == 'onnx' else 'torch'
+TRANSFORMER_AVAILABLE = all(
+    importlib.util.find_spec(module) is not None for module in ('transformers', _BACKEND_RUNTIME)
+)
+if not TRANSFORMER_AVAILABLE:
     logging.warning("Transformers or torch not available. Using fallback model.")
 
 # Model paths
 ENGLISH_MODEL_PATH = os.getenv("SENTIMENT_MODEL_PATH", "distilbert-base-uncased-finetuned-sst-2-english")
 MULTILINGUAL_MODEL_PATH = os.getenv("MULTILINGUAL_MODEL_PATH", "nlptown/bert-base-multilingual-uncased-sentiment")
 
+# Key trong registry của mô hình tiếng Anh và mô hình đa ngôn ngữ dùng cho các ngôn ngữ
+# không có mô hình riêng (khai báo thêm qua MODEL_REGISTRY_FILE, ví dụ 'vi')
+EN_MODEL_KEY = 'en'
+MULTILINGUAL_MODEL_KEY = 'multilingual'
+
+# Trạng thái tải mô hình
+STATUS_LOADING = 'loading'    # Đang tải mô hình, tạm thời phục vụ bằng rule-based
+STATUS_READY = 'ready'        # Mô hình transformer sẵn sàng
+STATUS_FALLBACK = 'fallback'  # Không tải được transformer, phục vụ bằng rule-based
+STATUS_ERROR = 'error'        # Không tải được transformer và không cho phép fallback
+
+
+def _select_device() -> str:
+    """Chọn thiết bị chạy mô hình, chỉ import torch khi có yêu cầu dùng GPU"""
+    if os.environ.get('USE_GPU', 'False').lower() != 'true':
+        return 'cpu'
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
 class SentimentModel:
     """
     Mô hình phân tích cảm xúc sử dụng transformer hoặc rule-based
     """
     
-    def __init__(self, model_path: Optional[str] = None, batch_size: int = 16):
+    def __init__(self, model_path: Optional[str] = None, batch_size: int = 16, load_async: bool = False):
         """
         Khởi tạo mô hình phân tích cảm xúc
         
         Args:
             model_path: Đường dẫn đến mô hình transformer, mặc định sẽ sử dụng mô hình tiếng Anh
             batch_size: Kích thước batch cho việc xử lý nhiều văn bản cùng lúc
+            load_async: Tải mô hình transformer trong luồng nền; trong lúc chờ sẽ dùng rule-based
         """
         # Thiết lập tham số
         self.batch_size = batch_size
-        self.stopwords = set(stopwords.words('english')) if nltk.data.find('corpora/stopwords') else set()
         
         # Mô hình và tokenizer mặc định cho tiếng Anh
         self.en_model_path = model_path or ENGLISH_MODEL_PATH
@@ -56,41 +72,129 @@ class SentimentModel:
         # Mô hình và tokenizer đa ngôn ngữ (hỗ trợ tiếng Việt)
         self.multilingual_model_path = MULTILINGUAL_MODEL_PATH
         
-        # Thiết lập thiết bị (CPU/GPU)
-        self.device = 'cuda' if torch.cuda.is_available() and os.environ.get('USE_GPU', 'False').lower() == 'true' else 'cpu'
-        logger.info(f"Using device: {self.device.upper()}")
+        # Thiết bị (CPU/GPU) được xác định khi tải mô hình
+        self.device = 'cpu'
         
-        # Khởi tạo mô hình transformer (nếu có thể)
-        self.en_tokenizer = None
-        self.en_model = None
-        self.multilingual_tokenizer = None
-        self.multilingual_model = None
+        # Bộ phân tích rule-based, từ điển được biên dịch một lần khi khởi tạo
+        self.rule_engine = RuleEngine.from_env()
         
-        if TRANSFORMER_AVAILABLE:
-            try:
-                # Tải mô hình tiếng Anh
-                logger.info(f"Loading English sentiment model: {self.en_model_path}")
-                self.en_tokenizer = AutoTokenizer.from_pretrained(self.en_model_path)
-                self.en_model = AutoModelForSequenceClassification.from_pretrained(self.en_model_path)
-                self.en_model = self.en_model.to(self.device)
-                
-                # Tải mô hình đa ngôn ngữ (lazy loading - chỉ tải khi cần)
-                if os.environ.get('PRELOAD_MULTILINGUAL_MODEL', 'False').lower() == 'true':
-                    self._load_multilingual_model()
-            except Exception as e:
-                logger.error(f"Error loading transformer model: {str(e)}")
-                if os.environ.get('USE_FALLBACK_MODEL', 'True').lower() == 'true':
-                    logger.warning("Using fallback rule-based model")
-                else:
-                    raise
+        # Định tuyến ngôn ngữ có cache (ASCII -> en, dấu tiếng Việt -> vi, còn lại dùng langdetect)
+        self.language_router = LanguageRouter()
+        
+        # Backend suy luận (torch, quantized, onnx) - xem src/models/inference_backends.py
+        self.inference_backend = INFERENCE_BACKEND
+        
+        # Registry mô hình theo ngôn ngữ/phiên bản: tải khi cần, gỡ theo LRU khi vượt ngân sách
+        # bộ nhớ, đổi phiên bản không cần khởi động lại (xem src/models/model_registry.py)
+        self.models = ModelRegistry(loader=self._load_backend)
+        self.models.register(EN_MODEL_KEY, self.en_model_path)
+        self.models.register(MULTILINGUAL_MODEL_KEY, self.multilingual_model_path)
+        self.models.poll_config(force=True)
+        
+        # ReviewClient dùng chung khi bên gọi không truyền client (tạo khi cần lần đầu)
+        self._review_client = None
+        self._review_client_lock = threading.Lock()
+        
+        self.status = STATUS_LOADING
+        self.load_error = None
+        
+        if load_async:
+            threading.Thread(target=self._load_in_background, name='sentiment-model-loader', daemon=True).start()
+        else:
+            self.load()
     
-    def _load_multilingual_model(self):
-        """Tải mô hình đa ngôn ngữ khi cần"""
-        if self.multilingual_model is None:
-            logger.info(f"Loading multilingual sentiment model: {self.multilingual_model_path}")
-            self.multilingual_tokenizer = AutoTokenizer.from_pretrained(self.multilingual_model_path)
-            self.multilingual_model = AutoModelForSequenceClassification.from_pretrained(self.multilingual_model_path)
-            self.multilingual_model = self.multilingual_model.to(self.device)
+    def load(self):
+        """
+        Tải mô hình transformer tiếng Anh (và đa ngôn ngữ nếu PRELOAD_MULTILINGUAL_MODEL=true)
+        
+        Raises:
+            Exception: Nếu không tải được mô hình và USE_FALLBACK_MODEL=false
+        """
+        if not TRANSFORMER_AVAILABLE:
+            self.status = STATUS_FALLBACK
+            return
+        
+        try:
+            self.device = _select_device()
+            logger.info(f"Using device: {self.device.upper()}")
+            
+            # Tải mô hình tiếng Anh
+            logger.info(f"Loading English sentiment model: {self.en_model_path}")
+            self.models.ensure_loaded(EN_MODEL_KEY)
+            
+            # Các mô hình khác được tải khi cần, trừ khi yêu cầu tải trước (chế độ pre-fork)
+            if os.environ.get('PRELOAD_MULTILINGUAL_MODEL', 'False').lower() == 'true':
+                for model in self.models.stats():
+                    self.models.ensure_loaded(model['key'])
+            
+            self.status = STATUS_READY
+        except Exception as e:
+            logger.error(f"Error loading transformer model: {str(e)}")
+            self.load_error = str(e)
+            if os.environ.get('USE_FALLBACK_MODEL', 'True').lower() == 'true':
+                logger.warning("Using fallback rule-based model")
+                self.status = STATUS_FALLBACK
+            else:
+                self.status = STATUS_ERROR
+                raise
+    
+    def _load_in_background(self):
+        """Tải mô hình trong luồng nền, lỗi chỉ được ghi log và phản ánh qua status"""
+        try:
+            self.load()
+        except Exception:
+            pass
+        logger.info(f"Sentiment model loading finished with status: {self.status}")
+    
+    def is_ready(self) -> bool:
+        """
+        Kiểm tra mô hình đã sẵn sàng phục vụ traffic hay chưa
+        
+        Returns:
+            bool: True nếu transformer đã tải xong hoặc đã chuyển hẳn sang rule-based
+        """
+        return self.status in (STATUS_READY, STATUS_FALLBACK)
+    
+    def _load_backend(self, model_path: str):
+        """Tải backend suy luận cho registry với thiết bị và backend đã cấu hình"""
+        return load_backend(model_path, self.device, self.inference_backend)
+    
+    @property
+    def en_backend(self):
+        """Backend tiếng Anh đang phục vụ (None nếu chưa tải)"""
+        return self.models.peek(EN_MODEL_KEY)
+    
+    @en_backend.setter
+    def en_backend(self, backend):
+        self.models.install(EN_MODEL_KEY, backend, self.en_model_path)
+    
+    @property
+    def multilingual_backend(self):
+        """Backend đa ngôn ngữ đang phục vụ (None nếu chưa tải)"""
+        return self.models.peek(MULTILINGUAL_MODEL_KEY)
+    
+    @multilingual_backend.setter
+    def multilingual_backend(self, backend):
+        self.models.install(MULTILINGUAL_MODEL_KEY, backend, self.multilingual_model_path)
+    
+    def swap_model(self, key: str, model_path: str, version: Optional[str] = None):
+        """
+        Đổi mô hình của một ngôn ngữ sang phiên bản mới mà không dừng phục vụ
+        
+        Phiên bản mới được tải xong mới thay thế; các batch đang chạy hoàn tất trên phiên bản cũ.
+        
+        Args:
+            key: Key của mô hình ('en', 'multilingual' hoặc mã ngôn ngữ)
+            model_path: Tên hoặc đường dẫn mô hình mới
+            version: Nhãn phiên bản
+        """
+        self.models.swap(key, model_path, version)
+    
+    def _model_key(self, lang: str) -> str:
+        """Key mô hình cho một ngôn ngữ: mô hình riêng nếu đã khai báo, nếu không thì mô hình đa ngôn ngữ"""
+        if lang == 'en' or not self.models.has(lang):
+            return EN_MODEL_KEY if lang == 'en' else MULTILINGUAL_MODEL_KEY
+        return lang
     
     def _detect_language(self, text: str) -> str:
         """
@@ -102,11 +206,7 @@ class SentimentModel:
         Returns:
             str: Mã ngôn ngữ (ví dụ: 'en', 'vi')
         """
-        try:
-            return detect(text)
-        except:
-            # Mặc định trả về tiếng Anh nếu không thể phát hiện
-            return 'en'
+        return self.language_router.detect(text)
     
     def analyze_text(self, text: str) -> Dict[str, Any]:
         """
@@ -119,388 +219,226 @@ class SentimentModel:
             Dict[str, Any]: Kết quả phân tích cảm xúc
         """
         # Phát hiện ngôn ngữ
-        lang = self._detect_language(text)
-        
-        # Sử dụng transformer nếu có thể
-        if TRANSFORMER_AVAILABLE and (self.en_model is not None or self.multilingual_model is not None):
-            if lang != 'en':
-                # Đảm bảo mô hình đa ngôn ngữ đã được tải
-                if self.multilingual_model is None:
-                    self._load_multilingual_model()
-                
-                # Nếu phát hiện ngôn ngữ khác tiếng Anh và có mô hình đa ngôn ngữ
-                if self.multilingual_model is not None:
-                    return self._analyze_with_transformer(text, self.multilingual_tokenizer, self.multilingual_model)
-                else:
-                    # Fallback về mô hình tiếng Anh nếu không có mô hình đa ngôn ngữ
-                    logger.warning(f"Multilingual model not available, using English model for {lang} text")
-            
-            # Sử dụng mô hình tiếng Anh
-            if self.en_model is not None:
-                return self._analyze_with_transformer(text, self.en_tokenizer, self.en_model)
-                
-        # Fallback về phương pháp rule-based
-        return self._analyze_with_rules(text)
+        with span('language'):
+            lang = self._detect_language(text)
+        
+        return self._analyze_group(self._model_key(lang), [text], [lang])[0]
     
-    def _analyze_with_transformer(self, text: str, tokenizer, model) -> Dict[str, Any]:
+    def _analyze_with_transformer(self, text: str, backend, model_key: str = EN_MODEL_KEY) -> Dict[str, Any]:
         """
         Phân tích cảm xúc sử dụng mô hình transformer
         
         Args:
             text: Đoạn văn bản cần phân tích
-            tokenizer: Tokenizer tương ứng với mô hình
-            model: Mô hình transformer đã tải
+            backend: Backend suy luận đã tải (xem src/models/inference_backends.py)
+            model_key: Key của mô hình trong registry
             
         Returns:
             Dict[str, Any]: Kết quả phân tích cảm xúc
         """
-        # Chuẩn bị input
-        max_length = int(os.environ.get('MAX_LENGTH', 512))
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=max_length)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        
-        # Dự đoán
-        with torch.no_grad():
-            outputs = model(**inputs)
-            scores = outputs.logits.softmax(dim=1)
-            
-            # Lấy nhãn và điểm số
-            # Mô hình đa ngôn ngữ 'nlptown/bert-base-multilingual-uncased-sentiment' trả về 5 lớp (1-5 sao)
-            # trong khi DistilBERT trả về 2 lớp (negative/positive)
-            num_labels = scores.shape[1]
-            
-            if num_labels == 2:
-                # Mô hình binary (negative/positive)
-                negative_idx = 0
-                positive_idx = 1
-                
-                # Kiểm tra nếu positive score cao hơn
-                if scores[0, positive_idx] > scores[0, negative_idx]:
-                    return {
-                        "text": text,
-                        "sentiment": "positive",
-                        "score": float(scores[0, positive_idx])
-                    }
-                else:
-                    return {
-                        "text": text,
-                        "sentiment": "negative", 
-                        "score": float(scores[0, negative_idx])
-                    }
-            elif num_labels == 3:
-                # Mô hình 3 lớp (negative/neutral/positive)
-                negative_idx = 0
-                neutral_idx = 1
-                positive_idx = 2
-                
-                # Lấy index của điểm cao nhất
-                max_score_idx = scores[0].argmax().item()
-                
-                if max_score_idx == positive_idx:
-                    return {
-                        "text": text,
-                        "sentiment": "positive",
-                        "score": float(scores[0, positive_idx])
-                    }
-                elif max_score_idx == negative_idx:
-                    return {
-                        "text": text,
-                        "sentiment": "negative",
-                        "score": float(scores[0, negative_idx])
-                    }
-                else:
-                    return {
-                        "text": text,
-                        "sentiment": "neutral",
-                        "score": float(scores[0, neutral_idx])
-                    }
-            elif num_labels == 5:
-                # Mô hình 5 sao (như bert-base-multilingual-uncased-sentiment)
-                # Điểm từ 1-5 sao, chuyển đổi thành positive/negative
-                # Lấy index của điểm cao nhất (0=1 sao, 4=5 sao)
-                star_rating = scores[0].argmax().item() + 1  # +1 vì index bắt đầu từ 0
-                score = float(scores[0, star_rating - 1])  # Độ tin cậy
-                
-                # Coi 1-2 sao là tiêu cực, 3 là trung tính, 4-5 là tích cực
-                if star_rating >= 4:
-                    sentiment = "positive"
-                    # Chuẩn hóa về thang điểm 0-1, với 4 sao = 0.8, 5 sao = 1.0
-                    normalized_score = 0.6 + (star_rating - 3) * 0.2
-                elif star_rating <= 2:
-                    sentiment = "negative"
-                    # Chuẩn hóa về thang điểm 0-1, với 1 sao = 0.2, 2 sao = 0.4
-                    normalized_score = star_rating * 0.2
-                else:  # 3 sao
-                    sentiment = "neutral"
-                    normalized_score = 0.5
-                
-                return {
-                    "text": text,
-                    "sentiment": sentiment,
-                    "score": normalized_score,
-                    "star_rating": star_rating
-                }
-            else:
-                # Mặc định, giả sử negative là nhãn đầu tiên và positive là nhãn thứ hai
-                negative_idx = 0
-                positive_idx = 1 if num_labels > 1 else 0
-                
-                # Kiểm tra nếu positive score cao hơn
-                if scores[0, positive_idx] > scores[0, negative_idx]:
-                    return {
-                        "text": text,
-                        "sentiment": "positive",
-                        "score": float(scores[0, positive_idx])
-                    }
-                else:
-                    return {
-                        "text": text,
-                        "sentiment": "negative", 
-                        "score": float(scores[0, negative_idx])
-                    }
+        return self._analyze_batch_with_transformer([text], backend, model_key)[0]
     
-    def _analyze_with_rules(self, text: str) -> Dict[str, Any]:
+    @staticmethod
+    def _scores_to_result(text: str, scores) -> Dict[str, Any]:
         """
-        Phân tích cảm xúc sử dụng phương pháp rule-based đơn giản
+        Chuyển vector xác suất của một văn bản thành kết quả phân tích cảm xúc
         
         Args:
-            text: Đoạn văn bản cần phân tích
+            text: Văn bản gốc
+            scores: Vector xác suất các nhãn của mô hình
             
         Returns:
             Dict[str, Any]: Kết quả phân tích cảm xúc
         """
-        # Các từ tích cực và tiêu cực (tiếng Anh)
-        positive_words = {'good', 'great', 'excellent', 'amazing', 'wonderful', 'best', 'love', 'awesome', 
-                         'happy', 'satisfied', 'perfect', 'recommended', 'positive', 'beautiful', 'nice', 'fan'}
-        negative_words = {'bad', 'worst', 'terrible', 'awful', 'disappointing', 'horrible', 'poor', 'waste',
-                         'not', 'never', 'problem', 'issues', 'faulty', 'negative', 'broken', 'uncomfortable', 'useless'}
-        
-        # Các từ tích cực và tiêu cực (tiếng Việt)
-        vi_positive_words = {'tốt', 'hay', 'tuyệt', 'vời', 'xuất sắc', 'đẹp', 'thích', 'yêu', 'hài lòng', 
-                           'tuyệt vời', 'tốt nhất', 'tuyệt hảo', 'hoàn hảo', 'giỏi', 'hấp dẫn', 'tiện lợi'}
-        vi_negative_words = {'tệ', 'kém', 'xấu', 'dở', 'chán', 'thất vọng', 'không', 'chẳng', 'không thích', 
-                           'không hài lòng', 'không tốt', 'hỏng', 'lỗi', 'vấn đề', 'khó chịu', 'gãy', 'hư'}
-        
-        # Kết hợp từ điển dựa vào ngôn ngữ phát hiện
-        lang = self._detect_language(text)
-        if lang == 'vi':
-            positive_words.update(vi_positive_words)
-            negative_words.update(vi_negative_words)
-        
-        # Tiền xử lý văn bản
-        text = text.lower()
-        words = re.findall(r'\w+', text)
-        words = [word for word in words if word not in self.stopwords]
-        
-        # Đếm từ tích cực và tiêu cực
-        positive_count = sum(1 for word in words if word in positive_words)
-        negative_count = sum(1 for word in words if word in negative_words)
-        
-        # Phân loại cảm xúc
-        if positive_count > negative_count:
-            sentiment = "positive"
-            score = 0.5 + min(0.5, (positive_count - negative_count) / len(words) if words else 0)
-        elif negative_count > positive_count:
-            sentiment = "negative"
-            score = 0.5 + min(0.5, (negative_count - positive_count) / len(words) if words else 0)
-        else:
-            # Nếu số lượng bằng nhau, xét thêm các từ ngữ phủ định
-            negation_count = sum(1 for i in range(len(words)-1) if words[i] in {'not', 'no', 'never', 'không', 'chẳng'})
-            if negation_count > 0:
+        # Mô hình đa ngôn ngữ 'nlptown/bert-base-multilingual-uncased-sentiment' trả về 5 lớp (1-5 sao)
+        # trong khi DistilBERT trả về 2 lớp (negative/positive)
+        num_labels = len(scores)
+        
+        if num_labels == 3:
+            # Mô hình 3 lớp (negative/neutral/positive)
+            labels = ["negative", "neutral", "positive"]
+            max_score_idx = int(np.argmax(scores))
+            return {
+                "text": text,
+                "sentiment": labels[max_score_idx],
+                "score": float(scores[max_score_idx])
+            }
+        
+        if num_labels == 5:
+            # Mô hình 5 sao (như bert-base-multilingual-uncased-sentiment)
+            # Lấy index của điểm cao nhất (0=1 sao, 4=5 sao)
+            star_rating = int(np.argmax(scores)) + 1
+            
+            # Coi 1-2 sao là tiêu cực, 3 là trung tính, 4-5 là tích cực
+            if star_rating >= 4:
+                sentiment = "positive"
+                # Chuẩn hóa về thang điểm 0-1, với 4 sao = 0.8, 5 sao = 1.0
+                normalized_score = 0.6 + (star_rating - 3) * 0.2
+            elif star_rating <= 2:
                 sentiment = "negative"
-                score = 0.5 + min(0.4, negation_count / len(words) if words else 0)
-            else:
+                # Chuẩn hóa về thang điểm 0-1, với 1 sao = 0.2, 2 sao = 0.4
+                normalized_score = star_rating * 0.2
+            else:  # 3 sao
                 sentiment = "neutral"
-                score = 0.5
-                
+                normalized_score = 0.5
+            
+            return {
+                "text": text,
+                "sentiment": sentiment,
+                "score": normalized_score,
+                "star_rating": star_rating
+            }
+        
+        # Mô hình binary (negative/positive) và mặc định:
+        # giả sử negative là nhãn đầu tiên và positive là nhãn thứ hai
+        negative_idx = 0
+        positive_idx = 1 if num_labels > 1 else 0
+        
+        if scores[positive_idx] > scores[negative_idx]:
+            return {
+                "text": text,
+                "sentiment": "positive",
+                "score": float(scores[positive_idx])
+            }
         return {
             "text": text,
-            "sentiment": sentiment,
-            "score": score
+            "sentiment": "negative",
+            "score": float(scores[negative_idx])
         }
     
+    def _analyze_with_rules(self, text: str, lang: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Phân tích cảm xúc sử dụng phương pháp rule-based (xem src/models/rule_engine.py)
+        
+        Args:
+            text: Đoạn văn bản cần phân tích
+            lang: Mã ngôn ngữ đã xác định trước đó (nếu có), tránh phát hiện lại
+            
+        Returns:
+            Dict[str, Any]: Kết quả phân tích cảm xúc
+        """
+        if lang is None:
+            with span('language'):
+                lang = self._detect_language(text)
+        with span('rules'):
+            return self.rule_engine.analyze(text, lang)
+    
     def analyze_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
         """
         Phân tích cảm xúc cho một danh sách văn bản
         
+        Văn bản trùng lặp chỉ được phân tích một lần, kết quả được sao chép cho các vị trí trùng.
+        
         Args:
             texts: Danh sách văn bản cần phân tích
             
         Returns:
             List[Dict[str, Any]]: Kết quả phân tích cảm xúc cho mỗi văn bản
         """
+        positions: Dict[str, int] = {}
+        unique_texts = []
+        index = []
+        for text in texts:
+            if text not in positions:
+                positions[text] = len(unique_texts)
+                unique_texts.append(text)
+            index.append(positions[text])
+        
+        if len(unique_texts) == len(texts):
+            return self._analyze_unique_batch(texts)
+        
+        unique_results = self._analyze_unique_batch(unique_texts)
+        seen = set()
         results = []
+        for i in index:
+            result = unique_results[i]
+            # Mỗi vị trí nhận một dict riêng để bên gọi có thể sửa kết quả độc lập
+            results.append(dict(result) if i in seen and result is not None else result)
+            seen.add(i)
+        return results
+    
+    def _analyze_unique_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Phân tích một batch văn bản không trùng lặp"""
+        # Xác định ngôn ngữ cho cả batch trong một lượt
+        with span('language'):
+            langs = self.language_router.route_batch(texts)
         
-        # Nhóm văn bản theo ngôn ngữ để xử lý batch hiệu quả hơn
-        en_texts = []
-        non_en_texts = []
-        text_indices = {}  # Lưu vị trí gốc của mỗi văn bản
+        # Nhóm văn bản theo mô hình để mỗi mô hình xử lý một batch
+        groups: Dict[str, List[int]] = {}
+        for i, lang in enumerate(langs):
+            groups.setdefault(self._model_key(lang), []).append(i)
         
-        for i, text in enumerate(texts):
-            lang = self._detect_language(text)
-            if lang == 'en':
-                text_indices[f"en_{len(en_texts)}"] = i
-                en_texts.append(text)
-            else:
-                text_indices[f"non_en_{len(non_en_texts)}"] = i
-                non_en_texts.append(text)
-        
-        # Kết quả sẽ chứa None cho mỗi văn bản, sẽ được cập nhật sau
         results = [None] * len(texts)
-        
-        # Xử lý văn bản tiếng Anh
-        if en_texts and TRANSFORMER_AVAILABLE and self.en_model is not None:
-            en_results = self._analyze_batch_with_transformer(en_texts, self.en_tokenizer, self.en_model)
-            for i, res in enumerate(en_results):
-                original_idx = text_indices[f"en_{i}"]
-                results[original_idx] = res
-        else:
-            # Fallback về phương pháp rule-based
-            for i, text in enumerate(en_texts):
-                original_idx = text_indices[f"en_{i}"]
-                results[original_idx] = self._analyze_with_rules(text)
-        
-        # Xử lý văn bản không phải tiếng Anh
-        if non_en_texts and TRANSFORMER_AVAILABLE:
-            # Tải mô hình đa ngôn ngữ nếu cần
-            if self.multilingual_model is None:
-                self._load_multilingual_model()
-                
-            if self.multilingual_model is not None:
-                non_en_results = self._analyze_batch_with_transformer(non_en_texts, self.multilingual_tokenizer, self.multilingual_model)
-                for i, res in enumerate(non_en_results):
-                    original_idx = text_indices[f"non_en_{i}"]
-                    results[original_idx] = res
-            else:
-                # Fallback nếu không có mô hình đa ngôn ngữ
-                for i, text in enumerate(non_en_texts):
-                    original_idx = text_indices[f"non_en_{i}"]
-                    results[original_idx] = self._analyze_with_rules(text)
-        else:
-            # Fallback về phương pháp rule-based
-            for i, text in enumerate(non_en_texts):
-                original_idx = text_indices[f"non_en_{i}"]
-                results[original_idx] = self._analyze_with_rules(text)
+        for key, indices in groups.items():
+            group_results = self._analyze_group(key, [texts[i] for i in indices], [langs[i] for i in indices])
+            for i, result in zip(indices, group_results):
+                results[i] = result
         
         return results
     
-    def _analyze_batch_with_transformer(self, texts: List[str], tokenizer, model) -> List[Dict[str, Any]]:
+    def _analyze_group(self, key: str, texts: List[str], langs: List[str]) -> List[Dict[str, Any]]:
+        """
+        Phân tích các văn bản dùng chung một mô hình
+        
+        Mô hình chưa tải chỉ được tải khi transformer đã sẵn sàng; trong lúc đang tải, khi đã
+        chuyển sang fallback hoặc khi tải lỗi thì dùng rule-based.
+        
+        Args:
+            key: Key của mô hình trong registry
+            texts: Danh sách văn bản
+            langs: Mã ngôn ngữ của từng văn bản
+            
+        Returns:
+            List[Dict[str, Any]]: Kết quả phân tích cảm xúc cho mỗi văn bản
+        """
+        entry = None
+        if TRANSFORMER_AVAILABLE:
+            try:
+                entry = self.models.checkout(key, load=self.status == STATUS_READY)
+            except Exception as e:
+                logger.error(f"Error loading model {key}, using rule-based analysis: {str(e)}")
+        
+        if entry is not None:
+            # Giữ tham chiếu tới phiên bản đang dùng: đổi phiên bản giữa chừng không ảnh hưởng batch này
+            try:
+                return self._analyze_batch_with_transformer(texts, entry.backend, key)
+            finally:
+                self.models.release(entry)
+        
+        with span('rules'):
+            return self.rule_engine.analyze_batch(texts, langs)
+    
+    def _analyze_batch_with_transformer(self, texts: List[str], backend,
+                                        model_key: str = EN_MODEL_KEY) -> List[Dict[str, Any]]:
         """
         Phân tích cảm xúc cho một batch văn bản sử dụng transformer
         
         Args:
             texts: Danh sách văn bản cần phân tích
-            tokenizer: Tokenizer tương ứng với mô hình
-            model: Mô hình transformer đã tải
+            backend: Backend suy luận đã tải (xem src/models/inference_backends.py)
+            model_key: Key của mô hình trong registry (nhãn của số liệu)
             
         Returns:
             List[Dict[str, Any]]: Kết quả phân tích cảm xúc cho mỗi văn bản
         """
-        results = []
         max_length = int(os.environ.get('MAX_LENGTH', 512))
         
-        # Xử lý theo batch
-        for i in range(0, len(texts), self.batch_size):
-            batch_texts = texts[i:i + self.batch_size]
-            
-            # Tokenize batch
-            inputs = tokenizer(batch_texts, padding=True, truncation=True, 
-                               return_tensors="pt", max_length=max_length)
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        # Tokenize cả batch trong một lần gọi, kết quả được dùng lại cho mọi nhóm bên dưới
+        with span('tokenize'):
+            features = backend.encode(texts, max_length=max_length)
+        
+        # Gom nhóm theo độ dài token để giảm padding trong mỗi lần suy luận
+        order = sorted(range(len(texts)), key=lambda i: len(features[i]['input_ids']))
+        results = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            batch = [features[i] for i in indices]
+            observe_batch(model_key, (len(f['input_ids']) for f in batch))
+            with span('forward'):
+                scores = backend.predict_encoded(batch)
             
-            # Dự đoán
-            with torch.no_grad():
-                outputs = model(**inputs)
-                scores = outputs.logits.softmax(dim=1)
-                
-                # Xác định số lớp đầu ra của mô hình
-                num_labels = scores.shape[1]
-                
-                for j, text in enumerate(batch_texts):
-                    if num_labels == 2:
-                        # Mô hình binary (negative/positive)
-                        negative_idx = 0
-                        positive_idx = 1
-                        
-                        if scores[j, positive_idx] > scores[j, negative_idx]:
-                            results.append({
-                                "text": text,
-                                "sentiment": "positive",
-                                "score": float(scores[j, positive_idx])
-                            })
-                        else:
-                            results.append({
-                                "text": text,
-                                "sentiment": "negative",
-                                "score": float(scores[j, negative_idx])
-                            })
-                    elif num_labels == 3:
-                        # Mô hình 3 lớp (negative/neutral/positive)
-                        negative_idx = 0
-                        neutral_idx = 1
-                        positive_idx = 2
-                        
-                        max_score_idx = scores[j].argmax().item()
-                        
-                        if max_score_idx == positive_idx:
-                            results.append({
-                                "text": text,
-                                "sentiment": "positive",
-                                "score": float(scores[j, positive_idx])
-                            })
-                        elif max_score_idx == negative_idx:
-                            results.append({
-                                "text": text,
-                                "sentiment": "negative",
-                                "score": float(scores[j, negative_idx])
-                            })
-                        else:
-                            results.append({
-                                "text": text,
-                                "sentiment": "neutral",
-                                "score": float(scores[j, neutral_idx])
-                            })
-                    elif num_labels == 5:
-                        # Mô hình 5 sao (như bert-base-multilingual-uncased-sentiment)
-                        # Điểm từ 1-5 sao, chuyển đổi thành positive/negative
-                        # Lấy index của điểm cao nhất (0=1 sao, 4=5 sao)
-                        star_rating = scores[j].argmax().item() + 1  # +1 vì index bắt đầu từ 0
-                        score = float(scores[j, star_rating - 1])  # Độ tin cậy
-                        
-                        # Coi 1-2 sao là tiêu cực, 3 là trung tính, 4-5 là tích cực
-                        if star_rating >= 4:
-                            sentiment = "positive"
-                            normalized_score = 0.6 + (star_rating - 3) * 0.2
-                        elif star_rating <= 2:
-                            sentiment = "negative"
-                            normalized_score = star_rating * 0.2
-                        else:  # 3 sao
-                            sentiment = "neutral"
-                            normalized_score = 0.5
-                        
-                        results.append({
-                            "text": text,
-                            "sentiment": sentiment,
-                            "score": normalized_score,
-                            "star_rating": star_rating
-                        })
-                    else:
-                        # Mặc định, giả sử negative là nhãn đầu tiên và positive là nhãn thứ hai
-                        negative_idx = 0
-                        positive_idx = 1 if num_labels > 1 else 0
-                        
-                        if scores[j, positive_idx] > scores[j, negative_idx]:
-                            results.append({
-                                "text": text,
-                                "sentiment": "positive",
-                                "score": float(scores[j, positive_idx])
-                            })
-                        else:
-                            results.append({
-                                "text": text,
-                                "sentiment": "negative",
-                                "score": float(scores[j, negative_idx])
-                            })
+            for j, i in enumerate(indices):
+                results[i] = self._scores_to_result(texts[i], scores[j])
         
         return results
     
@@ -539,30 +477,88 @@ class SentimentModel:
         
         return reviews
     
-    def analyze_product_reviews(self, product_id: str, limit: int = 100) -> Dict[str, Any]:
+    def _get_review_client(self):
+        """ReviewClient của mô hình (một Session và pool kết nối cho mọi request)"""
+        with self._review_client_lock:
+            if self._review_client is None:
+                from src.services.review_client import ReviewClient
+                self._review_client = ReviewClient()
+            return self._review_client
+    
+    def analyze_product_reviews(self, product_id: str, limit: Optional[int] = 100,
+                                include_reviews: bool = True,
+                                on_page: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                                review_client=None,
+                                analyze_page: Optional[Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]] = None
+                                ) -> Dict[str, Any]:
         """
         Phân tích cảm xúc cho reviews của một sản phẩm
         
+        Reviews được đọc theo từng trang và phân tích ngay khi trang về (trang kế tiếp được tải
+        song song), các chỉ số được cộng dồn nên bộ nhớ không phụ thuộc số reviews của sản phẩm
+        khi include_reviews=False.
+        
         Args:
             product_id: ID của sản phẩm
-            limit: Số lượng reviews tối đa
+            limit: Số lượng reviews tối đa (None = toàn bộ)
+            include_reviews: Giữ danh sách reviews đã phân tích trong kết quả
+            on_page: Hàm nhận từng trang reviews đã phân tích (ví dụ để ghi vào kho)
+            review_client: ReviewClient dùng chung (giữ kết nối giữa các request); mặc định là
+                client của mô hình, tạo một lần
+            analyze_page: Hàm phân tích một trang reviews, mặc định là `analyze_reviews` (không tiền
+                xử lý); SentimentAnalyzer truyền hàm có tiền xử lý theo batch
             
         Returns:
             Dict[str, Any]: Kết quả phân tích cảm xúc
         """
-        from src.services.review_client import ReviewClient
-        
-        # Lấy reviews từ review service
-        review_client = ReviewClient()
-        review_data = review_client.get_product_reviews(product_id, limit=limit)
-        
-        # Trích xuất reviews từ cấu trúc dữ liệu
-        verified_reviews = review_data.get('verified_reviews', [])
-        general_reviews = review_data.get('general_reviews', [])
-        reviews = verified_reviews + general_reviews
+        if review_client is None:
+            review_client = self._get_review_client()
+        analyze_page = analyze_page or self.analyze_reviews
+        
+        analyzed_reviews = []
+        product_info = {}
+        stats = {}
+        positive_count = neutral_count = negative_count = 0
+        total_score = 0.0
+        analyzed_count = 0
+        star_total = 0.0
+        star_count = 0
+        
+        # Lấy reviews từ review service theo từng trang (thời gian chờ trang được đo trong ReviewClient)
+        for page in review_client.iter_product_review_pages(product_id, max_reviews=limit):
+            if page['offset'] == 0:
+                product_info = page['product']
+                stats = page['stats']
+            if not page['reviews']:
+                continue
+            
+            # Phân tích cảm xúc
+            analyzed_page = analyze_page(page['reviews'])
+            
+            # Cộng dồn phân phối cảm xúc, điểm số và điểm sao
+            with span('aggregate'):
+                for r in analyzed_page:
+                    sentiment = r.get('sentiment')
+                    if sentiment == 'positive':
+                        positive_count += 1
+                    elif sentiment == 'neutral':
+                        neutral_count += 1
+                    elif sentiment == 'negative':
+                        negative_count += 1
+                    total_score += r.get('sentiment_score', 0.5)
+                    if 'star_rating' in r:
+                        star_total += r['star_rating']
+                        star_count += 1
+                analyzed_count += len(analyzed_page)
+            
+            if on_page is not None:
+                with span('store'):
+                    on_page(analyzed_page)
+            if include_reviews:
+                analyzed_reviews.extend(analyzed_page)
         
         # Nếu không có reviews, trả về kết quả trống
-        if not reviews:
+        if analyzed_count == 0:
             return {
                 "product_id": product_id,
                 "reviews": [],
@@ -575,21 +571,8 @@ class SentimentModel:
                 "overall_score": 0.5
             }
         
-        # Phân tích cảm xúc
-        analyzed_reviews = self.analyze_reviews(reviews)
-        
-        # Tính toán phân phối cảm xúc
-        positive_count = sum(1 for r in analyzed_reviews if r.get('sentiment') == 'positive')
-        neutral_count = sum(1 for r in analyzed_reviews if r.get('sentiment') == 'neutral')
-        negative_count = sum(1 for r in analyzed_reviews if r.get('sentiment') == 'negative')
-        
-        # Tính điểm số tổng thể
-        total_score = sum(r.get('sentiment_score', 0.5) for r in analyzed_reviews)
-        avg_score = total_score / len(analyzed_reviews) if analyzed_reviews else 0.5
-        
-        # Tính điểm sao trung bình nếu có
-        star_ratings = [r.get('star_rating') for r in analyzed_reviews if 'star_rating' in r]
-        avg_stars = sum(star_ratings) / len(star_ratings) if star_ratings else None
+        avg_score = total_score / analyzed_count
+        avg_stars = star_total / star_count if star_count else None
         
         # Xác định cảm xúc tổng thể
         if positive_count > negative_count:
@@ -600,12 +583,8 @@ class SentimentModel:
             overall_sentiment = "neutral"
         
         # Thông tin thống kê từ review service
-        stats = review_data.get('stats', {})
         average_rating = stats.get('average_rating', 0.0)
-        total_reviews = stats.get('total_reviews', len(reviews))
-        
-        # Thông tin sản phẩm
-        product_info = review_data.get('product', {})
+        total_reviews = stats.get('total_reviews', analyzed_count)
         
         result = {
             "product_id": product_id,
@@ -0,0 +1,157 @@
+"""
+Hàng đợi phân tích trước cảm xúc cho reviews mới.
+
+Review-service gửi sự kiện review mới tới `POST /api/reviews/events`; các review được đưa vào
+một hàng đợi cục bộ có giới hạn (thay cho message broker) và một luồng nền phân tích theo
+batch rồi ghi nhãn, điểm vào kho reviews. Các endpoint đọc (xu hướng, cảm xúc sản phẩm) nhờ đó
+lấy kết quả có sẵn thay vì chạy suy luận trong request.
+
+Luồng nền chỉ chạy khi worker rảnh (không có request API nào đang xử lý), trừ khi hàng đợi
+đã vượt ngưỡng PREANALYSIS_HIGH_WATERMARK. Khi hàng đợi đầy, sự kiện mới bị từ chối để bên
+gửi lùi lại và gửi lại sau (backpressure).
+"""
+
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Số reviews tối đa chờ phân tích trong hàng đợi
+PREANALYSIS_QUEUE_SIZE = int(os.getenv("PREANALYSIS_QUEUE_SIZE", "10000"))
+# Số reviews mỗi batch phân tích
+PREANALYSIS_BATCH_SIZE = int(os.getenv("PREANALYSIS_BATCH_SIZE", "64"))
+# Thời gian tối đa (giây) chờ gom đủ một batch
+PREANALYSIS_MAX_WAIT = float(os.getenv("PREANALYSIS_MAX_WAIT", "1.0"))
+# Tỷ lệ lấp đầy hàng đợi mà từ đó luồng nền phân tích ngay cả khi đang có request
+PREANALYSIS_HIGH_WATERMARK = float(os.getenv("PREANALYSIS_HIGH_WATERMARK", "0.5"))
+
+# Thời gian (giây) gợi ý bên gửi chờ trước khi gửi lại khi hàng đợi đầy
+RETRY_AFTER_SECONDS = 5
+# Chu kỳ (giây) kiểm tra lại trạng thái rảnh của worker
+_IDLE_POLL_SECONDS = 0.05
+
+
+class PreAnalysisQueue:
+    """
+    Hàng đợi có giới hạn kèm luồng nền phân tích reviews theo batch
+    """
+
+    def __init__(self, analyze: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+                 sink: Callable[[List[Dict[str, Any]]], Any],
+                 busy: Callable[[], bool] = lambda: False,
+                 maxsize: int = PREANALYSIS_QUEUE_SIZE, batch_size: int = PREANALYSIS_BATCH_SIZE,
+                 max_wait: float = PREANALYSIS_MAX_WAIT, high_watermark: float = PREANALYSIS_HIGH_WATERMARK):
+        """
+        Args:
+            analyze (Callable): Hàm phân tích cảm xúc một danh sách reviews
+            sink (Callable): Hàm ghi reviews đã phân tích (ví dụ vào kho)
+            busy (Callable): Trả về True khi worker đang xử lý request và luồng nền nên nhường
+            maxsize (int): Số reviews tối đa trong hàng đợi
+            batch_size (int): Số reviews mỗi batch
+            max_wait (float): Thời gian tối đa (giây) chờ gom batch
+            high_watermark (float): Tỷ lệ lấp đầy mà từ đó không nhường request nữa
+        """
+        self.analyze = analyze
+        self.sink = sink
+        self.busy = busy
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.high_watermark = high_watermark
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._stats = {'accepted': 0, 'rejected': 0, 'processed': 0, 'failed': 0}
+
+    @property
+    def depth(self) -> int:
+        """Số reviews đang chờ (kể cả batch đang phân tích)"""
+        return self._queue.unfinished_tasks
+
+    def submit(self, reviews: List[Dict[str, Any]]) -> bool:
+        """
+        Đưa reviews vào hàng đợi; cả lô được nhận hoặc bị từ chối
+
+        Args:
+            reviews (List[Dict[str, Any]]): Reviews mới (cần có 'id' và 'product_id')
+
+        Returns:
+            bool: False nếu hàng đợi không còn chỗ (bên gửi nên thử lại sau)
+        """
+        with self._lock:
+            if self.depth + len(reviews) > self.maxsize:
+                self._stats['rejected'] += len(reviews)
+                return False
+            for review in reviews:
+                self._queue.put(review)
+            self._stats['accepted'] += len(reviews)
+            # Luồng nền chỉ được tạo ở lần gửi đầu tiên (sau khi gunicorn fork worker)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='sentiment-preanalysis', daemon=True)
+                self._worker.start()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Trạng thái hàng đợi
+
+        Returns:
+            Dict[str, Any]: depth, capacity và số reviews đã nhận, từ chối, phân tích, lỗi
+        """
+        with self._lock:
+            return {'depth': self.depth, 'capacity': self.maxsize, **self._stats}
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """
+        Chờ tới khi mọi review trong hàng đợi đã được xử lý
+
+        Args:
+            timeout (float, optional): Thời gian chờ tối đa (giây)
+
+        Returns:
+            bool: True nếu hàng đợi đã rỗng
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.depth:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(_IDLE_POLL_SECONDS)
+        return True
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """Lấy một batch: chờ review đầu tiên, rồi gom thêm trong tối đa max_wait giây"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _wait_for_idle(self):
+        """Nhường các request đang xử lý, trừ khi hàng đợi đã vượt ngưỡng"""
+        while self.busy() and self.depth < self.maxsize * self.high_watermark:
+            time.sleep(_IDLE_POLL_SECONDS)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            self._wait_for_idle()
+            try:
+                analyzed = self.analyze(batch)
+                self.sink(analyzed)
+                with self._lock:
+                    self._stats['processed'] += len(batch)
+            except Exception as e:
+                logger.error(f"Error pre-analysing {len(batch)} reviews: {str(e)}")
+                with self._lock:
+                    self._stats['failed'] += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
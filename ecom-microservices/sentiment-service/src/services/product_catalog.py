@@ -0,0 +1,129 @@
+"""
+Tra cứu danh mục sản phẩm từ product-service để gắn vào reviews trước khi ghi vào kho.
+
+Sự kiện và dữ liệu từ review-service chỉ có product_id, trong khi các endpoint xu hướng lọc
+theo danh mục. Danh mục (phần tử đầu của `category_path`, ví dụ 'Books') được lấy bằng endpoint
+batch của product-service, mỗi lần tối đa PRODUCT_BATCH_SIZE sản phẩm, và cache trong bộ nhớ.
+Khi product-service lỗi, kết quả không được cache và review được ghi không kèm danh mục.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_SERVICE_URL = os.environ.get('PRODUCT_SERVICE_URL', 'http://product-service:8005')
+# Số sản phẩm mỗi request batch (giới hạn PRODUCT_BATCH_MAX_IDS của product-service)
+PRODUCT_BATCH_SIZE = int(os.environ.get('PRODUCT_BATCH_SIZE', '100'))
+# Thời gian (giây) giữ danh mục của một sản phẩm trong cache
+PRODUCT_CATEGORY_TTL = int(os.environ.get('PRODUCT_CATEGORY_TTL', '3600'))
+PRODUCT_CATEGORY_CACHE_SIZE = int(os.environ.get('PRODUCT_CATEGORY_CACHE_SIZE', '50000'))
+
+
+def _category(product: Dict[str, Any]) -> Optional[str]:
+    path = product.get('category_path') or []
+    return str(path[0]) if path else None
+
+
+class ProductCategoryResolver:
+    """
+    product_id -> danh mục cấp 1, có cache LRU với thời hạn
+    """
+
+    def __init__(self, base_url: Optional[str] = None, ttl: int = PRODUCT_CATEGORY_TTL,
+                 cache_size: int = PRODUCT_CATEGORY_CACHE_SIZE):
+        """
+        Args:
+            base_url (str, optional): URL của product-service, mặc định từ PRODUCT_SERVICE_URL
+            ttl (int): Thời gian (giây) giữ một danh mục trong cache
+            cache_size (int): Số sản phẩm tối đa trong cache
+        """
+        self.base_url = (base_url or PRODUCT_SERVICE_URL).rstrip('/')
+        self.timeout = 3
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=4))
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, product_id: str, now: float):
+        entry = self._cache.get(product_id)
+        if entry is None or entry[1] < now:
+            return False, None
+        self._cache.move_to_end(product_id)
+        return True, entry[0]
+
+    def _fetch(self, product_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Danh mục của một lô sản phẩm; sản phẩm không tồn tại có danh mục None"""
+        response = self.session.post(
+            f"{self.base_url}/products/batch/",
+            json={'ids': product_ids, 'fields': ['_id', 'category_path']},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        found = {str(product.get('_id')): _category(product) for product in response.json().get('results', [])}
+        return {product_id: found.get(product_id) for product_id in product_ids}
+
+    def categories(self, product_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Danh mục của nhiều sản phẩm, chỉ gọi product-service cho các sản phẩm chưa có trong cache
+
+        Args:
+            product_ids (Iterable[str]): ID sản phẩm
+
+        Returns:
+            Dict[str, Optional[str]]: product_id -> danh mục; sản phẩm không tra được không có trong kết quả
+        """
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for product_id in dict.fromkeys(str(p) for p in product_ids if p):
+                hit, category = self._cached(product_id, now)
+                if hit:
+                    result[product_id] = category
+                else:
+                    missing.append(product_id)
+
+        for start in range(0, len(missing), PRODUCT_BATCH_SIZE):
+            chunk = missing[start:start + PRODUCT_BATCH_SIZE]
+            try:
+                fetched = self._fetch(chunk)
+            except (requests.RequestException, ValueError) as e:
+                logger.warning(f"Error fetching categories for {len(chunk)} products: {str(e)}")
+                continue
+            result.update(fetched)
+            with self._lock:
+                for product_id, category in fetched.items():
+                    self._cache[product_id] = (category, now + self.ttl)
+                    self._cache.move_to_end(product_id)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def enrich(self, reviews: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Gắn danh mục cho các review chưa có trường category
+
+        Args:
+            reviews (List[Dict[str, Any]]): Reviews có product_id
+
+        Returns:
+            List[Dict[str, Any]]: Reviews (bản sao cho các review được gắn danh mục)
+        """
+        needed = [r.get('product_id') for r in reviews if not r.get('category') and r.get('product_id')]
+        if not needed:
+            return reviews
+        categories = self.categories(needed)
+        return [
+            {**r, 'category': categories[str(r['product_id'])]}
+            if not r.get('category') and categories.get(str(r.get('product_id'))) else r
+            for r in reviews
+        ]
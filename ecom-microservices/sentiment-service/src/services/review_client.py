@@ -4,8 +4,11 @@ import json
 import random
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+from requests.adapters import HTTPAdapter
+from src.utils.profiling import span
 
 # Cấu hình logging
 logging.basicConfig(
@@ -14,6 +17,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Số reviews mỗi trang khi đọc reviews theo luồng
+REVIEW_PAGE_SIZE = int(os.environ.get('REVIEW_PAGE_SIZE', '100'))
+# Số kết nối giữ lại tới review service
+REVIEW_POOL_SIZE = int(os.environ.get('REVIEW_POOL_SIZE', '10'))
+
 class ReviewClient:
     """
     Client để tương tác với Review Service
@@ -32,6 +40,12 @@ class ReviewClient:
         self.use_mock_data = os.environ.get('USE_MOCK_DATA', 'false').lower() == 'true'
         self.mock_data_size = int(os.environ.get('MOCK_DATA_SIZE', '200'))
         
+        # Session dùng chung để giữ kết nối keep-alive giữa các request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=REVIEW_POOL_SIZE, pool_maxsize=REVIEW_POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        
         # Biến để lưu trữ cache dữ liệu mẫu
         self._mock_products = None
         self._mock_reviews = None
@@ -100,7 +114,7 @@ class ReviewClient:
             if self.use_mock_data:
                 return self._generate_mock_product_reviews(product_id, limit)
                 
-            response = requests.get(url, params=params, timeout=self.timeout)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             return self._handle_response(response)
         except requests.RequestException as e:
             logger.error(f"Error fetching reviews for product {product_id}: {str(e)}")
@@ -110,6 +124,96 @@ class ReviewClient:
             mock_data = self._generate_mock_product_reviews(product_id, limit)
             return mock_data
     
+    def _fetch_review_page(self, product_id: str, limit: int, offset: int) -> Optional[Dict[str, Any]]:
+        """
+        Lấy một trang reviews; trang đầu dùng dữ liệu mẫu khi lỗi như get_product_reviews,
+        các trang sau trả về None để dừng đọc thay vì trộn dữ liệu mẫu
+        """
+        if offset == 0:
+            return self.get_product_reviews(product_id, limit=limit, offset=0)
+        try:
+            url = self._build_url(f"product_reviews/{product_id}")
+            response = self.session.get(url, params={'limit': limit, 'offset': offset}, timeout=self.timeout)
+            return self._handle_response(response)
+        except Exception as e:
+            logger.error(f"Error fetching reviews for product {product_id} at offset {offset}: {str(e)}")
+            return None
+    
+    def get_product_review_stats(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Thống kê reviews hiện tại của một sản phẩm (limit=0, không tải review nào)
+
+        Args:
+            product_id (str): ID của sản phẩm
+
+        Returns:
+            Optional[Dict[str, Any]]: 'total_reviews' và 'average_rating', None khi không lấy được
+            (không dùng dữ liệu mẫu)
+        """
+        if self.use_mock_data:
+            return None
+        try:
+            url = self._build_url(f"product_reviews/{product_id}")
+            with span('fetch'):
+                response = self.session.get(url, params={'limit': 0}, timeout=self.timeout)
+            return self._handle_response(response).get('stats')
+        except Exception as e:
+            logger.warning(f"Error fetching review stats for product {product_id}: {str(e)}")
+            return None
+
+    def iter_product_review_pages(self, product_id: str, page_size: Optional[int] = None,
+                                  max_reviews: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Đọc reviews của một sản phẩm theo từng trang (limit/offset)
+        
+        Trang kế tiếp được tải trước trong luồng nền trong lúc bên gọi xử lý trang hiện tại,
+        nên việc tải dữ liệu chồng lên thời gian suy luận và bộ nhớ chỉ giữ khoảng hai trang.
+        
+        Args:
+            product_id (str): ID của sản phẩm
+            page_size (int, optional): Số reviews mỗi trang. Mặc định là REVIEW_PAGE_SIZE.
+            max_reviews (int, optional): Tổng số reviews tối đa. Mặc định là đọc hết.
+            
+        Yields:
+            Dict[str, Any]: Trang gồm 'product', 'stats', 'reviews' (verified trước, general sau) và 'offset'
+        """
+        page_size = page_size or REVIEW_PAGE_SIZE
+        
+        def page_limit(offset: int) -> int:
+            return page_size if max_reviews is None else min(page_size, max_reviews - offset)
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='review-prefetch') as executor:
+            offset = 0
+            future = executor.submit(self._fetch_review_page, product_id, page_limit(offset), offset)
+            while future is not None:
+                # Chỉ tính thời gian thật sự phải chờ, phần tải trước song song với suy luận không tính
+                with span('fetch'):
+                    page = future.result()
+                if page is None:
+                    return
+                
+                reviews = page.get('verified_reviews', []) + page.get('general_reviews', [])
+                pagination = page.get('pagination')
+                page_offset = offset
+                offset += len(reviews)
+                
+                # Review service cũ không phân trang (không có 'pagination') trả về toàn bộ trong một lần
+                has_more = bool(reviews) and bool(pagination) and pagination.get('has_more', False)
+                if has_more and (max_reviews is None or offset < max_reviews):
+                    future = executor.submit(self._fetch_review_page, product_id, page_limit(offset), offset)
+                else:
+                    future = None
+                
+                if max_reviews is not None and page_offset + len(reviews) > max_reviews:
+                    reviews = reviews[:max_reviews - page_offset]
+                
+                yield {
+                    'product': page.get('product', {}),
+                    'stats': page.get('stats', {}),
+                    'reviews': reviews,
+                    'offset': page_offset
+                }
+    
     def get_user_reviews(self, user_id: str, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
         """
         Lấy danh sách reviews của một người dùng
@@ -136,7 +240,7 @@ class ReviewClient:
             if self.use_mock_data:
                 return self._generate_mock_user_reviews(user_id, limit)
                 
-            response = requests.get(url, params=params, timeout=self.timeout)
+            response = self.session.get(url, params=params, timeout=self.timeout)
             return self._handle_response(response)
         except requests.RequestException as e:
             logger.error(f"Error fetching reviews for user {user_id}: {str(e)}")
@@ -166,7 +270,7 @@ class ReviewClient:
             if self.use_mock_data:
                 return self._generate_mock_review(review_id)
                 
-            response = requests.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
             if response.status_code == 404:
                 return None
             return self._handle_response(response)
@@ -201,7 +305,7 @@ class ReviewClient:
                 mock_review = {**review_data, "id": review_id, "created_at": datetime.now().isoformat()}
                 return mock_review
                 
-            response = requests.post(
+            response = self.session.post(
                 url, 
                 data=json.dumps(review_data),
                 headers=headers,
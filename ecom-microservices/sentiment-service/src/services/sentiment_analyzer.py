@@ -1,26 +1,37 @@
 import os
 import json
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 import requests
 from src.models.sentiment_model import SentimentModel
-from src.utils.text_preprocessing import preprocess_text
+from src.utils.text_preprocessing import preprocess_batch, preprocess_text
 from src.services.review_client import ReviewClient
+from src.utils.profiling import span
 
 class SentimentAnalyzer:
     """
     Dịch vụ phân tích cảm xúc cho reviews
     """
     
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, load_async=False):
         """
         Khởi tạo dịch vụ phân tích cảm xúc
         
         Args:
             model_path (str, optional): Đường dẫn đến mô hình. Mặc định sẽ sử dụng đường dẫn từ biến môi trường.
+            load_async (bool, optional): Tải mô hình trong luồng nền để service khởi động ngay.
         """
-        self.model = SentimentModel(model_path)
+        self.model = SentimentModel(model_path, load_async=load_async)
         self.review_client = ReviewClient()
     
+    def is_ready(self) -> bool:
+        """
+        Kiểm tra mô hình đã sẵn sàng phục vụ traffic hay chưa
+        
+        Returns:
+            bool: True nếu mô hình đã tải xong (hoặc đã chuyển sang rule-based)
+        """
+        return self.model.is_ready()
+    
     def analyze_text(self, text: str) -> Dict[str, Any]:
         """
         Phân tích cảm xúc của một đoạn văn bản
@@ -32,7 +43,8 @@ class SentimentAnalyzer:
             Dict[str, Any]: Kết quả phân tích cảm xúc bao gồm nhãn và độ tin cậy
         """
         # Tiền xử lý văn bản
-        processed_text = preprocess_text(text)
+        with span('preprocess'):
+            processed_text = preprocess_text(text)
         
         # Phân tích cảm xúc
         result = self.model.analyze_text(processed_text)
@@ -62,8 +74,9 @@ class SentimentAnalyzer:
             else:
                 texts.append('') # Thêm chuỗi rỗng nếu không tìm thấy nội dung
         
-        # Tiền xử lý văn bản nếu cần
-        processed_texts = [preprocess_text(text) for text in texts]
+        # Tiền xử lý cả batch, văn bản trùng lặp chỉ xử lý một lần
+        with span('preprocess'):
+            processed_texts = preprocess_batch(texts)
         
         # Phân tích cảm xúc cho mỗi văn bản
         sentiment_results = self.model.analyze_batch(processed_texts)
@@ -89,19 +102,27 @@ class SentimentAnalyzer:
             
         return analyzed_reviews
     
-    def analyze_product_reviews(self, product_id: str, limit: int = 100) -> Dict[str, Any]:
+    def analyze_product_reviews(self, product_id: str, limit: Optional[int] = 100, include_reviews: bool = True,
+                                on_page: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> Dict[str, Any]:
         """
         Phân tích cảm xúc cho reviews của một sản phẩm
         
         Args:
             product_id (str): ID của sản phẩm
-            limit (int, optional): Số lượng reviews tối đa. Mặc định là 100.
+            limit (int, optional): Số lượng reviews tối đa. Mặc định là 100, None là toàn bộ.
+            include_reviews (bool, optional): Trả về danh sách reviews đã phân tích. Mặc định là True.
+            on_page (Callable, optional): Hàm nhận từng trang reviews đã phân tích.
             
         Returns:
             Dict[str, Any]: Kết quả phân tích bao gồm phân phối cảm xúc và danh sách reviews đã phân tích
         """
-        # Sử dụng trực tiếp phương thức analyze_product_reviews của model
-        return self.model.analyze_product_reviews(product_id, limit=limit)
+        # Sử dụng trực tiếp phương thức analyze_product_reviews của model, dùng chung ReviewClient
+        # (Session và pool kết nối) của analyzer cho mọi request; mỗi trang reviews được tiền xử
+        # lý theo batch (cắt MAX_TEXT_CHARS, bỏ trùng) trước khi suy luận
+        return self.model.analyze_product_reviews(
+            product_id, limit=limit, include_reviews=include_reviews, on_page=on_page,
+            review_client=self.review_client, analyze_page=self.analyze_reviews
+        )
     
     def analyze_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
         """
@@ -113,8 +134,9 @@ class SentimentAnalyzer:
         Returns:
             List[Dict[str, Any]]: Kết quả phân tích cho từng văn bản
         """
-        # Tiền xử lý các văn bản
-        processed_texts = [preprocess_text(text) for text in texts]
+        # Tiền xử lý các văn bản (một lần cho mỗi văn bản khác nhau)
+        with span('preprocess'):
+            processed_texts = preprocess_batch(texts)
         
         # Sử dụng phương thức analyze_batch của model
         return self.model.analyze_batch(processed_texts)
@@ -0,0 +1,138 @@
+"""
+Định tuyến ngôn ngữ nhanh cho phân tích cảm xúc.
+
+Thứ tự quyết định cho mỗi văn bản:
+    1. Văn bản chỉ gồm ký tự ASCII -> 'en'
+    2. Có ký tự chỉ tiếng Việt dùng (ă, đ, ơ, ư, nguyên âm mang dấu thanh như ấ, ế, ố, ạ...) -> 'vi'
+    3. Còn lại mới gọi bộ phát hiện ngôn ngữ (langdetect, seed cố định để kết quả ổn định)
+
+Kết quả được cache theo hash của văn bản nên một review lặp lại chỉ được phân loại một lần.
+"""
+
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+LANGUAGE_CACHE_SIZE = int(os.getenv("LANGUAGE_CACHE_SIZE", "10000"))
+DEFAULT_LANGUAGE = "en"
+
+# Các ký tự chỉ xuất hiện trong tiếng Việt. â, ê, ô đứng riêng không có mặt vì tiếng Pháp cũng
+# dùng ("hôtel", "fête"); khi chúng mang thêm dấu thanh (ấ, ế, ố...) thì chỉ có trong tiếng Việt
+VIETNAMESE_CHARS = re.compile(
+    "[ăđơư"
+    "ạảấầẩẫậắằẳẵặ"
+    "ẹẻẽếềểễệ"
+    "ỉịĩ"
+    "ọỏốồổỗộớờởỡợ"
+    "ụủũứừửữự"
+    "ỳỵỷỹ]"
+)
+
+
+def _langdetect(text: str) -> str:
+    """Phát hiện ngôn ngữ bằng langdetect với seed cố định"""
+    from langdetect import DetectorFactory, detect
+
+    DetectorFactory.seed = 0
+    return detect(text)
+
+
+class LanguageRouter:
+    """
+    Bộ định tuyến ngôn ngữ có cache, dùng chung cho phân tích đơn lẻ và theo batch
+    """
+
+    def __init__(self, detector: Optional[Callable[[str], str]] = None, cache_size: int = LANGUAGE_CACHE_SIZE):
+        """
+        Args:
+            detector: Hàm phát hiện ngôn ngữ dự phòng, mặc định là langdetect
+            cache_size: Số quyết định tối đa được lưu trong cache (LRU)
+        """
+        self.detector = detector or _langdetect
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+    def _classify(self, text: str) -> str:
+        """Phân loại một văn bản, không qua cache"""
+        if not text or text.isascii():
+            return DEFAULT_LANGUAGE
+
+        if VIETNAMESE_CHARS.search(unicodedata.normalize("NFC", text).lower()):
+            return "vi"
+
+        try:
+            return self.detector(text)
+        except Exception:
+            # Mặc định trả về tiếng Anh nếu không thể phát hiện
+            return DEFAULT_LANGUAGE
+
+    def _cache_get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            lang = self._cache.get(key)
+            if lang is not None:
+                self._cache.move_to_end(key)
+            return lang
+
+    def _cache_put(self, key: bytes, lang: str):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = lang
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def detect(self, text: str) -> str:
+        """
+        Xác định ngôn ngữ của một văn bản
+
+        Args:
+            text: Văn bản cần xác định ngôn ngữ
+
+        Returns:
+            str: Mã ngôn ngữ (ví dụ: 'en', 'vi')
+        """
+        # Văn bản ASCII quyết định ngay, không cần băm hay cache
+        if not text or text.isascii():
+            return DEFAULT_LANGUAGE
+
+        key = self._key(text)
+        lang = self._cache_get(key)
+        if lang is None:
+            lang = self._classify(text)
+            self._cache_put(key, lang)
+        return lang
+
+    def route_batch(self, texts: List[str]) -> List[str]:
+        """
+        Xác định ngôn ngữ cho cả batch trong một lượt, mỗi văn bản trùng lặp chỉ phân loại một lần
+
+        Args:
+            texts: Danh sách văn bản
+
+        Returns:
+            List[str]: Mã ngôn ngữ tương ứng với từng văn bản
+        """
+        decided: Dict[str, str] = {}
+        langs = []
+        for text in texts:
+            lang = decided.get(text)
+            if lang is None:
+                lang = self.detect(text)
+                decided[text] = lang
+            langs.append(lang)
+        return langs
+
+    def clear_cache(self):
+        """Xóa cache quyết định ngôn ngữ"""
+        with self._lock:
+            self._cache.clear()
@@ -0,0 +1,123 @@
+"""
+Hỗ trợ chế độ phục vụ pre-fork: tải mô hình một lần trong tiến trình master của gunicorn
+rồi fork ra các worker dùng chung trọng số qua copy-on-write.
+
+Các nguyên tắc để trang bộ nhớ chứa trọng số không bị sao chép sang từng worker:
+    - Master chỉ tải mô hình, không chạy suy luận (tránh khởi tạo thread pool của
+      OpenMP/ONNX Runtime trước khi fork, vốn không an toàn khi fork).
+    - Master chạy với 1 luồng intra-op; số luồng thật được đặt lại trong từng worker.
+    - Gọi `gc.freeze()` trước khi fork để bộ thu gom rác của worker không duyệt (và ghi
+      vào header) hàng triệu object được tạo lúc tải mô hình.
+    - Không tải lười mô hình đa ngôn ngữ trong worker; mọi mô hình được tải trước khi fork.
+
+Với INFERENCE_BACKEND=onnx, số luồng của session ONNX Runtime chỉ đặt được lúc tạo session nên
+mỗi worker tạo lại session sau khi fork: backend ONNX có đủ số luồng nhưng trọng số nằm trong bộ
+nhớ riêng của từng worker (không được chia sẻ như torch).
+
+Số liệu Prometheus của các worker được ghi vào PROMETHEUS_MULTIPROC_DIR và gộp lại khi
+đọc /metrics (xem src/utils/profiling.py).
+"""
+
+import os
+import gc
+import glob
+import logging
+import tempfile
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_master_environment(environ=os.environ) -> int:
+    """
+    Thiết lập biến môi trường cho master trước khi import ứng dụng
+
+    Args:
+        environ: Biến môi trường cần thiết lập (mặc định là os.environ)
+
+    Returns:
+        int: Số luồng suy luận cấu hình cho mỗi worker (0 = tự chia theo số CPU)
+    """
+    worker_threads = int(environ.get('INFERENCE_THREADS', '0'))
+
+    # Mô hình phải được tải đồng bộ trong master: luồng nền không tồn tại sau khi fork
+    environ['MODEL_LOAD_ASYNC'] = 'False'
+    # Tải trước mô hình đa ngôn ngữ để worker không tự tải một bản riêng
+    environ['PRELOAD_MULTILINGUAL_MODEL'] = 'True'
+    # Master chạy một luồng; torch/ONNX Runtime không tạo thread pool trước khi fork
+    environ['INFERENCE_THREADS'] = '1'
+    environ['OMP_NUM_THREADS'] = '1'
+    environ['MKL_NUM_THREADS'] = '1'
+    environ['TOKENIZERS_PARALLELISM'] = 'false'
+
+    # prometheus_client chọn chế độ multiprocess khi được import, nên thư mục phải có trước
+    metrics_dir = environ.setdefault(
+        'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'sentiment-metrics')
+    )
+    os.makedirs(metrics_dir, exist_ok=True)
+    # Bỏ số liệu của lần chạy trước (cùng container được khởi động lại)
+    for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+        os.remove(path)
+
+    return worker_threads
+
+
+def freeze_shared_state():
+    """Thu gom rác rồi đóng băng các object hiện có trước khi fork worker"""
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Froze {gc.get_freeze_count()} objects before forking workers")
+
+
+def configure_worker(worker_threads: int, workers: int):
+    """
+    Cấu hình số luồng suy luận trong một worker vừa được fork (torch và các session ONNX Runtime)
+
+    Args:
+        worker_threads: Số luồng cấu hình qua INFERENCE_THREADS, 0 = chia đều số CPU cho các worker
+        workers: Số worker của gunicorn
+    """
+    # Import muộn: module backend đọc INFERENCE_THREADS khi import, sau prepare_master_environment
+    from src.models.inference_backends import configure_threads
+
+    if worker_threads <= 0:
+        worker_threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    configure_threads(worker_threads)
+
+
+def worker_exited(pid: int):
+    """
+    Đánh dấu worker đã thoát để số liệu gauge của nó không còn được gộp
+
+    Args:
+        pid: ID tiến trình worker
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
+
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """
+    Đọc mức dùng bộ nhớ của một tiến trình từ /proc (chỉ trên Linux)
+
+    Args:
+        pid: ID tiến trình
+
+    Returns:
+        Dict[str, int]: rss, pss và private (kB); private là phần không chia sẻ với tiến trình khác
+    """
+    memory = {'rss': 0, 'pss': 0, 'private': 0}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            fields = value.split()
+            if not fields:
+                continue
+            if key == 'Rss':
+                memory['rss'] = int(fields[0])
+            elif key == 'Pss':
+                memory['pss'] = int(fields[0])
+            elif key in ('Private_Clean', 'Private_Dirty'):
+                memory['private'] += int(fields[0])
+    return memory
@@ -0,0 +1,268 @@
+"""
+Đo thời gian từng giai đoạn suy luận và xuất số liệu cho Prometheus.
+
+Mỗi giai đoạn (tải reviews, tiền xử lý, phát hiện ngôn ngữ, tokenize, forward, rule-based,
+tổng hợp, ghi kho) được bọc trong `span(stage)`: thời gian được ghi vào histogram
+`sentiment_stage_seconds` và cộng vào trace của request hiện tại (nếu có). Trace được
+trả về client qua header `Server-Timing` và ghi log dạng JSON khi request chậm.
+
+Khi PROFILE_SAMPLE_RATE > 0, một phần request được chạy dưới torch profiler và trace
+(định dạng Chrome trace) được ghi vào PROFILE_TRACE_DIR. torch profiler dùng chung cho cả
+process nên mỗi worker chỉ profile một request tại một thời điểm; request khác đến trong lúc
+đó chạy không profile. Trace vẫn có thể chứa op của các luồng khác đang xử lý song song, các
+span `record_function` của request được profile dùng để phân biệt. Client chỉ yêu cầu profile
+được (header X-Profile) khi gửi kèm X-Profile-Token khớp PROFILE_TOKEN.
+
+Dưới gunicorn pre-fork, số liệu của các worker được gộp qua thư mục
+PROMETHEUS_MULTIPROC_DIR (xem src/utils/prefork.py).
+"""
+
+import os
+import json
+import time
+import uuid
+import hmac
+import random
+import logging
+import threading
+import contextvars
+import importlib.util
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+
+logger = logging.getLogger(__name__)
+
+# Tỷ lệ request được chạy dưới torch profiler (0 = tắt)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Thư mục ghi trace của torch profiler
+PROFILE_TRACE_DIR = os.getenv("PROFILE_TRACE_DIR", os.path.join("reports", "profiles"))
+# Request chậm hơn ngưỡng này (giây) được ghi log kèm thời gian từng giai đoạn
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+# Bí mật để client yêu cầu profile qua header X-Profile (rỗng = chỉ lấy mẫu ngẫu nhiên)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+
+STAGE_SECONDS = Histogram(
+    'sentiment_stage_seconds', 'Time spent in each sentiment inference stage', ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+BATCH_SIZE = Histogram(
+    'sentiment_batch_size', 'Number of texts per transformer forward pass', ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+SEQUENCE_LENGTH = Histogram(
+    'sentiment_sequence_length', 'Token count of each text fed to the transformer', ['model'],
+    buckets=(8, 16, 32, 64, 128, 256, 512)
+)
+REQUEST_SECONDS = Histogram(
+    'sentiment_request_seconds', 'Latency of sentiment API requests', ['endpoint']
+)
+
+_TORCH_AVAILABLE = importlib.util.find_spec('torch') is not None
+
+# Trace của request đang xử lý trong luồng/ngữ cảnh hiện tại
+_current_trace = contextvars.ContextVar('sentiment_request_trace', default=None)
+# Giữ trong lúc một request chạy dưới torch profiler (profiler dùng chung cho cả process)
+_profiler_lock = threading.Lock()
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Đo thời gian một giai đoạn suy luận
+
+    Các span cùng tên trong một request được cộng dồn (ví dụ nhiều lần forward).
+
+    Args:
+        stage (str): Tên giai đoạn
+    """
+    trace = _current_trace.get()
+    record = trace.record_function(stage) if trace is not None and trace.profiler is not None else None
+    if record is not None:
+        record.__enter__()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if record is not None:
+            record.__exit__(None, None, None)
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+def observe_batch(model: str, lengths: Iterable[int]):
+    """
+    Ghi kích thước một lần forward và độ dài token của từng văn bản trong đó
+
+    Args:
+        model (str): Tên mô hình ('en' hoặc 'multilingual')
+        lengths (Iterable[int]): Số token của từng văn bản
+    """
+    count = 0
+    sequence_length = SEQUENCE_LENGTH.labels(model)
+    for length in lengths:
+        sequence_length.observe(length)
+        count += 1
+    BATCH_SIZE.labels(model).observe(count)
+
+
+class RequestTrace:
+    """
+    Thời gian các giai đoạn của một request, tùy chọn kèm torch profiler
+    """
+
+    def __init__(self, name: str, profile: bool = False):
+        """
+        Args:
+            name (str): Tên endpoint
+            profile (bool): Chạy request dưới torch profiler và ghi trace ra file
+        """
+        self.name = name
+        self.spans: Dict[str, float] = {}
+        self.total = 0.0
+        self.trace_file: Optional[str] = None
+        self.profiler = None
+        self.record_function = None
+        self._profile = profile
+        self._start = 0.0
+        self._token = None
+
+    def add(self, stage: str, elapsed: float):
+        self.spans[stage] = self.spans.get(stage, 0.0) + elapsed
+
+    def start(self) -> "RequestTrace":
+        """Bắt đầu trace và gắn vào ngữ cảnh hiện tại"""
+        if self._profile:
+            self._start_profiler()
+        self._token = _current_trace.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def finish(self) -> Dict[str, float]:
+        """
+        Kết thúc trace, ghi histogram độ trễ request và dừng profiler
+
+        Returns:
+            Dict[str, float]: Thời gian (giây) từng giai đoạn
+        """
+        self.total = time.perf_counter() - self._start
+        if self._token is not None:
+            _current_trace.reset(self._token)
+            self._token = None
+        REQUEST_SECONDS.labels(self.name).observe(self.total)
+        if self.profiler is not None:
+            self._stop_profiler()
+        if self.total >= SLOW_REQUEST_SECONDS:
+            logger.info(f"Slow request {json.dumps(self.to_dict())}")
+        return self.spans
+
+    def to_dict(self) -> Dict[str, object]:
+        """Trace dạng dict có cấu trúc để ghi log"""
+        return {
+            'endpoint': self.name,
+            'total_ms': round(self.total * 1000, 3),
+            'spans_ms': {stage: round(elapsed * 1000, 3) for stage, elapsed in self.spans.items()},
+            'trace_file': self.trace_file
+        }
+
+    def server_timing(self) -> str:
+        """
+        Giá trị header Server-Timing (thời gian tính bằng ms)
+
+        Returns:
+            str: Ví dụ 'fetch;dur=12.5, forward;dur=40.1, total;dur=60.2'
+        """
+        entries = [(stage, elapsed) for stage, elapsed in self.spans.items()] + [('total', self.total)]
+        return ', '.join(f"{stage};dur={elapsed * 1000:.3f}" for stage, elapsed in entries)
+
+    def _start_profiler(self):
+        if not _TORCH_AVAILABLE:
+            logger.warning("Profiling requested but torch is not installed")
+            return
+        if not _profiler_lock.acquire(blocking=False):
+            logger.debug(f"Skipping profiler for {self.name}: another request is being profiled")
+            return
+        try:
+            import torch
+            from torch.profiler import ProfilerActivity, profile, record_function
+
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            self.profiler = profile(activities=activities, record_shapes=True)
+            self.record_function = record_function
+            self.profiler.start()
+        except Exception as e:
+            logger.error(f"Error starting profiler: {str(e)}")
+            self.profiler = None
+            _profiler_lock.release()
+
+    def _stop_profiler(self):
+        try:
+            self.profiler.stop()
+        finally:
+            _profiler_lock.release()
+        try:
+            os.makedirs(PROFILE_TRACE_DIR, exist_ok=True)
+            self.trace_file = os.path.join(
+                PROFILE_TRACE_DIR, f"{self.name}-{int(time.time())}-{uuid.uuid4().hex[:8]}.json"
+            )
+            self.profiler.export_chrome_trace(self.trace_file)
+            logger.info(f"Wrote profiler trace for {self.name} to {self.trace_file}")
+        except Exception as e:
+            logger.error(f"Error writing profiler trace: {str(e)}")
+            self.trace_file = None
+        self.profiler = None
+
+
+def should_profile(forced: bool = False, sample_rate: Optional[float] = None) -> bool:
+    """
+    Quyết định có chạy request dưới torch profiler hay không
+
+    Args:
+        forced (bool): Request yêu cầu profile (chỉ có tác dụng khi profiling được bật)
+        sample_rate (float, optional): Tỷ lệ lấy mẫu, mặc định PROFILE_SAMPLE_RATE
+
+    Returns:
+        bool: True nếu request được profile
+    """
+    rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate <= 0:
+        return False
+    return forced or random.random() < rate
+
+
+def profile_requested(flag: Optional[str], token: Optional[str]) -> bool:
+    """
+    Request có yêu cầu profile hợp lệ hay không
+
+    Args:
+        flag (str, optional): Giá trị header X-Profile
+        token (str, optional): Giá trị header X-Profile-Token
+
+    Returns:
+        bool: True nếu X-Profile bật và token khớp PROFILE_TOKEN (PROFILE_TOKEN rỗng thì luôn False)
+    """
+    if (flag or '').lower() not in ('1', 'true') or not PROFILE_TOKEN:
+        return False
+    return hmac.compare_digest((token or '').encode(), PROFILE_TOKEN.encode())
+
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """
+    Số liệu theo định dạng Prometheus text, gộp mọi worker khi chạy multiprocess
+
+    Returns:
+        Tuple[bytes, str]: Nội dung và content type
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
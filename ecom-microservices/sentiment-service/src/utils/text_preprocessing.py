@@ -2,31 +2,58 @@
 Module tiện ích xử lý văn bản cho phân tích cảm xúc
 """
 
+import os
 import re
+import logging
 import unicodedata
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from typing import List, Optional
+from typing import Dict, List, Optional, FrozenSet
 
-# Đảm bảo stopwords và tokenizer đã được tải
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+from src.utils.stopwords import ENGLISH_STOPWORDS
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+logger = logging.getLogger(__name__)
 
-def preprocess_text(text: str, remove_stopwords: bool = False) -> str:
+# Tách từ bằng regex (tương đương word_tokenize cho câu đơn), không cần dữ liệu punkt
+_WORD_PATTERN = re.compile(r"\w+(?:'\w+)?|[^\w\s]")
+
+# Một lượt thay thế cho cả ký tự đặc biệt và khoảng trắng: mọi chuỗi ký tự không phải chữ/số
+# hay dấu câu giữ lại đều thành một dấu cách (tương đương hai lượt re.sub trước đây)
+_SEPARATOR_PATTERN = re.compile(r'[^\w.,!?]+')
+
+# Số ký tự tối đa giữ lại trước khi tokenize; dư nhiều so với MAX_LENGTH token để tokenizer
+# vẫn là bên quyết định điểm cắt, chỉ bỏ phần văn bản chắc chắn bị cắt
+MAX_TEXT_CHARS = int(os.getenv('MAX_TEXT_CHARS', str(int(os.getenv('MAX_LENGTH', '512')) * 8)))
+
+def get_stopwords(language: str = 'english') -> FrozenSet[str]:
+    """
+    Lấy danh sách stopwords theo ngôn ngữ
+    
+    Tiếng Anh dùng danh sách đóng gói sẵn; ngôn ngữ khác chỉ dùng NLTK nếu dữ liệu
+    đã có sẵn trên máy, không bao giờ tải xuống khi đang chạy.
+    
+    Args:
+        language (str): Ngôn ngữ của stopwords
+    
+    Returns:
+        FrozenSet[str]: Tập stopwords
+    """
+    if language == 'english':
+        return ENGLISH_STOPWORDS
+    
+    try:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words(language))
+    except (ImportError, LookupError, OSError):
+        logger.warning(f"Stopwords for {language} not available, skipping stopword removal")
+        return frozenset()
+
+def preprocess_text(text: str, remove_stopwords: bool = False, max_chars: Optional[int] = None) -> str:
     """
     Tiền xử lý văn bản
     
     Args:
         text (str): Văn bản cần xử lý
         remove_stopwords (bool): Có loại bỏ stopwords hay không
+        max_chars (int, optional): Số ký tự tối đa giữ lại. Mặc định là MAX_TEXT_CHARS.
     
     Returns:
         str: Văn bản đã xử lý
@@ -34,27 +61,49 @@ def preprocess_text(text: str, remove_stopwords: bool = False) -> str:
     if not text:
         return ""
     
-    # Chuyển về Unicode NFC
-    text = unicodedata.normalize('NFC', text)
+    # Cắt bớt phần đuôi sẽ bị tokenizer bỏ đi trước khi làm các bước tốn kém
+    max_chars = max_chars or MAX_TEXT_CHARS
+    if len(text) > max_chars:
+        text = text[:max_chars]
     
-    # Loại bỏ ký tự đặc biệt
-    text = re.sub(r'[^\w\s.,!?]', ' ', text)
+    # Chuyển về Unicode NFC (văn bản ASCII luôn ở dạng NFC)
+    if not text.isascii():
+        text = unicodedata.normalize('NFC', text)
     
-    # Loại bỏ khoảng trắng thừa
-    text = re.sub(r'\s+', ' ', text)
+    # Loại bỏ ký tự đặc biệt và khoảng trắng thừa
+    text = _SEPARATOR_PATTERN.sub(' ', text)
     
     # Chuyển về chữ thường
     text = text.lower().strip()
     
     # Loại bỏ stopwords nếu cần
     if remove_stopwords:
-        stop_words = set(stopwords.words('english'))
-        tokens = word_tokenize(text)
-        tokens = [word for word in tokens if word not in stop_words]
+        tokens = tokenize_text(text)
+        tokens = [word for word in tokens if word not in ENGLISH_STOPWORDS]
         text = ' '.join(tokens)
     
     return text
 
+def preprocess_batch(texts: List[str], remove_stopwords: bool = False) -> List[str]:
+    """
+    Tiền xử lý một batch văn bản, mỗi văn bản trùng lặp chỉ được xử lý một lần
+    
+    Args:
+        texts (List[str]): Danh sách văn bản
+        remove_stopwords (bool): Có loại bỏ stopwords hay không
+    
+    Returns:
+        List[str]: Văn bản đã xử lý, cùng thứ tự và độ dài với đầu vào
+    """
+    processed: Dict[str, str] = {}
+    results = []
+    for text in texts:
+        text = text or ""
+        if text not in processed:
+            processed[text] = preprocess_text(text, remove_stopwords=remove_stopwords)
+        results.append(processed[text])
+    return results
+
 def tokenize_text(text: str) -> List[str]:
     """
     Tách từ trong văn bản
@@ -65,7 +114,7 @@ def tokenize_text(text: str) -> List[str]:
     Returns:
         List[str]: Danh sách các từ
     """
-    return word_tokenize(text)
+    return _WORD_PATTERN.findall(text)
 
 def remove_stopwords(tokens: List[str], language: str = 'english') -> List[str]:
     """
@@ -78,7 +127,7 @@ def remove_stopwords(tokens: List[str], language: str = 'english') -> List[str]:
     Returns:
         List[str]: Danh sách các từ đã loại bỏ stopwords
     """
-    stop_words = set(stopwords.words(language))
+    stop_words = get_stopwords(language)
     return [word for word in tokens if word not in stop_words]
 
 def clean_html(text: str) -> str:
@@ -1 +1,10 @@
-# This file is intentionally left blank.
\ No newline at end of file
+import atexit
+import os
+import shutil
+import tempfile
+
+# src.api.routes tạo kho reviews ngay khi import; trỏ kho sang thư mục tạm để chạy test không ghi
+# parquet vào data/ của mã nguồn
+if 'REVIEW_STORE_DIR' not in os.environ:
+    os.environ['REVIEW_STORE_DIR'] = tempfile.mkdtemp(prefix='review-store-tests-')
+    atexit.register(shutil.rmtree, os.environ['REVIEW_STORE_DIR'], True)
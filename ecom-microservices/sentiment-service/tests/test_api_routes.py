@@ -1,8 +1,12 @@
 import unittest
 import json
+import shutil
+import tempfile
 from unittest.mock import patch, MagicMock
 from flask import Flask
 from src.api.routes import api_bp
+from src.analytics.review_store import ReviewSentimentStore
+from src.analytics.rollups import StoreRollups
 from src.services.sentiment_analyzer import SentimentAnalyzer
 
 class TestAPIRoutes(unittest.TestCase):
@@ -16,10 +20,26 @@ class TestAPIRoutes(unittest.TestCase):
         # Mock SentimentAnalyzer
         self.patcher = patch('src.api.routes.sentiment_analyzer')
         self.mock_analyzer = self.patcher.start()
+
+        # Mỗi test dùng kho reviews riêng trong thư mục tạm; không gọi product-service thật
+        self.store_dir = tempfile.mkdtemp()
+        store = ReviewSentimentStore(self.store_dir)
+        catalog = MagicMock()
+        catalog.enrich.side_effect = lambda reviews: reviews
+        self.store_patchers = [
+            patch('src.api.routes.review_store', store),
+            patch('src.api.routes.rollups', StoreRollups(store)),
+            patch('src.api.routes.product_catalog', catalog),
+        ]
+        for patcher in self.store_patchers:
+            patcher.start()
         
     def tearDown(self):
         """Kết thúc sau mỗi test case"""
         self.patcher.stop()
+        for patcher in self.store_patchers:
+            patcher.stop()
+        shutil.rmtree(self.store_dir, ignore_errors=True)
     
     def test_health_check(self):
         """Test endpoint kiểm tra sức khỏe"""
@@ -161,11 +181,11 @@ class TestAPIRoutes(unittest.TestCase):
         # Kiểm tra analyzer được gọi đúng
         self.mock_analyzer.analyze_reviews.assert_called_once_with(reviews)
     
-    @patch('src.api.routes.subprocess.run')
-    def test_generate_sentiment_report(self, mock_subprocess):
-        """Test endpoint tạo báo cáo phân tích cảm xúc"""
-        # Mock kết quả subprocess
-        mock_subprocess.return_value = MagicMock(stdout="Report generated", stderr="")
+    @patch('src.api.routes.report_jobs')
+    def test_generate_sentiment_report(self, mock_jobs):
+        """Test endpoint gửi job tạo báo cáo phân tích cảm xúc"""
+        # Mock job vừa được gửi
+        mock_jobs.submit.return_value = {'job_id': 'a' * 32, 'status': 'queued'}
         
         # Gửi request
         response = self.client.post('/api/reports/generate', 
@@ -176,18 +196,19 @@ class TestAPIRoutes(unittest.TestCase):
                                    }),
                                    content_type='application/json')
         
-        # Kiểm tra kết quả
-        self.assertEqual(response.status_code, 200)
+        # Request trả về ngay với ID job
+        self.assertEqual(response.status_code, 202)
         data = json.loads(response.data)
-        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['status'], 'accepted')
+        self.assertEqual(data['status_url'], f"/api/reports/jobs/{'a' * 32}")
         self.assertIn('report_path', data)
         
-        # Kiểm tra subprocess được gọi với tham số đúng
-        mock_subprocess.assert_called_once()
-        args = mock_subprocess.call_args[0][0]
-        self.assertIn('--product-ids=p1,p2', args)
-        self.assertIn('--use-sample', args)
-        self.assertIn('--limit=50', args)
+        # Kiểm tra job được gửi với tham số đúng
+        params = mock_jobs.submit.call_args[0][0]
+        self.assertEqual(params['product_ids'], ['p1', 'p2'])
+        self.assertTrue(params['use_sample'])
+        self.assertEqual(params['limit'], 50)
+        self.assertTrue(params['incremental'])
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
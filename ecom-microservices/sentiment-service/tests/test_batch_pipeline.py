@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from src.models.sentiment_model import SentimentModel
+from src.utils.text_preprocessing import preprocess_batch, preprocess_text
+
+
+class FakeBackend:
+    """Backend giả: văn bản chứa 'bad' là negative, ghi lại các lần gọi"""
+
+    def __init__(self):
+        self.encode_calls = []
+        self.batches = []
+
+    def encode(self, texts, max_length=512):
+        self.encode_calls.append(list(texts))
+        return [{'input_ids': list(range(len(t.split()))), 'negative': 'bad' in t} for t in texts]
+
+    def predict_encoded(self, features):
+        self.batches.append([len(f['input_ids']) for f in features])
+        return np.array([[0.9, 0.1] if f['negative'] else [0.1, 0.9] for f in features])
+
+
+class TestPreprocessing(unittest.TestCase):
+    def test_preprocess_text(self):
+        """Ký tự đặc biệt và khoảng trắng liên tiếp gộp thành một dấu cách"""
+        self.assertEqual(preprocess_text('  Great!!\t@@ product :)\n'), 'great!! product')
+        self.assertEqual(preprocess_text('Sản phẩm   TỐT #1'), 'sản phẩm tốt 1')
+        self.assertEqual(preprocess_text(''), '')
+
+    def test_truncates_long_text(self):
+        """Văn bản quá dài được cắt theo số ký tự trước khi xử lý"""
+        self.assertEqual(preprocess_text('ab ' * 100, max_chars=10), 'ab ab ab a')
+
+    def test_preprocess_batch(self):
+        """Giữ nguyên thứ tự, văn bản trùng chỉ xử lý một lần"""
+        with patch('src.utils.text_preprocessing.preprocess_text', side_effect=lambda t, **kw: t.upper()) as mock:
+            result = preprocess_batch(['a', 'b', 'a', None])
+        self.assertEqual(result, ['A', 'B', 'A', ''])
+        self.assertEqual(mock.call_count, 3)
+
+
+class TestBatchInference(unittest.TestCase):
+    def setUp(self):
+        self.model = SentimentModel(batch_size=2)
+        self.backend = FakeBackend()
+        self.model.en_backend = self.backend
+        patcher = patch('src.models.sentiment_model.TRANSFORMER_AVAILABLE', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_tokenizer_call_and_length_buckets(self):
+        """Cả batch được tokenize một lần, suy luận theo nhóm độ dài tăng dần"""
+        texts = ['one two three four', 'bad', 'one two', 'one two three']
+        results = self.model.analyze_batch(texts)
+
+        self.assertEqual(len(self.backend.encode_calls), 1)
+        self.assertEqual(self.backend.batches, [[1, 2], [3, 4]])
+        self.assertEqual([r['text'] for r in results], texts)
+        self.assertEqual(results[1]['sentiment'], 'negative')
+        self.assertEqual(results[0]['sentiment'], 'positive')
+
+    def test_duplicates_analyzed_once(self):
+        """Văn bản trùng lặp chỉ được suy luận một lần, mỗi vị trí có dict riêng"""
+        results = self.model.analyze_batch(['good', 'bad', 'good', 'good'])
+        self.assertEqual(self.backend.encode_calls, [['good', 'bad']])
+        self.assertEqual([r['sentiment'] for r in results], ['positive', 'negative', 'positive', 'positive'])
+        self.assertIsNot(results[0], results[2])
+        self.assertEqual(results[0], results[2])
+
+
+class TestAnalyzerBatchPaths(unittest.TestCase):
+    def setUp(self):
+        from src.api import routes
+
+        self.routes = routes
+        self.model = MagicMock()
+        self.model.analyze_batch.side_effect = lambda texts: [
+            {'text': t, 'sentiment': 'positive', 'score': 0.9} for t in texts
+        ]
+        patcher = patch.object(routes.sentiment_analyzer, 'model', self.model)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_analyze_batch_route_uses_single_batch(self):
+        """/api/analyze_batch tiền xử lý (cắt MAX_TEXT_CHARS) và suy luận cả lô trong một lần gọi"""
+        from src.app import create_app
+
+        client = create_app().test_client()
+        with patch('src.utils.text_preprocessing.MAX_TEXT_CHARS', 10):
+            response = client.post('/api/analyze_batch', json={'texts': ['good', 'x' * 50]})
+        self.assertEqual(response.status_code, 200)
+        self.model.analyze_text.assert_not_called()
+        self.assertEqual(self.model.analyze_batch.call_count, 1)
+        processed = self.model.analyze_batch.call_args[0][0]
+        self.assertEqual(len(processed), 2)
+        self.assertLessEqual(len(processed[1]), 10)
+
+        response = client.post('/api/analyze_batch', json={'texts': ['good', 3]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_product_reviews_use_analyzer_preprocessing(self):
+        """Reviews của sản phẩm được phân tích qua analyze_reviews của analyzer (preprocess_batch)"""
+        analyzer = self.routes.sentiment_analyzer
+        analyzer.analyze_product_reviews('p1', limit=10)
+        kwargs = self.model.analyze_product_reviews.call_args[1]
+        self.assertEqual(kwargs['analyze_page'], analyzer.analyze_reviews)
+
+        page = SentimentModel(batch_size=2)
+        client = MagicMock()
+        client.iter_product_review_pages.return_value = iter([
+            {'offset': 0, 'product': {}, 'stats': {}, 'reviews': [{'id': 'r1', 'comment': 'ok'}]}
+        ])
+        seen = []
+        with patch.object(page, 'analyze_reviews') as default:
+            page.analyze_product_reviews('p1', review_client=client, include_reviews=False,
+                                         analyze_page=lambda reviews: seen.append(reviews) or [{**r, 'sentiment': 'positive', 'sentiment_score': 0.9} for r in reviews])
+            default.assert_not_called()
+        self.assertEqual(seen, [[{'id': 'r1', 'comment': 'ok'}]])
+
+
+if __name__ == '__main__':
+    unittest.main()
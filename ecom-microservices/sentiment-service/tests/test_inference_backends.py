@@ -0,0 +1,99 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import importlib.util
+
+import numpy as np
+
+from src.models.inference_backends import load_backend, onnx_model_dir
+
+TORCH_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ('torch', 'transformers'))
+ONNX_AVAILABLE = TORCH_AVAILABLE and importlib.util.find_spec('onnxruntime') is not None
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'parity_reviews.json')
+
+# Tỷ lệ trùng nhãn tối thiểu giữa backend tối ưu và torch fp32
+MIN_AGREEMENT = float(os.environ.get('PARITY_MIN_AGREEMENT', '0.9'))
+
+
+class TestBackendSelection(unittest.TestCase):
+    """Test chọn backend theo cấu hình"""
+
+    def test_unknown_backend_raises(self):
+        """Backend không hỗ trợ phải báo lỗi rõ ràng"""
+        with self.assertRaises(ValueError):
+            load_backend('any-model', backend='tensorrt')
+
+    def test_onnx_model_dir(self):
+        """Tên mô hình trên Hugging Face được chuyển thành tên thư mục hợp lệ"""
+        path = onnx_model_dir('nlptown/bert-base-multilingual-uncased-sentiment', base_dir='models/onnx')
+        self.assertEqual(path, os.path.join('models/onnx', 'nlptown--bert-base-multilingual-uncased-sentiment'))
+
+
+@unittest.skipUnless(TORCH_AVAILABLE, "torch/transformers chưa được cài đặt")
+class TestBackendParity(unittest.TestCase):
+    """
+    Kiểm tra backend quantized/ONNX cho cùng nhãn với torch fp32 trên tập fixture.
+
+    Mặc định dùng mô hình tí hon tạo offline; đặt `PARITY_MODEL_PATH` để chạy với trọng số thật.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        from scripts.build_tiny_model import build_tiny_model
+        from src.models.inference_backends import TorchBackend
+
+        with open(FIXTURE_PATH, encoding='utf-8') as f:
+            cls.texts = json.load(f)
+
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.model_path = os.environ.get('PARITY_MODEL_PATH') or build_tiny_model(
+            os.path.join(cls.tmpdir, 'tiny'), corpus=cls.texts
+        )
+        cls.reference = cls._labels(TorchBackend(cls.model_path))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    @classmethod
+    def _labels(cls, backend):
+        from src.models.sentiment_model import SentimentModel
+
+        scores = backend.predict_proba(cls.texts)
+        return [SentimentModel._scores_to_result(text, scores[i]) for i, text in enumerate(cls.texts)]
+
+    def _assert_parity(self, results):
+        self.assertEqual(len(results), len(self.reference))
+        agreement = np.mean([
+            r['sentiment'] == ref['sentiment'] for r, ref in zip(results, self.reference)
+        ])
+        self.assertGreaterEqual(agreement, MIN_AGREEMENT)
+
+        # Giữ nguyên schema đầu ra của SentimentModel
+        for r, ref in zip(results, self.reference):
+            self.assertEqual(set(r.keys()), set(ref.keys()))
+            self.assertEqual(r['text'], ref['text'])
+            self.assertGreaterEqual(r['score'], 0.0)
+            self.assertLessEqual(r['score'], 1.0)
+
+    def test_quantized_label_agreement(self):
+        """Backend int8 cho nhãn trùng với fp32"""
+        from src.models.inference_backends import QuantizedTorchBackend
+
+        self._assert_parity(self._labels(QuantizedTorchBackend(self.model_path)))
+
+    @unittest.skipUnless(ONNX_AVAILABLE, "onnxruntime chưa được cài đặt")
+    def test_onnx_label_agreement(self):
+        """Backend ONNX Runtime cho nhãn trùng với fp32"""
+        from scripts.export_onnx import export_onnx
+        from src.models.inference_backends import OnnxBackend
+
+        onnx_dir = export_onnx(self.model_path, os.path.join(self.tmpdir, 'onnx'))
+        self._assert_parity(self._labels(OnnxBackend(self.model_path, onnx_dir=onnx_dir)))
+
+
+if __name__ == '__main__':
+    unittest.main()
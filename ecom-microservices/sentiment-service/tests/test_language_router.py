@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.utils.language_router import LanguageRouter
+
+
+class TestLanguageRouter(unittest.TestCase):
+    def setUp(self):
+        """Thiết lập cho mỗi test case"""
+        self.detector = MagicMock(return_value='fr')
+        self.router = LanguageRouter(detector=self.detector, cache_size=100)
+
+    def test_ascii_short_circuits_to_english(self):
+        """Văn bản ASCII được gán tiếng Anh mà không gọi detector"""
+        self.assertEqual(self.router.detect("This product is great!"), 'en')
+        self.assertEqual(self.router.detect(""), 'en')
+        self.detector.assert_not_called()
+
+    def test_vietnamese_diacritics(self):
+        """Dấu tiếng Việt được nhận diện bằng heuristic, không gọi detector"""
+        for text in ["Sản phẩm rất tốt", "Thất vọng với sản phẩm này", "ĐÓNG GÓI CẨN THẬN"]:
+            self.assertEqual(self.router.detect(text), 'vi')
+        self.detector.assert_not_called()
+
+    def test_fallback_to_detector(self):
+        """Văn bản không phải ASCII và không có dấu tiếng Việt dùng detector"""
+        self.assertEqual(self.router.detect("Très bon café"), 'fr')
+        self.detector.assert_called_once_with("Très bon café")
+
+    def test_french_circumflex_uses_detector(self):
+        """â, ê, ô không có dấu thanh cũng có trong tiếng Pháp nên không quyết định là tiếng Việt"""
+        for text in ["Un hôtel très agréable", "C'était une fête magnifique", "Le gâteau"]:
+            self.assertEqual(self.router.detect(text), 'fr')
+        self.assertEqual(self.detector.call_count, 3)
+
+    def test_detector_error_defaults_to_english(self):
+        """Lỗi từ detector không làm hỏng request"""
+        self.detector.side_effect = Exception("No features in text")
+        self.assertEqual(self.router.detect("¡¿"), 'en')
+
+    def test_decisions_are_cached(self):
+        """Cùng một văn bản chỉ gọi detector một lần"""
+        for _ in range(5):
+            self.router.detect("Très bon café")
+        self.assertEqual(self.detector.call_count, 1)
+
+    def test_cache_is_bounded(self):
+        """Cache LRU không vượt quá kích thước cấu hình"""
+        router = LanguageRouter(detector=self.detector, cache_size=2)
+        for text in ["café 1", "café 2", "café 3"]:
+            router.detect(text)
+        router.detect("café 1")
+        self.assertEqual(self.detector.call_count, 4)
+
+    def test_route_batch(self):
+        """Định tuyến cả batch, giữ đúng thứ tự và không phân loại lại văn bản trùng"""
+        texts = ["Great!", "Rất hài lòng", "Très bon café", "Très bon café", "Bad"]
+        self.assertEqual(self.router.route_batch(texts), ['en', 'vi', 'fr', 'fr', 'en'])
+        self.assertEqual(self.detector.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from src.models.model_registry import ModelRegistry
+from src.models.sentiment_model import STATUS_READY, SentimentModel
+from tests.test_batch_pipeline import FakeBackend
+
+MB = 1024 * 1024
+
+
+class FakeModel:
+    def __init__(self, path):
+        self.path = path
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.loads = []
+
+        def loader(path):
+            self.loads.append(path)
+            return FakeModel(path)
+
+        self.registry = ModelRegistry(loader, memory_budget_mb=0, config_path='', sizer=lambda backend: 40 * MB)
+        self.registry.register('en', 'models/en')
+        self.registry.register('vi', 'models/vi')
+        self.registry.register('th', 'models/th')
+
+    def test_lazy_load_once(self):
+        """Mô hình chỉ được tải khi cần và chỉ một lần kể cả khi nhiều luồng cùng yêu cầu"""
+        self.assertIsNone(self.registry.peek('en'))
+        with self.registry.acquire('vi', load=False) as backend:
+            self.assertIsNone(backend)
+
+        threads = [threading.Thread(target=self.registry.ensure_loaded, args=('en',)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.loads, ['models/en'])
+        self.assertEqual(self.registry.peek('en').path, 'models/en')
+
+        with self.assertRaises(KeyError):
+            self.registry.ensure_loaded('fr')
+
+    def test_lru_eviction_skips_models_in_use(self):
+        """Vượt ngân sách thì gỡ mô hình ít dùng nhất, không gỡ mô hình đang được giữ"""
+        self.registry.memory_budget = 100 * MB
+        self.registry.ensure_loaded('en')
+        with self.registry.acquire('vi'):
+            self.registry.ensure_loaded('th')
+            # en là mô hình ít dùng nhất và không ai giữ
+            self.assertIsNone(self.registry.peek('en'))
+            self.assertIsNotNone(self.registry.peek('vi'))
+
+        self.registry.ensure_loaded('en')
+        self.assertIsNone(self.registry.peek('vi'))
+        self.assertEqual(self.registry.loaded_bytes(), 80 * MB)
+
+    def test_swap_keeps_in_flight_batch_on_old_weights(self):
+        """Đổi phiên bản có hiệu lực ngay cho request mới, batch đang chạy dùng trọng số cũ"""
+        entry = self.registry.checkout('en')
+        old = entry.backend
+
+        self.registry.swap('en', 'models/en-v2', version='v2')
+        self.assertEqual(self.registry.peek('en').path, 'models/en-v2')
+        self.assertIs(entry.backend, old)
+
+        self.registry.release(entry)
+        self.assertIsNone(entry.backend)
+        stats = {m['key']: m for m in self.registry.stats()}
+        self.assertEqual(stats['en']['version'], 'v2')
+        self.assertEqual(stats['en']['in_use'], 0)
+
+    def test_out_of_order_swaps_keep_latest_version(self):
+        """Lần swap cũ tải xong sau lần swap mới không được đưa phiên bản cũ trở lại phục vụ"""
+        self.registry.ensure_loaded('en')
+        release_v2 = threading.Event()
+        loading_v2 = threading.Event()
+        loader = self.registry.loader
+
+        def slow_loader(path):
+            if path == 'models/en-v2':
+                loading_v2.set()
+                release_v2.wait(5)
+            return loader(path)
+
+        self.registry.loader = slow_loader
+        results = []
+        slow = threading.Thread(target=lambda: results.append(self.registry.swap('en', 'models/en-v2', 'v2')))
+        slow.start()
+        self.assertTrue(loading_v2.wait(5))
+        self.registry.swap('en', 'models/en-v3', version='v3')
+        release_v2.set()
+        slow.join()
+
+        self.assertEqual(results, [None])
+        self.assertEqual(self.registry.peek('en').path, 'models/en-v3')
+        self.assertEqual({m['key']: m['version'] for m in self.registry.stats()}['en'], 'v3')
+
+    def test_config_file_hot_swap(self):
+        """Thay đổi file khai báo được áp dụng: key đang tải đổi phiên bản trong nền, key mới được khai báo"""
+        workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, workdir)
+        config = os.path.join(workdir, 'models.json')
+        self.registry.config_path = config
+        self.registry.ensure_loaded('en')
+
+        with open(config, 'w') as f:
+            json.dump({'en': {'path': 'models/en-v3', 'version': 'v3'}, 'ko': 'models/ko'}, f)
+        self.registry.poll_config(force=True)
+        self.registry._swap_thread.join()
+
+        self.assertEqual(self.registry.peek('en').path, 'models/en-v3')
+        self.assertTrue(self.registry.has('ko'))
+        self.assertIsNone(self.registry.peek('ko'))
+
+
+class TestSentimentModelRegistry(unittest.TestCase):
+    def test_language_specific_model(self):
+        """Ngôn ngữ có mô hình riêng dùng mô hình đó, ngôn ngữ khác dùng mô hình đa ngôn ngữ"""
+        model = SentimentModel()
+        model.status = STATUS_READY
+        backends = {}
+
+        def loader(path):
+            backends[path] = FakeBackend()
+            return backends[path]
+
+        model.models.loader = loader
+        model.models.register('vi', 'models/vi')
+
+        with patch('src.models.sentiment_model.TRANSFORMER_AVAILABLE', True), \
+                patch.object(model.language_router, 'route_batch', return_value=['vi', 'de']):
+            results = model.analyze_batch(['hàng tốt', 'schlecht bad'])
+
+        self.assertEqual(backends['models/vi'].encode_calls, [['hàng tốt']])
+        self.assertEqual(backends[model.multilingual_model_path].encode_calls, [['schlecht bad']])
+        self.assertEqual([r['sentiment'] for r in results], ['positive', 'negative'])
+
+
+if __name__ == '__main__':
+    unittest.main()
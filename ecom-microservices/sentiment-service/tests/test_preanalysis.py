@@ -0,0 +1,163 @@
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from src.analytics.review_store import ReviewSentimentStore
+from src.analytics.rollups import StoreRollups
+from src.services.preanalysis import PreAnalysisQueue
+
+
+def _review(review_id, product_id='p1', comment='great product'):
+    return {'id': review_id, 'product_id': product_id, 'user_id': 'u1', 'rating': 5,
+            'comment': comment, 'created_at': '2024-03-01T10:00:00'}
+
+
+class TestPreAnalysisQueue(unittest.TestCase):
+    def setUp(self):
+        self.batches = []
+        self.written = []
+
+    def analyze(self, reviews):
+        self.batches.append([r['id'] for r in reviews])
+        return [{**r, 'sentiment': 'positive', 'sentiment_score': 0.9} for r in reviews]
+
+    def test_batches_and_sink(self):
+        """Reviews được phân tích theo batch và ghi ra sink"""
+        q = PreAnalysisQueue(self.analyze, self.written.extend, batch_size=3, max_wait=0.2)
+        self.assertTrue(q.submit([_review(f'r{i}') for i in range(7)]))
+        self.assertTrue(q.drain(timeout=5))
+
+        self.assertEqual(sum(self.batches, []), [f'r{i}' for i in range(7)])
+        self.assertTrue(all(len(batch) <= 3 for batch in self.batches))
+        self.assertEqual(len(self.written), 7)
+        self.assertEqual(q.stats()['processed'], 7)
+
+    def test_backpressure_and_idle_yield(self):
+        """Hàng đợi đầy thì từ chối cả lô; worker chỉ nhường request khi chưa vượt ngưỡng"""
+        busy = threading.Event()
+        busy.set()
+        q = PreAnalysisQueue(self.analyze, self.written.extend, busy=busy.is_set,
+                             maxsize=4, batch_size=2, max_wait=0.05, high_watermark=1.0)
+
+        self.assertTrue(q.submit([_review('r1'), _review('r2'), _review('r3')]))
+        self.assertFalse(q.submit([_review('r4'), _review('r5')]))
+        self.assertFalse(q.drain(timeout=0.3))
+        self.assertEqual(self.batches, [])
+
+        # Đầy tới ngưỡng: phân tích ngay cả khi worker đang bận, rồi nhường lại khi dưới ngưỡng
+        self.assertTrue(q.submit([_review('r4')]))
+        self.assertFalse(q.drain(timeout=0.5))
+        self.assertEqual(self.batches, [['r1', 'r2']])
+        busy.clear()
+        self.assertTrue(q.drain(timeout=5))
+        self.assertEqual(sorted(sum(self.batches, [])), ['r1', 'r2', 'r3', 'r4'])
+        self.assertEqual(q.stats()['rejected'], 2)
+
+    def test_failed_batch_does_not_stop_worker(self):
+        """Lỗi khi phân tích một batch được ghi nhận, các batch sau vẫn chạy"""
+        calls = []
+
+        def analyze(reviews):
+            calls.append(len(reviews))
+            if len(calls) == 1:
+                raise RuntimeError('boom')
+            return reviews
+
+        q = PreAnalysisQueue(analyze, self.written.extend, batch_size=1, max_wait=0)
+        q.submit([_review('r1'), _review('r2')])
+        self.assertTrue(q.drain(timeout=5))
+        self.assertEqual(q.stats()['failed'], 1)
+        self.assertEqual(q.stats()['processed'], 1)
+
+
+class TestReviewEventRoutes(unittest.TestCase):
+    def setUp(self):
+        from src.api import routes
+        from src.app import create_app
+
+        self.routes = routes
+        self.workdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.workdir)
+        self.store = ReviewSentimentStore(self.workdir)
+        for name, value in (('review_store', self.store), ('rollups', StoreRollups(self.store))):
+            patcher = patch.object(routes, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch.object(routes.product_catalog, 'enrich', side_effect=lambda reviews: reviews)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = create_app().test_client()
+
+    def _submit_events(self, reviews):
+        response = self.client.post('/api/reviews/events', json={'reviews': reviews})
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(self.routes.preanalysis.drain(timeout=10))
+
+    def _product_sentiment(self, total_reviews, query='include_reviews=false'):
+        """Gọi endpoint sản phẩm với số reviews hiện tại của review service là total_reviews"""
+        client = self.routes.sentiment_analyzer.review_client
+        live_result = {'overall_score': 0.5, 'sentiment_distribution': {}, 'overall_sentiment': 'neutral'}
+        with patch.object(client, 'get_product_review_stats', return_value={'total_reviews': total_reviews}), \
+                patch.object(self.routes.sentiment_analyzer, 'analyze_product_reviews',
+                             return_value=live_result) as live:
+            data = self.client.get(f'/api/product/p-ev/sentiment?{query}').get_json()
+        return data, live
+
+    def test_events_are_served_from_store(self):
+        """Reviews gửi qua sự kiện được phân tích nền, endpoint sản phẩm đọc từ kho không cần suy luận"""
+        self._submit_events([
+            _review('e1', 'p-ev', 'great product, love it'),
+            _review('e2', 'p-ev', 'terrible, broken after one day'),
+            _review('e3', 'p-ev', 'excellent quality'),
+        ])
+
+        data, live = self._product_sentiment(total_reviews=3)
+        live.assert_not_called()
+        self.assertEqual(data['source'], 'store')
+        self.assertEqual(sum(data['sentiment_distribution'].values()), 3)
+        self.assertEqual(data['review_stats']['total_reviews'], 3)
+
+    def test_store_not_covering_product_uses_live(self):
+        """Kho thiếu reviews cũ hoặc limit nhỏ hơn tổng số reviews thì phân tích trực tiếp"""
+        self._submit_events([_review('e1', 'p-ev', 'great product, love it')])
+
+        data, live = self._product_sentiment(total_reviews=500)
+        live.assert_called_once()
+        self.assertEqual(data['source'], 'live')
+
+        data, live = self._product_sentiment(total_reviews=1, query='include_reviews=false&limit=0')
+        self.assertEqual(data['source'], 'store')
+        self.store.append([{**_review(f'x{i}', 'p-ev'), 'sentiment': 'positive', 'sentiment_score': 0.9}
+                           for i in range(100)])
+        data, live = self._product_sentiment(total_reviews=101, query='include_reviews=false&limit=50')
+        self.assertEqual(data['source'], 'live')
+
+    def test_updated_and_deleted_events(self):
+        """Sự kiện 'updated' thay kết quả cũ trong kho, 'deleted' loại review khỏi kho"""
+        self._submit_events([_review('e1', 'p-ev', 'great product, love it'),
+                             _review('e2', 'p-ev', 'excellent quality')])
+        self._submit_events([{**_review('e1', 'p-ev', 'terrible, broken after one day'), 'event': 'updated'}])
+        self._submit_events([{**_review('e2', 'p-ev'), 'event': 'deleted'}])
+
+        rows = self.store.query(product_ids=['p-ev']).to_pylist()
+        self.assertEqual([row['review_id'] for row in rows], ['e1'])
+        self.assertEqual(rows[0]['label'], 'negative')
+
+        response = self.client.post('/api/reviews/events', json={'reviews': [{**_review('e3'), 'event': 'edited'}]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_and_full_queue(self):
+        """Sự kiện thiếu id bị từ chối 400; hàng đợi đầy trả 429 kèm Retry-After"""
+        response = self.client.post('/api/reviews/events', json={'reviews': [{'comment': 'x'}]})
+        self.assertEqual(response.status_code, 400)
+
+        with patch.object(self.routes.preanalysis, 'submit', return_value=False):
+            response = self.client.post('/api/reviews/events', json={'reviews': [_review('e9')]})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
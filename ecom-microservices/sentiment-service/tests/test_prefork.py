@@ -0,0 +1,63 @@
+import os
+import gc
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.utils.prefork import (
+    configure_worker, freeze_shared_state, prepare_master_environment, process_memory
+)
+
+
+class TestPrefork(unittest.TestCase):
+    def test_prepare_master_environment(self):
+        """Master tải mô hình đồng bộ, một luồng, và giữ lại số luồng cấu hình cho worker"""
+        environ = {'INFERENCE_THREADS': '4', 'MODEL_LOAD_ASYNC': 'True'}
+        self.assertEqual(prepare_master_environment(environ), 4)
+        self.assertEqual(environ['MODEL_LOAD_ASYNC'], 'False')
+        self.assertEqual(environ['PRELOAD_MULTILINGUAL_MODEL'], 'True')
+        self.assertEqual(environ['INFERENCE_THREADS'], '1')
+        self.assertEqual(environ['OMP_NUM_THREADS'], '1')
+
+    def test_configure_worker_splits_cpus(self):
+        """Không cấu hình INFERENCE_THREADS thì chia đều CPU cho các worker"""
+        torch = MagicMock()
+        with patch.dict(sys.modules, {'torch': torch}), patch('os.cpu_count', return_value=8):
+            configure_worker(0, workers=4)
+            torch.set_num_threads.assert_called_once_with(2)
+
+            torch.reset_mock()
+            configure_worker(3, workers=4)
+            torch.set_num_threads.assert_called_once_with(3)
+
+    def test_configure_worker_recreates_onnx_sessions(self):
+        """Session ONNX Runtime tạo trong master (1 luồng) được tạo lại với số luồng của worker"""
+        from src.models import inference_backends
+
+        backend = MagicMock()
+        with patch.object(inference_backends, '_onnx_backends', [backend]), \
+                patch.object(inference_backends, 'INFERENCE_THREADS', 1), \
+                patch('os.cpu_count', return_value=8):
+            configure_worker(0, workers=2)
+            backend.create_session.assert_called_once_with(4)
+            self.assertEqual(inference_backends.INFERENCE_THREADS, 4)
+
+    def test_freeze_shared_state(self):
+        """Các object hiện có được chuyển sang thế hệ vĩnh viễn của GC"""
+        try:
+            freeze_shared_state()
+            self.assertGreater(gc.get_freeze_count(), 0)
+        finally:
+            gc.unfreeze()
+
+    @unittest.skipUnless(os.path.exists('/proc/self/smaps_rollup'), "chỉ hỗ trợ Linux")
+    def test_process_memory(self):
+        """Đọc được bộ nhớ của tiến trình hiện tại"""
+        memory = process_memory(os.getpid())
+        self.assertGreater(memory['rss'], 0)
+        self.assertGreater(memory['pss'], 0)
+        self.assertLessEqual(memory['private'], memory['rss'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import MagicMock
+
+import requests
+
+from src.services.product_catalog import ProductCategoryResolver
+
+
+def _response(results):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {'results': results, 'missing': []}
+    return response
+
+
+class TestProductCategoryResolver(unittest.TestCase):
+    def setUp(self):
+        self.resolver = ProductCategoryResolver(base_url='http://products')
+        self.resolver.session = MagicMock()
+        self.resolver.session.post.return_value = _response([
+            {'_id': 'p1', 'category_path': ['Books', 'Fiction']},
+            {'_id': 'p2', 'category_path': []},
+        ])
+
+    def test_enrich_uses_top_level_category(self):
+        """Review được gắn danh mục cấp 1; review đã có danh mục giữ nguyên"""
+        reviews = [
+            {'id': 'r1', 'product_id': 'p1'},
+            {'id': 'r2', 'product_id': 'p2'},
+            {'id': 'r3', 'product_id': 'p1', 'category': 'Sale'},
+        ]
+        enriched = self.resolver.enrich(reviews)
+        self.assertEqual(enriched[0]['category'], 'Books')
+        self.assertNotIn('category', enriched[1])
+        self.assertEqual(enriched[2]['category'], 'Sale')
+        self.assertNotIn('category', reviews[0])
+
+    def test_categories_are_cached(self):
+        """Mỗi sản phẩm chỉ được tra một lần, kể cả sản phẩm không có danh mục"""
+        self.resolver.categories(['p1', 'p2'])
+        self.resolver.categories(['p1', 'p2', 'p1'])
+        self.assertEqual(self.resolver.session.post.call_count, 1)
+        self.assertEqual(self.resolver.session.post.call_args.kwargs['json']['ids'], ['p1', 'p2'])
+
+    def test_errors_are_not_cached(self):
+        """Lỗi product-service không làm hỏng việc ghi và lần sau được tra lại"""
+        self.resolver.session.post.side_effect = requests.ConnectionError("down")
+        self.assertEqual(self.resolver.enrich([{'id': 'r1', 'product_id': 'p1'}]), [{'id': 'r1', 'product_id': 'p1'}])
+        self.resolver.session.post.side_effect = None
+        self.assertEqual(self.resolver.categories(['p1']), {'p1': 'Books'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+
+from src.models.sentiment_model import SentimentModel
+from src.utils import profiling
+from src.utils.profiling import (
+    RequestTrace, metrics_payload, observe_batch, profile_requested, should_profile, span
+)
+from tests.test_batch_pipeline import FakeBackend
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestSpans(unittest.TestCase):
+    def test_span_records_histogram_and_trace(self):
+        """Span ghi histogram và cộng dồn vào trace của request hiện tại"""
+        before = sample('sentiment_stage_seconds_count', stage='unit-test')
+        trace = RequestTrace('unit').start()
+        try:
+            with span('unit-test'):
+                pass
+            with span('unit-test'):
+                pass
+        finally:
+            spans = trace.finish()
+
+        self.assertEqual(sample('sentiment_stage_seconds_count', stage='unit-test'), before + 2)
+        self.assertIn('unit-test', spans)
+        self.assertRegex(trace.server_timing(), r'^unit-test;dur=[\d.]+, total;dur=[\d.]+$')
+
+    def test_span_without_trace(self):
+        """Ngoài request vẫn ghi histogram, không lỗi"""
+        before = sample('sentiment_stage_seconds_count', stage='background')
+        with span('background'):
+            pass
+        self.assertEqual(sample('sentiment_stage_seconds_count', stage='background'), before + 1)
+
+    def test_should_profile(self):
+        """Profiling chỉ chạy khi được bật; request yêu cầu thì luôn được profile"""
+        self.assertFalse(should_profile(forced=True, sample_rate=0))
+        self.assertTrue(should_profile(forced=True, sample_rate=0.01))
+        self.assertTrue(should_profile(sample_rate=1.0))
+
+    def test_profile_requested_needs_token(self):
+        """Header X-Profile chỉ có tác dụng khi kèm token khớp PROFILE_TOKEN"""
+        with patch.object(profiling, 'PROFILE_TOKEN', ''):
+            self.assertFalse(profile_requested('1', ''))
+        with patch.object(profiling, 'PROFILE_TOKEN', 'secret'):
+            self.assertTrue(profile_requested('true', 'secret'))
+            self.assertFalse(profile_requested('1', 'wrong'))
+            self.assertFalse(profile_requested('1', None))
+            self.assertFalse(profile_requested('0', 'secret'))
+
+    def test_one_profiled_request_at_a_time(self):
+        """Khi một request đang được profile, request khác chạy không profile"""
+        with patch.object(profiling, '_TORCH_AVAILABLE', True):
+            self.assertTrue(profiling._profiler_lock.acquire(blocking=False))
+            try:
+                trace = RequestTrace('overlap', profile=True).start()
+                self.assertIsNone(trace.profiler)
+                with span('forward'):
+                    pass
+                trace.finish()
+                self.assertIsNone(trace.trace_file)
+            finally:
+                profiling._profiler_lock.release()
+
+    def test_observe_batch(self):
+        """Một lần forward ghi một mẫu kích thước batch và một mẫu độ dài cho mỗi văn bản"""
+        batches = sample('sentiment_batch_size_count', model='test')
+        lengths = sample('sentiment_sequence_length_count', model='test')
+        observe_batch('test', [3, 5, 9])
+        self.assertEqual(sample('sentiment_batch_size_count', model='test'), batches + 1)
+        self.assertEqual(sample('sentiment_sequence_length_count', model='test'), lengths + 3)
+
+
+class TestModelStages(unittest.TestCase):
+    def test_transformer_stages(self):
+        """Suy luận transformer ghi các giai đoạn language, tokenize, forward và histogram batch"""
+        model = SentimentModel(batch_size=2)
+        model.en_backend = FakeBackend()
+        batches = sample('sentiment_batch_size_count', model='en')
+
+        trace = RequestTrace('unit').start()
+        try:
+            with patch('src.models.sentiment_model.TRANSFORMER_AVAILABLE', True):
+                model.analyze_batch(['one two', 'bad', 'one two three'])
+        finally:
+            spans = trace.finish()
+
+        self.assertTrue({'language', 'tokenize', 'forward'} <= set(spans))
+        self.assertEqual(sample('sentiment_batch_size_count', model='en'), batches + 2)
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def test_metrics_payload(self):
+        """/metrics xuất các histogram theo định dạng Prometheus"""
+        from src.app import create_app
+
+        client = create_app().test_client()
+        response = client.post('/api/analyze', json={'text': 'great product'})
+        self.assertIn('preprocess;dur=', response.headers['Server-Timing'])
+
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.get_data(as_text=True)
+        self.assertIn('sentiment_stage_seconds_bucket{le="0.0005",stage="preprocess"}', body)
+        self.assertIn('sentiment_request_seconds_count{endpoint="analyze_text"}', body)
+
+        payload, content_type = metrics_payload()
+        self.assertTrue(content_type.startswith('text/plain'))
+
+
+if __name__ == '__main__':
+    unittest.main()
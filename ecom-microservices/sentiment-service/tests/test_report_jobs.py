@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.analytics.report_jobs import ReportJobManager
+
+
+def _fake_report(output_dir, workers, progress, product_ids=None, **params):
+    """Giả lập tạo báo cáo: ghi một file cho mỗi sản phẩm"""
+    if not product_ids:
+        return None
+    for product_id in product_ids:
+        os.makedirs(os.path.join(output_dir, 'products', product_id), exist_ok=True)
+        with open(os.path.join(output_dir, 'products', product_id, 'summary.html'), 'w') as f:
+            f.write(product_id)
+        progress(product_id, True)
+    with open(os.path.join(output_dir, 'manifest.json'), 'w') as f:
+        f.write('{}')
+    return {'rendered': product_ids, 'skipped': [], 'workers': workers}
+
+
+def _failing_report(output_dir, workers, progress, **params):
+    raise RuntimeError('boom')
+
+
+class TestReportJobManager(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.output_dir = os.path.join(self.root, 'report')
+        self.jobs_dir = os.path.join(self.root, 'jobs')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def _manager(self, runner):
+        return ReportJobManager(self.output_dir, self.jobs_dir, workers=2, runner=runner)
+
+    def test_job_lifecycle(self):
+        """Job được ghi nhận ngay, chạy nền và liệt kê artifact khi xong"""
+        manager = self._manager(_fake_report)
+        job = manager.submit({'product_ids': ['p1', 'p2']})
+        self.assertEqual(job['status'], 'queued')
+
+        result = manager.wait(job['job_id'], timeout=10)
+        self.assertEqual(result['status'], 'succeeded')
+        self.assertEqual(result['products_done'], 2)
+        self.assertEqual(result['summary']['workers'], 2)
+        self.assertEqual(result['artifacts'], ['products/p1/summary.html', 'products/p2/summary.html'])
+
+    def test_status_shared_between_managers(self):
+        """Trạng thái đọc được từ tiến trình khác qua thư mục job"""
+        manager = self._manager(_fake_report)
+        job = manager.submit({'product_ids': ['p1']})
+        manager.wait(job['job_id'], timeout=10)
+        self.assertEqual(self._manager(_fake_report).get(job['job_id'])['status'], 'succeeded')
+
+    def test_failed_jobs(self):
+        """Lỗi khi tạo báo cáo và trường hợp không có dữ liệu được ghi vào trạng thái"""
+        failed = self._manager(_failing_report)
+        job = failed.wait(failed.submit({})['job_id'], timeout=10)
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'boom')
+
+        empty = self._manager(_fake_report)
+        job = empty.wait(empty.submit({'product_ids': []})['job_id'], timeout=10)
+        self.assertEqual(job['status'], 'failed')
+        self.assertNotIn('artifacts', job)
+
+    def test_unknown_job(self):
+        """ID không tồn tại hoặc không hợp lệ trả về None"""
+        manager = self._manager(_fake_report)
+        self.assertIsNone(manager.get('0' * 32))
+        self.assertIsNone(manager.get('../../etc/passwd'))
+
+
+if __name__ == '__main__':
+    unittest.main()
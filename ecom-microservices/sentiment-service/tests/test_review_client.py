@@ -0,0 +1,111 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.services.review_client import ReviewClient
+
+
+def _response(payload, status_code=200):
+    response = MagicMock(status_code=status_code)
+    response.json.return_value = payload
+    return response
+
+
+def _page(offset, count, total, verified=0):
+    """Trang reviews theo định dạng của review-service khi có limit/offset"""
+    reviews = [{'id': f'r{offset + i}', 'comment': 'ok'} for i in range(count)]
+    return {
+        'product': {'id': 'p1'},
+        'stats': {'total_reviews': total, 'average_rating': 4.0},
+        'verified_reviews': reviews[:verified],
+        'general_reviews': reviews[verified:],
+        'pagination': {'limit': count, 'offset': offset, 'total': total, 'has_more': offset + count < total}
+    }
+
+
+class TestReviewClientPaging(unittest.TestCase):
+    def setUp(self):
+        with patch.dict('os.environ', {'USE_MOCK_DATA': 'false'}):
+            self.client = ReviewClient(base_url='http://reviews')
+        self.client.session = MagicMock()
+
+    def _serve(self, total, verified=0):
+        def get(url, params=None, timeout=None):
+            offset, limit = params['offset'], params['limit']
+            return _response(_page(offset, max(0, min(limit, total - offset)), total, verified))
+        self.client.session.get.side_effect = get
+
+    def test_iterates_all_pages(self):
+        """Đọc hết các trang theo limit/offset, verified trước general"""
+        self._serve(total=250, verified=30)
+        pages = list(self.client.iter_product_review_pages('p1', page_size=100))
+        self.assertEqual([p['offset'] for p in pages], [0, 100, 200])
+        self.assertEqual([len(p['reviews']) for p in pages], [100, 100, 50])
+        self.assertEqual(pages[0]['reviews'][0]['id'], 'r0')
+        self.assertEqual(pages[0]['stats']['total_reviews'], 250)
+        offsets = [c.kwargs['params']['offset'] for c in self.client.session.get.call_args_list]
+        self.assertEqual(offsets, [0, 100, 200])
+
+    def test_max_reviews(self):
+        """Không yêu cầu quá max_reviews"""
+        self._serve(total=250)
+        pages = list(self.client.iter_product_review_pages('p1', page_size=100, max_reviews=150))
+        self.assertEqual(sum(len(p['reviews']) for p in pages), 150)
+        limits = [c.kwargs['params']['limit'] for c in self.client.session.get.call_args_list]
+        self.assertEqual(limits, [100, 50])
+
+    def test_unpaged_service(self):
+        """Review service không phân trang trả về mọi reviews trong một trang"""
+        payload = _page(0, 5, 5)
+        del payload['pagination']
+        self.client.session.get.return_value = _response(payload)
+        pages = list(self.client.iter_product_review_pages('p1', page_size=2))
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(len(pages[0]['reviews']), 5)
+
+    def test_later_page_error_stops(self):
+        """Lỗi ở trang sau dừng việc đọc thay vì trộn dữ liệu mẫu"""
+        self.client.session.get.side_effect = [_response(_page(0, 10, 30)), _response({}, status_code=500)]
+        pages = list(self.client.iter_product_review_pages('p1', page_size=10))
+        self.assertEqual(len(pages), 1)
+
+    def test_prefetches_next_page(self):
+        """Trang kế tiếp được tải trong lúc bên gọi còn xử lý trang hiện tại"""
+        self._serve(total=20)
+        second_requested = threading.Event()
+        original = self.client.session.get.side_effect
+
+        def get(url, params=None, timeout=None):
+            if params['offset'] == 10:
+                second_requested.set()
+            return original(url, params=params, timeout=timeout)
+        self.client.session.get.side_effect = get
+
+        pages = self.client.iter_product_review_pages('p1', page_size=10)
+        next(pages)
+        self.assertTrue(second_requested.wait(timeout=5))
+        self.assertEqual(len(list(pages)), 1)
+
+
+
+class TestReviewClientReuse(unittest.TestCase):
+    def test_model_reuses_one_client(self):
+        """Các lần phân tích sản phẩm dùng chung một ReviewClient (một Session) thay vì tạo mới"""
+        from src.models.sentiment_model import SentimentModel
+
+        model = SentimentModel()
+        with patch('src.services.review_client.ReviewClient') as client_class:
+            client_class.return_value.iter_product_review_pages.return_value = iter([])
+            model.analyze_product_reviews('p1')
+            client_class.return_value.iter_product_review_pages.return_value = iter([])
+            model.analyze_product_reviews('p2')
+        self.assertEqual(client_class.call_count, 1)
+
+        shared = MagicMock()
+        shared.iter_product_review_pages.return_value = iter([])
+        model.analyze_product_reviews('p3', review_client=shared)
+        shared.iter_product_review_pages.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.analytics.review_store import ReviewSentimentStore
+
+
+def _review(review_id, product_id, label, created_at, category='books', rating=4):
+    return {
+        'id': review_id,
+        'product_id': product_id,
+        'category': category,
+        'user_id': 'u1',
+        'rating': rating,
+        'created_at': created_at,
+        'sentiment': {'label': label, 'score': 0.8}
+    }
+
+
+class TestReviewSentimentStore(unittest.TestCase):
+    def setUp(self):
+        """Mỗi test dùng một thư mục kho riêng"""
+        self.root = tempfile.mkdtemp()
+        self.store = ReviewSentimentStore(self.root, compact_files=3)
+        self.reviews = [
+            _review('r1', 'p1', 'positive', '2023-04-10T08:00:00Z'),
+            _review('r2', 'p1', 'negative', '2023-05-02T08:00:00'),
+            _review('r3', 'p2', 'neutral', '2023-05-20T08:00:00', category='shoes'),
+            _review('r4', 'p3', 'positive', '2023-06-01T08:00:00', category='shoes'),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_append_partitions_by_month(self):
+        """Mỗi tháng là một phân vùng riêng"""
+        self.assertTrue(self.store.is_empty())
+        self.assertEqual(self.store.append(self.reviews), 4)
+        self.assertFalse(self.store.is_empty())
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.root) if name.startswith('month=')),
+            ['month=2023-04', 'month=2023-05', 'month=2023-06']
+        )
+
+    def test_append_skips_known_ids(self):
+        """Review đã có trong kho không bị ghi lại, kể cả với instance mới"""
+        self.store.append(self.reviews)
+        self.assertEqual(self.store.append(self.reviews[:2]), 0)
+        self.assertEqual(ReviewSentimentStore(self.root).append(self.reviews), 0)
+        self.assertEqual(self.store.query().num_rows, 4)
+
+    def test_reviews_without_id_are_deduplicated(self):
+        """Review không có id được gán ID ổn định theo nội dung nên gửi lại không bị ghi trùng"""
+        review = {**_review(None, 'p1', 'positive', '2023-05-02T08:00:00'), 'comment': 'Tốt'}
+        self.assertEqual(self.store.append([review, dict(review)]), 1)
+        self.assertEqual(self.store.append([review]), 0)
+        self.assertEqual(self.store.append([{**review, 'comment': 'Rất tốt'}]), 1)
+        self.assertEqual(self.store.query().column('review_id').null_count, 0)
+
+    def test_append_sees_writes_of_other_workers(self):
+        """Hai instance (hai worker) cùng kho: ID do instance kia ghi sau khi đã nạp vẫn được bỏ qua"""
+        other = ReviewSentimentStore(self.root)
+        self.assertEqual(other.append(self.reviews[:1]), 1)
+        self.assertEqual(self.store.append(self.reviews[1:2]), 1)
+        self.assertEqual(other.append(self.reviews[:2]), 0)
+        self.assertEqual(self.store.append(self.reviews), 2)
+        self.assertEqual(self.store.query().num_rows, 4)
+
+    def test_known_ids_reload_after_compaction_by_other_worker(self):
+        """File bị worker khác gộp thì tập ID được nạp lại từ các file hiện có"""
+        other = ReviewSentimentStore(self.root)
+        self.store.append(self.reviews[:2])
+        self.store.append(self.reviews[2:])
+        other.append([])
+        self.store.compact()
+        self.assertEqual(other.append(self.reviews), 0)
+        self.assertEqual(self.store.query().num_rows, 4)
+
+    def test_flat_sentiment_format(self):
+        """Hỗ trợ định dạng của SentimentAnalyzer.analyze_reviews"""
+        self.store.append([{
+            'id': 'r9', 'product_id': 'p9', 'sentiment': 'negative',
+            'sentiment_score': 0.9, 'created_at': '2023-07-01'
+        }])
+        row = self.store.query().to_pylist()[0]
+        self.assertEqual(row['label'], 'negative')
+        self.assertAlmostEqual(row['score'], 0.9, places=5)
+
+    def test_query_filters(self):
+        """Lọc theo sản phẩm, danh mục và khoảng thời gian"""
+        self.store.append(self.reviews)
+        self.assertEqual(self.store.query(product_ids=['p1']).num_rows, 2)
+        self.assertEqual(self.store.query(category='shoes').num_rows, 2)
+        table = self.store.query(start_date='2023-05-01', end_date='2023-05-31')
+        self.assertEqual(sorted(table.column('review_id').to_pylist()), ['r2', 'r3'])
+
+    def test_end_date_includes_whole_day(self):
+        """end_date chỉ có ngày bao gồm cả các review sau 00:00 của ngày đó"""
+        self.store.append(self.reviews)
+        table = self.store.query(start_date='2023-05-02', end_date='2023-05-20')
+        self.assertEqual(sorted(table.column('review_id').to_pylist()), ['r2', 'r3'])
+        table = self.store.query(end_date='2023-05-20T07:00:00')
+        self.assertEqual(sorted(table.column('review_id').to_pylist()), ['r1', 'r2'])
+
+    def test_compaction(self):
+        """Phân vùng có quá nhiều file được gộp lại mà không mất dữ liệu"""
+        for i in range(5):
+            self.store.append([_review(f'c{i}', 'p1', 'positive', '2023-08-0%d' % (i + 1))])
+        files = os.listdir(os.path.join(self.root, 'month=2023-08'))
+        self.assertLessEqual(len(files), 3)
+        self.assertEqual(self.store.query(product_ids=['p1']).num_rows, 5)
+
+    def test_analyzer(self):
+        """Analyzer dựng trực tiếp từ kết quả truy vấn"""
+        self.store.append(self.reviews)
+        analyzer = self.store.analyzer(product_ids=['p1', 'p2'])
+        self.assertEqual(
+            analyzer.get_sentiment_distribution(), {'positive': 1, 'neutral': 1, 'negative': 1}
+        )
+        comparison = analyzer.compare_products(['p1'])
+        self.assertEqual(comparison['p1']['total_reviews'], 2)
+        self.assertAlmostEqual(comparison['p1']['sentiment_score'], 0.5)
+
+    def test_empty_store(self):
+        """Kho trống trả về kết quả rỗng"""
+        self.assertEqual(self.store.query().num_rows, 0)
+        self.assertTrue(self.store.analyzer().df.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
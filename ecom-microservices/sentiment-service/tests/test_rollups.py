@@ -0,0 +1,132 @@
+import shutil
+import tempfile
+import unittest
+
+from src.analytics.review_store import ReviewSentimentStore, reviews_to_table
+from src.analytics.rollups import SentimentRollups, StoreRollups
+
+
+def _review(review_id, product_id, label, created_at, category='books', rating=4):
+    return {
+        'id': review_id,
+        'product_id': product_id,
+        'category': category,
+        'user_id': 'u1',
+        'rating': rating,
+        'created_at': created_at,
+        'sentiment': {'label': label, 'score': 0.8}
+    }
+
+
+class TestSentimentRollups(unittest.TestCase):
+    def setUp(self):
+        """Rollups dựng từ một lô reviews nhỏ"""
+        self.rollups = SentimentRollups.from_table(reviews_to_table([
+            _review('r1', 'p1', 'positive', '2023-04-10T08:00:00', rating=5),
+            _review('r2', 'p1', 'negative', '2023-05-02T08:00:00', rating=1),
+            _review('r3', 'p2', 'neutral', '2023-05-20T08:00:00', category='shoes', rating=3),
+            _review('r4', 'p3', 'positive', '2023-05-21T08:00:00', category='shoes'),
+        ]))
+
+    def test_distribution_and_incremental_ingest(self):
+        """Lô mới được cộng dồn vào phân phối"""
+        self.assertEqual(self.rollups.distribution(), {'positive': 2, 'neutral': 1, 'negative': 1})
+        self.rollups.ingest(reviews_to_table([_review('r5', 'p2', 'positive', '2023-06-01T08:00:00')]))
+        self.assertEqual(self.rollups.distribution(), {'positive': 3, 'neutral': 1, 'negative': 1})
+
+    def test_top_products_by_category(self):
+        """Top-N theo danh mục và được tính lại khi danh mục có dữ liệu mới"""
+        top = self.rollups.top_products(n=2)
+        self.assertEqual([p['product_id'] for p in top], ['p3', 'p1'])
+        self.assertEqual(top[1]['avg_rating'], 3.0)
+        self.assertEqual(top[1]['total_reviews'], 2)
+
+        shoes = self.rollups.top_products(n=5, category='shoes')
+        self.assertEqual([p['product_id'] for p in shoes], ['p3', 'p2'])
+
+        self.rollups.ingest(reviews_to_table([
+            _review('r5', 'p2', 'positive', '2023-06-01T08:00:00', category='shoes'),
+            _review('r6', 'p2', 'positive', '2023-06-02T08:00:00', category='shoes'),
+            _review('r7', 'p3', 'negative', '2023-06-03T08:00:00', category='shoes'),
+        ]))
+        shoes = self.rollups.top_products(n=5, category='shoes')
+        self.assertEqual([p['product_id'] for p in shoes], ['p2', 'p3'])
+        self.assertEqual(self.rollups.top_products(n=5, category='books')[0]['product_id'], 'p1')
+
+    def test_reviews_without_product_are_skipped(self):
+        """Review thiếu product_id không tạo ra một sản phẩm rỗng trong top hay danh mục"""
+        self.rollups.ingest(reviews_to_table([
+            _review('r5', None, 'positive', '2023-06-01T08:00:00', rating=5),
+            _review('r6', '', 'positive', '2023-06-02T08:00:00', rating=5),
+        ]))
+        self.assertEqual(self.rollups.distribution(), {'positive': 2, 'neutral': 1, 'negative': 1})
+        top = self.rollups.top_products(n=10)
+        self.assertEqual(sorted(p['product_id'] for p in top), ['p1', 'p2', 'p3'])
+
+    def test_top_products_limits(self):
+        """n được giới hạn, danh mục không phân biệt hoa thường và cache top-N có giới hạn"""
+        from src.analytics import rollups as rollups_module
+
+        self.assertEqual(len(self.rollups.top_products(n=10 ** 9)), 3)
+        self.assertEqual(len(self.rollups.top_products(n=0)), 1)
+        self.assertEqual([p['product_id'] for p in self.rollups.top_products(n=5, category='Shoes')], ['p3', 'p2'])
+        for n in range(1, 2 * rollups_module.TOP_CACHE_SIZE):
+            self.rollups.top_products(n=n, category=f'c{n}')
+        self.assertLessEqual(len(self.rollups._top_cache), rollups_module.TOP_CACHE_SIZE)
+
+    def test_set_categories_for_uncategorized_products(self):
+        """Sản phẩm ghi trước khi có danh mục được gán danh mục về sau và có trong top-N theo danh mục"""
+        self.rollups.ingest(reviews_to_table([_review('r5', 'p4', 'positive', '2023-06-01T08:00:00', category=None)]))
+        self.assertEqual(self.rollups.uncategorized(), ['p4'])
+        self.assertEqual(self.rollups.top_products(n=5, category='Toys'), [])
+        self.rollups.set_categories({'p4': 'Toys', 'p9': 'Toys'})
+        self.assertEqual(self.rollups.uncategorized(), [])
+        self.assertEqual([p['product_id'] for p in self.rollups.top_products(n=5, category='toys')], ['p4'])
+
+    def test_over_time(self):
+        """Bộ đếm theo tháng và năm"""
+        monthly = self.rollups.over_time('month')
+        self.assertEqual(monthly['time_periods'], ['2023-04', '2023-05'])
+        self.assertEqual(monthly['positive'], [1, 1])
+        self.assertEqual(monthly['review_count'], [1, 3])
+        self.assertAlmostEqual(monthly['sentiment_score'][1], 0.5)
+        self.assertEqual(self.rollups.over_time('year')['review_count'], [4])
+        self.assertEqual(self.rollups.over_time('week')['time_periods'][0], '2023-W15')
+        with self.assertRaises(ValueError):
+            self.rollups.over_time('hour')
+
+
+class TestStoreRollups(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = ReviewSentimentStore(self.root, compact_files=100)
+        self.rollups = StoreRollups(self.store)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_refresh_reads_only_new_files(self):
+        """Chỉ file mới được nạp; phiên bản đổi khi kho đổi"""
+        self.store.append([_review('r1', 'p1', 'positive', '2023-04-10T08:00:00')])
+        self.assertEqual(self.rollups.refresh().distribution()['positive'], 1)
+        version = self.rollups.version
+
+        self.assertEqual(self.rollups.refresh().distribution()['positive'], 1)
+        self.assertEqual(self.rollups.version, version)
+
+        self.store.append([_review('r2', 'p1', 'negative', '2023-04-11T08:00:00')])
+        self.assertEqual(self.rollups.refresh().distribution(), {'positive': 1, 'neutral': 0, 'negative': 1})
+        self.assertNotEqual(self.rollups.version, version)
+
+    def test_rebuild_after_compaction(self):
+        """Gộp file không làm đếm trùng"""
+        for i in range(3):
+            self.store.append([_review(f'r{i}', 'p1', 'positive', '2023-04-10T08:00:00')])
+        self.rollups.refresh()
+        self.store.compact()
+        self.assertEqual(self.rollups.refresh().distribution()['positive'], 3)
+        self.assertEqual(len(self.store.files()), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
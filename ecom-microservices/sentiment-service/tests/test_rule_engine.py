@@ -0,0 +1,76 @@
+import unittest
+
+from src.models.rule_engine import RuleEngine, tokenize
+
+
+class TestRuleEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Trie chỉ cần xây một lần cho cả test case"""
+        cls.engine = RuleEngine()
+
+    def test_positive_and_negative(self):
+        """Từ cảm xúc đơn lẻ tiếng Anh"""
+        self.assertEqual(self.engine.analyze("This product is excellent!")['sentiment'], 'positive')
+        self.assertEqual(self.engine.analyze("This product is terrible!")['sentiment'], 'negative')
+
+    def test_neutral(self):
+        """Không có từ cảm xúc nào thì trung tính"""
+        result = self.engine.analyze("I received the package yesterday.")
+        self.assertEqual(result['sentiment'], 'neutral')
+        self.assertEqual(result['score'], 0.5)
+
+    def test_negation_window(self):
+        """Từ phủ định đảo cực của từ cảm xúc trong cửa sổ phía sau"""
+        self.assertEqual(self.engine.analyze("This is not bad at all.")['sentiment'], 'positive')
+        self.assertEqual(self.engine.analyze("I don't love this product.")['sentiment'], 'negative')
+        self.assertEqual(self.engine.analyze("It is not very good.")['sentiment'], 'negative')
+
+    def test_negation_outside_window(self):
+        """Từ cảm xúc nằm ngoài cửa sổ phủ định giữ nguyên cực"""
+        engine = RuleEngine(negation_window=1)
+        result = engine.analyze("Not what I expected but the screen is great")
+        self.assertEqual(result['sentiment'], 'positive')
+
+    def test_intensifier(self):
+        """Từ tăng cường làm tăng điểm tin cậy"""
+        regular = self.engine.analyze("This is good and bad and fine")
+        intensified = self.engine.analyze("This is very good and bad and fine")
+        self.assertEqual(regular['sentiment'], 'neutral')
+        self.assertEqual(intensified['sentiment'], 'positive')
+
+    def test_vietnamese_phrases(self):
+        """Cụm nhiều từ tiếng Việt được khớp nguyên cụm"""
+        self.assertEqual(self.engine.analyze("Sản phẩm tuyệt vời", 'vi')['sentiment'], 'positive')
+        self.assertEqual(self.engine.analyze("Tôi không hài lòng với chất lượng", 'vi')['sentiment'], 'negative')
+        self.assertEqual(self.engine.analyze("Không tệ chút nào", 'vi')['sentiment'], 'positive')
+
+    def test_vietnamese_lexicon_only_for_vi(self):
+        """Từ điển tiếng Việt chỉ bật khi văn bản là tiếng Việt"""
+        self.assertEqual(self.engine.analyze("tuyệt vời", 'en')['sentiment'], 'neutral')
+
+    def test_extra_lexicon(self):
+        """Từ điển bổ sung theo định dạng sentiment_keywords.json"""
+        engine = RuleEngine({'positive_words': ['stellar'], 'negative_words': ['meh']})
+        self.assertEqual(engine.analyze("A stellar purchase")['sentiment'], 'positive')
+        self.assertEqual(engine.analyze("Pretty meh")['sentiment'], 'negative')
+
+    def test_analyze_batch(self):
+        """Phân tích theo batch giữ đúng thứ tự và ngôn ngữ từng văn bản"""
+        results = self.engine.analyze_batch(
+            ["Great!", "Rất thất vọng", "Okay."], ['en', 'vi', 'en']
+        )
+        self.assertEqual([r['sentiment'] for r in results], ['positive', 'negative', 'neutral'])
+        self.assertEqual(results[1]['text'], "Rất thất vọng")
+
+    def test_empty_text(self):
+        """Văn bản rỗng trả về trung tính"""
+        self.assertEqual(self.engine.analyze("")['sentiment'], 'neutral')
+
+    def test_tokenize(self):
+        """Tách token giữ dạng rút gọn và chuẩn hóa chữ thường"""
+        self.assertEqual(tokenize("Don't BUY it"), ["don't", 'buy', 'it'])
+
+
+if __name__ == '__main__':
+    unittest.main()
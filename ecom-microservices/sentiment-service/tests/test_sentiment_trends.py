@@ -0,0 +1,93 @@
+import unittest
+
+import pandas as pd
+
+from src.analytics.sentiment_trends import SentimentTrendAnalyzer
+
+
+def _review(review_id, product_id, label, rating, created_at='2023-05-01'):
+    return {
+        'id': review_id,
+        'product_id': product_id,
+        'user_id': f'u{review_id}',
+        'rating': rating,
+        'created_at': created_at,
+        'sentiment': {'label': label, 'score': 0.9}
+    }
+
+
+class TestSentimentTrendAnalyzer(unittest.TestCase):
+    def setUp(self):
+        """Thiết lập cho mỗi test case"""
+        self.reviews = [
+            _review(1, 'p1', 'positive', 5),
+            _review(2, 'p1', 'positive', 4),
+            _review(3, 'p1', 'negative', 1, '2023-06-02'),
+            _review(4, 'p2', 'neutral', 3),
+            _review(5, 'p2', 'negative', 2, '2023-06-03'),
+            _review(6, 'p3', 'positive', 5),
+            {'id': 7, 'product_id': 'p3', 'rating': 1},  # Không có sentiment, bị bỏ qua
+        ]
+        self.analyzer = SentimentTrendAnalyzer(self.reviews)
+
+    def test_dataframe_columns(self):
+        """DataFrame dựng theo cột với kiểu categorical cho sentiment và product_id"""
+        df = self.analyzer.df
+        self.assertEqual(len(df), 6)
+        self.assertEqual(df['sentiment'].dtype.name, 'category')
+        self.assertEqual(df['product_id'].dtype.name, 'category')
+        self.assertEqual(list(df['sentiment'].cat.categories), ['positive', 'neutral', 'negative'])
+        self.assertEqual(df['sentiment_value'].tolist(), [1.0, 1.0, 0.0, 0.5, 0.0, 1.0])
+
+    def test_sentiment_distribution(self):
+        """Phân phối cảm xúc có đủ ba nhãn"""
+        self.assertEqual(
+            self.analyzer.get_sentiment_distribution(),
+            {'positive': 3, 'neutral': 1, 'negative': 2}
+        )
+
+    def test_compare_products(self):
+        """So sánh sản phẩm giữ thứ tự yêu cầu và bỏ qua sản phẩm không có review"""
+        comparison = self.analyzer.compare_products(['p2', 'p1', 'missing'])
+        self.assertEqual(list(comparison.keys()), ['p2', 'p1'])
+
+        p1 = comparison['p1']
+        self.assertEqual(p1['total_reviews'], 3)
+        self.assertEqual((p1['positive'], p1['neutral'], p1['negative']), (2, 0, 1))
+        self.assertAlmostEqual(p1['sentiment_score'], 2 / 3)
+        self.assertAlmostEqual(p1['negative_pct'], 100 / 3)
+        self.assertAlmostEqual(p1['avg_rating'], 10 / 3)
+        self.assertAlmostEqual(comparison['p2']['sentiment_score'], 0.25)
+
+    def test_top_products(self):
+        """Top sản phẩm được xếp hạng theo tiêu chí"""
+        top = self.analyzer.get_top_products(n=2)
+        self.assertEqual(top['product_id'].tolist(), ['p3', 'p1'])
+        self.assertEqual(top['positive_count'].tolist(), [1, 2])
+
+        by_negative = self.analyzer.get_top_products(n=1, by='negative_count')
+        self.assertEqual(by_negative['product_id'].tolist(), ['p1'])
+
+    def test_sentiment_by_rating(self):
+        """Bảng rating x cảm xúc có đủ cột và tỷ lệ phần trăm"""
+        table = self.analyzer.get_sentiment_by_rating()
+        self.assertEqual(table.loc[5, 'positive'], 2)
+        self.assertEqual(table.loc[1, 'negative'], 1)
+        self.assertEqual(table.loc[3, 'neutral_pct'], 100)
+
+    def test_sentiment_over_time(self):
+        """Điểm cảm xúc trung bình theo tháng"""
+        result = self.analyzer.get_sentiment_score_over_time(time_unit='month')
+        self.assertEqual(result['review_count'].tolist(), [4, 2])
+        self.assertEqual(result['avg_sentiment'].tolist(), [0.875, 0.0])
+
+    def test_empty(self):
+        """Không có review có sentiment thì trả về kết quả rỗng"""
+        analyzer = SentimentTrendAnalyzer([{'id': 1}])
+        self.assertTrue(analyzer.df.empty)
+        self.assertEqual(analyzer.compare_products(['p1']), {})
+        self.assertIsInstance(analyzer.get_top_products(), pd.DataFrame)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ShoeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shoe'
+
+    def ready(self):
+        from .product_cache import connect_signals
+        connect_signals()
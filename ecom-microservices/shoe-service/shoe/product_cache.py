@@ -0,0 +1,54 @@
+"""
+Báo product-service xóa chi tiết giày đã cache khi giày được tạo, sửa hoặc xóa.
+
+product-service cache chi tiết theo product_id và dùng nó cho ETag của trang chi tiết sản phẩm;
+nếu không được báo, khách hàng tiếp tục nhận thông tin giày cũ (kể cả 304) tới khi cache hết
+hạn. Request được gửi trong luồng nền sau khi transaction commit nên không làm chậm request
+ghi; lỗi chỉ được ghi log, cache của product-service vẫn tự hết hạn.
+"""
+
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Shoe
+
+logger = logging.getLogger(__name__)
+
+# Timeout (giây) khi gọi product-service
+INVALIDATE_TIMEOUT = 2
+
+
+def _invalidate(product_id):
+    try:
+        response = requests.post(
+            f"{settings.PRODUCT_SERVICE_URL}/products/{product_id}/invalidate_details/",
+            timeout=INVALIDATE_TIMEOUT
+        )
+        if response.status_code >= 400:
+            logger.warning(f"Product details invalidation for {product_id} failed with status {response.status_code}")
+    except requests.RequestException as e:
+        logger.warning(f"Error invalidating product details for {product_id}: {str(e)}")
+
+
+def invalidate_product_details(product_id):
+    """Xóa chi tiết đã cache của sản phẩm ở product-service sau khi transaction hiện tại commit"""
+    def send():
+        threading.Thread(
+            target=_invalidate, args=(product_id,), name='product-details-invalidate', daemon=True
+        ).start()
+
+    transaction.on_commit(send)
+
+
+def _on_shoe_changed(sender, instance, **kwargs):
+    invalidate_product_details(instance.product_id)
+
+
+def connect_signals():
+    post_save.connect(_on_shoe_changed, sender=Shoe, dispatch_uid='product-details-save')
+    post_delete.connect(_on_shoe_changed, sender=Shoe, dispatch_uid='product-details-delete')
@@ -1,5 +1,6 @@
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Shoe
@@ -14,4 +15,12 @@ class ShoeViewSet(viewsets.ModelViewSet):
         product_id = kwargs.get('pk')  # Lấy product_id từ URL
         shoe = get_object_or_404(Shoe, product_id=product_id)
         serializer = ShoeSerializer(shoe)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"])
+    def batch(self, request):
+        """Lấy thông tin giày của nhiều sản phẩm: ?ids=product_id1,product_id2"""
+        ids = [i for i in request.query_params.get("ids", "").split(",") if i]
+        shoes = Shoe.objects.filter(product_id__in=ids)
+        serializer = ShoeSerializer(shoes, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)